@@ -1,84 +1,99 @@
+import importlib
 from .version import version
-from pytplot import data_exists
-from pytplot import tnames
-from pytplot import time_string, time_datetime
-from pytplot import time_float, time_double
-from .utilities.tcopy import tcopy
-from pytplot import tkm2re
-
-from .analysis.avg_data import avg_data
-from pytplot import clean_spikes
-from .analysis.deriv_data import deriv_data
-from .analysis.dpwrspc import dpwrspc
-from pytplot import subtract_average
-from pytplot import subtract_median
-from pytplot import time_clip
-from .analysis.tdeflag import tdeflag
-from .analysis.tdpwrspc import tdpwrspc
-from .analysis.tinterpol import tinterpol
-from pytplot import tnormalize
-from pytplot import tdotp
-from pytplot import tcrossp
-from pytplot import tsmooth
-from .analysis.yclip import yclip
-from .analysis.twavpol import twavpol
-from pytplot import cdf_to_tplot
-
-from .cotrans.cotrans import cotrans
-from .cotrans.cotrans_get_coord import cotrans_get_coord
-from .cotrans.cotrans_set_coord import cotrans_set_coord
-from .cotrans.tvector_rotate import tvector_rotate
-from .cotrans.cart2spc import cart2spc
-from .cotrans.spc2cart import spc2cart
-from .cotrans.sm2mlt import sm2mlt
-
-from .mms import mms_load_mec, mms_load_fgm, mms_load_scm, mms_load_edi, \
-    mms_load_edp, mms_load_eis, mms_load_feeps, \
-    mms_load_hpca, mms_load_fpi, mms_load_aspoc, \
-    mms_load_dsp, mms_load_fsm, mms_load_state
-from .mms.feeps.mms_feeps_pad import mms_feeps_pad
-from .mms.feeps.mms_feeps_gpd import mms_feeps_gpd
-from .mms.eis.mms_eis_pad import mms_eis_pad
-from .mms.hpca.mms_hpca_calc_anodes import mms_hpca_calc_anodes
-from .mms.hpca.mms_hpca_spin_sum import mms_hpca_spin_sum
-
-from .maven import maven_load
-from .sosmag.load import sosmag_load
-
-from . import erg
-from . import ulysses
-from . import mica
-from . import goes
-from . import themis
-from . import omni
-from . import dscovr
-from . import psp
-from . import poes
-from . import rbsp
-from . import ace
-from . import wind
-from . import csswe
-from . import cluster
-from . import geotail
-from . import twins
-from . import stereo
-from . import image
-from . import polar
-from . import fast
-from . import equator_s
-from . import solo
-from . import secs
-from . import kyoto
-from . import swarm
-from . import vires
-from . import cnofs
-from . import lanl
-from . import st5
-from . import de2
-from . import akebono
-from . import soho
-from . import barrel
-from . import elfin
+
+# The analysis routines, the mission load routines and the mission subpackages
+# are imported the first time they're used (PEP 562), so that 'import pyspedas'
+# doesn't import pytplot, scipy, astropy, cdflib, netCDF4, etc., up front.
+
+# names available at the top level, and the modules they're imported from
+_lazy_names = {
+    'data_exists': 'pytplot',
+    'tnames': 'pytplot',
+    'time_string': 'pytplot',
+    'time_datetime': 'pytplot',
+    'time_float': 'pytplot',
+    'time_double': 'pytplot',
+    'tcopy': '.utilities.tcopy',
+    'tkm2re': 'pytplot',
+
+    'avg_data': '.analysis.avg_data',
+    'clean_spikes': 'pytplot',
+    'deriv_data': '.analysis.deriv_data',
+    'dpwrspc': '.analysis.dpwrspc',
+    'subtract_average': 'pytplot',
+    'subtract_median': 'pytplot',
+    'time_clip': 'pytplot',
+    'tdeflag': '.analysis.tdeflag',
+    'tdpwrspc': '.analysis.tdpwrspc',
+    'tinterpol': '.analysis.tinterpol',
+    'tnormalize': 'pytplot',
+    'tdotp': 'pytplot',
+    'tcrossp': 'pytplot',
+    'tsmooth': 'pytplot',
+    'yclip': '.analysis.yclip',
+    'twavpol': '.analysis.twavpol',
+    'cdf_to_tplot': 'pytplot',
+
+    'cotrans': '.cotrans.cotrans',
+    'cotrans_get_coord': '.cotrans.cotrans_get_coord',
+    'cotrans_set_coord': '.cotrans.cotrans_set_coord',
+    'tvector_rotate': '.cotrans.tvector_rotate',
+    'cart2spc': '.cotrans.cart2spc',
+    'spc2cart': '.cotrans.spc2cart',
+    'sm2mlt': '.cotrans.sm2mlt',
+
+    'mms_load_mec': '.mms',
+    'mms_load_fgm': '.mms',
+    'mms_load_scm': '.mms',
+    'mms_load_edi': '.mms',
+    'mms_load_edp': '.mms',
+    'mms_load_eis': '.mms',
+    'mms_load_feeps': '.mms',
+    'mms_load_hpca': '.mms',
+    'mms_load_fpi': '.mms',
+    'mms_load_aspoc': '.mms',
+    'mms_load_dsp': '.mms',
+    'mms_load_fsm': '.mms',
+    'mms_load_state': '.mms',
+    'mms_feeps_pad': '.mms.feeps.mms_feeps_pad',
+    'mms_feeps_gpd': '.mms.feeps.mms_feeps_gpd',
+    'mms_eis_pad': '.mms.eis.mms_eis_pad',
+    'mms_hpca_calc_anodes': '.mms.hpca.mms_hpca_calc_anodes',
+    'mms_hpca_spin_sum': '.mms.hpca.mms_hpca_spin_sum',
+
+    'maven_load': '.maven',
+    'sosmag_load': '.sosmag.load',
+}
+
+# subpackages available at the top level
+_lazy_subpackages = ['erg', 'ulysses', 'mica', 'goes', 'themis', 'omni', 'dscovr', 'psp', 'poes', 'rbsp',
+                     'ace', 'wind', 'csswe', 'cluster', 'geotail', 'twins', 'stereo', 'image', 'polar',
+                     'fast', 'equator_s', 'solo', 'secs', 'kyoto', 'swarm', 'vires', 'cnofs', 'lanl',
+                     'st5', 'de2', 'akebono', 'soho', 'barrel', 'elfin',
+                     'analysis', 'utilities', 'particles', 'mms', 'maven', 'sosmag', 'hapi', 'geopack']
+
+__all__ = ['version'] + list(_lazy_names) + _lazy_subpackages
+
+# 'cotrans' is both a function and a subpackage; import the (empty) subpackage now,
+# so that importing its modules later doesn't replace the function at the top level
+importlib.import_module('.cotrans', __name__)
+globals().pop('cotrans', None)
+
+
+def __getattr__(name):
+    if name in _lazy_names:
+        value = getattr(importlib.import_module(_lazy_names[name], __name__), name)
+    elif name in _lazy_subpackages:
+        value = importlib.import_module('.' + name, __name__)
+    else:
+        raise AttributeError("module '" + __name__ + "' has no attribute '" + name + "'")
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
+
 
 # set up logging/console output
 import logging
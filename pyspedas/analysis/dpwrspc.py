@@ -9,6 +9,10 @@ Similar to dpwrspc.pro in IDL SPEDAS.
 import logging
 import numpy as np
 
+# Maximum number of data points (spectra x points per spectrum)
+# transformed at once by dpwrspc
+DPWRSPC_CHUNK_POINTS = 2**22
+
 
 def dpwrspc(time, quantity, nboxpoints=256, nshiftpoints=128, binsize=3,
             nohanning=False, noline=False, notperhz=False, notmvariance=False,
@@ -16,6 +20,9 @@ def dpwrspc(time, quantity, nboxpoints=256, nshiftpoints=128, binsize=3,
     """
     Compute power spectra.
 
+    The spectra are detrended, windowed and transformed together, in
+    chunks of up to DPWRSPC_CHUNK_POINTS data points.
+
     Parameters
     ----------
     time: list of float
@@ -65,8 +72,8 @@ def dpwrspc(time, quantity, nboxpoints=256, nshiftpoints=128, binsize=3,
 
     # remove NaNs from the data
     where_finite = np.where(np.isnan(quantity) == False)
-    quantity2process = quantity[where_finite[0]]
-    times2process = time[where_finite[0]]
+    quantity2process = np.asarray(quantity[where_finite[0]], dtype=np.float64)
+    times2process = np.asarray(time[where_finite[0]], dtype=np.float64)
     nboxpnts = int(nboxpoints)
     nshiftpnts = nshiftpoints
 
@@ -95,93 +102,96 @@ def dpwrspc(time, quantity, nboxpoints=256, nshiftpoints=128, binsize=3,
     dps = np.zeros([nspectra, nfreqs])
     fdps = np.zeros([nspectra, nfreqs])
 
-    for nthspectrum in range(0, nspectra):
-        nbegin = int(nthspectrum*nshiftpnts)
-        nend = nbegin + nboxpnts
+    bign = nboxpnts
+
+    if bign % 2 != 0:
+        logging.warning('dpwrspc: needs an even number of data points, dropping last point...')
+        bign = bign - 1
 
-        if nend <= totalpoints:
-            t = times2process[nbegin:nend]
-            t0 = t[0]
-            t = t - t0
-            x = quantity2process[nbegin:nend]
+    # time variance can break power spectrum
+    # this keyword skips over those gaps
+    if tm_sensitivity is not None:
+        tmsn = tm_sensitivity
+    else:
+        tmsn = 100.0
 
-            # Use center time
-            tdps[nthspectrum] = (times2process[nbegin]+times2process[nend-1])/2.0
+    # following Numerical recipes in Fortran, p. 421, sort of...
+    # (actually following the IDL implementation)
+    k = np.arange(int(bign/2)+1)
+    npwr = int(bign/2)
+    nfinal = int(npwr/binsize)
+
+    if nohanning is False:
+        wss = bign*np.sum(window**2)
 
-            if noline is False:
-                coef = np.polyfit(t, x, 1)
-                poly1d_fn = np.poly1d(coef)
-                line = poly1d_fn(t)
-                x = x - line
+    # all of the spectra that fit in the data, as rows of a strided view
+    nthspectra = np.argwhere(nend <= totalpoints).flatten()
+    nbegin = nbegin[nthspectra]
+    t_windows = np.lib.stride_tricks.sliding_window_view(times2process, nboxpnts)
+    x_windows = np.lib.stride_tricks.sliding_window_view(quantity2process, nboxpnts)
 
-            if nohanning is False:
-                x = x*window
+    # the spectra are calculated in chunks to limit the memory used
+    chunk_size = max(1, DPWRSPC_CHUNK_POINTS // nboxpnts)
 
-            bign = nboxpnts
+    for start in range(0, len(nthspectra), chunk_size):
+        rows = nthspectra[start:start+chunk_size]
+        begins = nbegin[start:start+chunk_size]
 
-            if bign % 2 != 0:
-                logging.warning('dpwrspc: needs an even number of data points,\
-                      dropping last point...')
-                t = t[0:bign-1]
-                x = x[0:bign-1]
-                bign = bign - 1
+        t = t_windows[begins]
+        t = t - t[:, 0:1]
+        x = x_windows[begins]
 
-            n_tm = len(t)
+        # Use center time
+        tdps[rows] = (times2process[begins]+times2process[begins+nboxpnts-1])/2.0
 
-            # time variance can break power spectrum
-            # this keyword skips over those gaps
-            if notmvariance and n_tm > 1:
-                if tm_sensitivity is not None:
-                    tmsn = tm_sensitivity
-                else:
-                    tmsn = 100.0
+        if noline is False:
+            # subtract the least squares straight line from each spectrum
+            t_mean = np.mean(t, axis=1, keepdims=True)
+            x_mean = np.mean(x, axis=1, keepdims=True)
+            slope = (np.sum((t-t_mean)*(x-x_mean), axis=1, keepdims=True) /
+                     np.sum((t-t_mean)**2, axis=1, keepdims=True))
+            x = x - (x_mean + slope*(t-t_mean))
 
-                tdiff = t[1:n_tm]-t[0:n_tm-1]
-                med_diff = np.median(tdiff)
+        if nohanning is False:
+            x = x*window
 
-                idx = np.where(np.abs(tdiff/med_diff-1) > 1.0/tmsn)
+        t = t[:, 0:bign]
+        x = x[:, 0:bign]
 
-                if len(idx[0]) > 0:
-                    dps[nthspectrum, :] = float('nan')
-                    fdps[nthspectrum, :] = float('nan')
+        tdiff = t[:, 1:] - t[:, 0:-1]
+        tres = np.median(tdiff, axis=1)
 
-                    continue
+        if notmvariance and bign > 1:
+            variable = np.any(np.abs(tdiff/tres[:, np.newaxis]-1) > 1.0/tmsn, axis=1)
+        else:
+            variable = np.zeros(len(rows), dtype=bool)
 
-            # following Numerical recipes in Fortran, p. 421, sort of...
-            # (actually following the IDL implementation)
-            k = np.array(range(int(bign/2)+1))
-            tres = np.median(t[1:len(t)] - t[0:len(t)-1])
-            fk = k/(bign*tres)
+        fk = k[np.newaxis, :]/(bign*tres[:, np.newaxis])
 
-            xs2 = np.abs(np.fft.fft(x))**2
+        # the power at the positive and negative frequencies is combined
+        xs2 = np.abs(np.fft.rfft(x, axis=1))**2
 
-            pwr = np.zeros(int(bign/2+1))
-            pwr[0] = xs2[0]/bign**2
-            ptmp = (1+np.array(range(int(bign/2-1))))
-            pwr[1:int(bign/2)] = (xs2[1:int(bign/2)] + xs2[bign-ptmp])/bign**2
-            pwr[int(bign/2)] = xs2[int(bign/2)]/bign**2
+        pwr = xs2/bign**2
+        pwr[:, 1:int(bign/2)] = 2*pwr[:, 1:int(bign/2)]
 
-            if nohanning is False:
-                wss = bign*np.sum(window**2)
-                pwr = bign**2*pwr/wss
+        if nohanning is False:
+            pwr = bign**2*pwr/wss
 
-            dfreq = binsize*(fk[1]-fk[0])
+        dfreq = binsize*(fk[:, 1]-fk[:, 0])
 
-            npwr = len(pwr)-1
-            nfinal = int(npwr/binsize)
-            iarray = np.array(range(nfinal))
-            power = np.zeros(nfinal)
+        # Note: zeroth point includes zero freq. power.
+        iarray = np.arange(nfinal)
+        freqcenter = (fk[:, iarray*binsize+1]+fk[:, iarray*binsize+binsize])/2.
 
-            # Note: zeroth point includes zero freq. power.
-            freqcenter = (fk[iarray*binsize+1]+fk[iarray*binsize+binsize])/2.
+        power = np.sum(pwr[:, 1:nfinal*binsize+1].reshape(len(rows), nfinal, binsize), axis=2)
 
-            for i in range(binsize):
-                power = power+pwr[iarray*binsize+i+1]
+        if notperhz is False:
+            power = power/dfreq[:, np.newaxis]
 
-            if notperhz is False:
-                power = power/dfreq
+        power[variable] = float('nan')
+        freqcenter[variable] = float('nan')
 
-            dps[nthspectrum, :] = power
-            fdps[nthspectrum, :] = freqcenter
+        dps[rows, :] = power
+        fdps[rows, :] = freqcenter
 
     return tdps, fdps, dps
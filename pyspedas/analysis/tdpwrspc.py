@@ -10,6 +10,7 @@ Similar to tdpwrspc.pro in IDL SPEDAS.
 """
 import logging
 import numpy as np
+from concurrent.futures import ProcessPoolExecutor
 from .dpwrspc import dpwrspc
 from pytplot import get_data, store_data, options, split_vec
 from pyspedas import time_double
@@ -17,7 +18,7 @@ from pyspedas import time_double
 
 def tdpwrspc(varname, newname=None, nboxpoints=None, nshiftpoints=None,
              binsize=3, nohanning=False, noline=False, notperhz=False,
-             trange=None, notmvariance=False):
+             trange=None, notmvariance=False, nprocs=None):
     """
     Compute power spectra for a tplot variable.
 
@@ -49,6 +50,10 @@ def tdpwrspc(varname, newname=None, nboxpoints=None, nshiftpoints=None,
         If True, replace output spectrum for any windows that have variable.
         cadence with NaNs.
         The default is False.
+    nprocs: int, optional
+        Number of processes used to calculate the spectra of the components
+        of a multi-dimensional variable; by default, the components are
+        processed one at a time in this process.
 
     Returns
     -------
@@ -64,6 +69,14 @@ def tdpwrspc(varname, newname=None, nboxpoints=None, nshiftpoints=None,
     if data_tuple is not None:
         if data_tuple[1][0].shape != ():
             split_vars = split_vec(varname)
+            if nprocs is not None and nprocs > 1 and len(split_vars) > 1:
+                return _tdpwrspc_components(split_vars, nprocs,
+                                            nboxpoints=nboxpoints,
+                                            nshiftpoints=nshiftpoints,
+                                            binsize=binsize,
+                                            nohanning=nohanning,
+                                            noline=noline, notperhz=notperhz,
+                                            notmvariance=notmvariance)
             out_vars = []
             for var in split_vars:
                 out_vars.append(tdpwrspc(var, newname=var + '_dpwrspc',
@@ -75,45 +88,10 @@ def tdpwrspc(varname, newname=None, nboxpoints=None, nshiftpoints=None,
                                          notmvariance=notmvariance))
             return out_vars
         else:
-            t = data_tuple[0]
-            y = data_tuple[1]
-            if trange is not None:
-                tr = time_double(trange)
-                ok = np.argwhere((t >= tr[0]) & (t < tr[1]))
-                if len(ok) == 0:
-                    logging.error('No data in time range')
-                    logging.error(f'{tr}')
-                    return
-                t = t[ok]
-                y = y[ok]
-
-            # filter out NaNs
-            ok = np.isfinite(y)
-            if len(ok) == 0:
-                logging.error('No finite data in time range')
-                return
-            t = t[ok]
-            y = y[ok]
-
-            t00 = data_tuple[0][0]
-            t = t - t00
-
-            # Only do this if there are enough data points, default nboxpoints to
-            # 64 and nshiftpoints to 32, and use larger values when there are more
-            # points
-            if nboxpoints is None:
-                nbp = np.max([2**(np.floor(np.log(len(ok)) / np.log(2)) - 5), 8])
-            else:
-                nbp = nboxpoints
-
-            if nshiftpoints is None:
-                nsp = nbp/2.0
-            else:
-                nsp = nshiftpoints
-
-            if len(ok) <= nbp:
-                logging.error('Not enough data in time range')
+            inputs = _tdpwrspc_inputs(data_tuple, trange, nboxpoints, nshiftpoints)
+            if inputs is None:
                 return
+            t, y, t00, nbp, nsp = inputs
 
             pwrspc = dpwrspc(t, y,
                              nboxpoints=nbp,
@@ -123,13 +101,89 @@ def tdpwrspc(varname, newname=None, nboxpoints=None, nshiftpoints=None,
                              noline=noline, notperhz=notperhz,
                              notmvariance=notmvariance)
 
-            if pwrspc is not None:
-                store_data(newname, data={'x': pwrspc[0] + t00,
-                                          'y': pwrspc[2],
-                                          'v': pwrspc[1]})
-                options(newname, 'spec', True)
-                options(newname, 'ylog', True)
-                options(newname, 'zlog', True)
-                options(newname, 'Colormap', 'spedas')
-                # options(newname, 'yrange', [0.01, 16])
+            _tdpwrspc_store(newname, pwrspc, t00)
         return newname
+
+
+def _tdpwrspc_inputs(data_tuple, trange, nboxpoints, nshiftpoints):
+    """
+    Select the finite data to process, and the number of points per spectrum
+    """
+    t = data_tuple[0]
+    y = data_tuple[1]
+    if trange is not None:
+        tr = time_double(trange)
+        ok = np.argwhere((t >= tr[0]) & (t < tr[1]))
+        if len(ok) == 0:
+            logging.error('No data in time range')
+            logging.error(f'{tr}')
+            return
+        t = t[ok]
+        y = y[ok]
+
+    # filter out NaNs
+    ok = np.isfinite(y)
+    if len(ok) == 0:
+        logging.error('No finite data in time range')
+        return
+    t = t[ok]
+    y = y[ok]
+
+    t00 = data_tuple[0][0]
+    t = t - t00
+
+    # Only do this if there are enough data points, default nboxpoints to
+    # 64 and nshiftpoints to 32, and use larger values when there are more
+    # points
+    if nboxpoints is None:
+        nbp = np.max([2**(np.floor(np.log(len(ok)) / np.log(2)) - 5), 8])
+    else:
+        nbp = nboxpoints
+
+    if nshiftpoints is None:
+        nsp = nbp/2.0
+    else:
+        nsp = nshiftpoints
+
+    if len(ok) <= nbp:
+        logging.error('Not enough data in time range')
+        return
+
+    return t, y, t00, nbp, nsp
+
+
+def _tdpwrspc_store(newname, pwrspc, t00):
+    """
+    Save the power spectrum as a tplot spectrogram
+    """
+    if pwrspc is not None:
+        store_data(newname, data={'x': pwrspc[0] + t00,
+                                  'y': pwrspc[2],
+                                  'v': pwrspc[1]})
+        options(newname, 'spec', True)
+        options(newname, 'ylog', True)
+        options(newname, 'zlog', True)
+        options(newname, 'Colormap', 'spedas')
+        # options(newname, 'yrange', [0.01, 16])
+
+
+def _tdpwrspc_components(split_vars, nprocs, nboxpoints=None, nshiftpoints=None, **kwargs):
+    """
+    Compute the power spectra of the components of a variable on a process pool
+    """
+    out_vars = [None]*len(split_vars)
+    futures = {}
+    with ProcessPoolExecutor(max_workers=nprocs) as executor:
+        for idx, var in enumerate(split_vars):
+            inputs = _tdpwrspc_inputs(get_data(var), None, nboxpoints, nshiftpoints)
+            if inputs is None:
+                continue
+            t, y, t00, nbp, nsp = inputs
+            futures[idx] = (executor.submit(dpwrspc, t, y, nboxpoints=nbp, nshiftpoints=nsp, **kwargs), t00)
+
+        for idx, (future, t00) in futures.items():
+            newname = split_vars[idx] + '_dpwrspc'
+            _tdpwrspc_store(newname, future.result(), t00)
+            out_vars[idx] = newname
+
+    return out_vars
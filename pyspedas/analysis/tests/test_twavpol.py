@@ -8,7 +8,8 @@ import numpy as np
 
 from pytplot import data_exists
 
-from pyspedas.analysis.twavpol import twavpol
+from pyspedas.analysis import twavpol as twavpol_module
+from pyspedas.analysis.twavpol import twavpol, wavpol
 
 class TwavpolDataValidation(unittest.TestCase):
     """ Compares cotrans results between Python and IDL """
@@ -108,5 +109,59 @@ class TwavpolDataValidation(unittest.TestCase):
         #pytplot.tplot('thc_scf_fac_helict')
 
 
+class WavpolSyntheticTestCases(unittest.TestCase):
+    """ Checks wavpol results for a synthetic circularly polarized wave """
+
+    def setUp(self):
+        rng = np.random.default_rng(12)
+        self.ct = np.arange(8192)/16.0
+        # gap in the data, to give two batches
+        self.ct[5000:] += 60.0
+        phase = 2*np.pi*1.0*np.arange(8192)/16.0
+        self.bx = np.cos(phase) + 0.05*rng.normal(size=8192)
+        self.by = np.sin(phase) + 0.05*rng.normal(size=8192)
+        self.bz = 0.05*rng.normal(size=8192)
+        self.bx[1000:1003] = np.nan
+
+    def test_circular_wave(self):
+        """ The wave is fully polarized, with its wave vector along Z """
+        timeline, freqline, powspec, degpol, waveangle, elliptict, helict, pspec3, err_flag = wavpol(self.ct, self.bx, self.by, self.bz)
+        self.assertEqual(err_flag, 0)
+        self.assertEqual(powspec.shape, (len(timeline), 128))
+        ifreq = np.argmax(np.nanmean(powspec, axis=0))
+        assert_allclose(freqline[ifreq], 1.0)
+        good = np.isfinite(timeline)
+        self.assertTrue(np.all(degpol[good, ifreq][powspec[good, ifreq] > 0] > 0.95))
+        self.assertTrue(np.all(waveangle[good, ifreq][powspec[good, ifreq] > 0] < 0.1))
+
+    def test_chunks(self):
+        """ The results don't depend on the number of FFTs processed at once """
+        expected = wavpol(self.ct, self.bx, self.by, self.bz, nopfft=128, bin_freq=5)
+        chunk_size = twavpol_module.WAVPOL_CHUNK_SIZE
+        try:
+            twavpol_module.WAVPOL_CHUNK_SIZE = 7
+            actual = wavpol(self.ct, self.bx, self.by, self.bz, nopfft=128, bin_freq=5)
+        finally:
+            twavpol_module.WAVPOL_CHUNK_SIZE = chunk_size
+        for expected_values, actual_values in zip(expected, actual):
+            assert_allclose(actual_values, expected_values)
+
+    def test_unfilled_rows(self):
+        """ The leap frog row after each batch is zeros; rows left over at the end are NaN """
+        # the NaNs reduce the number of FFTs in the first batch, so that some rows aren't used
+        bx = self.bx.copy()
+        bx[1000:1200] = np.nan
+        timeline, freqline, powspec, degpol, waveangle, elliptict, helict, pspec3, err_flag = wavpol(self.ct, bx, self.by, self.bz)
+        leap = np.isfinite(timeline) & np.all(powspec == 0, axis=1)
+        self.assertEqual(np.count_nonzero(leap), 2)
+        for values in [powspec, degpol, waveangle, elliptict, helict, pspec3]:
+            self.assertTrue(np.all(values[leap] == 0))
+        unfilled = np.isnan(timeline)
+        self.assertTrue(np.any(unfilled))
+        self.assertTrue(unfilled[-1])
+        for values in [powspec, elliptict, helict, pspec3]:
+            self.assertTrue(np.all(np.isnan(values[unfilled])))
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -4,7 +4,7 @@ import unittest
 from pytplot import smooth
 from pyspedas import (subtract_average, subtract_median, tsmooth, avg_data,
                       yclip, time_clip, deriv_data, tdeflag, clean_spikes,
-                      tinterpol)
+                      tinterpol, dpwrspc, tdpwrspc)
 from pytplot import tcrossp
 from pytplot import tdotp
 from pytplot import tnormalize
@@ -240,6 +240,34 @@ class AnalysisTestCases(BaseTestCase):
         d = get_data('test1-itrp')
         self.assertTrue(d[1][1] == 20.)
 
+    def test_dpwrspc(self):
+        """Test dpwrspc with a sine wave."""
+        time = np.arange(4096)/32.0
+        quantity = np.sin(2*np.pi*4.0*time) + 0.1*time
+        tdps, fdps, dps = dpwrspc(time, quantity, nboxpoints=256, nshiftpoints=128, binsize=1)
+        self.assertTrue(len(tdps) == 31)
+        self.assertTrue(np.allclose(tdps[0], (time[0] + time[255])/2.0))
+        self.assertTrue(np.allclose(fdps[:, np.argmax(dps, axis=1)], 4.0, atol=0.125))
+        # no power left from the linear trend
+        self.assertTrue(np.all(dps[:, 0] < 1e-3*np.max(dps, axis=1)))
+        # spectra with variable cadence are skipped
+        time[2000:] += 0.01
+        tdps, fdps, dps = dpwrspc(time, quantity, notmvariance=True)
+        self.assertTrue(np.all(np.isnan(dps[14:16])))
+        self.assertTrue(np.all(np.isfinite(dps[:14])))
+
+    def test_tdpwrspc_nprocs(self):
+        """Test tdpwrspc with the components processed in parallel."""
+        rng = np.random.default_rng(4)
+        store_data('test_pwrspc', data={'x': np.arange(5000)/16.0, 'y': rng.normal(size=(5000, 3))})
+        out = tdpwrspc('test_pwrspc')
+        expected = [get_data(var) for var in out]
+        out = tdpwrspc('test_pwrspc', nprocs=2)
+        self.assertTrue(out == ['test_pwrspc_x_dpwrspc', 'test_pwrspc_y_dpwrspc', 'test_pwrspc_z_dpwrspc'])
+        for var, data in zip(out, expected):
+            self.assertTrue(np.array_equal(get_data(var).y, data.y))
+            self.assertTrue(np.array_equal(get_data(var).v, data.v))
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -72,7 +72,6 @@ Restrictions:
 
 """
 import logging
-import warnings
 import numpy as np
 # use nansum from bottleneck if it's installed, otherwise use the numpy one
 try:
@@ -89,157 +88,72 @@ if np.__version__ < '1.20':
     logging.error('Please update numpy with: pip install numpy --upgrade')
     breakpoint()
 
-
-def atan2c(zx, zy):
-    """Define arctan2 with complex numbers."""
-    if np.isreal(zx) and np.isreal(zy):
-        res = np.arctan2(zx, zy)
-    else:
-        res = -1j * np.log((zx + 1j*zy)/np.sqrt(zx**2 + zy**2))
-    return res
+# Number of FFTs calculated at once by wavpol; this limits the size of
+# the (FFTs x frequencies x 3 x 3) spectral matrices kept in memory
+WAVPOL_CHUNK_SIZE = 1024
 
 
-def wpol_ematspec(i1, i2, i3, i4, aa, nosmbins, matspec):
-    """Calculate ematspec array."""
-    id0 = (i2 - int((nosmbins-1)/2))
-    id1 = (i2 + int((nosmbins-1)/2)) + 1
+def wpol_ematspec(matspec, aa, nosmbins):
+    """Calculate the smoothed spectral matrices (ematspec) for a set of FFTs."""
+    ematspec = np.zeros(matspec.shape, dtype=complex)
+    half = int((nosmbins-1)/2)
+    k0 = half
+    k1 = int((matspec.shape[1]-1)-(nosmbins-1)/2) + 1
     # Using nansum() rather than sum() here results in a mismatch between IDL and Python results.
-    res = np.sum(aa[0:nosmbins] * matspec[i1, id0:id1, i3, i4])
-    return res
-
-
-def wpol_matsqrd(i1, i2, i3, ematspec):
-    """Calculate matsqrd array."""
-    res = (ematspec[i1, :, i2, 0] * ematspec[i1, :, 0, i3] +
-           ematspec[i1, :, i2, 1] * ematspec[i1, :, 1, i3] +
-           ematspec[i1, :, i2, 2] * ematspec[i1, :, 2, i3])
-    return res
-
-
-def wpol_helicity(nosteps, nopfft, KK, ematspec, waveangle):
-    """Calculate helicity, ellipticity."""
-    # Avoid warnings.
-    warnings.simplefilter("ignore", np.ComplexWarning)
-
-    # Define arrays.
-    helicity = np.empty((nosteps, int(nopfft/2), 3))
-    ellip = np.empty((nosteps, int(nopfft/2), 3))
-    alphax = np.empty((nosteps, int(nopfft/2)))
-    alphasin2x = np.empty((nosteps, int(nopfft/2)))
-    alphacos2x = np.empty((nosteps, int(nopfft/2)))
-    alphasin3x = np.empty((nosteps, int(nopfft/2)))
-    alphacos3x = np.empty((nosteps, int(nopfft/2)))
-    alphay = np.empty((nosteps, int(nopfft/2)))
-    alphasin2y = np.empty((nosteps, int(nopfft/2)))
-    alphacos2y = np.empty((nosteps, int(nopfft/2)))
-    alphasin3y = np.empty((nosteps, int(nopfft/2)))
-    alphacos3y = np.empty((nosteps, int(nopfft/2)))
-    alphaz = np.empty((nosteps, int(nopfft/2)))
-    alphasin2z = np.empty((nosteps, int(nopfft/2)))
-    alphacos2z = np.empty((nosteps, int(nopfft/2)))
-    alphasin3z = np.empty((nosteps, int(nopfft/2)))
-    alphacos3z = np.empty((nosteps, int(nopfft/2)))
-    lambdau = np.empty((nosteps, int(nopfft/2), 3, 3), dtype=complex)
-    lambday = np.empty((nosteps, int(nopfft/2), 3, 3), dtype=complex)
-    lambdaurot = np.empty((nosteps, int(nopfft/2), 2), dtype=complex)
-
-    alphax[KK, :] = np.sqrt(ematspec[KK, :, 0, 0])
-    alphacos2x[KK, :] = (np.real(ematspec[KK, :, 0, 1]) /
-                         np.sqrt(ematspec[KK, :, 0, 0]))
-    alphasin2x[KK, :] = (-np.imag(ematspec[KK, :, 0, 1]) /
-                         np.sqrt(ematspec[KK, :, 0, 0]))
-    alphacos3x[KK, :] = (np.real(ematspec[KK, :, 0, 2]) /
-                         np.sqrt(ematspec[KK, :, 0, 0]))
-    alphasin3x[KK, :] = (-np.imag(ematspec[KK, :, 0, 2]) /
-                         np.sqrt(ematspec[KK, :, 0, 0]))
-    lambdau[KK, :, 0, 0] = alphax[KK, :]
-    lambdau[KK, :, 0, 1] = (alphacos2x[KK, :] +
-                            1j * alphasin2x[KK, :])
-    lambdau[KK, :, 0, 2] = (alphacos3x[KK, :] +
-                            1j * alphasin3x[KK, :])
-
-    alphay[KK, :] = np.sqrt(ematspec[KK, :, 1, 1])
-    alphacos2y[KK, :] = (np.real(ematspec[KK, :, 1, 0]) /
-                         np.sqrt(ematspec[KK, :, 1, 1]))
-    alphasin2y[KK, :] = (-np.imag(ematspec[KK, :, 1, 0]) /
-                         np.sqrt(ematspec[KK, :, 1, 1]))
-    alphacos3y[KK, :] = (np.real(ematspec[KK, :, 1, 2]) /
-                         np.sqrt(ematspec[KK, :, 1, 1]))
-    alphasin3y[KK, :] = (-np.imag(ematspec[KK, :, 1, 2]) /
-                         np.sqrt(ematspec[KK, :, 1, 1]))
-    lambdau[KK, :, 1, 0] = alphay[KK, :]
-    lambdau[KK, :, 1, 1] = (alphacos2y[KK, :] +
-                            1j * alphasin2y[KK, :])
-    lambdau[KK, :, 1, 2] = (alphacos3y[KK, :] +
-                            1j * alphasin3y[KK, :])
-
-    alphaz[KK, :] = np.sqrt(ematspec[KK, :, 2, 2])
-    alphacos2z[KK, :] = (np.real(ematspec[KK, :, 2, 0]) /
-                         np.sqrt(ematspec[KK, :, 2, 2]))
-    alphasin2z[KK, :] = (-np.imag(ematspec[KK, :, 2, 0]) /
-                         np.sqrt(ematspec[KK, :, 2, 2]))
-    alphacos3z[KK, :] = (np.real(ematspec[KK, :, 2, 1]) /
-                         np.sqrt(ematspec[KK, :, 2, 2]))
-    alphasin3z[KK, :] = (-np.imag(ematspec[KK, :, 2, 1]) /
-                         np.sqrt(ematspec[KK, :, 2, 2]))
-    lambdau[KK, :, 2, 0] = alphaz[KK, :]
-    lambdau[KK, :, 2, 1] = (alphacos2z[KK, :] +
-                            1j * alphasin2z[KK, :])
-    lambdau[KK, :, 2, 2] = (alphacos3z[KK, :] +
-                            1j * alphasin3z[KK, :])
-
-    for k in range(int(nopfft/2)):
-        for k1 in range(3):
-            upper = nansum(2*np.real(lambdau[KK, k, k1, 0:3]) *
-                           np.imag(lambdau[KK, k, k1, 0:3]))
-            la2 = np.imag(lambdau[KK, k, k1, 0:3])**2
-            lower = nansum(np.real(lambdau[KK, k, k1, 0:3])**2 - la2)
-            gammay = np.nan
-            if np.isfinite(upper) and np.isfinite(lower):
-                if upper > 0.0:
-                    gammay = atan2c(upper, lower)
-                else:
-                    gammay = (2*np.pi + atan2c(upper, lower))
-            lambday[KK, k, k1, :] = (np.exp((0.0 - 1j*0.5*gammay)) *
-                                     lambdau[KK, k, k1, :])
-            lay2 = np.imag(lambday[KK, k, k1, 0:3])**2
-            # Using nansum() rather than sum() in the helicity calculation results in a mismatch betweeen IDL and Python results.
-            helicity[KK, k, k1] = (1 /
-                                   (np.sqrt(np.real(lambday[KK, k, k1, 0])**2 +
-                                    np.real(lambday[KK, k, k1, 1])**2 +
-                                    np.real(lambday[KK, k, k1, 2])**2) /
-                                    np.sqrt(np.sum(lay2))))
-            uppere = (np.imag(lambday[KK, k, k1, 0]) *
-                      np.real(lambday[KK, k, k1, 0]) +
-                      np.imag(lambday[KK, k, k1, 1]) *
-                      np.real(lambday[KK, k, k1, 1]))
-            lowere = (-np.imag(lambday[KK, k, k1, 0])**2 +
-                      np.real(lambday[KK, k, k1, 0])**2 -
-                      np.imag(lambday[KK, k, k1, 1])**2 +
-                      np.real(lambday[KK, k, k1, 1])**2)
-            gammarot = np.nan
-            if np.isfinite(uppere) and np.isfinite(lowere):
-                if uppere > 0.0:
-                    gammarot = atan2c(uppere, lowere)
-                else:
-                    gammarot = 2*np.pi + atan2c(uppere, lowere)
-
-            lam = lambday[KK, k, k1, 0:2]
-            lambdaurot[KK, k, :] = np.exp(0 - 1j*0.5*gammarot) * lam[:]
-
-            ellip[KK, k, k1] = (np.sqrt(np.imag(lambdaurot[KK, k, 0])**2 +
-                                        np.imag(lambdaurot[KK, k, 1])**2) /
-                                np.sqrt(np.real(lambdaurot[KK, k, 0])**2 +
-                                        np.real(lambdaurot[KK, k, 1])**2))
-            ellip[KK, k, k1] = (-ellip[KK, k, k1] *
-                                (np.imag(ematspec[KK, k, 0, 1]) *
-                                 np.sin(waveangle[KK, k])) /
-                                np.abs(np.imag(ematspec[KK, k, 0, 1]) *
-                                       np.sin(waveangle[KK, k])))
+    for i in range(nosmbins):
+        ematspec[:, k0:k1] += aa[i] * matspec[:, k0-half+i:k1-half+i]
+    return ematspec
+
+
+def wpol_helicity(ematspec, waveangle):
+    """Calculate helicity, ellipticity for a set of FFTs."""
+    # Wave state vectors, from each row of the smoothed spectral matrix.
+    lambdau = np.empty(ematspec.shape, dtype=complex)
+    for k1, (k2, k3) in enumerate([(1, 2), (0, 2), (0, 1)]):
+        alpha = np.sqrt(ematspec[:, :, k1, k1])
+        lambdau[:, :, k1, 0] = np.real(alpha)
+        lambdau[:, :, k1, 1] = (np.real(np.real(ematspec[:, :, k1, k2]) / alpha) +
+                                1j * np.real(-np.imag(ematspec[:, :, k1, k2]) / alpha))
+        lambdau[:, :, k1, 2] = (np.real(np.real(ematspec[:, :, k1, k3]) / alpha) +
+                                1j * np.real(-np.imag(ematspec[:, :, k1, k3]) / alpha))
+
+    upper = nansum(2*np.real(lambdau) * np.imag(lambdau), axis=3)
+    la2 = np.imag(lambdau)**2
+    lower = nansum(np.real(lambdau)**2 - la2, axis=3)
+    gammay = np.where(upper > 0.0, np.arctan2(upper, lower),
+                      2*np.pi + np.arctan2(upper, lower))
+    gammay[~(np.isfinite(upper) & np.isfinite(lower))] = np.nan
+    lambday = (np.exp((0.0 - 1j*0.5*gammay))[..., np.newaxis] * lambdau)
+
+    lay2 = np.imag(lambday)**2
+    # Using nansum() rather than sum() in the helicity calculation results in a mismatch betweeen IDL and Python results.
+    helicity = (1 /
+                (np.sqrt(np.real(lambday[..., 0])**2 +
+                         np.real(lambday[..., 1])**2 +
+                         np.real(lambday[..., 2])**2) /
+                 np.sqrt(lay2[..., 0] + lay2[..., 1] + lay2[..., 2])))
+    uppere = (np.imag(lambday[..., 0]) * np.real(lambday[..., 0]) +
+              np.imag(lambday[..., 1]) * np.real(lambday[..., 1]))
+    lowere = (-np.imag(lambday[..., 0])**2 +
+              np.real(lambday[..., 0])**2 -
+              np.imag(lambday[..., 1])**2 +
+              np.real(lambday[..., 1])**2)
+    gammarot = np.where(uppere > 0.0, np.arctan2(uppere, lowere),
+                        2*np.pi + np.arctan2(uppere, lowere))
+    gammarot[~(np.isfinite(uppere) & np.isfinite(lowere))] = np.nan
+
+    lambdaurot = np.exp(0 - 1j*0.5*gammarot)[..., np.newaxis] * lambday[..., 0:2]
+
+    ellip = (np.sqrt(np.imag(lambdaurot[..., 0])**2 +
+                     np.imag(lambdaurot[..., 1])**2) /
+             np.sqrt(np.real(lambdaurot[..., 0])**2 +
+                     np.real(lambdaurot[..., 1])**2))
+    sign = (np.imag(ematspec[:, :, 0, 1]) * np.sin(waveangle))[..., np.newaxis]
+    ellip = -ellip * sign / np.abs(sign)
 
     # Average over helicity and ellipticity results.
-    elliptict0 = (ellip[KK, :, 0]+ellip[KK, :, 1]+ellip[KK, :, 2])/3
-    helict0 = (helicity[KK, :, 0]+helicity[KK, :, 1]+helicity[KK, :, 2])/3
+    elliptict0 = (ellip[..., 0]+ellip[..., 1]+ellip[..., 2])/3
+    helict0 = (helicity[..., 0]+helicity[..., 1]+helicity[..., 2])/3
 
     return (helict0, elliptict0)
 
@@ -251,6 +165,10 @@ def wavpol(ct, bx, by, bz,
     """
     Perform polarisation analysis of Bx, By, Bz time series data.
 
+    The FFT windows of each batch (continuous interval) are processed
+    WAVPOL_CHUNK_SIZE at a time, so that the memory used by the spectral
+    matrices doesn't depend on the length of the data.
+
     Parameters
     ----------
     ct : list of float
@@ -304,9 +222,7 @@ def wavpol(ct, bx, by, bz,
 
     # Convert to numpy arrays.
     ct = np.array(ct, np.float64)
-    bx = np.array(bx, np.float64)
-    by = np.array(by, np.float64)
-    bz = np.array(bz, np.float64)
+    bxyz = np.array([bx, by, bz], np.float64)
 
     # Define empty returns.
     timeline = ''
@@ -320,9 +236,9 @@ def wavpol(ct, bx, by, bz,
     err_flag = 0
 
     # Define variables.
-    nopoints = len(bx)
+    nopoints = bxyz.shape[1]
     iano = np.zeros(nopoints, dtype=int)
-    dt = [ct[i+1]-ct[i] for i in range(len(ct)-1)]  # time difference
+    dt = np.diff(ct)  # time difference
     beginsampfreq = 1./(ct[1]-ct[0])
     endsampfreq = 1./(ct[nopoints-1]-ct[nopoints-2])
 
@@ -335,27 +251,19 @@ def wavpol(ct, bx, by, bz,
     samp_per = 1./samp_freq
 
     # Time reversal detection.
-    for i in range(len(dt)-1):
-        if dt[i] < 0:
-            iano[i] = 16
+    iano[0:len(dt)-1][dt[0:len(dt)-1] < 0] = 16
 
     # The accuracy of the sampling frequency should be about 1%
     accuracy = 0.01
 
     # Find discontinuities.
     discont_trigger = accuracy*samp_per
-    for i in range(nopoints-1):
-        if abs(dt[i]-1./samp_freq) > discont_trigger:
-            iano[i] = 17
+    iano[0:nopoints-1][np.abs(dt-1./samp_freq) > discont_trigger] = 17
     iano[nopoints-1] = 22
 
     # Count batches, should be less than 80,000
-    n_batches = 0
-    errs = []
-    for i in range(nopoints):
-        if iano[i] >= 15:
-            n_batches += 1
-            errs.append(i)
+    errs = np.argwhere(iano >= 15).flatten()
+    n_batches = len(errs)
 
     # If there are too many batches, return.
     if n_batches > 80000.0:
@@ -366,16 +274,10 @@ def wavpol(ct, bx, by, bz,
                   elliptict, helict, pspec3, err_flag)
         return result
 
-    nbp_fft_batches = [0] * n_batches
     # Total numbers of FFT calculations including 1 leap frog for each batch
-    ind_batch0 = 0
-    nosteps = 0
     logging.info('n_batches: ' + str(n_batches))
 
-    for i in range(n_batches):
-        nosteps = int(nosteps + np.floor((errs[i] - ind_batch0)/steplength))
-        ind_batch0 = errs[i]
-
+    nosteps = int(np.sum(np.floor(np.diff(errs, prepend=0)/steplength)))
     nosteps = nosteps + n_batches
     logging.info('Total number of steps:' + str(nosteps))
 
@@ -393,229 +295,132 @@ def wavpol(ct, bx, by, bz,
     tot = np.sum(w)
     aa = w/tot
 
+    nfreq = int(nopfft/2)
+    step = int(steplength)
+
+    # Smoothing window applied before each FFT.
+    smooth = 0.08 + 0.46 * (1 - np.cos(2 * np.pi * np.arange(nopfft) / nopfft))
+    temp_i = np.arange(nopfft)
+
+    # Scaling power results to units with meaning
+    binwidth = samp_freq / nopfft
+    W = np.sum(smooth**2) / np.real(nopfft)
+
     ind0 = 0
     KK = 0
 
-    # Create empty arrays
-    specx = np.empty((nosteps, nopfft), dtype=complex)
-    specy = np.empty((nosteps, nopfft), dtype=complex)
-    specz = np.empty((nosteps, nopfft), dtype=complex)
-    halfspecx = np.empty((nosteps, int(nopfft/2)), dtype=complex)
-    halfspecy = np.empty((nosteps, int(nopfft/2)), dtype=complex)
-    halfspecz = np.empty((nosteps, int(nopfft/2)), dtype=complex)
-    matspec = np.empty((nosteps, int(nopfft/2), 3, 3), dtype=complex)
-    ematspec = np.empty((nosteps, int(nopfft/2), 3, 3), dtype=complex)
-    aaa2 = np.empty((nosteps, int(nopfft/2)))
-    wnx = np.empty((nosteps, int(nopfft/2)))
-    wny = np.empty((nosteps, int(nopfft/2)))
-    wnz = np.empty((nosteps, int(nopfft/2)))
-    waveangle = np.empty((nosteps, int(nopfft/2)))
-    matsqrd = np.empty((nosteps, int(nopfft/2), 3, 3), dtype=complex)
-    trmatsqrd = np.empty((nosteps, int(nopfft/2)))
-    trmatspec = np.empty((nosteps, int(nopfft/2)))
-    degpol = np.empty((nosteps, int(nopfft/2)))
-    xrmatspec = np.empty((nosteps, int(nopfft/2)))
-    yrmatspec = np.empty((nosteps, int(nopfft/2)))
-    zrmatspec = np.empty((nosteps, int(nopfft/2)))
-
     # Return arrays.
-    timeline = np.empty((nosteps))
+    timeline = np.zeros((nosteps))
     freqline = ''
-    helict = np.empty((nosteps, int(nopfft/2)))
-    elliptict = np.empty((nosteps, int(nopfft/2)))
-    powspec = np.empty((nosteps, int(nopfft/2)))
-    pspecx = np.empty((nosteps, int(nopfft/2)))
-    pspecy = np.empty((nosteps, int(nopfft/2)))
-    pspecz = np.empty((nosteps, int(nopfft/2)))
-    pspec3 = np.empty((nosteps, int(nopfft/2), 3))
+    helict = np.zeros((nosteps, nfreq))
+    elliptict = np.zeros((nosteps, nfreq))
+    powspec = np.zeros((nosteps, nfreq))
+    degpol = np.zeros((nosteps, nfreq))
+    waveangle = np.zeros((nosteps, nfreq))
+    pspec3 = np.zeros((nosteps, nfreq, 3))
 
     for batch in range(n_batches):
         ind1 = errs[batch]+1
-        # nbp_batch = ind1-ind0+1
         ind1_ref = ind1
-        KK_batch_start = KK
 
-        xs = np.array(bx[ind0:ind1])
-        ys = np.array(by[ind0:ind1])
-        zs = np.array(bz[ind0:ind1])
+        xyzs = bxyz[:, ind0:ind1]
 
-        ngood = np.count_nonzero(~np.isnan(xs))  # Count finite data.
+        ngood = np.count_nonzero(~np.isnan(xyzs[0]))  # Count finite data.
         if ngood > nopfft:
-            nbp_fft_batches[batch] = np.floor(ngood/steplength)
-            logging.info('Total number of possible FFT in the batch no ' + str(batch) + ' is:' + str(nbp_fft_batches[batch]))
-            ind0_fft = 0
-            for j in range(int(nbp_fft_batches[batch])):
-                # ind1_fft = nopfft * (j+1)-1
-                # ind1_ref_fft = ind1_fft
+            nbp_fft_batch = int(np.floor(ngood/steplength))
+            logging.info('Total number of possible FFT in the batch no ' + str(batch) + ' is:' + str(nbp_fft_batch))
 
-                # FFT Calculation.
-                smooth = 0.08 + 0.46 * (1 - np.cos(2 * np.pi *
-                                                   np.arange(nopfft) / nopfft))
-                tempx = smooth * xs[0:nopfft]
-                tempy = smooth * ys[0:nopfft]
-                tempz = smooth * zs[0:nopfft]
+            # The FFT intervals start every steplength points; intervals that
+            # run past the end of the batch wrap around to its start.
+            xyzs = np.concatenate((xyzs, xyzs[:, 0:nopfft]), axis=1)
+            windows = np.lib.stride_tricks.sliding_window_view(xyzs, nopfft, axis=1)[:, ::step]
+
+            for start in range(0, nbp_fft_batch, WAVPOL_CHUNK_SIZE):
+                stop = min(start + WAVPOL_CHUNK_SIZE, nbp_fft_batch)
+                rows = slice(KK + start, KK + stop)
+
+                # Print an indication that a computation is happening.
+                logging.info('wavpol step: ' + str(KK + start) + ' ')
 
-                # previous version (prior to 15Dec2021)
-                # specx[KK, :] = np.fft.fft(tempx, norm='forward')
-                # specy[KK, :] = np.fft.fft(tempy, norm='forward')
-                # specz[KK, :] = np.fft.fft(tempz, norm='forward')
+                # FFT Calculation.
+                temps = smooth * windows[:, start:stop]
 
                 # mask out the NaNs
-                temp_i = np.arange(len(tempx))
-                tempx_mask = np.isfinite(tempx)
-                tempx_filtered = np.interp(temp_i, temp_i[tempx_mask], tempx[tempx_mask])
-                tempy_mask = np.isfinite(tempy)
-                tempy_filtered = np.interp(temp_i, temp_i[tempy_mask], tempy[tempy_mask])
-                tempz_mask = np.isfinite(tempz)
-                tempz_filtered = np.interp(temp_i, temp_i[tempz_mask], tempz[tempz_mask])
+                bad = ~np.isfinite(temps)
+                for k1, j in zip(*np.nonzero(np.any(bad, axis=2))):
+                    mask = ~bad[k1, j]
+                    temps[k1, j] = np.interp(temp_i, temp_i[mask], temps[k1, j, mask])
 
                 # back to forward option, 23June2022, after applying mask for NaNs above
                 # forward seems to be the only option that works now after the NaN mask
                 # is applied; this requires numpy >= 1.20.0
-                specx[KK, :] = np.fft.fft(tempx_filtered, norm='forward')
-                specy[KK, :] = np.fft.fft(tempy_filtered, norm='forward')
-                specz[KK, :] = np.fft.fft(tempz_filtered, norm='forward')
-
-                halfspecx[KK, :] = specx[KK, 0:int(nopfft/2)]
-                halfspecy[KK, :] = specy[KK, 0:int(nopfft/2)]
-                halfspecz[KK, :] = specz[KK, 0:int(nopfft/2)]
-                xs = np.roll(xs, -int(steplength))
-                ys = np.roll(ys, -int(steplength))
-                zs = np.roll(zs, -int(steplength))
-
-                # Calculation of the spectral matrix.
-                matspec[KK, :, 0, 0] = (halfspecx[KK, :] *
-                                        np.conjugate(halfspecx[KK, :]))
-                matspec[KK, :, 1, 0] = (halfspecx[KK, :] *
-                                        np.conjugate(halfspecy[KK, :]))
-                matspec[KK, :, 2, 0] = (halfspecx[KK, :] *
-                                        np.conjugate(halfspecz[KK, :]))
-                matspec[KK, :, 0, 1] = (halfspecy[KK, :] *
-                                        np.conjugate(halfspecx[KK, :]))
-                matspec[KK, :, 1, 1] = (halfspecy[KK, :] *
-                                        np.conjugate(halfspecy[KK, :]))
-                matspec[KK, :, 2, 1] = (halfspecy[KK, :] *
-                                        np.conjugate(halfspecz[KK, :]))
-                matspec[KK, :, 0, 2] = (halfspecz[KK, :] *
-                                        np.conjugate(halfspecx[KK, :]))
-                matspec[KK, :, 1, 2] = (halfspecz[KK, :] *
-                                        np.conjugate(halfspecy[KK, :]))
-                matspec[KK, :, 2, 2] = (halfspecz[KK, :] *
-                                        np.conjugate(halfspecz[KK, :]))
-
-                # Calculation of smoothed spectral matrix.
-                for k in range(int((nosmbins-1)/2),
-                               int((nopfft/2-1)-(nosmbins-1)/2)+1):
-                    for k2 in range(0, 3):
-                        for k1 in range(0, 3):
-                            ematspec[KK, k, k1, k2] = wpol_ematspec(KK, k, k1,
-                                                                    k2, aa,
-                                                                    nosmbins,
-                                                                    matspec)
-
-                # Calculation of the minimum variance direction
-                # and wavenormal angle.
-                aaa2[KK, :] = np.sqrt(np.imag(ematspec[KK, :, 0, 1])**2 +
-                                      np.imag(ematspec[KK, :, 0, 2])**2 +
-                                      np.imag(ematspec[KK, :, 1, 2])**2)
-                # Avoid warnings due to NaN values.
-                np.seterr(divide='ignore', invalid='ignore')
-                wnx[KK, :] = np.abs(np.imag(ematspec[KK, :, 1, 2]) /
-                                    aaa2[KK, :])
-                wny[KK, :] = -np.abs(np.imag(ematspec[KK, :, 0, 2]) /
-                                     aaa2[KK, :])
-                wnz[KK, :] = (np.imag(ematspec[KK, :, 0, 1]) / aaa2[KK, :])
-                waveangle[KK, :] = np.arctan2(np.sqrt(wnx[KK, :]**2 +
-                                                      wny[KK, :]**2),
-                                              np.abs(wnz[KK, :]))
-
-                # Calculation of the degree of polarization.
-                # Calculation of square of smoothed spec matrix.
-                # for k1 in range(3):
-                #    for k2 in range(3):
-                #        matsqrd[KK, :, k1, k2] = wpol_matsqrd(KK, k1, k2,
-                #                                              ematspec)
-
-                # A user suggested using the @ operator (shorthand for np.matmul()) to square the ematspec array,
-                # since it already deals with any leading dimensions.  (Note that only the KKth and lower slices are
-                # initialized at this point.) -- JWL 2023-04-20
-
-                matsqrd[KK] = ematspec[KK] @ ematspec[KK]
-
-                trmatsqrd[KK, :] = np.real(matsqrd[KK, :, 0, 0] +
-                                           matsqrd[KK, :, 1, 1] +
-                                           matsqrd[KK, :, 2, 2])
-                trmatspec[KK, :] = np.real(ematspec[KK, :, 0, 0] +
-                                           ematspec[KK, :, 1, 1] +
-                                           ematspec[KK, :, 2, 2])
-                id1 = int((nosmbins-1)/2)
-                id2 = int((nopfft/2-1)-(nosmbins-1)/2) + 1
-                degpol[KK, id1:id2] = ((3 * trmatsqrd[KK, id1:id2] -
-                                        trmatspec[KK, id1:id2]**2) /
-                                       (2 * trmatspec[KK, id1:id2]**2))
-
-                xrmatspec[KK, :] = np.real(ematspec[KK, :, 0, 0])
-                yrmatspec[KK, :] = np.real(ematspec[KK, :, 1, 1])
-                zrmatspec[KK, :] = np.real(ematspec[KK, :, 2, 2])
-
-                # Calculation of helicity, ellipticity
-                # and the wave state vector
-                (helict[KK], elliptict[KK]) = wpol_helicity(nosteps,
-                                                            nopfft,
-                                                            KK,
-                                                            ematspec,
-                                                            waveangle)
+                halfspec = np.fft.rfft(temps, axis=2, norm='forward')[:, :, 0:nfreq]
+                halfspec = np.moveaxis(halfspec, 0, -1)
+
+                with np.errstate(divide='ignore', invalid='ignore'):
+                    # Calculation of the spectral matrix.
+                    matspec = halfspec[:, :, np.newaxis, :] * np.conjugate(halfspec[:, :, :, np.newaxis])
+
+                    # Calculation of smoothed spectral matrix.
+                    ematspec = wpol_ematspec(matspec, aa, nosmbins)
+                    del matspec
+
+                    # Calculation of the minimum variance direction
+                    # and wavenormal angle.
+                    aaa2 = np.sqrt(np.imag(ematspec[:, :, 0, 1])**2 +
+                                   np.imag(ematspec[:, :, 0, 2])**2 +
+                                   np.imag(ematspec[:, :, 1, 2])**2)
+                    wnx = np.abs(np.imag(ematspec[:, :, 1, 2]) / aaa2)
+                    wny = -np.abs(np.imag(ematspec[:, :, 0, 2]) / aaa2)
+                    wnz = (np.imag(ematspec[:, :, 0, 1]) / aaa2)
+                    waveangle[rows] = np.arctan2(np.sqrt(wnx**2 + wny**2), np.abs(wnz))
+
+                    # Calculation of the degree of polarization.
+                    # Calculation of square of smoothed spec matrix.
+                    matsqrd = ematspec @ ematspec
+
+                    trmatsqrd = np.real(matsqrd[:, :, 0, 0] +
+                                        matsqrd[:, :, 1, 1] +
+                                        matsqrd[:, :, 2, 2])
+                    trmatspec = np.real(ematspec[:, :, 0, 0] +
+                                        ematspec[:, :, 1, 1] +
+                                        ematspec[:, :, 2, 2])
+                    id1 = int((nosmbins-1)/2)
+                    id2 = int((nopfft/2-1)-(nosmbins-1)/2) + 1
+                    degpol[rows, id1:id2] = ((3 * trmatsqrd[:, id1:id2] -
+                                              trmatspec[:, id1:id2]**2) /
+                                             (2 * trmatspec[:, id1:id2]**2))
+
+                    # Calculation of helicity, ellipticity
+                    # and the wave state vector
+                    (helict[rows], elliptict[rows]) = wpol_helicity(ematspec, waveangle[rows])
 
                 # Scaling power results to units with meaning
-                binwidth = samp_freq / nopfft
-                W = np.sum(smooth**2) / np.real(nopfft)
                 id2 = int(nopfft/2-1)
-                powspec[KK, 1:id2] = 1./W*2*trmatspec[KK, 1:id2]/binwidth
-                powspec[KK, 0] = 1./W * trmatspec[KK, 0]/binwidth
-                powspec[KK, id2] = 1./W*trmatspec[KK, id2]/binwidth
-
-                pspecx[KK, 1:id2] = 1./W*2*xrmatspec[KK, 1:id2]/binwidth
-                pspecx[KK, 0] = 1./W*xrmatspec[KK, 0]/binwidth
-                pspecx[KK, id2] = 1./W*xrmatspec[KK, id2]/binwidth
-
-                pspecy[KK, 1:id2] = 1./W*2*yrmatspec[KK, 1:id2]/binwidth
-                pspecy[KK, 0] = 1./W*yrmatspec[KK, 0]/binwidth
-                pspecy[KK, id2] = 1./W*yrmatspec[KK, id2]/binwidth
-
-                pspecz[KK, 1:id2] = 1./W*2*zrmatspec[KK, 1:id2]/binwidth
-                pspecz[KK, 0] = 1./W*zrmatspec[KK, 0]/binwidth
-                pspecz[KK, id2] = 1./W*zrmatspec[KK, id2]/binwidth
-
-                pspec3[KK, :, 0] = pspecx[KK, :]
-                pspec3[KK, :, 1] = pspecy[KK, :]
-                pspec3[KK, :, 2] = pspecz[KK, :]
-
-                ind0_fft = ind0_fft + steplength
-                KK_batch_stop = KK
-
-                # Print an indication that a computation is happening.
-                if KK == 0 or KK % 40 == 0:
-                    logging.info('wavpol step: ' + str(KK) + ' ')
-
-                KK += 1
-                # End loop "for j"
-
-            ids = KK_batch_start
-            idf = KK_batch_stop+1
-            ta = np.arange(nbp_fft_batches[batch])
-            timeline[ids:idf] = (ct[ind0] +
-                                 np.abs(int(nopfft/2))/samp_freq +
-                                 ta*steplength/samp_freq)
+                powspec[rows, 1:id2] = 1./W*2*trmatspec[:, 1:id2]/binwidth
+                powspec[rows, 0] = 1./W * trmatspec[:, 0]/binwidth
+                powspec[rows, id2] = 1./W*trmatspec[:, id2]/binwidth
+
+                for k1 in range(3):
+                    rmatspec = np.real(ematspec[:, :, k1, k1])
+                    pspec3[rows, 1:id2, k1] = 1./W*2*rmatspec[:, 1:id2]/binwidth
+                    pspec3[rows, 0, k1] = 1./W*rmatspec[:, 0]/binwidth
+                    pspec3[rows, id2, k1] = 1./W*rmatspec[:, id2]/binwidth
+
+            ta = np.arange(nbp_fft_batch)
+            timeline[KK:KK+nbp_fft_batch] = (ct[ind0] +
+                                             np.abs(int(nopfft/2))/samp_freq +
+                                             ta*steplength/samp_freq)
+            KK += nbp_fft_batch
             if KK == len(timeline):
                 continue
 
-            timeline[idf] = (ct[ind0] +
-                             np.abs(int(nopfft/2))/samp_freq +
-                             (nbp_fft_batches[batch]+1)*steplength/samp_freq)
+            timeline[KK] = (ct[ind0] +
+                            np.abs(int(nopfft/2))/samp_freq +
+                            (nbp_fft_batch+1)*steplength/samp_freq)
             KK += 1
             # End "if ngood > nopfft"
         else:
-            binwidth = samp_freq/nopfft
             logging.error('Fourier Transform is not possible. ')
             logging.error('Ngood = ' + str(ngood))
             logging.error('Required number of points for FFT = ' + str(nopfft))
@@ -635,9 +440,6 @@ def wavpol(ct, bx, by, bz,
     if len(wherezero) > 0:
         timeline[wherezero] = np.nan
         powspec[wherezero, :] = np.nan
-        pspecx[wherezero, :] = np.nan
-        pspecy[wherezero, :] = np.nan
-        pspecz[wherezero, :] = np.nan
         pspec3[wherezero, :, :] = np.nan
         elliptict[wherezero, :] = np.nan
         helict[wherezero, :] = np.nan
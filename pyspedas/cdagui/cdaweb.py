@@ -9,6 +9,8 @@ For cdasws documentation, see:
 import logging
 import os
 import re
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
 from cdasws import CdasWs
 from pytplot import cdf_to_tplot
 from pyspedas.utilities.download import download
@@ -20,6 +22,8 @@ class CDAWeb():
     def __init__(self):
         """Initialize."""
         self.cdas = CdasWs()
+        # size and modification time of the remote files found by get_filenames
+        self.file_info = {}
 
     def get_observatories(self):
         """Return a list of missions."""
@@ -69,9 +73,13 @@ class CDAWeb():
             dnames.append(data_item)
         return dnames
 
-    def get_filenames(self, dataset_list, t0, t1):
+    def get_filenames(self, dataset_list, t0, t1, max_workers=4):
         """Return a list of urls for a dataset between dates t0 and t1.
 
+        The file lists of the datasets are requested in parallel, using up
+        to max_workers simultaneous queries; the urls are returned in the
+        order of dataset_list.
+
         Example: get_files(['THB_L2_FIT (2007-02-26 to 2020-01-17)'],
             '2010-01-01 00:00:00', '2010-01-10 00:00:00')
         """
@@ -89,63 +97,119 @@ class CDAWeb():
         elif len(t1) > 10:
             t1 += "Z"
 
+        datasets = [d.split(' ')[0] for d in dataset_list if len(d.split(' ')) > 0]
+
+        def get_files(dataset):
+            return self.cdas.get_data_file(dataset, [], t0, t1)
+
         # For each dataset, find the url of files
-        for d in dataset_list:
-            d0 = d.split(' ')
-            if (len(d0) > 0):
-                status, result = self.cdas.get_data_file(d0[0], [], t0, t1)
-                if (status == 200 and (result is not None)):
-                    r = result.get('FileDescription')
-                    for f in r:
-                        remote_url.append(f.get('Name'))
+        if max_workers is None or max_workers <= 1 or len(datasets) <= 1:
+            responses = map(get_files, datasets)
+        else:
+            with ThreadPoolExecutor(max_workers=min(max_workers, len(datasets))) as executor:
+                responses = list(executor.map(get_files, datasets))
+
+        for status, result in responses:
+            if (status == 200 and (result is not None)):
+                r = result.get('FileDescription')
+                for f in r:
+                    remote_url.append(f.get('Name'))
+                    self.file_info[f.get('Name')] = {'Length': f.get('Length'),
+                                                     'LastModified': f.get('LastModified')}
         return remote_url
 
+    def is_current(self, remote_file, local_file):
+        """Return True if the local file is the same as the remote file.
+
+        Only the files found by get_filenames can be checked; the local
+        file is current if it has the same size as the remote file, and
+        it was saved after the remote file was last modified.
+        """
+        info = self.file_info.get(remote_file)
+        if info is None or info.get('Length') is None or not os.path.isfile(local_file):
+            return False
+        if os.path.getsize(local_file) != int(info['Length']):
+            return False
+        if info.get('LastModified') is not None:
+            try:
+                modified = datetime.fromisoformat(info['LastModified'].replace('Z', '+00:00'))
+            except ValueError:
+                return False
+            if os.path.getmtime(local_file) < modified.timestamp():
+                return False
+        return True
+
     def cda_download(self, remote_files, local_dir, download_only=False,
                      varformat=None, get_support_data=False, prefix='',
-                     suffix='', varnames=[], notplot=False):
+                     suffix='', varnames=[], notplot=False, max_workers=4):
         """Download cdf files.
 
         Load cdf files into pytplot variables (optional).
+
+        Up to max_workers files are downloaded at the same time, while the
+        files that have already been downloaded are loaded into pytplot
+        variables, in the order of remote_files. Files that are already
+        current (see is_current) aren't downloaded again. Set max_workers
+        to 1 to download and load the files one at a time.
         """
         result = []
         loaded_vars = []
         remotehttp = "https://cdaweb.gsfc.nasa.gov/sp_phys/data"
         count = 0
         dcount = 0
-        for remotef in remote_files:
-            tplot_loaded = 0
-            f = remotef.strip().replace(remotehttp, '', 1)
-            localf = local_dir + os.path.sep + f
-            localfile = download(remote_file=remotef, local_file=localf)
-            if localfile is None:
-                continue
-            localfile = localfile[0]  # download returns an array
-            count += 1
-            if localfile != '':
-                dcount += 1
-                if not download_only:
-                    try:
-                        cvars = cdf_to_tplot(localfile,
-                                             suffix=suffix,
-                                             get_support_data=get_support_data,
-                                             varformat=varformat,
-                                             varnames=varnames,
-                                             notplot=notplot)
-                        if cvars != [] and cvars is not None:
-                            loaded_vars.extend(cvars)
-                        tplot_loaded = 1
-                    except ValueError as err:
-                        msg = "cdf_to_tplot could not load " + localfile
-                        msg += "\n\n"
-                        msg += "Error from pytplot: " + str(err)
-                        logging.error(msg)
-                        tplot_loaded = 0
-            else:
-                logging.error(str(count) + '. There was a problem. Could not download \
-                      file: ' + remotef)
-                tplot_loaded = -1
-                localfile = ''
-            result.append([remotef, localfile, tplot_loaded])
+
+        def fetch(remotef, localf):
+            if self.is_current(remotef, localf):
+                logging.info('File is current: ' + localf)
+                return [localf]
+            return download(remote_file=remotef, local_file=localf, max_workers=1)
+
+        localfs = [local_dir + os.path.sep + remotef.strip().replace(remotehttp, '', 1) for remotef in remote_files]
+
+        executor = None
+        if max_workers is not None and max_workers > 1 and len(remote_files) > 1:
+            executor = ThreadPoolExecutor(max_workers=min(max_workers, len(remote_files)))
+            downloads = [executor.submit(fetch, remotef, localf) for remotef, localf in zip(remote_files, localfs)]
+
+        try:
+            for idx, (remotef, localf) in enumerate(zip(remote_files, localfs)):
+                tplot_loaded = 0
+                if executor is None:
+                    localfile = fetch(remotef, localf)
+                else:
+                    localfile = downloads[idx].result()
+                if localfile is None:
+                    continue
+                localfile = localfile[0]  # download returns an array
+                count += 1
+                if localfile != '':
+                    dcount += 1
+                    if not download_only:
+                        try:
+                            cvars = cdf_to_tplot(localfile,
+                                                 suffix=suffix,
+                                                 get_support_data=get_support_data,
+                                                 varformat=varformat,
+                                                 varnames=varnames,
+                                                 notplot=notplot)
+                            if cvars != [] and cvars is not None:
+                                loaded_vars.extend(cvars)
+                            tplot_loaded = 1
+                        except ValueError as err:
+                            msg = "cdf_to_tplot could not load " + localfile
+                            msg += "\n\n"
+                            msg += "Error from pytplot: " + str(err)
+                            logging.error(msg)
+                            tplot_loaded = 0
+                else:
+                    logging.error(str(count) + '. There was a problem. Could not download \
+                          file: ' + remotef)
+                    tplot_loaded = -1
+                    localfile = ''
+                result.append([remotef, localfile, tplot_loaded])
+        finally:
+            if executor is not None:
+                executor.shutdown(wait=True)
 
         logging.info('Downloaded ' + str(dcount) + ' files.')
         if not download_only:
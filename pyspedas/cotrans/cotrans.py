@@ -11,6 +11,7 @@ Notes
 This function is similar to cotrans.pro of IDL SPEDAS.
 """
 import logging
+import numpy as np
 import pytplot
 from pytplot import get_coords,set_coords
 from pyspedas.cotrans.cotrans_lib import subcotrans
@@ -93,7 +94,7 @@ def cotrans(name_in=None, name_out=None, time_in=None, data_in=None,
         return 0
 
     # Perform coordinate transformation.
-    data_out = subcotrans(list(time_in), list(data_in), coord_in, coord_out)
+    data_out = subcotrans(np.asarray(time_in), np.asarray(data_in), coord_in, coord_out)
 
     if name_in is None and name_out is None:
         return data_out
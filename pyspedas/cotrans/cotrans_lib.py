@@ -13,10 +13,44 @@ For a comparison to IDL, see: http://spedas.org/wiki/index.php?title=Cotrans
 """
 import numpy as np
 import logging
-from datetime import datetime
+from collections import OrderedDict
 from pyspedas.cotrans.igrf import set_igrf_params
 from pyspedas.cotrans.j2000 import set_j2000_params
 
+# maximum number of time arrays with cached sun/dipole directions
+EPHEMERIS_CACHE_SIZE = 8
+
+# number of samples transformed at once by subcotrans
+SUBCOTRANS_CHUNK_SIZE = 1000000
+
+# sun and dipole directions for recently used time arrays, so that
+# transformations of several variables with the same times reuse them
+_ephemeris_cache = OrderedDict()
+
+
+def _cached_ephemeris(func, time_in):
+    """
+    Return func(time_in), from the cache if it was already calculated for these times.
+    """
+    times = np.asarray(time_in, dtype=np.float64)
+    key = (func.__name__, times.shape, hash(times.tobytes()))
+
+    result = _ephemeris_cache.get(key)
+    if result is not None and np.array_equal(result[0], times):
+        _ephemeris_cache.move_to_end(key)
+        return result[1]
+
+    values = func(times)
+    for value in values:
+        value.flags.writeable = False
+
+    times = times.copy()
+    _ephemeris_cache[key] = (times, values)
+    if len(_ephemeris_cache) > EPHEMERIS_CACHE_SIZE:
+        _ephemeris_cache.popitem(last=False)
+
+    return values
+
 
 def get_time_parts(time_in):
     """
@@ -41,12 +75,24 @@ def get_time_parts(time_in):
         Seconds and milliseconds.
 
     """
-    tnp = np.vectorize(datetime.utcfromtimestamp)(time_in[:])
-    iyear = np.array([tt.year for tt in tnp])
-    idoy = np.array([tt.timetuple().tm_yday for tt in tnp])
-    ih = np.array([tt.hour for tt in tnp])
-    im = np.array([tt.minute for tt in tnp])
-    isec = np.array([tt.second + tt.microsecond/1000000.0 for tt in tnp])
+    time_in = np.asarray(time_in, dtype=np.float64)
+
+    # whole seconds and microseconds, rounded the same way as datetime.utcfromtimestamp
+    frac, whole = np.modf(time_in)
+    usec = np.round(frac*1e6)
+    whole = whole + (usec >= 1e6) - (usec < 0)
+    usec = usec - 1e6*(usec >= 1e6) + 1e6*(usec < 0)
+
+    tdt = whole.astype(np.int64).astype('datetime64[s]')
+    tyear = tdt.astype('datetime64[Y]')
+    tday = tdt.astype('datetime64[D]')
+    sod = (tdt - tday).astype(np.int64)
+
+    iyear = tyear.astype(np.int64) + 1970
+    idoy = (tday - tyear).astype(np.int64) + 1
+    ih = sod // 3600
+    im = (sod % 3600) // 60
+    isec = (sod % 60) + usec/1000000.0
 
     return iyear, idoy, ih, im, isec
 
@@ -55,6 +101,8 @@ def csundir_vect(time_in):
     """
     Calculate the direction of the sun.
 
+    The results for the most recent time arrays are cached.
+
     Parameters
     ----------
     time_in: list of float
@@ -74,6 +122,10 @@ def csundir_vect(time_in):
         Inclination of Earth's axis (radians).
 
     """
+    return _cached_ephemeris(_csundir_vect, time_in)
+
+
+def _csundir_vect(time_in):
     iyear, idoy, ih, im, isec = get_time_parts(time_in)
 
     # Julian day and greenwich mean sideral time
@@ -151,9 +203,10 @@ def cdipdir(time_in=None, iyear=None, idoy=None):
 
     year0 = y
     year1 = y + 5
-    g0 = ga[year0]
-    h0 = ha[year0]
     maxind = max(ga.keys())
+    # after the last IGRF epoch, extrapolate from it using the secular variation
+    g0 = ga[min(year0, maxind)]
+    h0 = ha[min(year0, maxind)]
     g = g0
     h = h0
 
@@ -236,35 +289,75 @@ def cdipdir_vect(time_in=None, iyear=None, idoy=None):
     Notes
     -----
     Same as SPEDAS cdipdir_vec.
+    The results for the most recent time arrays are cached.
     """
-    if ((time_in is None or not isinstance(time_in, list))
-        and (iyear is None or not isinstance(iyear, list))
-            and (idoy is None or not isinstance(idoy, list))):
+    if ((time_in is None or not isinstance(time_in, (list, np.ndarray)))
+        and (iyear is None or not isinstance(iyear, (list, np.ndarray)))
+            and (idoy is None or not isinstance(idoy, (list, np.ndarray)))):
         return cdipdir(time_in, iyear, idoy)
 
+    if (iyear is None) or (idoy is None):
+        return _cached_ephemeris(_cdipdir_days, time_in)
+
+    return _cdipdir_days(None, iyear, idoy)
+
+
+def _cdipdir_days(time_in, iyear=None, idoy=None):
     if (iyear is None) or (idoy is None):
         iyear, idoy, ih, im, isec = get_time_parts(time_in)
 
-    d1 = []
-    d2 = []
-    d3 = []
+    # the dipole direction only depends on the day, so calculate it
+    # once for each unique (year, doy)
+    days, inverse = np.unique(np.asarray(iyear, dtype=np.int64)*1000 + np.asarray(idoy, dtype=np.int64),
+                              return_inverse=True)
+    inverse = inverse.flatten()
+    iyear = days // 1000
+    idoy = days % 1000
+
+    # IGRF-13 parameters, 1965-2020.
+    minyear, maxyear, ga, ha, dg, dh = set_igrf_params()
+    maxind = max(ga.keys())
+
+    year0 = np.clip(iyear - (iyear % 5), minyear, maxyear)
+    f2 = (iyear + (idoy-1)/365.25 - year0)/5.
+    f1 = 1.0 - f2
+    f3 = iyear + (idoy-1)/365.25 - maxind
 
-    cdipdir_cache = {}
+    # only the first order coefficients are needed for the dipole direction
+    # (the Schmidt normalization factor is 1 for these)
+    g1 = np.zeros(len(iyear))
+    g2 = np.zeros(len(iyear))
+    h2 = np.zeros(len(iyear))
+    for y in np.unique(year0):
+        idx = year0 == y
+        if y + 5 <= maxind:
+            # years 1970-2020
+            g1[idx] = ga[y][1]*f1[idx] + ga[y+5][1]*f2[idx]
+            g2[idx] = ga[y][2]*f1[idx] + ga[y+5][2]*f2[idx]
+            h2[idx] = ha[y][2]*f1[idx] + ha[y+5][2]*f2[idx]
+        else:
+            # years 2020-2025
+            g1[idx] = ga[maxind][1] + dg[1]*f3[idx]
+            g2[idx] = ga[maxind][2] + dg[2]*f3[idx]
+            h2[idx] = ha[maxind][2] + dh[2]*f3[idx]
+
+    g10 = -g1
+    g11 = g2
+    h11 = h2
 
-    for i in range(len(idoy)):
-        # check the cache before re-calculating the dipole direction
-        if cdipdir_cache.get(iyear[i] + idoy[i]) != None:
-            d1.append(cdipdir_cache.get(iyear[i] + idoy[i])[0])
-            d2.append(cdipdir_cache.get(iyear[i] + idoy[i])[1])
-            d3.append(cdipdir_cache.get(iyear[i] + idoy[i])[2])
-            continue
-        _d1, _d2, _d3 = cdipdir(None, iyear[i], idoy[i])
-        d1.append(_d1)
-        d2.append(_d2)
-        d3.append(_d3)
-        cdipdir_cache[iyear[i] + idoy[i]] = [_d1, _d2, _d3]
+    sq = g11**2 + h11**2
+    sqq = np.sqrt(sq)
+    sqr = np.sqrt(g10**2 + sq)
+    s10 = -h11/sqq
+    c10 = -g11/sqq
+    st0 = sqq/sqr
+    ct0 = g10/sqr
+
+    d1 = st0*c10
+    d2 = st0*s10
+    d3 = ct0
 
-    return np.array(d1), np.array(d2), np.array(d3)
+    return d1[inverse], d2[inverse], d3[inverse]
 
 
 def tgeigse_vect(time_in, data_in):
@@ -791,41 +884,8 @@ def subgeo2mag(time_in, data_in):
     Adapted from spedas IDL file geo2mag.pro.
 
     """
-    d = np.array(data_in)
-
-    # Step 1. Transform SM to GEO: SM -> GSM -> GSE -> GEI -> GEO
-    n = len(time_in)
-    sm = np.zeros((n, 3), float)
-    sm[:, 2] = 1.0
-    gsm = subsm2gsm(time_in, sm)
-    gse = subgsm2gse(time_in, gsm)
-    gei = subgse2gei(time_in, gse)
-    geo = subgei2geo(time_in, gei)
-    mag = geo  # the output
-
-    # Step 2. Transform cartesian to spherical.
-    x2y2 = geo[:, 0]**2 + geo[:, 1]**2
-    # r = np.sqrt(x2y2 + geo[:, 2]**2)
-    theta = np.arctan2(geo[:, 2], np.sqrt(x2y2))  # lat
-    phi = np.arctan2(geo[:, 1], geo[:, 0])  # long
-
-    for i in range(n):
-        # Step 3. Apply rotations.
-        mlong = np.zeros((3, 3), float)
-        mlong[0, 0] = np.cos(phi[i])
-        mlong[0, 1] = np.sin(phi[i])
-        mlong[1, 0] = -np.sin(phi[i])
-        mlong[1, 1] = np.cos(phi[i])
-        mlong[2, 2] = 1.0
-        out = mlong @ d[i]
-
-        mlat = np.zeros((3, 3), float)
-        mlat[0, 0] = np.cos(np.pi/2.0 - theta[i])
-        mlat[0, 2] = -np.sin(np.pi/2.0 - theta[i])
-        mlat[2, 0] = np.sin(np.pi/2.0 - theta[i])
-        mlat[2, 2] = np.cos(np.pi/2.0 - theta[i])
-        mlat[1, 1] = 1.0
-        mag[i] = mlat @ out
+    d = np.array(data_in, dtype=np.float64)
+    mag = np.einsum('nij,nj->ni', _geo2mag_matrix(time_in), d)
 
     logging.info("Running transformation: subgeo2mag")
     return mag
@@ -852,40 +912,9 @@ def submag2geo(time_in, data_in):
     Adapted from spedas IDL file mag2geo.pro.
 
     """
-    d = np.array(data_in)
-
-    # Step 1. Transform SM to GEO: SM -> GSM -> GSE -> GEI -> GEO
-    n = len(time_in)
-    sm = np.zeros((n, 3), float)
-    sm[:, 2] = 1.0
-    gsm = subsm2gsm(time_in, sm)
-    gse = subgsm2gse(time_in, gsm)
-    gei = subgse2gei(time_in, gse)
-    geo = subgei2geo(time_in, gei)
-
-    # Step 2. Transform cartesian to spherical.
-    x2y2 = geo[:, 0]**2 + geo[:, 1]**2
-    # r = np.sqrt(x2y2 + geo[:, 2]**2)
-    theta = np.arctan2(geo[:, 2], np.sqrt(x2y2))  # lat
-    phi = np.arctan2(geo[:, 1], geo[:, 0])  # long
-
-    for i in range(n):
-        # Step 3. Apply rotations.
-        glat = np.zeros((3, 3), float)
-        glat[0, 0] = np.cos(np.pi/2.0 - theta[i])
-        glat[0, 2] = np.sin(np.pi/2.0 - theta[i])
-        glat[2, 0] = -np.sin(np.pi/2.0 - theta[i])
-        glat[2, 2] = np.cos(np.pi/2.0 - theta[i])
-        glat[1, 1] = 1.0
-        out = glat @ d[i]
-
-        glong = np.zeros((3, 3), float)
-        glong[0, 0] = np.cos(phi[i])
-        glong[0, 1] = -np.sin(phi[i])
-        glong[1, 0] = np.sin(phi[i])
-        glong[1, 1] = np.cos(phi[i])
-        glong[2, 2] = 1.0
-        geo[i] = glong @ out
+    d = np.array(data_in, dtype=np.float64)
+    # the inverse of the rotation is its transpose
+    geo = np.einsum('nji,nj->ni', _geo2mag_matrix(time_in), d)
 
     logging.info("Running transformation: submag2geo")
     return geo
@@ -1130,6 +1159,231 @@ def subj20002gei(time_in, data_in):
     return np.transpose(d_out)
 
 
+def _gei2gse_matrix(time_in):
+    """
+    Rotation matrices (n, 3, 3) from GEI to GSE, same as tgeigse_vect.
+    """
+    gst, slong, sra, sdec, obliq = csundir_vect(time_in)
+
+    m = np.zeros((len(gst), 3, 3), float)
+    m[:, 0, 0] = np.cos(sra) * np.cos(sdec)
+    m[:, 0, 1] = np.sin(sra) * np.cos(sdec)
+    m[:, 0, 2] = np.sin(sdec)
+
+    m[:, 2, 1] = -np.sin(obliq)
+    m[:, 2, 2] = np.cos(obliq)
+
+    # y axis = z x x
+    m[:, 1, :] = np.cross(m[:, 2, :], m[:, 0, :])
+
+    return m
+
+
+def _gse2gsm_matrix(time_in):
+    """
+    Rotation matrices (n, 3, 3) from GSE to GSM, same as tgsegsm_vect.
+    """
+    gd1, gd2, gd3 = cdipdir_vect(time_in)
+    gst, slong, sra, sdec, obliq = csundir_vect(time_in)
+
+    gs1 = np.cos(sra) * np.cos(sdec)
+    gs2 = np.sin(sra) * np.cos(sdec)
+    gs3 = np.sin(sdec)
+
+    sgst = np.sin(gst)
+    cgst = np.cos(gst)
+
+    ge1 = 0.0
+    ge2 = -np.sin(obliq)
+    ge3 = np.cos(obliq)
+
+    gm1 = gd1 * cgst - gd2 * sgst
+    gm2 = gd1 * sgst + gd2 * cgst
+    gm3 = gd3
+
+    gmgs1 = gm2 * gs3 - gm3 * gs2
+    gmgs2 = gm3 * gs1 - gm1 * gs3
+    gmgs3 = gm1 * gs2 - gm2 * gs1
+
+    rgmgs = np.sqrt(gmgs1**2 + gmgs2**2 + gmgs3**2)
+
+    cdze = (ge1 * gm1 + ge2 * gm2 + ge3 * gm3)/rgmgs
+    sdze = (ge1 * gmgs1 + ge2 * gmgs2 + ge3 * gmgs3)/rgmgs
+
+    m = np.zeros((len(gst), 3, 3), float)
+    m[:, 0, 0] = 1.0
+    m[:, 1, 1] = cdze
+    m[:, 1, 2] = sdze
+    m[:, 2, 1] = -sdze
+    m[:, 2, 2] = cdze
+
+    return m
+
+
+def _gsm2sm_matrix(time_in):
+    """
+    Rotation matrices (n, 3, 3) from GSM to SM, same as tgsmsm_vect.
+    """
+    gd1, gd2, gd3 = cdipdir_vect(time_in)
+    gst, slong, sra, sdec, obliq = csundir_vect(time_in)
+
+    gs1 = np.cos(sra) * np.cos(sdec)
+    gs2 = np.sin(sra) * np.cos(sdec)
+    gs3 = np.sin(sdec)
+
+    sgst = np.sin(gst)
+    cgst = np.cos(gst)
+
+    # Direction of the sun in GEO system
+    ps1 = gs1 * cgst + gs2 * sgst
+    ps2 = -gs1 * sgst + gs2 * cgst
+    ps3 = gs3
+
+    # Computation of mu angle
+    smu = ps1 * gd1 + ps2 * gd2 + ps3 * gd3
+    cmu = np.sqrt(1.0 - smu * smu)
+
+    m = np.zeros((len(gst), 3, 3), float)
+    m[:, 0, 0] = cmu
+    m[:, 0, 2] = -smu
+    m[:, 1, 1] = 1.0
+    m[:, 2, 0] = smu
+    m[:, 2, 2] = cmu
+
+    return m
+
+
+def _gei2geo_matrix(time_in):
+    """
+    Rotation matrices (n, 3, 3) from GEI to GEO, same as subgei2geo.
+    """
+    gst, slong, sra, sdec, obliq = csundir_vect(time_in)
+
+    sgst = np.sin(gst)
+    cgst = np.cos(gst)
+
+    m = np.zeros((len(gst), 3, 3), float)
+    m[:, 0, 0] = cgst
+    m[:, 0, 1] = sgst
+    m[:, 1, 0] = -sgst
+    m[:, 1, 1] = cgst
+    m[:, 2, 2] = 1.0
+
+    return m
+
+
+def _geo2mag_matrix(time_in):
+    """
+    Rotation matrices (n, 3, 3) from GEO to MAG, same as geo2mag.pro.
+    """
+    # The SM z axis (dipole) in GEO: SM -> GSM -> GSE -> GEI -> GEO
+    sm2geo = cotrans_matrix(time_in, 'sm', 'geo')
+    geo = sm2geo[:, :, 2]
+
+    # Transform cartesian to spherical.
+    x2y2 = geo[:, 0]**2 + geo[:, 1]**2
+    theta = np.arctan2(geo[:, 2], np.sqrt(x2y2))  # lat
+    phi = np.arctan2(geo[:, 1], geo[:, 0])  # long
+
+    mlong = np.zeros((len(phi), 3, 3), float)
+    mlong[:, 0, 0] = np.cos(phi)
+    mlong[:, 0, 1] = np.sin(phi)
+    mlong[:, 1, 0] = -np.sin(phi)
+    mlong[:, 1, 1] = np.cos(phi)
+    mlong[:, 2, 2] = 1.0
+
+    mlat = np.zeros((len(theta), 3, 3), float)
+    mlat[:, 0, 0] = np.cos(np.pi/2.0 - theta)
+    mlat[:, 0, 2] = -np.sin(np.pi/2.0 - theta)
+    mlat[:, 2, 0] = np.sin(np.pi/2.0 - theta)
+    mlat[:, 2, 2] = np.cos(np.pi/2.0 - theta)
+    mlat[:, 1, 1] = 1.0
+
+    return mlat @ mlong
+
+
+def _gei2j2000_matrix(time_in):
+    """
+    Rotation matrices (n, 3, 3) from GEI to J2000, same as subgei2j2000.
+    """
+    return np.transpose(j2000_matrix_vec(time_in), (2, 1, 0))
+
+
+def get_all_matrices_t1_t2():
+    """
+    Give a dictionary of the functions returning the rotation matrices
+    of the transformations in this file.
+
+    The inverse transformations use the transposed matrices.
+
+    Parameters
+    ----------
+    None
+
+    Returns
+    -------
+    Dictionary of functions.
+    """
+    p = {'gei': {'gse': _gei2gse_matrix,
+                 'geo': _gei2geo_matrix,
+                 'j2000': _gei2j2000_matrix},
+         'gse': {'gsm': _gse2gsm_matrix},
+         'gsm': {'sm': _gsm2sm_matrix},
+         'geo': {'mag': _geo2mag_matrix}}
+    return p
+
+
+def cotrans_matrix(time_in, coord_in, coord_out, cpath=None):
+    """
+    Rotation matrices from coord_in to coord_out.
+
+    The matrices of the individual transformations are multiplied
+    together, so that the data can be rotated once.
+
+    Parameters
+    ----------
+    time_in: list of float
+        Time array.
+    coord_in: string
+        One of GSE, GSM, SM, GEI, GEO, MAG, J2000.
+    coord_out: string
+        One of GSE, GSM, SM, GEI, GEO, MAG, J2000.
+    cpath: list of string, optional
+        Path of transformations from coord_in to coord_out;
+        found with find_path_t1_t2 if not given.
+
+    Returns
+    -------
+    Array of float
+        Array (n, 3, 3) of rotation matrices, such that
+        data_out[i] = matrix[i] @ data_in[i].
+
+    """
+    coord_in = coord_in.lower()
+    coord_out = coord_out.lower()
+
+    if cpath is None:
+        cpath = find_path_t1_t2(coord_in, coord_out)
+        cpath = shorten_path_t1_t2(cpath)
+        cpath = shorten_path_t1_t2(cpath)
+
+    m = get_all_matrices_t1_t2()
+    matrix = None
+    for i in range(len(cpath)-1):
+        c1 = cpath[i]
+        c2 = cpath[i+1]
+        if c1 in m and c2 in m[c1]:
+            step = m[c1][c2](time_in)
+        else:
+            step = np.transpose(m[c2][c1](time_in), (0, 2, 1))
+        matrix = step if matrix is None else step @ matrix
+
+    if matrix is None:
+        matrix = np.tile(np.eye(3), (len(np.atleast_1d(time_in)), 1, 1))
+
+    return matrix
+
+
 def get_all_paths_t1_t2():
     """
     Give a dictionary of existing sub functions in this file.
@@ -1276,11 +1530,17 @@ def subcotrans(time_in, data_in, coord_in, coord_out):
     p = shorten_path_t1_t2(p)
     logging.info(p)
 
-    # Daisy chain the list of transformations.
+    # Combine the list of transformations into one rotation,
+    # and apply it to the data in chunks to limit memory use.
     for i in range(len(p)-1):
-        c1 = p[i]
-        c2 = p[i+1]
-        subname = "sub" + c1 + "2" + c2
-        data_out = globals()[subname](time_in, data_out)
+        logging.info("Running transformation: sub" + p[i] + "2" + p[i+1])
+
+    times = np.asarray(time_in, dtype=np.float64)
+    d = np.asarray(data_in, dtype=np.float64)
+    data_out = np.empty(d.shape, dtype=np.float64)
+    for start in range(0, len(times), SUBCOTRANS_CHUNK_SIZE):
+        stop = min(start + SUBCOTRANS_CHUNK_SIZE, len(times))
+        matrix = cotrans_matrix(times[start:stop], coord_in, coord_out, cpath=p)
+        data_out[start:stop] = np.einsum('nij,nj->ni', matrix, d[start:stop])
 
     return data_out
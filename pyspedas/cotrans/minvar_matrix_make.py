@@ -1,5 +1,4 @@
 from pyspedas import time_double
-from pyspedas.cotrans.minvar import minvar
 from pytplot import get_data, store_data
 import numpy as np
 
@@ -11,6 +10,41 @@ def minvar_matrix_make(in_var_name,
                        tslide=None,
                        newname=None):
     """
+    Calculates minimum variance analysis (MVA) transformation matrices
+    over sliding windows of a vector tplot variable.
+
+    The covariance matrices of all the windows are calculated from
+    cumulative sums of the data, and their eigenvectors are found
+    together, instead of calling minvar for each window.
+
+    Input
+    ------
+        in_var_name: str
+            Tplot variable containing the vector data (N x 3)
+
+    Parameters
+    -----------
+        tstart: str or float
+            Start time of the first window; defaults to the first data time
+
+        tstop: str or float
+            Stop time of the last window; defaults to the last data time
+
+        twindow: float
+            Length of each window (seconds); defaults to the whole interval
+
+        tslide: float
+            Time between the starts of consecutive windows (seconds);
+            defaults to half of twindow
+
+        newname: str
+            Name of the output tplot variable; defaults to in_var_name + '_mva_mat'
+
+    Returns
+    --------
+        List containing the name of the variable created; the matrices are stored
+        at the midpoint times of the windows, and rotate vectors into the
+        (maximum, intermediate, minimum) variance directions.
 
     """
     data = get_data(in_var_name)
@@ -36,8 +70,6 @@ def minvar_matrix_make(in_var_name,
     if newname is None:
         newname = in_var_name + '_mva_mat'
 
-    current_d = start_d
-
     # estimate the number of output matrices to generate temporary storage
     if tslide != 0:
         o_num = (stop_d - start_d) / tslide
@@ -46,44 +78,32 @@ def minvar_matrix_make(in_var_name,
 
     o_num = int(o_num)
 
+    # start times of the windows; the windows continue until the start time
+    # passes the stop time (or o_num windows are found)
+    starts = np.cumsum(np.concatenate(([start_d], np.full(max(o_num - 1, 0), tslide))))[:max(o_num, 0)]
+    starts = starts[starts <= stop_d]
+
     o_times = np.zeros(o_num)
-    o_lams = np.zeros((o_num, 3))
     o_eigs = np.zeros((o_num, 3, 3))
 
-    i = 0
-
-    while current_d + twindow <= stop_d + twindow:
-        if i >= o_num:
-            break
-        # output time for the mva matrix is the midpoint time for the interval
-        o_times[i] = current_d + twindow / 2.0
+    # output time for the mva matrix is the midpoint time for the interval
+    o_times[:len(starts)] = starts + twindow / 2.0
 
-        idx = np.argwhere((data.times >= current_d) & (data.times <= (current_d + twindow))).flatten()
+    # data in each window: start <= t <= start + twindow
+    times = np.asarray(data.times)
+    lo = np.searchsorted(times, starts, side='left')
+    hi = np.searchsorted(times, starts + twindow, side='right')
 
-        if len(idx) == 0:
-            current_d += tslide
-            i += 1
-            continue
+    valid = np.argwhere(hi > lo).flatten()
 
-        in_data = data.y[idx, :]
+    if len(valid) > 0:
+        mvamats = minvar_window_covariances(data.y, lo[valid], hi[valid])
 
         try:
-            out = minvar(in_data)
+            v, w = minvar_eigen(mvamats)
+            o_eigs[valid, :, :] = np.transpose(v, (0, 2, 1))
         except np.linalg.LinAlgError:
-            current_d += tslide
-            i += 1
-            continue
-
-        if out is not None:
-            v_rot, o_eig, o_lam = out
-            o_lams[i, :] = o_lam
-            o_eigs[i, :, :] = o_eig.transpose()
-
-        i += 1
-        current_d += tslide
-
-        if tslide == 0:
-            break
+            pass
 
     o_d = {'x': o_times[:-1], 'y': o_eigs[0:-1, :, :]}
 
@@ -95,3 +115,123 @@ def minvar_matrix_make(in_var_name,
         out_vars.append(newname)
 
     return out_vars
+
+
+def minvar_window_covariances(data, lo, hi):
+    """
+    Calculates the variance matrices used by minvar for the windows data[lo:hi],
+    from cumulative sums of the data and of the products of its components
+
+    The data are split into blocks at least as long as the longest window, so
+    that each window is the end of one block and the start of the next. The
+    cumulative sums restart in each block, relative to the mean of the block,
+    and the two parts of each window are combined with the pairwise update of
+    Chan et al.; this keeps the sums small when the variance is small compared
+    to the offset of the data, or when the offset drifts.
+
+    Parameters
+    -----------
+        data: ndarray
+            Vector data (N x 3); NaNs are treated as zeros, as in minvar
+
+        lo, hi: ndarray
+            Start and end (exclusive) indices of the windows (M)
+
+    Returns
+    --------
+        Variance matrices of the windows (M x 3 x 3)
+    """
+    d = np.nan_to_num(np.asarray(data, dtype=np.float64)[:, 0:3], nan=0.0)
+    lo = np.asarray(lo)
+    hi = np.asarray(hi)
+
+    block = max(int(np.max(hi - lo)), 1)
+    n_blocks = -(-len(d) // block)
+    block_starts = np.arange(n_blocks) * block
+
+    # reference (mean) of each block; an extra block past the end is left empty
+    refs = np.zeros((n_blocks + 1, 3))
+    refs[:n_blocks] = np.add.reduceat(d, block_starts, axis=0) / np.diff(np.append(block_starts, len(d)))[:, np.newaxis]
+
+    centered = np.zeros(((n_blocks + 1) * block, 3))
+    centered[:len(d)] = d - np.repeat(refs[:n_blocks], block, axis=0)[:len(d)]
+
+    rows, cols = np.triu_indices(3)
+    columns = np.concatenate((centered, centered[:, rows] * centered[:, cols]), axis=1)
+    columns[len(d):] = 0.0
+
+    # sums[b, k] is the sum over the first k points of block b
+    sums = np.zeros((n_blocks + 1, block + 1, columns.shape[1]))
+    np.cumsum(columns.reshape(n_blocks + 1, block, columns.shape[1]), axis=1, out=sums[:, 1:])
+
+    # the first part of each window is in block b, the rest at the start of block b + 1
+    b = lo // block
+    split = np.minimum(hi, (b + 1) * block)
+    first = sums[b, split - b * block] - sums[b, lo - b * block]
+    second = sums[b + 1, np.maximum(hi - (b + 1) * block, 0)]
+
+    n_first = (split - lo).astype(np.float64)
+    n_second = (hi - split).astype(np.float64)
+    counts = n_first + n_second
+
+    def moments(part, n):
+        # mean (relative to the block reference) and sum of squared deviations
+        mean = part[:, 0:3] / np.maximum(n, 1.0)[:, np.newaxis]
+        m2 = part[:, 3:] - n[:, np.newaxis] * mean[:, rows] * mean[:, cols]
+        return mean, m2
+
+    mean_first, m2_first = moments(first, n_first)
+    mean_second, m2_second = moments(second, n_second)
+
+    delta = (refs[b + 1] - refs[b]) + (mean_second - mean_first)
+    m2 = m2_first + m2_second + (n_first * n_second / counts)[:, np.newaxis] * delta[:, rows] * delta[:, cols]
+
+    mvamats = np.zeros((len(lo), 3, 3))
+    mvamats[:, rows, cols] = m2 / counts[:, np.newaxis]
+    mvamats[:, cols, rows] = mvamats[:, rows, cols]
+
+    # windows with a single point have no variance
+    mvamats[counts == 1] = 0.0
+
+    return mvamats
+
+
+def minvar_eigen(mvamats):
+    """
+    Finds the principal variance directions and variances of a set of
+    variance matrices, with the same ordering and sign conventions as minvar
+
+    Parameters
+    -----------
+        mvamats: ndarray
+            Variance matrices (M x 3 x 3)
+
+    Returns
+    --------
+        Tuple containing the principal axes vectors (M x 3 x 3, with the maximum,
+        intermediate and minimum variance directions in v[:, :, 0], v[:, :, 1]
+        and v[:, :, 2]) and the eigenvalues (M x 3, descending order)
+    """
+    # Calculate eigenvalues and eigenvectors
+    w, v = np.linalg.eigh(mvamats, UPLO='U')
+
+    # Sorting to ensure descending order
+    w = np.abs(w)
+    idx = np.flip(np.argsort(w, axis=1), axis=1)
+
+    # IDL compatability
+    idx[np.sum(w, axis=1) == 0.0] = [0, 2, 1]
+
+    w = np.take_along_axis(w, idx, axis=1)
+    v = np.take_along_axis(v, idx[:, np.newaxis, :], axis=2)
+
+    # Rotate intermediate var direction if system is not Right Handed
+    YcrossZdotX = v[:, 0, 0] * (v[:, 1, 1] * v[:, 2, 2] - v[:, 2, 1] * v[:, 1, 2])
+    v[YcrossZdotX < 0, :, 1] *= -1
+
+    # Ensure minvar direction is along +Z (for FAC system)
+    flip = v[:, 2, 2] < 0
+    v[flip, :, 2] *= -1
+    v[flip, :, 1] *= -1
+
+    return v, w
@@ -10,11 +10,16 @@ These tests include the function in the following files:
 
 """
 import unittest
+import numpy as np
 import pyspedas
+from datetime import datetime
 import logging
 from pyspedas.themis.cotrans.dsl2gse import dsl2gse
 from pyspedas.cotrans.cotrans import cotrans
 from pyspedas.cotrans.fac_matrix_make import fac_matrix_make
+from pyspedas.cotrans.tvector_rotate import tvector_rotate
+from pyspedas.cotrans.cotrans_lib import get_time_parts, cdipdir, cdipdir_vect, subcotrans
+from pyspedas.cotrans.cotrans_lib import subgse2gsm, subgsm2sm, subgei2geo, subgeo2mag, submag2geo
 from pytplot import get_data, store_data, del_data
 from pyspedas import cotrans_get_coord, cotrans_set_coord, sm2mlt
 
@@ -178,6 +183,69 @@ class CotransTestCases(unittest.TestCase):
         self.assertTrue(abs(gsm[1]-res[1]) <= 1e-6)
         self.assertTrue(abs(gsm[2]-res[2]) <= 1e-6)
 
+    def test_get_time_parts(self):
+        """Test the time decomposition against datetime."""
+        t = np.array([0.0, 1577112800.25, 1577308800.9999996, 1583020799.5, 1709164800.0])
+        iyear, idoy, ih, im, isec = get_time_parts(t)
+        for idx, time in enumerate(t):
+            dt = datetime.utcfromtimestamp(time)
+            self.assertTrue(iyear[idx] == dt.year)
+            self.assertTrue(idoy[idx] == dt.timetuple().tm_yday)
+            self.assertTrue(ih[idx] == dt.hour)
+            self.assertTrue(im[idx] == dt.minute)
+            self.assertTrue(isec[idx] == dt.second + dt.microsecond/1000000.0)
+
+    def test_cdipdir_vect(self):
+        """Test the vectorized dipole direction against cdipdir."""
+        # days with the same year+doy sum, e.g., 2020/100 and 2019/101
+        t = [1586390400.0, 1554768000.0, 1577112800.0, 1790000000.0]
+        d1, d2, d3 = cdipdir_vect(t)
+        iyear, idoy, ih, im, isec = get_time_parts(t)
+        for idx in range(len(t)):
+            res = cdipdir(None, iyear[idx], idoy[idx])
+            self.assertTrue(abs(d1[idx]-res[0]) <= 1e-12)
+            self.assertTrue(abs(d2[idx]-res[1]) <= 1e-12)
+            self.assertTrue(abs(d3[idx]-res[2]) <= 1e-12)
+
+    def test_subcotrans_fused(self):
+        """Test that the combined rotations match the individual transformations."""
+        rng = np.random.default_rng(11)
+        t = 1.0e9 + np.sort(rng.random(500))*8e8
+        d = rng.normal(size=(500, 3))*1e4
+        chained = subgsm2sm(t, subgse2gsm(t, d))
+        self.assertTrue(np.allclose(subcotrans(t, d, 'gse', 'sm'), chained, rtol=0, atol=1e-8))
+        chained = subgeo2mag(t, subgei2geo(t, d))
+        self.assertTrue(np.allclose(subcotrans(t, d, 'gei', 'mag'), chained, rtol=0, atol=1e-8))
+        # the transformations are rotations, so the length is unchanged
+        out = subcotrans(t, d, 'mag', 'j2000')
+        self.assertTrue(np.allclose(np.linalg.norm(out, axis=1), np.linalg.norm(d, axis=1)))
+        self.assertTrue(np.allclose(subcotrans(t, out, 'j2000', 'mag'), d, rtol=0, atol=1e-8))
+        self.assertTrue(np.allclose(submag2geo(t, subgeo2mag(t, d)), d, rtol=0, atol=1e-8))
+
+    def test_tvector_rotate(self):
+        """Test rotating several variables, with and without interpolating the matrices."""
+        angle = np.radians(np.arange(11)*5.0)
+        mats = np.zeros((11, 3, 3))
+        mats[:, 0, 0] = np.cos(angle)
+        mats[:, 0, 1] = -np.sin(angle)
+        mats[:, 1, 0] = np.sin(angle)
+        mats[:, 1, 1] = np.cos(angle)
+        mats[:, 2, 2] = 1.0
+        store_data('tvr_mats', data={'x': np.arange(11)*10.0, 'y': mats})
+        store_data('tvr_vec1', data={'x': np.arange(11)*10.0, 'y': np.tile([1.0, 0.0, 2.0], (11, 1))})
+        store_data('tvr_vec2', data={'x': np.arange(101)*1.0, 'y': np.tile([1.0, 0.0, 2.0], (101, 1))})
+        store_data('tvr_vec3', data={'x': np.arange(101)*1.0, 'y': np.tile([0.0, 3.0, 0.0], (101, 1))})
+        out = tvector_rotate('tvr_mats', ['tvr_vec1', 'tvr_vec2', 'tvr_vec3'])
+        self.assertTrue(out == ['tvr_vec1_rot', 'tvr_vec2_rot', 'tvr_vec3_rot'])
+        rot1 = get_data('tvr_vec1_rot').y
+        self.assertTrue(np.allclose(rot1, np.stack([np.cos(angle), np.sin(angle), np.full(11, 2.0)], axis=1)))
+        # the slerped matrices rotate by the linearly interpolated angle
+        angle = np.radians(np.arange(101)*0.5)
+        rot2 = get_data('tvr_vec2_rot').y
+        self.assertTrue(np.allclose(rot2, np.stack([np.cos(angle), np.sin(angle), np.full(101, 2.0)], axis=1)))
+        rot3 = get_data('tvr_vec3_rot').y
+        self.assertTrue(np.allclose(rot3, np.stack([-3.0*np.sin(angle), 3.0*np.cos(angle), np.zeros(101)], axis=1)))
+
     def test_cotrans_j2000(self):
         """Test GEI->J2000 and J2000 params."""
         del_data()
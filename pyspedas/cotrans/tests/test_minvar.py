@@ -2,6 +2,8 @@
 Unit Tests for minvar function.
 """
 from pyspedas.cotrans.minvar import minvar
+from pyspedas.cotrans.minvar_matrix_make import minvar_matrix_make, minvar_window_covariances, minvar_eigen
+from pytplot import store_data, get_data
 import numpy as np
 import unittest
 
@@ -61,6 +63,53 @@ class TestMinvar(unittest.TestCase):
         # v[2,2] Should be positive after that
         self.assertTrue(v[2, 2] > 0)
 
+    def test_minvar_matrix_make(self):
+        """Test the sliding windows against minvar on each window"""
+        rng = np.random.default_rng(seed=27182)
+        times = 1000.0 + np.arange(600)*0.5
+        data = np.cumsum(rng.normal(size=(600, 3)), axis=0)
+        data[50:53, 1] = np.nan
+        store_data('minvar_test', data={'x': times, 'y': data})
+        out = minvar_matrix_make('minvar_test', twindow=20.0, tslide=5.0)
+        self.assertTrue(out == ['minvar_test_mva_mat'])
+        mats = get_data('minvar_test_mva_mat')
+        self.assertTrue(len(mats.times) == 58)
+        for i, time in enumerate(mats.times):
+            idx = (times >= time - 10.0) & (times <= time + 10.0)
+            vrot, v, w = minvar(data[idx, :])
+            self.assertTrue(np.abs(mats.y[i] - v.T).max() < 1e-8)
+
+        # windows without data give zeros
+        store_data('minvar_test', data={'x': np.concatenate((times[:100], times[300:])),
+                                        'y': np.concatenate((data[:100], data[300:]))})
+        minvar_matrix_make('minvar_test', twindow=20.0, tslide=5.0)
+        mats = get_data('minvar_test_mva_mat')
+        self.assertTrue(np.all(mats.y[(mats.times > 1060.0) & (mats.times < 1140.0)] == 0.0))
+
+    def test_minvar_matrix_make_offset(self):
+        """Test windows with a small variance on top of a large, drifting offset"""
+        rng = np.random.default_rng(seed=16180)
+        times = 1000.0 + np.arange(4000)*0.5
+        rot = np.linalg.qr(rng.normal(size=(3, 3)))[0]
+        data = 1e4 + np.linspace(0.0, 200.0, 4000)[:, np.newaxis] + (rng.normal(size=(4000, 3))*[0.3, 0.1, 0.02]) @ rot.T
+        store_data('minvar_test', data={'x': times, 'y': data})
+        minvar_matrix_make('minvar_test', twindow=20.0, tslide=5.0)
+        mats = get_data('minvar_test_mva_mat')
+        for i, time in enumerate(mats.times):
+            idx = (times >= time - 10.0) & (times <= time + 10.0)
+            # the variance doesn't depend on the offset; removing it here keeps
+            # minvar itself accurate
+            vrot, v, w = minvar(data[idx, :] - data[idx, :][0])
+            self.assertTrue(np.abs(mats.y[i] - v.T).max() < 1e-8)
+
+        # the variances along the minimum variance direction are much smaller than the offset
+        lo = np.arange(0, 3960, 10)
+        hi = lo + 40
+        vecs, w = minvar_eigen(minvar_window_covariances(data, lo, hi))
+        for i in range(len(lo)):
+            vrot, v, expected = minvar(data[lo[i]:hi[i], :] - data[lo[i], :])
+            self.assertTrue(np.abs(w[i] - expected).max() < 1e-10*expected.max())
+
 
 if __name__ == '__main__':
     unittest.main()
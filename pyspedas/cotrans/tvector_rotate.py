@@ -54,47 +54,61 @@ def tvector_rotate(mat_var_in, vec_var_in, newname=None):
 
     out_names = []
 
+    mat_data = get_data(mat_var_in)
+
+    # the matrices are interpolated once for each time grid of the vector
+    # variables, and shared by the variables on the same grid
+    interpolated = []
+
     # loop over the vectors
     for vec_var, new_var in zip(vec_var_in, newname):
         vec_data = get_data(vec_var)
         vec_metadata = get_data(vec_var, metadata=True)
-        mat_data = get_data(mat_var_in)
         m_d_y = mat_data.y
 
         if not np.array_equal(vec_data.times, mat_data.times) and len(mat_data.times) != 1:
-            verify_check = ctv_verify_mats(mat_data.y)
+            m_d_y = None
+            for times, matrices in interpolated:
+                if np.array_equal(vec_data.times, times):
+                    m_d_y = matrices
+                    break
 
-            is_left_mat = ctv_left_mats(mat_data.y)
+            if m_d_y is None:
+                m_d_y = _interpolate_matrices(mat_data, vec_data.times)
+                interpolated.append((vec_data.times, m_d_y))
 
-            # left-handed matrices can mess up qslerping
-            if is_left_mat:
-                q_in = mtoq(ctv_swap_hands(mat_data.y))
-            else:
-                q_in = mtoq(mat_data.y)
+        # rotate all of the vectors at once; a single matrix is applied to every vector
+        vec_fac = np.matmul(m_d_y, vec_data.y[:, :, np.newaxis])[:, :, 0]
 
-            # interpolate quaternions
-            q_out = qslerp(q_in, mat_data.times, vec_data.times)
+        saved = store_data(new_var, data={'x': vec_data.times, 'y': vec_fac}, attr_dict=vec_metadata)
 
-            # turn quaternions back into matrices
-            m_d_y = qtom(q_out)
+        if saved:
+            out_names.append(new_var)
 
-            if is_left_mat:
-                m_d_y = ctv_swap_hands(m_d_y)
+    return out_names
 
 
-        vec_fac = np.zeros((len(vec_data.times), len(vec_data.y[0, :])))
+def _interpolate_matrices(mat_data, times):
+    """
+    Interpolates the rotation matrices to new times, by slerping their quaternions
+    """
+    verify_check = ctv_verify_mats(mat_data.y)
 
-        for i in range(0, len(vec_data.times)):
-            if m_d_y.shape[0] == 1:  # only a single matrix
-                matrix = m_d_y[0, :, :]
-            else:
-                matrix = m_d_y[i, :, :]
+    is_left_mat = ctv_left_mats(mat_data.y)
 
-            vec_fac[i, :] = matrix @ vec_data.y[i, :]
+    # left-handed matrices can mess up qslerping
+    if is_left_mat:
+        q_in = mtoq(ctv_swap_hands(mat_data.y))
+    else:
+        q_in = mtoq(mat_data.y)
 
-        saved = store_data(new_var, data={'x': vec_data.times, 'y': vec_fac}, attr_dict=vec_metadata)
+    # interpolate quaternions
+    q_out = qslerp(q_in, mat_data.times, times)
 
-        if saved:
-            out_names.append(new_var)
+    # turn quaternions back into matrices
+    m_d_y = qtom(q_out)
 
-    return out_names
+    if is_left_mat:
+        m_d_y = ctv_swap_hands(m_d_y)
+
+    return m_d_y
@@ -8,6 +8,7 @@ from pytplot import time_string
 
 from pyspedas.particles.moments.spd_pgs_moments import spd_pgs_moments
 from pyspedas.particles.spd_part_products.spd_pgs_regrid import spd_pgs_regrid
+from pyspedas.particles.spd_part_products.spd_pgs_parallel import spd_pgs_parallel
 from pytplot import get_timespan, get_data, store_data, ylim
 
 from .erg_lepe_get_dist import erg_lepe_get_dist
@@ -43,7 +44,9 @@ def erg_lep_part_products(
     mag_name=None,
     pos_name=None,
     relativistic=False,
-    no_regrid=False
+    no_regrid=False,
+    nprocs=None,
+    executor=None
     ):
 
     if len(tnames(in_tvarname)) < 1:
@@ -137,54 +140,7 @@ def erg_lep_part_products(
     if instnm == 'lepi':
         dist = erg_lepi_get_dist(in_tvarname, 0, species=species, units=units_lc)
 
-    if 'energy' in outputs_lc:
-        out_energy = np.zeros((times_array.shape[0], dist['n_energy']))
-        out_energy_y = np.zeros((times_array.shape[0], dist['n_energy']))
-    if 'theta' in outputs_lc:
-        if instnm == 'lepe':
-            n_theta_unique = len(np.unique(dist['theta']))
-            out_theta = np.zeros((times_array.shape[0], n_theta_unique))
-            out_theta_y = np.zeros((times_array.shape[0], n_theta_unique))
-        elif  instnm == 'lepi':
-            out_theta = np.zeros((times_array.shape[0], dist['n_theta']))
-            out_theta_y = np.zeros((times_array.shape[0], dist['n_theta']))
-    if 'phi' in outputs_lc:
-        out_phi = np.zeros((times_array.shape[0], dist['n_phi']))
-        out_phi_y = np.zeros((times_array.shape[0], dist['n_phi']))
-
-    if 'gyro' in outputs_lc:
-        out_gyro = np.zeros((times_array.shape[0], regrid[0]))
-        out_gyro_y = np.zeros((times_array.shape[0], regrid[0]))
-
-    if 'pa' in outputs_lc:
-        out_pad = np.zeros((times_array.shape[0], regrid[1]))
-        out_pad_y = np.zeros((times_array.shape[0], regrid[1]))
-
-    if 'moments' in outputs_lc:
-        out_density = np.zeros(times_array.shape[0])
-        out_avgtemp = np.zeros(times_array.shape[0])
-        out_vthermal = np.zeros(times_array.shape[0])
-        out_flux = np.zeros([times_array.shape[0], 3])
-        out_velocity = np.zeros([times_array.shape[0], 3])
-        out_mftens = np.zeros([times_array.shape[0], 6])
-        out_ptens = np.zeros([times_array.shape[0], 6])
-        out_ttens = np.zeros([times_array.shape[0], 3, 3])
-
-    if 'fac_energy' in outputs_lc:
-        out_fac_energy = np.zeros((times_array.shape[0], dist['n_energy']))
-        out_fac_energy_y = np.zeros((times_array.shape[0], dist['n_energy']))
-
-    if 'fac_moments' in outputs_lc:
-        out_fac_density = np.zeros(times_array.shape[0])
-        out_fac_avgtemp = np.zeros(times_array.shape[0])
-        out_fac_vthermal = np.zeros(times_array.shape[0])
-        out_fac_flux = np.zeros([times_array.shape[0], 3])
-        out_fac_velocity = np.zeros([times_array.shape[0], 3])
-        out_fac_mftens = np.zeros([times_array.shape[0], 6])
-        out_fac_ptens = np.zeros([times_array.shape[0], 6])
-        out_fac_ttens = np.zeros([times_array.shape[0], 3, 3])
     out_vars = []
-    last_update_time = None
 
     """
     ;;--------------------------------------------------------
@@ -237,9 +193,238 @@ def erg_lep_part_products(
     ;; Loop over time to build spectrograms and/or moments
     ;;-------------------------------------------------
     """
-    for index in range(time_indices.shape[0]):
-        last_update_time = erg_pgs_progress_update(last_update_time=last_update_time,
-             current_sample=index, total_samples=time_indices.shape[0], type_string=in_tvarname)
+    state = {'show_progress': True,
+             'in_tvarname': in_tvarname,
+             'instnm': instnm,
+             'species': species,
+             'units_lc': units_lc,
+             'outputs_lc': outputs_lc,
+             'fac_requested': fac_requested,
+             'phi_in': phi_in,
+             'theta': theta,
+             'energy': energy,
+             'pitch': pitch,
+             'gyro': gyro,
+             'no_ang_weighting': no_ang_weighting,
+             'no_regrid': no_regrid,
+             'regrid': regrid,
+             'dist': {key: value for key, value in dist.items() if not isinstance(value, np.ndarray)}}
+    if (instnm == 'lepe') and ('theta' in outputs_lc):
+        state['dist']['n_theta_unique'] = len(np.unique(dist['theta']))
+
+    # large inputs are shared with the worker processes, instead of sent with each chunk
+    arrays = {'time_indices': time_indices, 'magf': magf}
+    if fac_requested:
+        arrays['fac_matrix'] = fac_matrix
+    if instnm == 'lepe':
+        for key, value in dist_all_time_range.items():
+            if isinstance(value, np.ndarray):
+                arrays['dist_'+key] = value
+            else:
+                state['dist_all_time_range_'+key] = value
+
+    if (nprocs is not None) or (executor is not None):
+        state['show_progress'] = False
+        out = spd_pgs_parallel(_erg_lep_part_products_samples, time_indices.shape[0], state, arrays=arrays,
+                               tvars=[in_tvarname] if instnm == 'lepi' else [], nprocs=nprocs, executor=executor, type_string=in_tvarname)
+    else:
+        out = _erg_lep_part_products_samples(state, arrays, 0, time_indices.shape[0])
+
+    made_et_spec = ('energy' in outputs_lc) or ('fac_energy' in outputs_lc)
+
+    if 'energy' in outputs_lc:
+        output_tplot_name = in_tvarname+'_energy' + suffix
+        erg_pgs_make_tplot(output_tplot_name, x=times_array, y=out['energy_y'], z=out['energy'], units=units, ylog=True, ytitle=dist['data_name'] + ' \\ energy (eV)')
+        ylim(output_tplot_name,  1e+1, 3e+4) #  ;; default yrange: [10 eV, 30 keV]
+        out_vars.append(output_tplot_name)
+    if 'theta' in outputs_lc:
+        output_tplot_name = in_tvarname+'_theta' + suffix
+        erg_pgs_make_tplot(output_tplot_name, x=times_array, y=out['theta_y'], z=out['theta'], units=units, ylog=False, ytitle=dist['data_name'] + ' \\ theta (deg)')
+        out_vars.append(output_tplot_name)
+    if 'phi' in outputs_lc:
+        output_tplot_name = in_tvarname+'_phi' + suffix
+        erg_pgs_make_tplot(output_tplot_name, x=times_array, y=out['phi_y'], z=out['phi'], units=units, ylog=False, ytitle=dist['data_name'] + ' \\ phi (deg)')
+        out_vars.append(output_tplot_name)
+
+    #  ;;Pitch Angle Spectrograms
+    if 'pa' in outputs_lc:
+        output_tplot_name = in_tvarname+'_pa' + suffix
+        erg_pgs_make_tplot(output_tplot_name, x=times_array, y=out['pad_y'], z=out['pad'], units=units, ylog=False, ytitle=dist['data_name'] + ' \\ PA (deg)')
+        out_vars.append(output_tplot_name)
+
+    if 'gyro' in outputs_lc:
+        output_tplot_name = in_tvarname+'_gyro' + suffix
+        erg_pgs_make_tplot(output_tplot_name, x=times_array, y=out['gyro_y'], z=out['gyro'], units=units, ylog=False, ytitle=dist['data_name'] + ' \\ gyro (deg)')
+        out_vars.append(output_tplot_name)
+
+
+    #  ;Moments Variables
+    if 'moments' in outputs_lc:
+        moments = {'density': out['density'], 
+              'flux': out['flux'], 
+              'mftens': out['mftens'], 
+              'velocity': out['velocity'], 
+              'ptens': out['ptens'],
+              'ttens': out['ttens'],
+              'vthermal': out['vthermal'],
+              'avgtemp': out['avgtemp']}
+        moments_vars = erg_pgs_moments_tplot(moments, x=times_array, prefix=in_tvarname, suffix=suffix)
+        out_vars.extend(moments_vars)
+
+    if 'fac_energy' in outputs_lc:
+
+        output_tplot_name = in_tvarname+'_energy_mag' + suffix
+        erg_pgs_make_tplot(output_tplot_name, x=times_array, y=out['fac_energy_y'], z=out['fac_energy'], units=units, ylog=True, ytitle=dist['data_name'] + ' \\ energy (eV)')
+        ylim(output_tplot_name, 1e+1, 3e+4)  # ;; default yrange: [10 eV, 30 keV]
+        out_vars.append(output_tplot_name)
+
+    #  ;FAC Moments Variables
+    if 'fac_moments' in outputs_lc:
+        fac_moments = {'density': out['fac_density'], 
+              'flux': out['fac_flux'], 
+              'mftens': out['fac_mftens'], 
+              'velocity': out['fac_velocity'], 
+              'ptens': out['fac_ptens'],
+              'ttens': out['fac_ttens'],
+              'vthermal': out['fac_vthermal'],
+              'avgtemp': out['fac_avgtemp']}
+        fac_mom_suffix = '_mag' + suffix
+        fac_moments_vars = erg_pgs_moments_tplot(fac_moments, x=times_array, prefix=in_tvarname, suffix=fac_mom_suffix)
+        out_vars.extend(fac_moments_vars)
+
+    
+    #  ;;Sort a data array by energy for (fac-)energy spectra
+    if ('erg_lepe_' in in_tvarname)  and (made_et_spec):
+        if 'energy' in outputs_lc:
+            t_plot_name = in_tvarname+'_energy' + suffix
+            get_data_energy = get_data(t_plot_name)
+            energy_meta_data = get_data(t_plot_name, metadata=True)
+        elif 'fac_energy' in outputs_lc:
+            t_plot_name = in_tvarname+'_energy_mag' + suffix
+            get_data_energy = get_data(t_plot_name)
+            energy_meta_data = get_data(t_plot_name, metadata=True)
+        
+        if get_data_energy is not None:
+            
+            arange_time_indices = np.arange(get_data_energy[0].size)
+            time_indices_repeat = np.repeat(np.array([arange_time_indices]).T, get_data_energy[1].shape[1], axis=1)
+            time_indices_repeat_reshape =  time_indices_repeat.reshape((time_indices_repeat.size, 1))
+            
+            if get_data_energy[2].ndim == 1:
+                arg_sort_axis_1 = np.repeat(np.argsort([get_data_energy[2]], axis=1), get_data_energy[0].size, axis=0)
+            elif get_data_energy[2].ndim == 2:
+                arg_sort_axis_1=np.argsort(get_data_energy[2], axis=1)
+
+            arg_sort_axis_1_reshape = arg_sort_axis_1.reshape((arg_sort_axis_1.size, 1))
+
+            indices_array =np.concatenate([time_indices_repeat_reshape, arg_sort_axis_1_reshape], axis=1)
+            indices_list_0 = indices_array[:,0].tolist()
+            indices_list_1 = indices_array[:,1].tolist()
+            y_new_1d = get_data_energy[1][indices_list_0 , indices_list_1 ]
+            y_new_2d = y_new_1d.reshape(get_data_energy[1].shape)
+            v_new_1d = get_data_energy[2][indices_list_0 , indices_list_1]
+            v_new_2d = v_new_1d.reshape(get_data_energy[2].shape)
+
+            store_data(t_plot_name, data={'x':get_data_energy[0],
+                                          'y':y_new_2d,
+                                          'v':v_new_2d},
+                        attr_dict=energy_meta_data)
+
+    return out_vars
+
+
+def _erg_lep_part_products_samples(state, arrays, start, stop):
+    """
+    Processes the time samples start:stop for erg_lep_part_products; this is called
+    for the full time range, or for chunks of it on worker processes (see spd_pgs_parallel)
+
+    Returns:
+        Dictionary containing the spectra and moments for these time samples
+    """
+    in_tvarname = state['in_tvarname']
+    instnm = state['instnm']
+    species = state['species']
+    units_lc = state['units_lc']
+    outputs_lc = state['outputs_lc']
+    fac_requested = state['fac_requested']
+    phi_in = state['phi_in']
+    theta = state['theta']
+    energy = state['energy']
+    pitch = state['pitch']
+    gyro = state['gyro']
+    no_ang_weighting = state['no_ang_weighting']
+    no_regrid = state['no_regrid']
+    regrid = state['regrid']
+    show_progress = state['show_progress']
+    dist = state['dist']
+
+    time_indices = arrays['time_indices']
+    magf = arrays['magf']
+    fac_matrix = arrays.get('fac_matrix')
+
+    dist_all_time_range = {}
+    for key, value in state.items():
+        if key.startswith('dist_all_time_range_'):
+            dist_all_time_range[key[len('dist_all_time_range_'):]] = value
+    for key, value in arrays.items():
+        if key.startswith('dist_'):
+            dist_all_time_range[key[len('dist_'):]] = value
+
+    ntimes = stop-start
+    out = {}
+
+    if 'energy' in outputs_lc:
+        out['energy'] = np.zeros((ntimes, dist['n_energy']))
+        out['energy_y'] = np.zeros((ntimes, dist['n_energy']))
+    if 'theta' in outputs_lc:
+        if instnm == 'lepe':
+            n_theta_unique = dist['n_theta_unique']
+            out['theta'] = np.zeros((ntimes, n_theta_unique))
+            out['theta_y'] = np.zeros((ntimes, n_theta_unique))
+        elif  instnm == 'lepi':
+            out['theta'] = np.zeros((ntimes, dist['n_theta']))
+            out['theta_y'] = np.zeros((ntimes, dist['n_theta']))
+    if 'phi' in outputs_lc:
+        out['phi'] = np.zeros((ntimes, dist['n_phi']))
+        out['phi_y'] = np.zeros((ntimes, dist['n_phi']))
+
+    if 'gyro' in outputs_lc:
+        out['gyro'] = np.zeros((ntimes, regrid[0]))
+        out['gyro_y'] = np.zeros((ntimes, regrid[0]))
+
+    if 'pa' in outputs_lc:
+        out['pad'] = np.zeros((ntimes, regrid[1]))
+        out['pad_y'] = np.zeros((ntimes, regrid[1]))
+
+    if 'moments' in outputs_lc:
+        out['density'] = np.zeros(ntimes)
+        out['avgtemp'] = np.zeros(ntimes)
+        out['vthermal'] = np.zeros(ntimes)
+        out['flux'] = np.zeros([ntimes, 3])
+        out['velocity'] = np.zeros([ntimes, 3])
+        out['mftens'] = np.zeros([ntimes, 6])
+        out['ptens'] = np.zeros([ntimes, 6])
+        out['ttens'] = np.zeros([ntimes, 3, 3])
+
+    if 'fac_energy' in outputs_lc:
+        out['fac_energy'] = np.zeros((ntimes, dist['n_energy']))
+        out['fac_energy_y'] = np.zeros((ntimes, dist['n_energy']))
+
+    if 'fac_moments' in outputs_lc:
+        out['fac_density'] = np.zeros(ntimes)
+        out['fac_avgtemp'] = np.zeros(ntimes)
+        out['fac_vthermal'] = np.zeros(ntimes)
+        out['fac_flux'] = np.zeros([ntimes, 3])
+        out['fac_velocity'] = np.zeros([ntimes, 3])
+        out['fac_mftens'] = np.zeros([ntimes, 6])
+        out['fac_ptens'] = np.zeros([ntimes, 6])
+        out['fac_ttens'] = np.zeros([ntimes, 3, 3])
+
+    last_update_time = None
+    for index in range(start, stop):
+        if show_progress:
+            last_update_time = erg_pgs_progress_update(last_update_time=last_update_time,
+                 current_sample=index, total_samples=time_indices.shape[0], type_string=in_tvarname)
 
         #  ;; Get the data structure for this sample
 
@@ -299,29 +484,29 @@ def erg_lep_part_products(
             moments = spd_pgs_moments(clean_data_eflux_for_moments)
 
             if 'moments' in outputs_lc:
-                out_density[index] = moments['density']
-                out_avgtemp[index] = moments['avgtemp']
-                out_vthermal[index] = moments['vthermal']
-                out_flux[index, :] = moments['flux']
-                out_velocity[index, :] = moments['velocity']
-                out_mftens[index, :] = moments['mftens']
-                out_ptens[index, :] = moments['ptens']
-                out_ttens[index, :] = moments['ttens']
+                out['density'][index-start] = moments['density']
+                out['avgtemp'][index-start] = moments['avgtemp']
+                out['vthermal'][index-start] = moments['vthermal']
+                out['flux'][index-start, :] = moments['flux']
+                out['velocity'][index-start, :] = moments['velocity']
+                out['mftens'][index-start, :] = moments['mftens']
+                out['ptens'][index-start, :] = moments['ptens']
+                out['ttens'][index-start, :] = moments['ttens']
 
         #  ;;Build theta spectrogram
         if 'theta' in outputs_lc:
             if  instnm == 'lepe':
-                out_theta_y[index, :], out_theta[index, :] = erg_pgs_make_theta_spec(clean_data, no_ang_weighting=no_ang_weighting)
+                out['theta_y'][index-start, :], out['theta'][index-start, :] = erg_pgs_make_theta_spec(clean_data, no_ang_weighting=no_ang_weighting)
             elif instnm == 'lepi':
-                out_theta_y[index, :], out_theta[index, :] = erg_pgs_make_theta_spec(clean_data, resolution=dist['n_theta'],no_ang_weighting=no_ang_weighting)
+                out['theta_y'][index-start, :], out['theta'][index-start, :] = erg_pgs_make_theta_spec(clean_data, resolution=dist['n_theta'],no_ang_weighting=no_ang_weighting)
 
         #  ;;Build energy spectrogram
         if 'energy' in outputs_lc:
-            out_energy_y[index, :], out_energy[index, :] = erg_pgs_make_e_spec(clean_data)
+            out['energy_y'][index-start, :], out['energy'][index-start, :] = erg_pgs_make_e_spec(clean_data)
 
         #  ;;Build phi spectrogram
         if 'phi' in outputs_lc:
-            out_phi_y[index, :], out_phi[index, :] = erg_pgs_make_phi_spec(clean_data, resolution=dist['n_phi'],no_ang_weighting=no_ang_weighting)
+            out['phi_y'][index-start, :], out['phi'][index-start, :] = erg_pgs_make_phi_spec(clean_data, resolution=dist['n_phi'],no_ang_weighting=no_ang_weighting)
 
         #  ;;Perform transformation to FAC, (regrid data), and apply limits in new coords
         
@@ -346,14 +531,14 @@ def erg_lep_part_products(
 
             if 'pa' in outputs_lc:
                 # ;Build pitch angle spectrogram
-                out_pad_y[index, :], out_pad[index, :] = erg_pgs_make_theta_spec(clean_data, colatitude=True, resolution=regrid[1], no_ang_weighting=no_ang_weighting)
+                out['pad_y'][index-start, :], out['pad'][index-start, :] = erg_pgs_make_theta_spec(clean_data, colatitude=True, resolution=regrid[1], no_ang_weighting=no_ang_weighting)
 
             if 'gyro' in outputs_lc:
                 # ;Build gyrophase spectrogram
-                out_gyro_y[index, :], out_gyro[index, :] = erg_pgs_make_phi_spec(clean_data, resolution=regrid[0], no_ang_weighting=no_ang_weighting)
+                out['gyro_y'][index-start, :], out['gyro'][index-start, :] = erg_pgs_make_phi_spec(clean_data, resolution=regrid[0], no_ang_weighting=no_ang_weighting)
 
             if 'fac_energy' in outputs_lc:
-                out_fac_energy_y[index, :], out_fac_energy[index, :] = erg_pgs_make_e_spec(clean_data)
+                out['fac_energy_y'][index-start, :], out['fac_energy'][index-start, :] = erg_pgs_make_e_spec(clean_data)
 
             if 'fac_moments' in outputs_lc:
                 clean_data['theta'] = 90. - clean_data['theta'] # ;convert back to latitude for moments calc
@@ -371,113 +556,13 @@ def erg_lep_part_products(
                                                                 0,clean_data_eflux_for_moments['data'])
                 fac_moments = spd_pgs_moments(clean_data_eflux_for_moments)
 
-                out_fac_density[index] = fac_moments['density']
-                out_fac_avgtemp[index] = fac_moments['avgtemp']
-                out_fac_vthermal[index] = fac_moments['vthermal']
-                out_fac_flux[index, :] = fac_moments['flux']
-                out_fac_velocity[index, :] = fac_moments['velocity']
-                out_fac_mftens[index, :] = fac_moments['mftens']
-                out_fac_ptens[index, :] = fac_moments['ptens']
-                out_fac_ttens[index, :] = fac_moments['ttens']
-
-    made_et_spec = ('energy' in outputs_lc) or ('fac_energy' in outputs_lc)
-
-    if 'energy' in outputs_lc:
-        output_tplot_name = in_tvarname+'_energy' + suffix
-        erg_pgs_make_tplot(output_tplot_name, x=times_array, y=out_energy_y, z=out_energy, units=units, ylog=True, ytitle=dist['data_name'] + ' \\ energy (eV)')
-        ylim(output_tplot_name,  1e+1, 3e+4) #  ;; default yrange: [10 eV, 30 keV]
-        out_vars.append(output_tplot_name)
-    if 'theta' in outputs_lc:
-        output_tplot_name = in_tvarname+'_theta' + suffix
-        erg_pgs_make_tplot(output_tplot_name, x=times_array, y=out_theta_y, z=out_theta, units=units, ylog=False, ytitle=dist['data_name'] + ' \\ theta (deg)')
-        out_vars.append(output_tplot_name)
-    if 'phi' in outputs_lc:
-        output_tplot_name = in_tvarname+'_phi' + suffix
-        erg_pgs_make_tplot(output_tplot_name, x=times_array, y=out_phi_y, z=out_phi, units=units, ylog=False, ytitle=dist['data_name'] + ' \\ phi (deg)')
-        out_vars.append(output_tplot_name)
-
-    #  ;;Pitch Angle Spectrograms
-    if 'pa' in outputs_lc:
-        output_tplot_name = in_tvarname+'_pa' + suffix
-        erg_pgs_make_tplot(output_tplot_name, x=times_array, y=out_pad_y, z=out_pad, units=units, ylog=False, ytitle=dist['data_name'] + ' \\ PA (deg)')
-        out_vars.append(output_tplot_name)
-
-    if 'gyro' in outputs_lc:
-        output_tplot_name = in_tvarname+'_gyro' + suffix
-        erg_pgs_make_tplot(output_tplot_name, x=times_array, y=out_gyro_y, z=out_gyro, units=units, ylog=False, ytitle=dist['data_name'] + ' \\ gyro (deg)')
-        out_vars.append(output_tplot_name)
-
-
-    #  ;Moments Variables
-    if 'moments' in outputs_lc:
-        moments = {'density': out_density, 
-              'flux': out_flux, 
-              'mftens': out_mftens, 
-              'velocity': out_velocity, 
-              'ptens': out_ptens,
-              'ttens': out_ttens,
-              'vthermal': out_vthermal,
-              'avgtemp': out_avgtemp}
-        moments_vars = erg_pgs_moments_tplot(moments, x=times_array, prefix=in_tvarname, suffix=suffix)
-        out_vars.extend(moments_vars)
-
-    if 'fac_energy' in outputs_lc:
-
-        output_tplot_name = in_tvarname+'_energy_mag' + suffix
-        erg_pgs_make_tplot(output_tplot_name, x=times_array, y=out_fac_energy_y, z=out_fac_energy, units=units, ylog=True, ytitle=dist['data_name'] + ' \\ energy (eV)')
-        ylim(output_tplot_name, 1e+1, 3e+4)  # ;; default yrange: [10 eV, 30 keV]
-        out_vars.append(output_tplot_name)
-
-    #  ;FAC Moments Variables
-    if 'fac_moments' in outputs_lc:
-        fac_moments = {'density': out_fac_density, 
-              'flux': out_fac_flux, 
-              'mftens': out_fac_mftens, 
-              'velocity': out_fac_velocity, 
-              'ptens': out_fac_ptens,
-              'ttens': out_fac_ttens,
-              'vthermal': out_fac_vthermal,
-              'avgtemp': out_fac_avgtemp}
-        fac_mom_suffix = '_mag' + suffix
-        fac_moments_vars = erg_pgs_moments_tplot(fac_moments, x=times_array, prefix=in_tvarname, suffix=fac_mom_suffix)
-        out_vars.extend(fac_moments_vars)
-
-    
-    #  ;;Sort a data array by energy for (fac-)energy spectra
-    if ('erg_lepe_' in in_tvarname)  and (made_et_spec):
-        if 'energy' in outputs_lc:
-            t_plot_name = in_tvarname+'_energy' + suffix
-            get_data_energy = get_data(t_plot_name)
-            energy_meta_data = get_data(t_plot_name, metadata=True)
-        elif 'fac_energy' in outputs_lc:
-            t_plot_name = in_tvarname+'_energy_mag' + suffix
-            get_data_energy = get_data(t_plot_name)
-            energy_meta_data = get_data(t_plot_name, metadata=True)
-        
-        if get_data_energy is not None:
-            
-            arange_time_indices = np.arange(get_data_energy[0].size)
-            time_indices_repeat = np.repeat(np.array([arange_time_indices]).T, get_data_energy[1].shape[1], axis=1)
-            time_indices_repeat_reshape =  time_indices_repeat.reshape((time_indices_repeat.size, 1))
-            
-            if get_data_energy[2].ndim == 1:
-                arg_sort_axis_1 = np.repeat(np.argsort([get_data_energy[2]], axis=1), get_data_energy[0].size, axis=0)
-            elif get_data_energy[2].ndim == 2:
-                arg_sort_axis_1=np.argsort(get_data_energy[2], axis=1)
-
-            arg_sort_axis_1_reshape = arg_sort_axis_1.reshape((arg_sort_axis_1.size, 1))
+                out['fac_density'][index-start] = fac_moments['density']
+                out['fac_avgtemp'][index-start] = fac_moments['avgtemp']
+                out['fac_vthermal'][index-start] = fac_moments['vthermal']
+                out['fac_flux'][index-start, :] = fac_moments['flux']
+                out['fac_velocity'][index-start, :] = fac_moments['velocity']
+                out['fac_mftens'][index-start, :] = fac_moments['mftens']
+                out['fac_ptens'][index-start, :] = fac_moments['ptens']
+                out['fac_ttens'][index-start, :] = fac_moments['ttens']
 
-            indices_array =np.concatenate([time_indices_repeat_reshape, arg_sort_axis_1_reshape], axis=1)
-            indices_list_0 = indices_array[:,0].tolist()
-            indices_list_1 = indices_array[:,1].tolist()
-            y_new_1d = get_data_energy[1][indices_list_0 , indices_list_1 ]
-            y_new_2d = y_new_1d.reshape(get_data_energy[1].shape)
-            v_new_1d = get_data_energy[2][indices_list_0 , indices_list_1]
-            v_new_2d = v_new_1d.reshape(get_data_energy[2].shape)
-
-            store_data(t_plot_name, data={'x':get_data_energy[0],
-                                          'y':y_new_2d,
-                                          'v':v_new_2d},
-                        attr_dict=energy_meta_data)
-
-    return out_vars
+    return out
@@ -0,0 +1,124 @@
+import unittest
+import numpy as np
+from numpy.testing import assert_allclose
+from pytplot import store_data
+from pyspedas.particles.spd_part_products.spd_pgs_parallel import spd_pgs_parallel
+from pyspedas.erg.satellite.erg.particle.erg_hep_part_products import _erg_hep_part_products_samples
+from pyspedas.erg.satellite.erg.particle.erg_lep_part_products import _erg_lep_part_products_samples
+from pyspedas.erg.satellite.erg.particle.erg_mep_part_products import _erg_mep_part_products_samples
+from pyspedas.erg.satellite.erg.particle.erg_mepe_get_dist import erg_mepe_get_dist
+
+N_TIMES = 6
+OUTPUTS = ['energy', 'theta', 'phi', 'pa', 'gyro', 'moments']
+
+
+def dist_all_time_range(n_energy=8, n_phi=16, n_theta=4, n_times=N_TIMES):
+    """
+    Synthetic ERG-like distributions, with dimensions [energy, phi, theta, time]
+    """
+    rng = np.random.default_rng(8)
+    shape = (n_energy, n_phi, n_theta, n_times)
+    energy = np.geomspace(100.0, 20000.0, n_energy)
+    phi = (np.arange(n_phi) + 0.5)*360.0/n_phi
+    theta = -90.0 + (np.arange(n_theta) + 0.5)*180.0/n_theta
+    times = 1490000000.0 + np.arange(n_times)*8.0
+    bins = np.ones(shape, dtype='int8')
+    bins[0] = 0
+    return {'project_name': 'ERG', 'spacecraft': 1, 'data_name': 'Test Electron 3dflux', 'units_name': 'flux',
+            'units_procedure': 'erg_convert_flux_units', 'species': 'e', 'valid': 1, 'charge': -1.0, 'mass': 5.68566e-06,
+            'time': times, 'end_time': times + 8.0,
+            'data': rng.random(shape)*1e4,
+            'bins': bins,
+            'energy': np.broadcast_to(energy[:, None, None, None], shape).copy(),
+            'denergy': np.broadcast_to(0.2*energy[:, None, None, None], shape).copy(),
+            'n_energy': n_energy, 'n_bins': n_phi*n_theta,
+            'phi': np.broadcast_to(phi[None, :, None, None], shape).copy(),
+            'dphi': np.full(shape, 360.0/n_phi),
+            'n_phi': n_phi,
+            'theta': np.broadcast_to(theta[None, None, :, None], shape).copy(),
+            'dtheta': np.full(shape, 180.0/n_theta),
+            'n_theta': n_theta}
+
+
+def fac_matrices(n_times=N_TIMES):
+    """
+    Random rotation matrices, standing in for the FAC transformation
+    """
+    rng = np.random.default_rng(9)
+    return np.array([np.linalg.qr(rng.normal(size=(3, 3)))[0] for _ in range(n_times)])
+
+
+def make_state(dist, **kwargs):
+    """
+    State shared by the sample functions, as set up by the part products routines
+    """
+    state = {'show_progress': False, 'species': 'e', 'units_lc': 'flux', 'outputs_lc': OUTPUTS, 'relativistic': False,
+             'fac_requested': True, 'phi_in': [0., 360.], 'theta': [-90., 90.], 'energy': None, 'pitch': [0., 180.],
+             'gyro': [0., 360.], 'no_ang_weighting': True, 'no_regrid': True, 'regrid': [16, 16],
+             'dist': {key: value for key, value in dist.items() if not isinstance(value, np.ndarray)}}
+    state.update(kwargs)
+    return state
+
+
+class ERGPartProductsParallelTestCases(unittest.TestCase):
+    """
+    Check that processing the time samples in worker processes gives the
+    same results as processing them in this process
+    """
+    def setUp(self):
+        rng = np.random.default_rng(10)
+        self.arrays = {'time_indices': np.arange(N_TIMES), 'magf': rng.normal(size=(N_TIMES, 3))*100.0,
+                       'fac_matrix': fac_matrices()}
+
+    def compare(self, func, state, tvars=[], products=OUTPUTS):
+        expected = func(state, self.arrays, 0, N_TIMES)
+        actual = spd_pgs_parallel(func, N_TIMES, state, arrays=self.arrays, tvars=tvars, nprocs=2, chunk_size=2)
+        self.assertEqual(sorted(actual.keys()), sorted(expected.keys()))
+        # names of the outputs of each product
+        for product, key in zip(OUTPUTS, ['energy', 'theta', 'phi', 'pad', 'gyro', 'density']):
+            self.assertEqual(key in expected, product in products, msg=key)
+        for key in expected.keys():
+            if not isinstance(expected[key], np.ndarray):
+                # e.g., the HEP subtitle
+                self.assertEqual(actual[key], expected[key], msg=key)
+                continue
+            self.assertEqual(expected[key].shape[0], N_TIMES, msg=key)
+            assert_allclose(actual[key], expected[key], rtol=1e-12, atol=0, err_msg=key)
+
+    def add_dist(self, state, dist):
+        arrays = dict(self.arrays)
+        for key, value in dist.items():
+            if isinstance(value, np.ndarray):
+                arrays['dist_' + key] = value
+            else:
+                state['dist_all_time_range_' + key] = value
+        self.arrays = arrays
+
+    def test_hep(self):
+        dist = dist_all_time_range()
+        state = make_state(dist, in_tvarname='erg_hep_l2_FEDU_L', muconv=False)
+        state['dist']['n_theta_unique'] = len(np.unique(dist['theta']))
+        self.add_dist(state, dist)
+        self.compare(_erg_hep_part_products_samples, state, products=OUTPUTS[0:5])
+
+    def test_lep(self):
+        dist = dist_all_time_range()
+        state = make_state(dist, in_tvarname='erg_lepe_l2_3dflux_FEDU', instnm='lepe')
+        state['dist']['n_theta_unique'] = len(np.unique(dist['theta']))
+        self.add_dist(state, dist)
+        self.compare(_erg_lep_part_products_samples, state)
+
+    def test_mep(self):
+        # the MEP-e distributions are read from the tplot variable for each sample; the
+        # energy channels are in descending order, as in the L2 files
+        rng = np.random.default_rng(11)
+        tvar = 'erg_mepe_l2_3dflux_FEDU'
+        store_data(tvar, data={'x': 1490000000.0 + np.arange(N_TIMES)*8.0, 'y': rng.random((N_TIMES, 32, 16, 16))*1e4,
+                               'v1': np.arange(32), 'v2': np.geomspace(90.0, 6.0, 16), 'v3': np.arange(16)})
+        dist = erg_mepe_get_dist(tvar, 0)
+        state = make_state(dist, in_tvarname=tvar, instnm='mepe')
+        self.compare(_erg_mep_part_products_samples, state, tvars=[tvar])
+
+
+if __name__ == '__main__':
+    unittest.main()
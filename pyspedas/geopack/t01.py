@@ -1,10 +1,9 @@
 import logging
-import numpy as np
 from pytplot import get_data, store_data
-from geopack import geopack, t01
+from pyspedas.geopack.tsy_eval import tsy_eval
 
 
-def tt01(pos_var_gsm, parmod=None, suffix=''):
+def tt01(pos_var_gsm, parmod=None, suffix='', time_tolerance=None, nprocs=None):
     """
     tplot wrapper for the functional interface to Sheng Tian's implementation of the Tsyganenko 2001 and IGRF model:
 
@@ -29,6 +28,14 @@ def tt01(pos_var_gsm, parmod=None, suffix=''):
         suffix: str
             Suffix to append to the tplot output variable
 
+        time_tolerance: float
+            Use the same dipole tilt for all the times within each interval of this
+            many seconds; by default, the tilt is calculated at each unique time
+
+        nprocs: int
+            Number of processes to evaluate the model on; by default, the model is
+            evaluated in this process
+
     Returns
     --------
         Name of the tplot variable containing the model data
@@ -39,9 +46,6 @@ def tt01(pos_var_gsm, parmod=None, suffix=''):
         logging.error('Variable not found: ' + pos_var_gsm)
         return
 
-    b0gsm = np.zeros((len(pos_data.times), 3))
-    dbgsm = np.zeros((len(pos_data.times), 3))
-
     # convert to Re
     pos_re = pos_data.y/6371.2
 
@@ -54,14 +58,7 @@ def tt01(pos_var_gsm, parmod=None, suffix=''):
         logging.error('parmod keyword required.')
         return
 
-    for idx, time in enumerate(pos_data.times):
-        tilt = geopack.recalc(time)
-
-        # dipole B in GSM
-        b0gsm[idx, 0], b0gsm[idx, 1], b0gsm[idx, 2] = geopack.dip(pos_re[idx, 0], pos_re[idx, 1], pos_re[idx, 2])
-
-        # T96 dB in GSM
-        dbgsm[idx, 0], dbgsm[idx, 1], dbgsm[idx, 2] = t01.t01(par[idx, :], tilt, pos_re[idx, 0], pos_re[idx, 1], pos_re[idx, 2])
+    b0gsm, dbgsm = tsy_eval('t01', pos_data.times, pos_re, parmod=par, time_tolerance=time_tolerance, nprocs=nprocs)
 
     bgsm = b0gsm + dbgsm
 
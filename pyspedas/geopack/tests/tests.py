@@ -82,6 +82,26 @@ class LoadTestCases(unittest.TestCase):
         tts04('mms1_mec_r_gsm-itrp', parmod=params)
         self.assertTrue(data_exists('mms1_mec_r_gsm-itrp_bts04'))
 
+    def test_array_options(self):
+        # the tilt tolerance and multiprocessing options should match the default results
+        times = time_double(trange[0]) + np.arange(200)*30.0
+        pos = np.zeros((200, 3))
+        pos[:, 0] = 6.0*6371.2*np.cos(np.arange(200)/30.0)
+        pos[:, 1] = 6.0*6371.2*np.sin(np.arange(200)/30.0)
+        pos[:, 2] = 6371.2
+        store_data('array_test_pos', data={'x': times, 'y': pos})
+        par = np.zeros((200, 10))
+        par[:, 0:4] = [2.0, -20.0, 1.0, -3.0]
+        store_data('array_test_par', data={'x': times, 'y': par})
+
+        expected = get_data(tt89('array_test_pos')).y
+        self.assertTrue(np.allclose(get_data(tt89('array_test_pos', nprocs=2)).y, expected, rtol=1e-12))
+        approx = get_data(tt89('array_test_pos', time_tolerance=60.0)).y
+        self.assertTrue(np.all(np.linalg.norm(approx-expected, axis=1) < 1e-3*np.linalg.norm(expected, axis=1)))
+
+        expected = get_data(tt96('array_test_pos', parmod='array_test_par')).y
+        self.assertTrue(np.allclose(get_data(tt96('array_test_pos', parmod='array_test_par', nprocs=2)).y, expected, rtol=1e-12))
+
     def test_get_w(self):
         w_vals = get_w(trange=['2015-10-16', '2015-10-17'])
 
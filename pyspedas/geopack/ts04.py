@@ -1,10 +1,10 @@
 import logging
 import numpy as np
 from pytplot import get_data, store_data
-from geopack import geopack, t04
+from pyspedas.geopack.tsy_eval import tsy_eval
 
 
-def tts04(pos_var_gsm, parmod=None, suffix=''):
+def tts04(pos_var_gsm, parmod=None, suffix='', time_tolerance=None, nprocs=None):
     """
     tplot wrapper for the functional interface to Sheng Tian's implementation of the 
     Tsyganenko-Sitnov (2004) storm-time geomagnetic field model
@@ -30,6 +30,14 @@ def tts04(pos_var_gsm, parmod=None, suffix=''):
         suffix: str
             Suffix to append to the tplot output variable
 
+        time_tolerance: float
+            Use the same dipole tilt for all the times within each interval of this
+            many seconds; by default, the tilt is calculated at each unique time
+
+        nprocs: int
+            Number of processes to evaluate the model on; by default, the model is
+            evaluated in this process
+
     Returns
     --------
         Name of the tplot variable containing the model data
@@ -55,18 +63,11 @@ def tts04(pos_var_gsm, parmod=None, suffix=''):
         logging.error('parmod keyword required.')
         return
 
-    for idx, time in enumerate(pos_data.times):
-        tilt = geopack.recalc(time)
-
-        if not np.isfinite(par[idx, :]).all():
-            # skip if there are any NaNs in the input
-            continue
-
-        # dipole B in GSM
-        b0gsm[idx, 0], b0gsm[idx, 1], b0gsm[idx, 2] = geopack.dip(pos_re[idx, 0], pos_re[idx, 1], pos_re[idx, 2])
+    # skip if there are any NaNs in the input
+    valid = np.isfinite(par).all(axis=1)
 
-        # T96 dB in GSM
-        dbgsm[idx, 0], dbgsm[idx, 1], dbgsm[idx, 2] = t04.t04(par[idx, :], tilt, pos_re[idx, 0], pos_re[idx, 1], pos_re[idx, 2])
+    b0gsm[valid], dbgsm[valid] = tsy_eval('ts04', pos_data.times[valid], pos_re[valid], parmod=par[valid],
+                                          time_tolerance=time_tolerance, nprocs=nprocs)
 
     bgsm = b0gsm + dbgsm
 
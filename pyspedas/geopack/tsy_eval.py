@@ -0,0 +1,126 @@
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from geopack import geopack, t89, t96, t01, t04
+
+models = {'t89': t89.t89, 't96': t96.t96, 't01': t01.t01, 'ts04': t04.t04}
+
+
+def tsy_eval(model, times, pos_re, parmod=None, iopt=3, time_tolerance=None, nprocs=None, dipole_only=False):
+    """
+    Evaluates the dipole field and a Tsyganenko model field at each of an array
+    of positions
+
+    The dipole tilt (and the other geopack state set by recalc) is calculated once
+    for each unique time, or once for each time_tolerance-second interval. The dipole
+    field is calculated for all the positions at once, and the (scalar) model
+    functions can be evaluated on multiple processes.
+
+    Input
+    ------
+        model: str
+            Tsyganenko model: 't89', 't96', 't01' or 'ts04'
+
+        times: ndarray
+            Unix times of the positions
+
+        pos_re: ndarray
+            Positions in GSM coordinates (Re), shape (time, 3)
+
+    Parameters
+    -----------
+        parmod: ndarray
+            Model parameters vs. time (T96, T01 and TS04), shape (time, 10)
+
+        iopt: int
+            Ground disturbance level (T89)
+
+        time_tolerance: float
+            Use the same dipole tilt for all the times within each interval of this
+            many seconds (the tilt changes by up to ~0.05 degrees per minute);
+            by default, the tilt is calculated at each unique time
+
+        nprocs: int
+            Number of processes to evaluate the model on; by default, the model is
+            evaluated in this process
+
+        dipole_only: bool
+            Only calculate the dipole field; the model field is returned as zeros
+
+    Returns
+    --------
+        Tuple containing the dipole field and the model field (nT, GSM), shape (time, 3)
+    """
+    times = np.asarray(times, dtype=np.float64)
+    pos_re = np.asarray(pos_re, dtype=np.float64)
+
+    # the time used for the tilt of each position
+    if time_tolerance is not None and time_tolerance > 0 and len(times) > 0:
+        buckets = np.floor((times - times[0])/time_tolerance)
+        _, first, inverse = np.unique(buckets, return_index=True, return_inverse=True)
+        tilt_times = times[first][inverse.flatten()]
+    else:
+        tilt_times = times
+
+    if nprocs is None or nprocs <= 1 or len(times) < 2:
+        return _tsy_eval_chunk(model, tilt_times, pos_re, parmod, iopt, dipole_only)
+
+    n_chunks = min(len(times), 4*nprocs)
+    bounds = np.linspace(0, len(times), n_chunks+1).astype(int)
+
+    with ProcessPoolExecutor(max_workers=nprocs) as executor:
+        futures = [executor.submit(_tsy_eval_chunk, model, tilt_times[start:stop], pos_re[start:stop],
+                                   None if parmod is None else parmod[start:stop], iopt, dipole_only)
+                   for start, stop in zip(bounds[:-1], bounds[1:])]
+        results = [future.result() for future in futures]
+
+    b0gsm = np.concatenate([result[0] for result in results])
+    dbgsm = np.concatenate([result[1] for result in results])
+    return b0gsm, dbgsm
+
+
+def _tsy_eval_chunk(model, tilt_times, pos_re, parmod, iopt, dipole_only):
+    """
+    Evaluates the dipole and model fields for a chunk of positions
+    """
+    unique_times, inverse = np.unique(tilt_times, return_inverse=True)
+    inverse = inverse.flatten()
+
+    tilt = np.zeros(len(unique_times))
+    sps = np.zeros(len(unique_times))
+    cps = np.zeros(len(unique_times))
+    dipmom = np.zeros(len(unique_times))
+
+    for idx, time in enumerate(unique_times):
+        tilt[idx] = geopack.recalc(time)
+        sps[idx] = geopack.sps
+        cps[idx] = geopack.cps
+        dipmom[idx] = np.sqrt(geopack.g[1]**2+geopack.g[2]**2+geopack.h[2]**2)
+
+    tilt = tilt[inverse]
+
+    # dipole B in GSM; same as geopack.dip, for all of the positions at once
+    x = pos_re[:, 0]
+    y = pos_re[:, 1]
+    z = pos_re[:, 2]
+    p = x**2
+    u = z**2
+    v = 3*z*x
+    t = y**2
+    q = dipmom[inverse]/np.sqrt(p+t+u)**5
+    b0gsm = np.zeros((len(x), 3))
+    b0gsm[:, 0] = q*((t+u-2.*p)*sps[inverse]-v*cps[inverse])
+    b0gsm[:, 1] = -3.*y*q*(x*sps[inverse]+z*cps[inverse])
+    b0gsm[:, 2] = q*((p+t-2.*u)*cps[inverse]-v*sps[inverse])
+
+    dbgsm = np.zeros((len(x), 3))
+    if dipole_only:
+        return b0gsm, dbgsm
+
+    model_func = models[model]
+    for idx in range(len(x)):
+        if model == 't89':
+            dbgsm[idx, :] = model_func(iopt, tilt[idx], x[idx], y[idx], z[idx])
+        else:
+            dbgsm[idx, :] = model_func(parmod[idx, :], tilt[idx], x[idx], y[idx], z[idx])
+
+    return b0gsm, dbgsm
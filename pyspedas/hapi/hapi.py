@@ -1,7 +1,7 @@
 import logging
 import warnings
 from pyspedas import time_double
-from pytplot import get_data, store_data, options
+from pytplot import get_data, store_data, options, time_string
 import numpy as np
 
 try:
@@ -11,7 +11,7 @@ except ImportError:
 
 
 def hapi(trange=None, server=None, dataset=None, parameters='', suffix='',
-         prefix='', catalog=False):
+         prefix='', catalog=False, chunk=None):
     """
     Loads data from a HAPI server into pytplot variables
 
@@ -39,6 +39,11 @@ def hapi(trange=None, server=None, dataset=None, parameters='', suffix='',
         catalog: bool
             If True, returns the server's catalog of datasets
 
+        chunk: float
+            Request the data in intervals of this many seconds, and convert
+            each response before requesting the next, instead of requesting
+            the whole time range at once
+
     Returns
     -------
         List of tplot variables created.
@@ -79,66 +84,58 @@ def hapi(trange=None, server=None, dataset=None, parameters='', suffix='',
 
     opts = {'logging': False}
 
-    with warnings.catch_warnings():
-        warnings.simplefilter('ignore', category=ResourceWarning)
-        warnings.filterwarnings('ignore', message='Unverified HTTPS request')
-        data, hapi_metadata = load_hapi(server, dataset, parameters, trange[0], trange[1], **opts)
+    if chunk is not None and not chunk > 0:
+        logging.error('Error, chunk must be a positive number of seconds')
+        return
 
-    out_vars = []
+    if chunk is None:
+        intervals = [(trange[0], trange[1])]
+    else:
+        intervals = _hapi_intervals(trange, chunk)
 
-    # loop through the parameters in this dataset
-    params = hapi_metadata['parameters']
+    # the times and parameter values, converted from each response
+    unixtimes = []
+    columns = None
+
+    for start, stop in intervals:
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore', category=ResourceWarning)
+            warnings.filterwarnings('ignore', message='Unverified HTTPS request')
+            data, hapi_metadata = load_hapi(server, dataset, parameters, start, stop, **opts)
+
+        params = hapi_metadata['parameters']
+
+        unixtimes.append(_hapi_times(data[data.dtype.names[0]]))
+
+        if columns is None:
+            columns = [[] for param in params[1:]]
 
-    timestamps = [datapoint[0] for datapoint in data]
-    unixtimes = [time_double(timestamp.decode('utf-8')) for timestamp in timestamps]
+        for param_idx, param in enumerate(params[1:]):
+            if columns[param_idx] is None:
+                continue
+            values = _hapi_values(data, param_idx+1, param)
+            if values is None:
+                columns[param_idx] = None
+            else:
+                columns[param_idx].append(values)
+
+        del data
+
+    out_vars = []
+
+    unixtimes = np.concatenate(unixtimes)
+    if len(unixtimes) == 0:
+        return out_vars
 
+    # loop through the parameters in this dataset
     for param_idx, param in enumerate(params[1:]):
         spec = False
         param_name = param.get('name')
-        param_type = param.get('type')
-        data_size = param.get('size')
-
-        if param_type is None:
-            param_type = 'double'
 
-        if data_size is None:
-            single_line = True
-
-        try:
-            if param_type == 'double':
-                single_line = isinstance(data[0][param_idx+1], np.float64)
-            elif param_type == 'integer':
-                single_line = isinstance(data[0][param_idx+1], np.int32)
-        except IndexError:
+        if columns[param_idx] is None:
             continue
 
-        if single_line:
-            data_out = np.zeros((len(data)))
-        else:
-            try:
-                data_out = np.zeros((len(data), len(data[0][param_idx+1])))
-            except TypeError:
-                continue
-
-        for idx, datapoint in enumerate(data):
-            if single_line:
-                data_out[idx] = datapoint[param_idx+1]
-            else:
-                data_out[idx, :] = datapoint[param_idx+1]
-
-        data_out = data_out.squeeze()
-
-        # check for fill values
-        fill_value = param.get('fill')
-        if fill_value is not None:
-            if param_type == 'double':
-                fill_value = float(fill_value)
-                data_out[data_out == fill_value] = np.nan
-            elif param_type == 'integer':
-                # NaN is only floating point, so we replace integer fill
-                # values with 0 instead of NaN
-                fill_value = int(fill_value)
-                data_out[data_out == fill_value] = 0
+        data_out = np.concatenate(columns[param_idx]).squeeze()
 
         bins = param.get('bins')
 
@@ -172,3 +169,63 @@ def hapi(trange=None, server=None, dataset=None, parameters='', suffix='',
             out_vars.append(prefix + param_name + suffix)
 
     return out_vars
+
+
+def _hapi_intervals(trange, chunk):
+    """
+    Split the time range into intervals of chunk seconds, as HAPI time strings;
+    returns the whole time range if it can't be split (e.g., start == stop)
+    """
+    start, stop = time_double(trange)
+    bounds = np.append(np.arange(start, stop, chunk), stop)
+    if len(bounds) < 2:
+        return [(trange[0], trange[1])]
+    strings = time_string(bounds, fmt='%Y-%m-%dT%H:%M:%S.%fZ')
+    return list(zip(strings[:-1], strings[1:]))
+
+
+def _hapi_times(timestamps):
+    """
+    Convert a column of HAPI (ISO 8601) time stamps to unix times
+    """
+    strings = np.char.rstrip(np.char.decode(timestamps, 'utf-8'), 'Z')
+    try:
+        # microseconds since 1970, as the time_double conversion
+        times = strings.astype('datetime64[ns]').astype('datetime64[us]')
+    except ValueError:
+        # other ISO 8601 formats (e.g., day of year)
+        return np.array([time_double(timestamp) for timestamp in strings], dtype=np.float64)
+    return times.astype(np.int64)/1e6
+
+
+def _hapi_values(data, field_idx, param):
+    """
+    Convert a parameter of the HAPI response to a floating point array, with
+    the fill values replaced; returns None for non-numeric parameters
+    """
+    param_type = param.get('type')
+    if param_type is None:
+        param_type = 'double'
+
+    if field_idx >= len(data.dtype.names):
+        return None
+
+    values = data[data.dtype.names[field_idx]]
+    if values.dtype.kind not in 'biuf':
+        return None
+
+    data_out = np.array(values, dtype=np.float64)
+
+    # check for fill values
+    fill_value = param.get('fill')
+    if fill_value is not None:
+        if param_type == 'double':
+            fill_value = float(fill_value)
+            data_out[data_out == fill_value] = np.nan
+        elif param_type == 'integer':
+            # NaN is only floating point, so we replace integer fill
+            # values with 0 instead of NaN
+            fill_value = int(fill_value)
+            data_out[data_out == fill_value] = 0
+
+    return data_out
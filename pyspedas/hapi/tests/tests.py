@@ -1,5 +1,7 @@
 import unittest
-from pyspedas.hapi.hapi import hapi
+import numpy as np
+from pyspedas import time_double
+from pyspedas.hapi.hapi import hapi, _hapi_intervals, _hapi_times, _hapi_values
 from pytplot import data_exists
 
 
@@ -33,6 +35,41 @@ class HAPITests(unittest.TestCase):
         self.assertTrue(data_exists('BY_GSE'))
         self.assertTrue(data_exists('BZ_GSE'))
 
+    def test_invalid_chunk(self):
+        h_vars = hapi(trange=['2003-10-20', '2003-11-30'], server='https://cdaweb.gsfc.nasa.gov/hapi',
+                      dataset='OMNI_HRO2_1MIN', chunk=0)
+        self.assertTrue(h_vars is None)
+
+    def test_intervals(self):
+        intervals = _hapi_intervals(['2019-10-16', '2019-10-16/02:30'], 3600.0)
+        self.assertTrue(intervals == [('2019-10-16T00:00:00.000000Z', '2019-10-16T01:00:00.000000Z'),
+                                      ('2019-10-16T01:00:00.000000Z', '2019-10-16T02:00:00.000000Z'),
+                                      ('2019-10-16T02:00:00.000000Z', '2019-10-16T02:30:00.000000Z')])
+        # time ranges that can't be split are requested at once
+        self.assertTrue(_hapi_intervals(['2019-10-16', '2019-10-16'], 3600.0) == [('2019-10-16', '2019-10-16')])
+
+    def test_convert_times(self):
+        timestamps = np.array([b'2019-10-16T00:00:00.000Z', b'2019-10-16T00:00:01.123456Z', b'2019-10-16T12:34:56Z'])
+        self.assertTrue(np.array_equal(_hapi_times(timestamps), time_double(['2019-10-16T00:00:00.000',
+                                                                               '2019-10-16T00:00:01.123456',
+                                                                               '2019-10-16T12:34:56'])))
+        # day of year format
+        timestamps = np.array([b'2019-289T00:00:00Z', b'2019-289T00:00:01.5Z'])
+        self.assertTrue(np.array_equal(_hapi_times(timestamps), time_double(['2019-10-16', '2019-10-16/00:00:01.5'])))
+
+    def test_convert_values(self):
+        data = np.zeros(3, dtype=[('Time', 'S24'), ('B', '<f8', (3,)), ('Q', '<i4'), ('Name', 'S8')])
+        data['B'] = [[1.0, 2.0, 3.0], [-1e31, 5.0, 6.0], [7.0, 8.0, 9.0]]
+        data['Q'] = [1, -99, 3]
+        b = _hapi_values(data, 1, {'name': 'B', 'type': 'double', 'size': [3], 'fill': '-1e31'})
+        self.assertTrue(b.shape == (3, 3))
+        self.assertTrue(np.isnan(b[1, 0]))
+        self.assertTrue(b[2, 1] == 8.0)
+        q = _hapi_values(data, 2, {'name': 'Q', 'type': 'integer', 'fill': '-99'})
+        self.assertTrue(q.tolist() == [1.0, 0.0, 3.0])
+        # non-numeric parameters aren't converted
+        self.assertTrue(_hapi_values(data, 3, {'name': 'Name', 'type': 'string'}) is None)
+
 
 if __name__ == '__main__':
     unittest.main()
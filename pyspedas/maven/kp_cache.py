@@ -0,0 +1,241 @@
+"""
+Binary sidecar cache for the MAVEN key parameter (KP) files
+
+Parsing the fixed-width insitu files (and the IUVS files) is slow, and the same
+files are often loaded over and over. The first time a file is read, its columns
+are saved in an uncompressed .npz file in the 'kp/cache' directory of the local
+MAVEN data directory; later calls load the columns from the cache instead of
+parsing the text file.
+
+Each cache file records a schema version and the modification time and size of
+the source file, and is only used when all three still match.
+"""
+import collections
+import logging
+import os
+import zipfile
+import numpy as np
+from .download_files_utilities import get_root_data_dir
+from .utilities import read_iuvs_file
+
+# increment when the layout of the cache files changes
+KP_CACHE_VERSION = 1
+
+
+def kp_cache_file(filename):
+    """
+    Returns the name of the cache file for a KP file
+    """
+    cache_dir = os.path.join(get_root_data_dir(), 'maven', 'data', 'sci', 'kp', 'cache')
+    return os.path.join(cache_dir, os.path.basename(filename) + '.npz')
+
+
+def read_kp_insitu_file(filename, names, cache=True):
+    """
+    Read the data in an insitu KP file into a DataFrame indexed by the time strings
+
+    Parameters
+    -----------
+        filename: str
+            Name of the insitu KP file
+
+        names: list of str
+            Names of the data columns (following the time column)
+
+        cache: bool
+            Load the columns from (and save them to) the cache file
+
+    Returns
+    --------
+        pandas DataFrame, the same as reading the file with pandas.read_fwf
+    """
+    import pandas as pd
+
+    stamp = _source_stamp(filename)
+    if cache:
+        cached = _read_cache(filename, stamp)
+        if cached is not None and 'names' in cached and cached['names'].tolist() == list(names):
+            data = pd.DataFrame(_load_columns(cached, len(names)), index=pd.Index(cached['time'].astype(object)))
+            data.columns = list(names)
+            return data
+
+    # Determine number of header lines
+    nheader = 0
+    with open(filename) as f:
+        for line in f:
+            if line.startswith('#'):
+                nheader += 1
+
+    data = pd.read_fwf(filename, skiprows=nheader, index_col=0, widths=[19] + len(names) * [16], names=names)
+
+    if cache:
+        arrays = {'names': np.array(names, dtype=str), 'time': np.array(data.index, dtype=str)}
+        _store_columns(arrays, [data.iloc[:, idx].to_numpy() for idx in range(len(names))])
+        _write_cache(filename, stamp, arrays)
+
+    return data
+
+
+def read_kp_iuvs_file(filename, cache=True):
+    """
+    Read an IUVS KP file, with the same output as read_iuvs_file
+
+    Parameters
+    -----------
+        filename: str
+            Name of the IUVS KP file
+
+        cache: bool
+            Load the values from (and save them to) the cache file
+
+    Returns
+    --------
+        Dictionary of the observations in the file
+    """
+    stamp = _source_stamp(filename)
+    if cache:
+        cached = _read_cache(filename, stamp)
+        if cached is not None and 'layout' in cached:
+            return _unflatten_iuvs(cached)
+
+    iuvs_dict = read_iuvs_file(filename)
+
+    if cache:
+        arrays = {}
+        layout = []
+        try:
+            _flatten_iuvs(iuvs_dict, (), arrays, layout)
+        except ValueError:
+            # values that can't be saved as plain arrays; don't cache this file
+            return iuvs_dict
+        arrays['layout'] = np.array(layout, dtype=str).reshape(-1, 3)
+        _write_cache(filename, stamp, arrays)
+
+    return iuvs_dict
+
+
+def _source_stamp(filename):
+    """
+    Returns the modification time and size of a file
+    """
+    stat = os.stat(filename)
+    return stat.st_mtime_ns, stat.st_size
+
+
+def _read_cache(filename, stamp):
+    """
+    Returns the arrays in the cache file for a KP file, or None if there isn't
+    a valid cache file
+    """
+    cache_file = kp_cache_file(filename)
+    if not os.path.exists(cache_file):
+        return None
+    try:
+        with np.load(cache_file, allow_pickle=False) as cached:
+            if cached['version'] != KP_CACHE_VERSION or (int(cached['mtime']), int(cached['size'])) != stamp:
+                return None
+            return {key: cached[key] for key in cached.files}
+    except (OSError, ValueError, KeyError, zipfile.BadZipFile):
+        return None
+
+
+def _write_cache(filename, stamp, arrays):
+    """
+    Save the arrays to the cache file for a KP file; the file is written under a
+    temporary name first, so that a partially written file is never read
+    """
+    cache_file = kp_cache_file(filename)
+    temp_file = cache_file + '.' + str(os.getpid()) + '.tmp'
+    try:
+        os.makedirs(os.path.dirname(cache_file), exist_ok=True)
+        with open(temp_file, 'wb') as f:
+            np.savez(f, version=KP_CACHE_VERSION, mtime=stamp[0], size=stamp[1], **arrays)
+        os.replace(temp_file, cache_file)
+    except OSError as e:
+        logging.warning('Unable to write the KP cache file ' + cache_file + ': ' + str(e))
+        if os.path.exists(temp_file):
+            os.remove(temp_file)
+
+
+def _store_columns(arrays, columns):
+    """
+    Numeric columns are saved in one 2D array for each data type; text columns
+    are saved separately as strings, with a mask of the missing values
+    """
+    blocks = {}
+    for idx, values in enumerate(columns):
+        if values.dtype.kind in 'biufcmM':
+            blocks.setdefault(values.dtype.str, []).append(idx)
+        else:
+            key = 'text' + str(idx)
+            arrays[key] = np.array([value if isinstance(value, str) else '' for value in values], dtype=str)
+            arrays[key + '_missing'] = np.array([not isinstance(value, str) for value in values], dtype=bool)
+
+    for block_num, (dtype, indices) in enumerate(blocks.items()):
+        arrays['block' + str(block_num)] = np.stack([columns[idx] for idx in indices], axis=1).astype(dtype)
+        arrays['block' + str(block_num) + '_columns'] = np.array(indices)
+
+
+def _load_columns(cached, ncols):
+    """
+    Inverse of _store_columns; returns a dictionary of the columns, keyed by position
+    """
+    columns = {}
+    block_num = 0
+    while 'block' + str(block_num) in cached:
+        block = cached['block' + str(block_num)]
+        for col, idx in enumerate(cached['block' + str(block_num) + '_columns']):
+            columns[int(idx)] = block[:, col]
+        block_num += 1
+
+    for idx in range(ncols):
+        key = 'text' + str(idx)
+        if key in cached:
+            values = cached[key].astype(object)
+            values[cached[key + '_missing']] = np.nan
+            columns[idx] = values
+
+    return {idx: columns[idx] for idx in range(ncols)}
+
+
+def _flatten_iuvs(node, path, arrays, layout):
+    """
+    Save the values of the nested IUVS dictionaries as separate arrays; the layout
+    table lists the path, type and array name of each entry in order
+    """
+    for key, value in node.items():
+        entry = path + (key,)
+        name = '\t'.join(entry)
+        if isinstance(value, collections.OrderedDict):
+            layout.append((name, 'ordered', ''))
+            _flatten_iuvs(value, entry, arrays, layout)
+        elif isinstance(value, dict):
+            layout.append((name, 'dict', ''))
+            _flatten_iuvs(value, entry, arrays, layout)
+        else:
+            key = 'value' + str(len(arrays))
+            arrays[key] = np.array(value)
+            if arrays[key].dtype == object:
+                raise ValueError('Unable to save ' + name.replace('\t', '.') + ' as an array')
+            layout.append((name, 'list' if isinstance(value, list) else 'scalar', key))
+
+
+def _unflatten_iuvs(cached):
+    """
+    Inverse of _flatten_iuvs
+    """
+    iuvs_dict = {}
+    nodes = {'': iuvs_dict}
+    for name, kind, key in cached['layout'].tolist():
+        parent, _, leaf = name.rpartition('\t')
+        if kind == 'ordered':
+            nodes[name] = collections.OrderedDict()
+            nodes[parent][leaf] = nodes[name]
+        elif kind == 'dict':
+            nodes[name] = {}
+            nodes[parent][leaf] = nodes[name]
+        elif kind == 'list':
+            nodes[parent][leaf] = cached[key].tolist()
+        else:
+            nodes[parent][leaf] = cached[key].item()
+    return iuvs_dict
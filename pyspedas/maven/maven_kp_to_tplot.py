@@ -8,16 +8,18 @@ import numpy as np
 from .utilities import kp_regex
 from .utilities import param_dict
 from .utilities import remove_inst_tag
-from .utilities import get_latest_files_from_date_range, read_iuvs_file, get_latest_iuvs_files_from_date_range
+from .utilities import get_latest_files_from_date_range, get_latest_iuvs_files_from_date_range
 from .utilities import get_header_info
-from .utilities import orbit_time
+from .orbit_time import orbit_time
+from .kp_cache import read_kp_insitu_file, read_kp_iuvs_file
 import pytplot
 from _collections import OrderedDict
 import builtins
 import os
 
 
-def maven_kp_to_tplot(filename=None, input_time=None, instruments=None, insitu_only=False, specified_files_only=False, ancillary_only=False):
+def maven_kp_to_tplot(filename=None, input_time=None, instruments=None, insitu_only=False, specified_files_only=False, ancillary_only=False,
+                      use_cache=True):
     '''
     Read in a given filename in situ file into a dictionary object
     Optional keywords maybe used to downselect instruments returned
@@ -43,13 +45,16 @@ def maven_kp_to_tplot(filename=None, input_time=None, instruments=None, insitu_o
             as well.
         ancillary_only:
             Will only load in the spacecraft and APP info
+        use_cache:
+            Load the data from (and save it to) the binary cache files in
+            the kp/cache directory of the local MAVEN data directory
     Output:
         A dictionary (data structure) containing up to all of the columns
             included in a MAVEN in-situ Key parameter data file.
     '''
     import pandas as pd
     import re
-    from datetime import datetime, timedelta
+    from datetime import timedelta
     from dateutil.parser import parse
 
     filenames = []
@@ -220,20 +225,12 @@ def maven_kp_to_tplot(filename=None, input_time=None, instruments=None, insitu_o
         temp_data = []
         filenames.sort()
         for filename in filenames:
-            # Determine number of header lines
-            nheader = 0
-            with open(filename) as f:
-                for line in f:
-                    if line.startswith('#'):
-                        nheader += 1
-                if kp_regex.match(os.path.basename(filename)).group('description') == '_crustal':
-                    temp_data.append(pd.read_fwf(filename, skiprows=nheader, index_col=0,
-                                                 widths=[19] + len(crus_name) * [16], names=crus_name))
-                else:
-                    temp_data.append(pd.read_fwf(filename, skiprows=nheader, index_col=0,
-                                                 widths=[19] + len(names) * [16], names=names))
-                for i in delete_groups:
-                    del temp_data[-1][i]
+            if kp_regex.match(os.path.basename(filename)).group('description') == '_crustal':
+                temp_data.append(read_kp_insitu_file(filename, crus_name, cache=use_cache))
+            else:
+                temp_data.append(read_kp_insitu_file(filename, names, cache=use_cache))
+            for i in delete_groups:
+                del temp_data[-1][i]
 
         temp_unconverted = pd.concat(temp_data, axis=0, sort=True)
 
@@ -251,17 +248,11 @@ def maven_kp_to_tplot(filename=None, input_time=None, instruments=None, insitu_o
             temp = temp_unconverted
 
         # Cut out the times not included in the date range
-        time_unix = [calendar.timegm(datetime.strptime(i, '%Y-%m-%dT%H:%M:%S').timetuple()) for i in temp.index]
-        start_index = 0
-        for t in time_unix:
-            if t >= date1_unix:
-                break
-            start_index += 1
-        end_index = 0
-        for t in time_unix:
-            if t >= date2_unix:
-                break
-            end_index += 1
+        time_unix = np.array(temp.index, dtype='datetime64[s]').astype(np.int64)
+        after_start = time_unix >= date1_unix
+        start_index = np.argmax(after_start) if after_start.any() else len(time_unix)
+        after_end = time_unix >= date2_unix
+        end_index = np.argmax(after_end) if after_end.any() else len(time_unix)
 
         # Assign the first-level only tags
         time_unix = time_unix[start_index:end_index]
@@ -391,7 +382,7 @@ def maven_kp_to_tplot(filename=None, input_time=None, instruments=None, insitu_o
     kp_iuvs = []
     if not insitu_only and iuvs_filenames:
         for file in iuvs_filenames:
-            kp_iuvs.append(read_iuvs_file(file))
+            kp_iuvs.append(read_kp_iuvs_file(file, cache=use_cache))
     if not kp_iuvs:
         return tplot_varcreate(kp_insitu)
     else:
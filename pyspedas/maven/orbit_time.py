@@ -1,13 +1,25 @@
-
 """
 File:
     orbit_time.py
 
 Description:
     MAVEN orbit file handling routines.
+
+    The orbit file is parsed once into a table of orbit numbers and periapsis
+    times, which is kept until the file changes (e.g., when get_orbit_files
+    downloads a new version); lookups in both directions are binary searches
+    on the table, and accept arrays of orbits or times.
 """
 
 import os
+import numpy as np
+
+# merged orbit file, created by download_files_utilities.merge_orbit_files
+ORBIT_FILE = os.path.join(os.path.dirname(__file__), 'maven_orb_rec.orb')
+
+# orbit table parsed from the orbit file, and the name, modification time and
+# size of the file it was parsed from
+_orbit_table = {'stamp': None, 'orbits': None, 'times': None, 'time_strings': None}
 
 
 def month_to_num(month_string):
@@ -21,31 +33,125 @@ def month_to_num(month_string):
         raise ValueError('Month string is not valid')
 
 
-def orbit_time(begin_orbit, end_orbit=None):
-    orb_file = os.path.join(os.path.dirname(__file__),
-                            'maven_orb_rec.orb')
+def orbit_table():
+    """
+    Returns the orbit numbers and periapsis times in the orbit file
+
+    Returns
+    --------
+        Tuple containing the orbit numbers (int), the periapsis times (unix times)
+        and the periapsis times as strings ('YYYY-MM-DDThh:mm:ss'); the arrays are
+        read-only, and shared by all the callers
+    """
+    orb_file = ORBIT_FILE
 
-    with open(orb_file, "r") as f:
-        if end_orbit is None:
-            end_orbit = begin_orbit
+    stat = os.stat(orb_file)
+    stamp = (orb_file, stat.st_mtime_ns, stat.st_size)
+
+    if _orbit_table['stamp'] != stamp:
         orbit_num = []
         time = []
-        f.readline()
-        f.readline()
-        for line in f:
-            line = line[0:28]
-            line = line.split(' ')
-            line = [x for x in line if x != '']
-            orbit_num.append(int(line[0]))
-            time.append(line[1] + "-" + month_to_num(line[2]) + "-" + line[3] + "T" + line[4])
-        try:
-
-            if orbit_num.index(begin_orbit) > len(time) or orbit_num.index(end_orbit) + 1 > len(time):
-                print("Orbit numbers not found.  Please choose a number between 1 and %s.", orbit_num[-1])
-                return [None, None]
-            else:
-                begin_time = time[orbit_num.index(begin_orbit)]
-                end_time = time[orbit_num.index(end_orbit) + 1]
-        except ValueError:
-            return [None, None]
-    return [begin_time, end_time]
+        with open(orb_file, "r") as f:
+            f.readline()
+            f.readline()
+            for line in f:
+                line = line[0:28].split()
+                if len(line) < 5:
+                    continue
+                orbit_num.append(int(line[0]))
+                time.append(line[1] + "-" + month_to_num(line[2]) + "-" + line[3] + "T" + line[4])
+
+        orbits = np.array(orbit_num, dtype=np.int64)
+        time_strings = np.array(time, dtype=str)
+        times = time_strings.astype('datetime64[s]').astype(np.int64).astype(np.float64)
+
+        for values in [orbits, times, time_strings]:
+            values.flags.writeable = False
+
+        _orbit_table.update(stamp=stamp, orbits=orbits, times=times, time_strings=time_strings)
+
+    return _orbit_table['orbits'], _orbit_table['times'], _orbit_table['time_strings']
+
+
+def orbit_index(orbits):
+    """
+    Returns the rows of the orbit table for an orbit number or array of orbit numbers;
+    orbits that aren't in the table are returned as -1
+    """
+    orbit_nums = orbit_table()[0]
+    orbits = np.asarray(orbits, dtype=np.int64)
+    if len(orbit_nums) == 0:
+        return np.full(orbits.shape, -1)
+
+    # the orbit numbers in the file are in increasing order
+    idx = np.minimum(np.searchsorted(orbit_nums, orbits), len(orbit_nums) - 1)
+    return np.where(orbit_nums[idx] == orbits, idx, -1)
+
+
+def orbit_to_time(orbits):
+    """
+    Returns the periapsis (start) times of an orbit number or array of orbit numbers
+
+    Parameters
+    -----------
+        orbits: int or array of int
+            Orbit numbers
+
+    Returns
+    --------
+        Unix times of the periapses; NaN for orbits that aren't in the orbit file
+    """
+    times = orbit_table()[1]
+    idx = orbit_index(orbits)
+    if len(times) == 0:
+        return np.full(idx.shape, np.nan)
+    return np.where(idx >= 0, times[idx], np.nan)
+
+
+def time_to_orbit(times):
+    """
+    Returns the orbit numbers at a time or array of times
+
+    Parameters
+    -----------
+        times: float, str or array
+            Unix times, or time strings
+
+    Returns
+    --------
+        Orbit numbers; each orbit runs from its periapsis to the periapsis of
+        the next orbit. Times outside of the orbits in the orbit file are
+        returned as -1
+    """
+    orbit_nums, orbit_times = orbit_table()[0:2]
+    times = np.asarray(times)
+    if times.dtype.kind in 'USO':
+        from pytplot import time_double
+        times = np.asarray(time_double(times.tolist()), dtype=np.float64)
+
+    idx = np.searchsorted(orbit_times, times, side='right') - 1
+    valid = (idx >= 0) & (idx < len(orbit_times) - 1)
+    if not valid.any():
+        return np.full(idx.shape, -1)
+    return np.where(valid, orbit_nums[np.where(valid, idx, 0)], -1)
+
+
+def orbit_time(begin_orbit, end_orbit=None):
+    """
+    Returns the time range of an orbit or range of orbits, from the periapsis of
+    begin_orbit to the periapsis following end_orbit, as a list of time strings
+    """
+    if end_orbit is None:
+        end_orbit = begin_orbit
+
+    orbit_nums, _, time = orbit_table()
+    begin_idx, end_idx = orbit_index([begin_orbit, end_orbit])
+
+    if begin_idx < 0 or end_idx < 0:
+        return [None, None]
+
+    if end_idx + 1 >= len(time):
+        print("Orbit numbers not found.  Please choose a number between 1 and %s." % orbit_nums[-2])
+        return [None, None]
+
+    return [str(time[begin_idx]), str(time[end_idx + 1])]
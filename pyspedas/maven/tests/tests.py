@@ -1,9 +1,16 @@
 
 import os
+import collections
+import tempfile
 import unittest
+import numpy as np
+import pandas as pd
 from pytplot import data_exists
 from pyspedas import maven
+from pyspedas.maven.config import CONFIG
 from pyspedas.maven.download_files_utilities import get_orbit_files, merge_orbit_files
+from pyspedas.maven import orbit_time as orbit_time_module
+from pyspedas.maven.kp_cache import read_kp_insitu_file, kp_cache_file, _flatten_iuvs, _unflatten_iuvs
 
 
 class OrbitTestCases(unittest.TestCase):
@@ -13,6 +20,41 @@ class OrbitTestCases(unittest.TestCase):
         self.assertTrue(os.path.join(os.path.join(os.path.dirname(__file__), '..'), 'maven_orb_rec.orb'))
 
 
+class OrbitTableTestCases(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.orbit_file = orbit_time_module.ORBIT_FILE
+        orbit_time_module.ORBIT_FILE = os.path.join(self.tmpdir.name, 'maven_orb_rec.orb')
+        with open(orbit_time_module.ORBIT_FILE, 'w') as f:
+            f.write('  #Orb  Event UTC PERI\n  ====  ====================\n')
+            for orbit, hour in zip(range(1, 6), range(0, 20, 4)):
+                f.write('%6d  2014 SEP 22 %02d:10:00  464617465.65427\n' % (orbit, hour))
+
+    def tearDown(self):
+        orbit_time_module.ORBIT_FILE = self.orbit_file
+        self.tmpdir.cleanup()
+
+    def test_orbit_time(self):
+        self.assertEqual(orbit_time_module.orbit_time(2), ['2014-09-22T04:10:00', '2014-09-22T08:10:00'])
+        self.assertEqual(orbit_time_module.orbit_time(1, 3), ['2014-09-22T00:10:00', '2014-09-22T12:10:00'])
+        self.assertEqual(orbit_time_module.orbit_time(5), [None, None])
+        self.assertEqual(orbit_time_module.orbit_time(9), [None, None])
+
+    def test_orbit_lookups(self):
+        times = orbit_time_module.orbit_to_time([1, 4, 9])
+        np.testing.assert_array_equal(times[0:2], [1411344600.0, 1411387800.0])
+        self.assertTrue(np.isnan(times[2]))
+        np.testing.assert_array_equal(orbit_time_module.time_to_orbit(times[0:2] + 60.0), [1, 4])
+        np.testing.assert_array_equal(orbit_time_module.time_to_orbit(['2014-09-22T00:00:00', '2014-09-22/09:00',
+                                                                       '2014-09-23']), [-1, 3, -1])
+
+    def test_orbit_file_update(self):
+        self.assertEqual(len(orbit_time_module.orbit_table()[0]), 5)
+        with open(orbit_time_module.ORBIT_FILE, 'a') as f:
+            f.write('%6d  2014 SEP 22 20:10:00  464617465.65427\n' % 6)
+        self.assertEqual(orbit_time_module.orbit_time(5), ['2014-09-22T16:10:00', '2014-09-22T20:10:00'])
+
+
 class LoadTestCases(unittest.TestCase):
     def test_load_kp_data(self):
         data = maven.kp()
@@ -59,5 +101,47 @@ class LoadTestCases(unittest.TestCase):
     #     data = maven.ngi()
     #     self.assertTrue(data_exists(''))
 
+
+class KPCacheTestCases(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.data_dir = CONFIG['local_data_dir']
+        CONFIG['local_data_dir'] = self.tmpdir.name
+
+    def tearDown(self):
+        CONFIG['local_data_dir'] = self.data_dir
+        self.tmpdir.cleanup()
+
+    def test_insitu_cache(self):
+        filename = os.path.join(self.tmpdir.name, 'mvn_kp_insitu_20150101_v01_r01.tab')
+        with open(filename, 'w') as f:
+            f.write('# header\n')
+            for i in range(20):
+                value = '%16.6E' % (i*1.5) if i % 7 else 16*' '
+                flag = '%16s' % ('I' if i % 2 else 'O') if i % 5 else 16*' '
+                f.write('2015-01-01T00:00:%02d ' % i + value + '%16d' % i + flag + '\n')
+        names = ['MAG.Magnetic Field MSO X', 'SPICE.Orbit Number', 'SPICE.Inbound Outbound Flag']
+        expected = read_kp_insitu_file(filename, names, cache=False)
+        self.assertFalse(os.path.exists(kp_cache_file(filename)))
+        pd.testing.assert_frame_equal(read_kp_insitu_file(filename, names), expected)
+        self.assertTrue(os.path.exists(kp_cache_file(filename)))
+        pd.testing.assert_frame_equal(read_kp_insitu_file(filename, names), expected)
+        # a modified file is read again
+        with open(filename, 'a') as f:
+            f.write('2015-01-01T00:00:20 ' + '%16.6E' % 1.0 + '%16d' % 20 + '%16s' % 'I' + '\n')
+        self.assertEqual(len(read_kp_insitu_file(filename, names)), 21)
+
+    def test_iuvs_layout(self):
+        iuvs_dict = {'periapse1': {'time_start': '2015-01-01T00:00:00', 'orbit_number': 10, 'sza': 45.0,
+                                   'density': collections.OrderedDict([('CO2', [1.0, np.nan]), ('O', [])])},
+                     'apoapse': {'latitude': [1.0, 2.0], 'data': [[1.0, 2.0], [3.0, 4.0]]}}
+        arrays, layout = {}, []
+        _flatten_iuvs(iuvs_dict, (), arrays, layout)
+        arrays['layout'] = np.array(layout, dtype=str)
+        np.testing.assert_equal(_unflatten_iuvs(arrays), iuvs_dict)
+        self.assertIsInstance(_unflatten_iuvs(arrays)['periapse1']['density'], collections.OrderedDict)
+        self.assertIsInstance(_unflatten_iuvs(arrays)['periapse1']['orbit_number'], int)
+
+
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
@@ -737,35 +737,6 @@ def get_values_from_list(the_list, location):
         return testing
 
 
-def orbit_time(begin_orbit, end_orbit=None):
-    orb_file = os.path.join(os.path.dirname(__file__),
-                            'maven_orb_rec.orb')
-
-    with open(orb_file, "r") as f:
-        if end_orbit is None:
-            end_orbit = begin_orbit
-        orbit_num = []
-        time = []
-        f.readline()
-        f.readline()
-        for line in f:
-            line = line[0:28]
-            line = line.split(' ')
-            line = [x for x in line if x != '']
-            orbit_num.append(int(line[0]))
-            time.append(line[1] + "-" + month_to_num(line[2]) + "-" + line[3] + "T" + line[4])
-        try:
-            if orbit_num.index(begin_orbit) > len(time) or orbit_num.index(end_orbit) + 1 > len(time):
-                print("Orbit numbers not found.  Please choose a number between 1 and %s.", orbit_num[-1])
-                return [None, None]
-            else:
-                begin_time = time[orbit_num.index(begin_orbit)]
-                end_time = time[orbit_num.index(end_orbit) + 1]
-        except ValueError:
-            return [None, None]
-    return [begin_time, end_time]
-
-
 def month_to_num(month_string):
     if month_string == 'JAN':
         return '01'
@@ -4,14 +4,7 @@ import numpy as np
 from pyspedas import tnames
 from pytplot import get_data, store_data, options
 from pyspedas.mms.eis.mms_eis_pad_spinavg import mms_eis_pad_spinavg
-
-# use nanmean from bottleneck if it's installed, otherwise use the numpy one
-# bottleneck nanmean is ~2.5x faster
-try:
-    import bottleneck as bn
-    nanmean = bn.nanmean
-except ImportError:
-    nanmean = np.nanmean
+from pyspedas.mms.mms_pad_binning import mms_pad_bin_nanmean
 
 logging.captureWarnings(True)
 logging.basicConfig(format='%(asctime)s: %(message)s', datefmt='%d-%b-%y %H:%M:%S', level=logging.INFO)
@@ -118,9 +111,6 @@ def mms_eis_pad(scopes=['0', '1', '2', '3', '4', '5'], probe='1', level='l2',
 
                 flux_file = np.zeros([len(pa_times), len(scopes), len(these_energies)])
                 flux_file[:] = 'nan'
-                pa_flux = np.zeros([len(pa_times), int(n_pabins), len(these_energies)])
-                pa_flux[:] = 'nan'
-                pa_num_in_bin = np.zeros([len(pa_times), int(n_pabins), len(these_energies)])
 
                 for t, scope in enumerate(scopes):
                     pa_times, pa_data = get_data(prefix + datatype_id + '_pitch_angle_t' + scope + suffix)
@@ -144,12 +134,7 @@ def mms_eis_pad(scopes=['0', '1', '2', '3', '4', '5'], probe='1', level='l2',
                     flux_file[:, t, :] = flux_data[:, these_energies]
 
                 # CREATE PAD VARIABLES FOR EACH ENERGY CHANNEL IN USER-DEFINED ENERGY RANGE
-                for i, flux_time in enumerate(flux_times):
-                    for j, pa_bin in enumerate(range(0, int(n_pabins))):
-                        for ee in range(0, len(these_energies)):
-                            ind = np.where((pa_file[i, :] + pa_halfang_width >= pa_label[j] - delta_pa) & (pa_file[i, :] - pa_halfang_width < pa_label[j] + delta_pa))[0]
-                            if ind.size != 0:
-                                pa_flux[i, j, ee] = nanmean(flux_file[i, ind, ee], axis=0)
+                pa_flux = mms_pad_bin_nanmean(pa_file, flux_file, pa_label, delta_pa, pa_halfang_width)
 
                 for ee in range(0, len(these_energies)):
                     # energy_string = str(int(flux_energies[these_energies[ee]])) + 'keV'
@@ -178,14 +163,9 @@ def mms_eis_pad(scopes=['0', '1', '2', '3', '4', '5'], probe='1', level='l2',
                 energy_range_string = str(int(erange[these_energies[0], 0])) + '-' + str(int(erange[these_energies[-1], 1])) + 'keV'
                 new_name = prefix + datatype_id + '_' + energy_range_string + '_' + species_id + '_' + data_units + scope_suffix + '_pad'
 
-                avg_pa_flux = np.zeros([len(flux_times), int(n_pabins)])
-                avg_pa_flux[:] = 'nan'
-
-                for tt in range(0, len(flux_times)):
-                    for bb in range(0, int(n_pabins)):
-                        with warnings.catch_warnings():
-                            warnings.simplefilter("ignore", category=RuntimeWarning)
-                            avg_pa_flux[tt, bb] = nanmean(pa_flux[tt, bb, :])
+                with warnings.catch_warnings():
+                    warnings.simplefilter("ignore", category=RuntimeWarning)
+                    avg_pa_flux = np.nanmean(pa_flux, axis=2)
 
                 store_data(new_name, data={'x': flux_times, 'y': avg_pa_flux, 'v': pa_label})
                 options(new_name, 'ylog', False)
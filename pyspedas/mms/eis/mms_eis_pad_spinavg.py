@@ -1,16 +1,8 @@
 import logging
-import warnings
 import numpy as np
 from pyspedas import tnames
 from pytplot import get_data, store_data, options
-
-# use nanmean from bottleneck if it's installed, otherwise use the numpy one
-# bottleneck nanmean is ~2.5x faster
-try:
-    import bottleneck as bn
-    nanmean = bn.nanmean
-except ImportError:
-    nanmean = np.nanmean
+from pyspedas.mms.mms_pad_binning import mms_spin_nanmean
 
 logging.captureWarnings(True)
 logging.basicConfig(format='%(asctime)s: %(message)s', datefmt='%d-%b-%y %H:%M:%S', level=logging.INFO)
@@ -75,7 +67,7 @@ def mms_eis_pad_spinavg(scopes=['0','1','2','3','4','5'], probe='1',
     spin_times, spin_nums = get_data(prefix + datatype + '_spin' + suffix)
 
     # find where the spins start
-    spin_starts = [spin_start for spin_start in np.where(spin_nums[1:] > spin_nums[:-1])[0]]
+    spin_starts = np.where(spin_nums[1:] > spin_nums[:-1])[0]
 
     pad_vars = tnames(prefix + datatype + '_*keV_' + species + '_' + data_units + scope_suffix + '_pad')
 
@@ -88,20 +80,12 @@ def mms_eis_pad_spinavg(scopes=['0','1','2','3','4','5'], probe='1',
             logging.error('Error, variable containing valid PAD data missing: ' + pad_var)
             continue
 
-        spin_avg_flux = np.zeros([len(spin_starts), len(pad_angles)])
-        spin_times = np.zeros(len(spin_starts))
-
-        current_start = 0
+        # average the PADs over all of the samples in each spin
+        unique_spins, spin_means = mms_spin_nanmean(pad_data, spin_nums)
+        spin_avg_flux = spin_means[np.searchsorted(unique_spins, spin_nums[spin_starts])]
 
-        # loop through the spins for this telescope
-        for spin_idx, spin_start in enumerate(spin_starts):
-            ind = np.where(spin_nums == spin_nums[spin_starts[spin_idx]])[0]
-            if ind is not None:
-                with warnings.catch_warnings():
-                    warnings.simplefilter("ignore", category=RuntimeWarning)
-                    spin_avg_flux[spin_idx, :] = nanmean(pad_data[ind], axis=0)
-            spin_times[spin_idx] = pad_times[current_start]
-            current_start = spin_starts[spin_idx]+1
+        # each spin is labeled with the time of the sample after the end of the previous spin
+        spin_times = pad_times[np.concatenate(([0], spin_starts[:-1] + 1))[:len(spin_starts)]]
 
         newname = pad_var + '_spin'
 
@@ -5,6 +5,7 @@ from pytplot import get, store, options
 from pyspedas.mms.feeps.mms_feeps_pitch_angles import mms_feeps_pitch_angles
 from pyspedas.mms.feeps.mms_feeps_active_eyes import mms_feeps_active_eyes
 from pyspedas.mms.feeps.mms_feeps_pad_spinavg import mms_feeps_pad_spinavg
+from pyspedas.mms.mms_pad_binning import mms_pad_bin_nanmean
 
 # use nanmean from bottleneck if it's installed, otherwise use the numpy one
 # bottleneck nanmean is ~2.5x faster
@@ -150,21 +151,13 @@ def mms_feeps_pad(bin_size=16.3636, probe='1', energy=[70, 600], level='l2', suf
     # for this datatype/data_rate
     dpa[dpa == 0] = 'nan'
 
-    pa_flux = np.zeros([len(pa_times), int(n_pabins)])
     delta_pa = (pa_bins[1]-pa_bins[0])/2.0
 
-    # Now loop through PA bins and time, find the telescopes where there is data in those bins and average it up!
-    for pa_idx, pa_time in enumerate(pa_times):
-        for ipa in range(0, int(n_pabins)):
-            if not np.isnan(dpa[pa_idx, :][0]):
-                with warnings.catch_warnings():
-                    warnings.simplefilter("ignore", category=RuntimeWarning)
-                    ind = np.argwhere((dpa[pa_idx, :] + dangresp >= pa_label[ipa]-delta_pa) & (dpa[pa_idx, :]-dangresp < pa_label[ipa]+delta_pa)).flatten()
-                    if ind.size != 0:
-                        if len(ind) > 1:
-                            pa_flux[pa_idx, ipa] = nanmean(dflux[pa_idx, ind], axis=0)
-                        else:
-                            pa_flux[pa_idx, ipa] = dflux[pa_idx, ind[0]]
+    # Now find the telescopes where there is data in each PA bin and average it up, for all times at once!
+    pa_flux = mms_pad_bin_nanmean(dpa, dflux, pa_label, delta_pa, dangresp)
+
+    # skip the times where the first sensor doesn't have a pitch angle
+    pa_flux[np.isnan(dpa[:, 0]), :] = np.nan
 
     pa_flux[pa_flux == 0] = 'nan' # fill any missed bins with NAN
 
@@ -1,15 +1,6 @@
-import warnings
 import numpy as np
-import scipy 
 from pytplot import get_data, store, options
-
-# use nanmean from bottleneck if it's installed, otherwise use the numpy one
-# bottleneck nanmean is ~2.5x faster
-try:
-    import bottleneck as bn
-    nanmean = bn.nanmean
-except ImportError:
-    nanmean = np.nanmean
+from pyspedas.mms.mms_pad_binning import mms_spin_nanmean
 
 
 def mms_feeps_pad_spinavg(probe='1', data_units='intensity', datatype='electron', data_rate='srvy', level='l2', suffix='', energy=[70, 600], bin_size=16.3636):
@@ -61,38 +52,37 @@ def mms_feeps_pad_spinavg(probe='1', data_units='intensity', datatype='electron'
     # v5.5+ = mms1_epd_feeps_srvy_l1b_electron_spinsectnum
     sector_times, spin_sectors = get_data(prefix + data_rate + '_' + level + '_' + datatype + '_spinsectnum' + suffix)
 
-    spin_starts = [spin_end + 1 for spin_end in np.where(spin_sectors[:-1] >= spin_sectors[1:])[0]]
+    spin_starts = np.where(spin_sectors[:-1] >= spin_sectors[1:])[0] + 1
 
     en_range_string = str(int(energy[0])) + '-' + str(int(energy[1])) + 'keV'
     var_name =  prefix + data_rate + '_' + level + '_' + datatype + '_' + data_units + '_' + en_range_string + '_pad' + suffix
 
     times, data, angles = get_data(var_name)
 
+    # spin number of each sample; spin i runs from the sample after the end of spin i-1
+    # through spin_starts[i], and the samples after the last spin aren't included
+    spin_idxs = np.searchsorted(spin_starts, np.arange(len(times)), side='left')
+    in_spin = spin_idxs < len(spin_starts)
     spin_avg_flux = np.zeros([len(spin_starts), len(angles)])
-    rebinned_data = np.zeros([len(spin_starts), int(n_pabins)+1])
-    spin_times = np.zeros(len(spin_starts))
-
-    # the following is for rebinning and interpolating to new_bins
-    srx = [float(len(angles))/(int(n_pabins)+1)*(x + 0.5) - 0.5 for x in range(int(n_pabins)+1)]
-
-    current_start = 0
-    for spin_idx in range(0, len(spin_starts)):
-        with warnings.catch_warnings():
-            warnings.simplefilter("ignore", category=RuntimeWarning)
-            spin_avg_flux[spin_idx, :] = nanmean(data[current_start:spin_starts[spin_idx]+1, :], axis=0)
-            spin_times[spin_idx] = times[current_start]
-
-            # rebin and interpolate to new_bins
-            # this is meant to replicate the functionality of congrid in the IDL routine
-            spin_avg_interp = scipy.interpolate.interp1d(np.arange(len(spin_avg_flux[spin_idx, :])), spin_avg_flux[spin_idx, :], fill_value='extrapolate')
-            rebinned_data[spin_idx, :] = spin_avg_interp(srx)
-
-            # we want to take the end values instead of extrapolating
-            # again, to match the functionality of congrid in IDL
-            rebinned_data[spin_idx, 0] = spin_avg_flux[spin_idx, 0]
-            rebinned_data[spin_idx, -1] = spin_avg_flux[spin_idx, -1]
-
-        current_start = spin_starts[spin_idx] + 1
+    spins, spin_means = mms_spin_nanmean(data[in_spin], spin_idxs[in_spin])
+    spin_avg_flux[spins] = spin_means
+    spin_times = times[np.concatenate(([0], spin_starts[:-1] + 1))[:len(spin_starts)]]
+
+    # rebin and interpolate to new_bins
+    # this is meant to replicate the functionality of congrid in the IDL routine,
+    # with the same linear interpolation (and extrapolation) as scipy's interp1d
+    srx = np.array([float(len(angles))/(int(n_pabins)+1)*(x + 0.5) - 0.5 for x in range(int(n_pabins)+1)])
+    x = np.arange(len(angles), dtype=np.float64)
+    hi = np.clip(np.searchsorted(x, srx), 1, len(x)-1)
+    lo = hi - 1
+    with np.errstate(invalid='ignore'):
+        slope = (spin_avg_flux[:, hi] - spin_avg_flux[:, lo])/(x[hi] - x[lo])
+        rebinned_data = slope*(srx - x[lo]) + spin_avg_flux[:, lo]
+
+    # we want to take the end values instead of extrapolating
+    # again, to match the functionality of congrid in IDL
+    rebinned_data[:, 0] = spin_avg_flux[:, 0]
+    rebinned_data[:, -1] = spin_avg_flux[:, -1]
 
     # store_data(var_name + '_spin' + suffix, data={'x': spin_times, 'y': spin_avg_flux, 'v': angles})
     store(var_name + '_spin' + suffix, data={'x': spin_times, 'y': rebinned_data, 'v': new_bins})
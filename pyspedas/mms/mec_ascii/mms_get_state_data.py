@@ -1,9 +1,8 @@
 import os
 import logging
 import warnings
-from shutil import copyfileobj, copy
-from tempfile import NamedTemporaryFile
 from pyspedas import time_double, time_string
+from pyspedas.utilities.download import stream_to_file
 from pyspedas.mms.mms_login_lasp import mms_login_lasp
 from pyspedas.mms.mms_config import CONFIG
 from pyspedas.mms.mec_ascii.mms_get_local_state_files import mms_get_local_state_files
@@ -115,19 +114,13 @@ def mms_get_state_data(probe='1', trange=['2015-10-16', '2015-10-17'],
                         warnings.simplefilter("ignore", category=ResourceWarning)
                         fsrc = sdc_session.get(download_url, stream=True, verify=True)
 
-                    ftmp = NamedTemporaryFile(delete=False)
+                    try:
+                        saved = stream_to_file(fsrc, out_file, expected_size=file['file_size'])
+                    finally:
+                        fsrc.close()
 
-                    with open(ftmp.name, 'wb') as f:
-                        copyfileobj(fsrc.raw, f)
-
-                    if not os.path.exists(out_dir):
-                        os.makedirs(out_dir)
-
-                    # if the download was successful, copy to data directory
-                    copy(ftmp.name, out_file)
-                    out_files.append(out_file)
-                    fsrc.close()
-                    ftmp.close()
+                    if saved:
+                        out_files.append(out_file)
 
             if download_only:
                 continue
@@ -6,7 +6,8 @@ CONFIG = {'local_data_dir': 'pydata',
           'mirror_data_dir': None, # e.g., '/Volumes/data_network/data/mms'
           'debug_mode': False,
           'download_only': False,
-          'no_download': False}
+          'no_download': False,
+          'max_workers': 4} # max # of simultaneous queries/downloads from the SDC
 
 # override local data directory with environment variables
 if os.environ.get('SPEDAS_DATA_DIR'):
@@ -17,4 +18,7 @@ if os.environ.get('MMS_DATA_DIR'):
 
 
 if os.environ.get('MMS_MIRROR_DATA_DIR'):
-    CONFIG['mirror_data_dir'] = os.environ['MMS_MIRROR_DATA_DIR']
\ No newline at end of file
+    CONFIG['mirror_data_dir'] = os.environ['MMS_MIRROR_DATA_DIR']
+
+if os.environ.get('MMS_MAX_WORKERS'):
+    CONFIG['max_workers'] = int(os.environ['MMS_MAX_WORKERS'])
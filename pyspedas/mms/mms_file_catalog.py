@@ -0,0 +1,233 @@
+import os
+import json
+import time
+import logging
+from tempfile import NamedTemporaryFile
+from dateutil.rrule import rrule, DAILY
+from dateutil.parser import parse
+from datetime import timedelta
+from .mms_config import CONFIG
+
+# name of the catalog file, stored at the top of each data directory
+CATALOG_FILE = '.mms_file_catalog.json'
+
+# increment this if the format of the catalog changes
+CATALOG_VERSION = 1
+
+# catalogs already loaded by this process, keyed by data directory
+_catalogs = {}
+
+
+def mms_parse_file_name(file_name):
+    """
+    Split an MMS CDF file name into its components
+
+    File names are of the form:
+        spacecraft_instrument_rate_level[_descriptor]_YYYYMMDD[hhmmss]_vX.Y.Z.cdf
+
+    Returns
+    ---------
+        dict with the keys 'probe', 'instrument', 'data_rate', 'level', 'descriptor',
+        'timetag' (padded to YYYYMMDDhhmmss) and 'version' (tuple of ints),
+        or None if the file name doesn't follow the MMS conventions
+    """
+    if not file_name.endswith('.cdf') or not file_name.startswith('mms'):
+        return None
+
+    parts = file_name[:-4].split('_')
+    if len(parts) < 6:
+        return None
+
+    timetag = parts[-2]
+    version = parts[-1]
+    if not timetag.isdigit() or not 8 <= len(timetag) <= 14 or version[0:1] != 'v':
+        return None
+
+    try:
+        version = tuple(int(v) for v in version[1:].split('.'))
+    except ValueError:
+        return None
+
+    if len(version) != 3:
+        return None
+
+    return {'probe': parts[0][3:],
+            'instrument': parts[1],
+            'data_rate': parts[2],
+            'level': parts[3],
+            'descriptor': '_'.join(parts[4:-2]),
+            'timetag': timetag.ljust(14, '0'),
+            'version': version}
+
+
+def _catalog_path(data_dir):
+    return os.path.join(data_dir, CATALOG_FILE)
+
+
+def _load_catalog(data_dir):
+    """
+    Load the catalog for a data directory, from memory if possible, then from disk
+    """
+    catalog = _catalogs.get(data_dir)
+    if catalog is not None:
+        return catalog
+
+    catalog = {'version': CATALOG_VERSION, 'dirs': {}}
+    try:
+        with open(_catalog_path(data_dir), 'r') as f:
+            saved = json.load(f)
+        if saved.get('version') == CATALOG_VERSION:
+            catalog = saved
+    except (OSError, ValueError):
+        pass
+
+    _catalogs[data_dir] = catalog
+    return catalog
+
+
+def _save_catalog(data_dir, catalog):
+    """
+    Save the catalog for a data directory; the file is replaced atomically, so
+    other processes never read a partially written catalog
+    """
+    try:
+        with NamedTemporaryFile('w', dir=data_dir, prefix=CATALOG_FILE + '.', suffix='.tmp', delete=False) as f:
+            json.dump(catalog, f)
+        os.replace(f.name, _catalog_path(data_dir))
+    except OSError:
+        # e.g., read-only network mirrors; the catalog is still kept in memory
+        if CONFIG['debug_mode']: logging.info('Unable to save the file catalog in ' + data_dir)
+
+
+def _scan_dir(path):
+    """
+    Return the catalog entries for the MMS CDF files in a directory
+    """
+    files = []
+    try:
+        with os.scandir(path) as entries:
+            for entry in entries:
+                if not entry.is_file():
+                    continue
+                info = mms_parse_file_name(entry.name)
+                if info is None:
+                    continue
+                info['file_name'] = entry.name
+                info['version'] = list(info['version'])
+                files.append(info)
+    except OSError:
+        return []
+    return sorted(files, key=lambda f: f['file_name'])
+
+
+def mms_catalog_files(data_dir, probe, instrument, data_rate, level, datatype, trange):
+    """
+    Find the local MMS files for the requested probe, instrument, rate, level,
+    datatype and time range using the file catalog
+
+    The catalog stores the parsed file names in each data directory, along with the
+    modification time of the directory; only directories that changed since they were
+    last indexed are listed again. The catalog is saved at the top of the data directory,
+    so it's shared with subsequent sessions.
+
+    Parameters
+    ------------
+        data_dir: str
+            Top-level MMS data directory
+
+        probe: str
+            probe #, e.g., '4' for MMS4
+
+        instrument: str
+            instrument name, e.g., 'fpi' or 'fgm'
+
+        data_rate: str
+            instrument data rate, e.g., 'srvy' or 'brst'
+
+        level: str
+            data level, e.g., 'l2'
+
+        datatype: str
+            data descriptor, e.g., 'des-moms'; the files are assumed to be stored in
+            a subdirectory with this name
+
+        trange: list of str
+            two-element array containing the start and end date/times
+
+    Returns
+    ---------
+        List of dicts containing the 'file_name', the 'full_name' (path), the 'timetag'
+        and the 'version' (tuple of ints) of each file, sorted by time tag
+    """
+    # directory search patterns
+    #   -assume directories are of the form:
+    #      (srvy, SITL): spacecraft/instrument/rate/level[/datatype]/year/month/
+    #      (brst): spacecraft/instrument/rate/level[/datatype]/year/month/day/
+    start_day = parse(parse(trange[0]).strftime('%Y-%m-%d'))
+    end_time = parse(trange[1])-timedelta(seconds=1)
+    days = rrule(DAILY, dtstart=start_day, until=end_time)
+
+    if datatype == '' or datatype is None:
+        level_and_dtype = [level]
+    else:
+        level_and_dtype = [level, datatype]
+
+    rel_dirs = []
+    for date in days:
+        rel_dir = ['mms'+probe, instrument, data_rate] + level_and_dtype + [date.strftime('%Y'), date.strftime('%m')]
+        if data_rate == 'brst':
+            rel_dir.append(date.strftime('%d'))
+        rel_dir = '/'.join(rel_dir)
+        if rel_dir not in rel_dirs:
+            rel_dirs.append(rel_dir)
+
+    catalog = _load_catalog(data_dir)
+    updated = False
+
+    start_tag = start_day.strftime('%Y%m%d%H%M%S')
+    end_tag = end_time.strftime('%Y%m%d%H%M%S')
+
+    files_out = []
+    for rel_dir in rel_dirs:
+        local_dir = os.path.join(data_dir, *rel_dir.split('/'))
+        try:
+            mtime = os.stat(local_dir).st_mtime
+        except OSError:
+            if rel_dir in catalog['dirs']:
+                del catalog['dirs'][rel_dir]
+                updated = True
+            continue
+
+        entry = catalog['dirs'].get(rel_dir)
+        if entry is None or entry['mtime'] != mtime:
+            if CONFIG['debug_mode']: logging.info('Indexing ' + local_dir)
+            # the directory could still change without changing its modification time
+            # on file systems with coarse timestamps; re-index recently modified directories
+            entry = {'mtime': mtime if time.time() - mtime > 2.0 else None, 'files': _scan_dir(local_dir)}
+            catalog['dirs'][rel_dir] = entry
+            updated = True
+
+        for file in entry['files']:
+            if file['probe'] != probe or file['instrument'] != instrument or file['data_rate'] != data_rate or file['level'] != level:
+                continue
+            if start_tag <= file['timetag'] <= end_tag:
+                files_out.append({'file_name': file['file_name'],
+                                  'full_name': os.path.join(local_dir, file['file_name']),
+                                  'timetag': file['timetag'],
+                                  'version': tuple(file['version'])})
+
+    if updated:
+        _save_catalog(data_dir, catalog)
+
+    return sorted(files_out, key=lambda f: (f['timetag'], f['file_name']))
+
+
+def mms_clear_file_catalog(data_dir=None):
+    """
+    Remove the file catalog for a data directory (default: the local data directory)
+    """
+    if data_dir is None:
+        data_dir = CONFIG['local_data_dir']
+    _catalogs.pop(data_dir, None)
+    if os.path.exists(_catalog_path(data_dir)):
+        os.remove(_catalog_path(data_dir))
@@ -1,12 +1,8 @@
 import logging
-import os
-import re
 import shutil
 from .mms_config import CONFIG
 from .mms_files_in_interval import mms_files_in_interval
-from dateutil.rrule import rrule, DAILY
-from dateutil.parser import parse
-from datetime import timedelta
+from .mms_file_catalog import mms_catalog_files
 
 
 def mms_get_local_files(probe, instrument, data_rate, level, datatype, trange, mirror=False):
@@ -41,8 +37,6 @@ def mms_get_local_files(probe, instrument, data_rate, level, datatype, trange, m
     ---------
         List of file paths.
     """
-    files_out = []
-
     if mirror:
         if CONFIG.get('mirror_data_dir') is not None:
             data_dir = CONFIG['mirror_data_dir']
@@ -51,50 +45,14 @@ def mms_get_local_files(probe, instrument, data_rate, level, datatype, trange, m
     else:
         data_dir = CONFIG['local_data_dir']
 
-    # directory and file name search patterns
-    #   -assume directories are of the form:
-    #      (srvy, SITL): spacecraft/instrument/rate/level[/datatype]/year/month/
-    #      (brst): spacecraft/instrument/rate/level[/datatype]/year/month/day/
-    #   -assume file names are of the form:
-    #      spacecraft_instrument_rate_level[_datatype]_YYYYMMDD[hhmmss]_version.cdf
-
-    file_name = 'mms'+probe+'_'+instrument+'_'+data_rate+'_'+level+'(_)?.*_([0-9]{8,14})_v(\d+).(\d+).(\d+).cdf'
-
-    days = rrule(DAILY, dtstart=parse(parse(trange[0]).strftime('%Y-%m-%d')), until=parse(trange[1])-timedelta(seconds=1))
-
-    if datatype == '' or datatype is None:
-        level_and_dtype = level
-    else:
-        level_and_dtype = os.sep.join([level, datatype])
+    # look up the files in the catalog of the data directory; this only lists
+    # the directories that changed since the last time they were indexed
+    files_out = mms_catalog_files(data_dir, probe, instrument, data_rate, level, datatype, trange)
 
-    for date in days:
-        if data_rate == 'brst':
-            local_dir = os.sep.join([data_dir, 'mms'+probe, instrument, data_rate, level_and_dtype, date.strftime('%Y'), date.strftime('%m'), date.strftime('%d')])
-        else:
-            local_dir = os.sep.join([data_dir, 'mms'+probe, instrument, data_rate, level_and_dtype, date.strftime('%Y'), date.strftime('%m')])
+    for file in files_out:
+        if CONFIG['debug_mode']: logging.info('Found ' + file['full_name'])
 
-        if os.name == 'nt':
-            full_path = os.sep.join([re.escape(local_dir)+os.sep, file_name])
-        else:
-            full_path = os.sep.join([re.escape(local_dir), file_name])
-
-        # check for extra /'s in the path
-        if '//' in full_path:
-            full_path = full_path.replace('//', '/')
-
-        regex = re.compile(full_path)
-        for root, dirs, files in os.walk(data_dir):
-            for file in files:
-                this_file = os.sep.join([root, file])
-                if CONFIG['debug_mode']: logging.info('Checking ' + this_file)
-                if CONFIG['debug_mode']: logging.info('against: ' + full_path)
-                
-                matches = regex.match(this_file)
-                if matches:
-                    this_time = parse(matches.groups()[1])
-                    if this_time >= parse(parse(trange[0]).strftime('%Y-%m-%d')) and this_time <= parse(trange[1])-timedelta(seconds=1):
-                        if not any(this_file == f['full_name'] for f in files_out):
-                            files_out.append({'file_name': file, 'timetag': '', 'full_name': this_file, 'file_size': ''})
+    files_out = [{'file_name': f['file_name'], 'timetag': '', 'full_name': f['full_name'], 'file_size': ''} for f in files_out]
 
     files_in_interval = mms_files_in_interval(files_out, trange)
 
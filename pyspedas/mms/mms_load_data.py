@@ -9,8 +9,8 @@ from pytplot import time_clip as tclip
 from pyspedas import time_double, time_string
 from dateutil.parser import parse
 from datetime import timedelta, datetime
-from shutil import copyfileobj, copy
-from tempfile import NamedTemporaryFile
+from concurrent.futures import ThreadPoolExecutor
+from pyspedas.utilities.download import stream_to_file
 from .mms_config import CONFIG
 from .mms_get_local_files import mms_get_local_files
 from .mms_files_in_interval import mms_files_in_interval
@@ -22,11 +22,15 @@ from .mms_load_data_spdf import mms_load_data_spdf
 def mms_load_data(trange=['2015-10-16', '2015-10-17'], probe='1', data_rate='srvy', level='l2', 
     instrument='fgm', datatype='', varformat=None, exclude_format=None, prefix='', suffix='', get_support_data=False, time_clip=False,
     no_update=False, center_measurement=False, available=False, notplot=False, latest_version=False, 
-    major_version=False, min_version=None, cdf_version=None, spdf=False, always_prompt=False, varnames=[]):
+    major_version=False, min_version=None, cdf_version=None, spdf=False, always_prompt=False, varnames=[],
+    max_workers=None):
     """
     This function loads MMS data into pyTplot variables
 
     This function is not meant to be called directly. Please see the individual load routines for documentation and use.
+
+    The file_info queries and the downloads for the requested probes/data rates/levels/datatypes are
+    sent to the SDC in parallel, using up to max_workers connections (default: CONFIG['max_workers']).
     """
     if not isinstance(probe, list): probe = [probe]
     if not isinstance(data_rate, list): data_rate = [data_rate]
@@ -65,13 +69,22 @@ def mms_load_data(trange=['2015-10-16', '2015-10-17'], probe='1', data_rate='srv
         release_version = 'bleeding edge'
     headers['User-Agent'] = 'pySPEDAS ' + release_version
 
+    if max_workers is None:
+        max_workers = CONFIG['max_workers']
+    max_workers = max(int(max_workers), 1)
+
     user = None
     if not no_download:
         sdc_session, user = mms_login_lasp(always_prompt=always_prompt, headers=headers)
+        # keep enough connections open for the parallel queries and downloads
+        adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=max_workers)
+        sdc_session.mount('https://', adapter)
 
     out_files = []
     available_files = []
 
+    # build the list of file_info queries to send to the SDC
+    queries = []
     for prb in probe:
         for drate in data_rate:
             start_date = parse(trange[0]).strftime('%Y-%m-%d') # need to request full day, then parse out later
@@ -88,9 +101,6 @@ def mms_load_data(trange=['2015-10-16', '2015-10-17'], probe='1', data_rate='srv
 
             for lvl in level:
                 for dtype in datatype:
-
-                    file_found = False
-
                     if user is None:
                         url = 'https://lasp.colorado.edu/mms/sdc/public/files/api/v1/file_info/science?start_date=' + start_date + '&end_date=' + end_date + '&sc_id=mms' + prb + '&instrument_id=' + instrument + '&data_rate_mode=' + drate + '&data_level=' + lvl
                     else:
@@ -99,87 +109,86 @@ def mms_load_data(trange=['2015-10-16', '2015-10-17'], probe='1', data_rate='srv
                     if dtype != '':
                         url = url + '&descriptor=' + dtype
 
-                    if CONFIG['debug_mode']: logging.info('Fetching: ' + url)
-
-                    if not no_download:
-                        # query list of available files
-                        try:
-                            with warnings.catch_warnings():
-                                warnings.simplefilter("ignore", category=ResourceWarning)
-                                http_json = sdc_session.get(url, verify=True, headers=headers).json()
-
-                            if CONFIG['debug_mode']: logging.info('Filtering the results down to your trange')
-
-                            files_in_interval = mms_files_in_interval(http_json['files'], trange)
-
-                            if available:
-                                for file in files_in_interval:
-                                    logging.info(file['file_name'] + ' (' + str(np.round(file['file_size']/(1024.*1024), decimals=1)) + ' MB)')
-                                    available_files.append(file['file_name'])
-                                continue
-
-                            for file in files_in_interval:
-                                file_date = parse(file['timetag'])
-                                if dtype == '':
-                                    out_dir = os.sep.join([CONFIG['local_data_dir'], 'mms'+prb, instrument, drate, lvl, file_date.strftime('%Y'), file_date.strftime('%m')])
-                                else:
-                                    out_dir = os.sep.join([CONFIG['local_data_dir'], 'mms'+prb, instrument, drate, lvl, dtype, file_date.strftime('%Y'), file_date.strftime('%m')])
-
-                                if drate.lower() == 'brst':
-                                    out_dir = os.sep.join([out_dir, file_date.strftime('%d')])
-
-                                out_file = os.sep.join([out_dir, file['file_name']])
-
-                                if CONFIG['debug_mode']: logging.info('File: ' + file['file_name'] + ' / ' + file['timetag'])
-
-                                if os.path.exists(out_file) and str(os.stat(out_file).st_size) == str(file['file_size']):
-                                    if not download_only: logging.info('Loading ' + out_file)
-                                    out_files.append(out_file)
-                                    file_found = True
-                                    continue
-
-                                if user is None:
-                                    download_url = 'https://lasp.colorado.edu/mms/sdc/public/files/api/v1/download/science?file=' + file['file_name']
-                                else:
-                                    download_url = 'https://lasp.colorado.edu/mms/sdc/sitl/files/api/v1/download/science?file=' + file['file_name']
-
-                                logging.info('Downloading ' + file['file_name'] + ' to ' + out_dir)
-
-                                with warnings.catch_warnings():
-                                    warnings.simplefilter("ignore", category=ResourceWarning)
-                                    fsrc = sdc_session.get(download_url, stream=True, verify=True, headers=headers)
-                                ftmp = NamedTemporaryFile(delete=False)
-
-                                with open(ftmp.name, 'wb') as f:
-                                    copyfileobj(fsrc.raw, f)
-
-                                if not os.path.exists(out_dir):
-                                    os.makedirs(out_dir)
-
-                                # if the download was successful, copy to data directory
-                                copy(ftmp.name, out_file)
-                                out_files.append(out_file)
-                                file_found = True
-                                fsrc.close()
-                                ftmp.close()
-                                os.unlink(ftmp.name)  # delete the temporary file
-                        except requests.exceptions.ConnectionError:
-                            # No/bad internet connection; try loading the files locally
-                            logging.error('No internet connection!')
-
-                    if not file_found:
-                        added_local_files = False
-                        if not download_only:
-                            logging.info('Searching for local files...')
-                            out_files.extend(mms_get_local_files(prb, instrument, drate, lvl, dtype, trange))
-                            added_local_files = True
-
-                        if added_local_files and CONFIG['mirror_data_dir'] is not None:
-                            # check for network mirror; note: network mirrors are assumed to be read-only
-                            # and we always copy the files from the mirror to the local data directory
-                            # before trying to load into tplot variables 
-                            logging.info('No local files found; checking network mirror...')
-                            out_files.extend(mms_get_local_files(prb, instrument, drate, lvl, dtype, trange, mirror=True))
+                    queries.append({'probe': prb, 'data_rate': drate, 'level': lvl, 'datatype': dtype, 'url': url,
+                                    'files': [], 'file_found': False})
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        if not no_download:
+            # query the lists of available files; the queries are sent in parallel,
+            # but the results are processed in the original order
+            file_lists = executor.map(lambda query: _mms_query_files(sdc_session, query['url'], headers, trange), queries)
+
+            for query, files_in_interval in zip(queries, file_lists):
+                prb, drate, lvl, dtype = query['probe'], query['data_rate'], query['level'], query['datatype']
+
+                if files_in_interval is None:
+                    # No/bad internet connection; try loading the files locally
+                    continue
+
+                if available:
+                    for file in files_in_interval:
+                        logging.info(file['file_name'] + ' (' + str(np.round(file['file_size']/(1024.*1024), decimals=1)) + ' MB)')
+                        available_files.append(file['file_name'])
+                    query['file_found'] = None
+                    continue
+
+                for file in files_in_interval:
+                    file_date = parse(file['timetag'])
+                    if dtype == '':
+                        out_dir = os.sep.join([CONFIG['local_data_dir'], 'mms'+prb, instrument, drate, lvl, file_date.strftime('%Y'), file_date.strftime('%m')])
+                    else:
+                        out_dir = os.sep.join([CONFIG['local_data_dir'], 'mms'+prb, instrument, drate, lvl, dtype, file_date.strftime('%Y'), file_date.strftime('%m')])
+
+                    if drate.lower() == 'brst':
+                        out_dir = os.sep.join([out_dir, file_date.strftime('%d')])
+
+                    out_file = os.sep.join([out_dir, file['file_name']])
+
+                    if CONFIG['debug_mode']: logging.info('File: ' + file['file_name'] + ' / ' + file['timetag'])
+
+                    if os.path.exists(out_file) and str(os.stat(out_file).st_size) == str(file['file_size']):
+                        if not download_only: logging.info('Loading ' + out_file)
+                        query['files'].append((out_file, None))
+                        continue
+
+                    if user is None:
+                        download_url = 'https://lasp.colorado.edu/mms/sdc/public/files/api/v1/download/science?file=' + file['file_name']
+                    else:
+                        download_url = 'https://lasp.colorado.edu/mms/sdc/sitl/files/api/v1/download/science?file=' + file['file_name']
+
+                    query['files'].append((out_file, executor.submit(_mms_download_file, sdc_session, download_url, out_file,
+                                                                     file['file_size'], headers)))
+
+        for query in queries:
+            if query['file_found'] is None:
+                # only listing the available files
+                continue
+
+            for out_file, download in query['files']:
+                if download is not None:
+                    try:
+                        if not download.result():
+                            continue
+                    except requests.exceptions.ConnectionError:
+                        logging.error('No internet connection!')
+                        continue
+                out_files.append(out_file)
+                query['file_found'] = True
+
+            if not query['file_found']:
+                prb, drate, lvl, dtype = query['probe'], query['data_rate'], query['level'], query['datatype']
+                added_local_files = False
+                if not download_only:
+                    logging.info('Searching for local files...')
+                    out_files.extend(mms_get_local_files(prb, instrument, drate, lvl, dtype, trange))
+                    added_local_files = True
+
+                if added_local_files and CONFIG['mirror_data_dir'] is not None:
+                    # check for network mirror; note: network mirrors are assumed to be read-only
+                    # and we always copy the files from the mirror to the local data directory
+                    # before trying to load into tplot variables 
+                    logging.info('No local files found; checking network mirror...')
+                    out_files.extend(mms_get_local_files(prb, instrument, drate, lvl, dtype, trange, mirror=True))
 
     if not no_download:
         sdc_session.close()
@@ -211,3 +220,41 @@ def mms_load_data(trange=['2015-10-16', '2015-10-17'], probe='1', data_rate='srv
         return new_variables
     else:
         return out_files
+
+
+def _mms_query_files(sdc_session, url, headers, trange):
+    """
+    Query the SDC for the files available for one probe/rate/level/datatype and filter the
+    results down to the requested time range; returns None if the SDC can't be reached
+    """
+    if CONFIG['debug_mode']: logging.info('Fetching: ' + url)
+
+    try:
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", category=ResourceWarning)
+            http_json = sdc_session.get(url, verify=True, headers=headers).json()
+    except requests.exceptions.ConnectionError:
+        logging.error('No internet connection!')
+        return None
+
+    if CONFIG['debug_mode']: logging.info('Filtering the results down to your trange')
+
+    return mms_files_in_interval(http_json['files'], trange)
+
+
+def _mms_download_file(sdc_session, download_url, out_file, file_size, headers):
+    """
+    Download a single file from the SDC; returns True if the file was saved
+    """
+    logging.info('Downloading ' + os.path.basename(out_file) + ' to ' + os.path.dirname(out_file))
+
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", category=ResourceWarning)
+        fsrc = sdc_session.get(download_url, stream=True, verify=True, headers=headers)
+
+    # stream directly into the data directory; the file only appears
+    # at out_file once it's complete
+    try:
+        return stream_to_file(fsrc, out_file, expected_size=file_size)
+    finally:
+        fsrc.close()
@@ -0,0 +1,94 @@
+"""
+Binning kernels shared by the EIS and FEEPS pitch angle distribution routines
+"""
+import numpy as np
+
+
+def mms_pad_bin_nanmean(pitch_angles, flux, pa_label, delta_pa, halfang_width):
+    """
+    Average the flux of the telescopes/sensors that look into each pitch angle bin,
+    for all times (and energies) at once
+
+    A telescope contributes to a bin when its pitch angle, widened by the angular
+    response of the instrument, overlaps the bin:
+
+        pa + halfang_width >= pa_label - delta_pa  and  pa - halfang_width < pa_label + delta_pa
+
+    so each telescope can contribute to more than one bin.
+
+    Parameters
+    -----------
+        pitch_angles: ndarray
+            Pitch angles of the telescopes (time x telescope); NaNs are excluded
+
+        flux: ndarray
+            Flux of the telescopes (time x telescope, or time x telescope x energy)
+
+        pa_label: list or ndarray
+            Centers of the pitch angle bins
+
+        delta_pa: float
+            Half-width of the pitch angle bins
+
+        halfang_width: float
+            Half-width of the angular response of the telescopes
+
+    Returns
+    --------
+        NaN-mean of the flux in each bin (time x bin, or time x bin x energy);
+        NaN where no telescope with valid flux is in the bin
+    """
+    pitch_angles = np.asarray(pitch_angles, dtype=np.float64)
+    flux = np.asarray(flux, dtype=np.float64)
+    pa_label = np.asarray(pa_label, dtype=np.float64)
+
+    squeeze = flux.ndim == 2
+    if squeeze:
+        flux = flux[:, :, np.newaxis]
+
+    # telescopes in each bin (time x telescope x bin)
+    with np.errstate(invalid='ignore'):
+        in_bin = ((pitch_angles[:, :, np.newaxis] + halfang_width >= pa_label - delta_pa)
+                  & (pitch_angles[:, :, np.newaxis] - halfang_width < pa_label + delta_pa)).astype(np.float64)
+
+    valid = ~np.isnan(flux)
+    sums = np.einsum('tsb,tse->tbe', in_bin, np.where(valid, flux, 0.0))
+    counts = np.einsum('tsb,tse->tbe', in_bin, valid.astype(np.float64))
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        pa_flux = np.where(counts > 0, sums/counts, np.nan)
+
+    return pa_flux[:, :, 0] if squeeze else pa_flux
+
+
+def mms_spin_nanmean(data, spins):
+    """
+    Average data over the samples that have the same spin number
+
+    Parameters
+    -----------
+        data: ndarray
+            Data to average (time x ...)
+
+        spins: ndarray
+            Spin number (or any other group label) of each time
+
+    Returns
+    --------
+        Tuple containing the unique spin numbers (sorted), and the NaN-mean of
+        the data for each of them (spin x ...)
+    """
+    data = np.asarray(data, dtype=np.float64)
+    unique_spins, inverse = np.unique(np.asarray(spins), return_inverse=True)
+    inverse = inverse.reshape(-1)
+
+    valid = ~np.isnan(data)
+    sums = np.zeros((len(unique_spins),) + data.shape[1:])
+    counts = np.zeros((len(unique_spins),) + data.shape[1:])
+    np.add.at(sums, inverse, np.where(valid, data, 0.0))
+    np.add.at(counts, inverse, valid)
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        means = np.where(counts > 0, sums/counts, np.nan)
+
+    return unique_spins, means
@@ -1,6 +1,5 @@
-import datetime
 import numpy as np
-from pyspedas.utilities.leap_seconds import load_leap_table
+from pyspedas.utilities.leap_seconds import tai2unix
 
 
 def mms_tai2unix(values):
@@ -19,19 +18,4 @@ def mms_tai2unix(values):
         Array of time values as unix times
 
     """
-    if not isinstance(values, list) and not isinstance(values, np.ndarray):
-        values = [values]
-    table = load_leap_table()
-    tai_minus_unix = 378691200.0
-    juls = np.array(table['juls'])
-    values_juls = np.array(values)/86400.0 + datetime.date(1958, 1, 1).toordinal() + 1721424.5
-    out = np.zeros(len(values))
-    for idx, value in enumerate(values_juls):
-        loc_greater = np.argwhere(value > juls).flatten()
-        if len(loc_greater) == 0:
-            continue
-        last_loc = loc_greater[len(loc_greater)-1]
-        current_leap = float(table['leaps'][last_loc])
-        tinput_1970 = values[idx] - tai_minus_unix
-        out[idx] = tinput_1970 - current_leap
-    return out
+    return tai2unix(np.atleast_1d(np.asarray(values, dtype=np.float64)))
@@ -29,7 +29,10 @@ def mms_part_getspec(instrument='fpi',
                      disable_photoelectron_corrections=False,
                      zero_negative_values=False,
                      regrid=[32, 16],
-                     no_regrid=False):
+                     no_regrid=False,
+                     batch_size=None,
+                     nprocs=None,
+                     executor=None):
     """
     Generate spectra and moments from 3D MMS particle data
 
@@ -112,6 +115,18 @@ def mms_part_getspec(instrument='fpi',
         zero_negative_values: bool
             Turn negative values to 0 after doing the photoelectron corrections (DES)
 
+        batch_size: int
+            Number of FPI time samples to process at once with the vectorized
+            routines; default is to process one sample at a time
+
+        nprocs: int
+            Number of worker processes to split the time samples across;
+            default is to process the data in this process
+
+        executor: concurrent.futures.Executor
+            Existing executor (e.g., a ProcessPoolExecutor) to process the time
+            samples on, instead of creating a new process pool
+
     Returns
     ----------
         Creates tplot variables containing spectrograms and moments
@@ -204,7 +219,8 @@ def mms_part_getspec(instrument='fpi',
                           correct_photoelectrons=correct_photoelectrons, zero_negative_values=zero_negative_values,
                           internal_photoelectron_corrections=internal_photoelectron_corrections,
                           disable_photoelectron_corrections=disable_photoelectron_corrections, regrid=regrid,
-                          no_regrid=no_regrid)
+                          no_regrid=no_regrid, batch_size=batch_size,
+                          nprocs=nprocs, executor=executor)
         
         if new_vars is None:
             continue
@@ -1,5 +1,6 @@
 import logging
 import numpy as np
+from types import SimpleNamespace
 
 from pytplot import get_data
 
@@ -7,9 +8,10 @@ from pyspedas.utilities.interpol import interpol
 from pyspedas.particles.spd_part_products.spd_pgs_make_tplot import spd_pgs_make_tplot
 from pyspedas.particles.spd_part_products.spd_pgs_limit_range import spd_pgs_limit_range
 from pyspedas.particles.spd_part_products.spd_pgs_progress_update import spd_pgs_progress_update
-from pyspedas.particles.spd_part_products.spd_pgs_do_fac import spd_pgs_do_fac
+from pyspedas.particles.spd_part_products.spd_pgs_parallel import spd_pgs_parallel
+from pyspedas.particles.spd_part_products.spd_pgs_do_fac import spd_pgs_do_fac, spd_pgs_do_fac_batch
 from pyspedas.particles.spd_part_products.spd_pgs_regrid import spd_pgs_regrid
-from pyspedas.particles.moments.spd_pgs_moments import spd_pgs_moments
+from pyspedas.particles.moments.spd_pgs_moments import spd_pgs_moments, spd_pgs_moments_batch
 from pyspedas.particles.moments.spd_pgs_moments_tplot import spd_pgs_moments_tplot
 
 from pyspedas.mms.fpi.mms_get_fpi_dist import mms_get_fpi_dist
@@ -23,6 +25,8 @@ from pyspedas.mms.particles.mms_pgs_make_e_spec import mms_pgs_make_e_spec
 from pyspedas.mms.particles.mms_pgs_make_phi_spec import mms_pgs_make_phi_spec
 from pyspedas.mms.particles.mms_pgs_make_theta_spec import mms_pgs_make_theta_spec
 from pyspedas.mms.particles.mms_part_des_photoelectrons import mms_part_des_photoelectrons
+from pyspedas.mms.particles.mms_pgs_batch import mms_pgs_get_fpi_block, mms_pgs_clean_data_batch, \
+    mms_pgs_make_e_spec_batch, mms_pgs_make_theta_spec_batch, mms_pgs_make_phi_spec_batch, mms_pgs_regrid_batch
 
 logging.captureWarnings(True)
 logging.basicConfig(format='%(asctime)s: %(message)s', datefmt='%d-%b-%y %H:%M:%S', level=logging.INFO)
@@ -50,7 +54,10 @@ def mms_part_products(in_tvarname,
                       disable_photoelectron_corrections=False,
                       no_regrid=False,
                       regrid=[32, 16],
-                      vel_name=None):
+                      vel_name=None,
+                      batch_size=None,
+                      nprocs=None,
+                      executor=None):
     """
     Generate spectra and moments from 3D MMS particle data; note: this routine isn't
     meant to be called directly - see the wrapper mms_part_getspec instead.
@@ -135,6 +142,23 @@ def mms_part_products(in_tvarname,
 
         zero_negative_values: bool
             Turn negative values to 0 after doing the photoelectron corrections (DES)
+
+        batch_size: int
+            Number of time samples to process at once; when set, the FPI distributions
+            are processed in blocks of this many samples using vectorized routines,
+            instead of one sample at a time. The results are the same; larger blocks
+            are faster, but use more memory. HPCA data are always processed one
+            sample at a time
+
+        nprocs: int
+            Number of worker processes; when set, the time axis is split into
+            chunks that are processed in parallel on a pool of processes. The
+            distribution data and support arrays (FAC matrices, spacecraft potential)
+            are placed in shared memory, rather than copied to each worker
+
+        executor: concurrent.futures.Executor
+            Existing executor (e.g., a ProcessPoolExecutor) to process the chunks
+            with, instead of creating a new process pool
             
     Returns
     ----------
@@ -155,8 +179,13 @@ def mms_part_products(in_tvarname,
     if isinstance(output, str):
         output = output.split(' ')
 
+    if batch_size is not None and batch_size > 0 and instrument != 'fpi':
+        logging.info('Batch processing is only supported for FPI data; processing one sample at a time.')
+        batch_size = None
+
     if instrument == 'fpi':
-        dist_in = mms_get_fpi_dist(in_tvarname, species=species, probe=probe, data_rate=data_rate)
+        # only the metadata are needed here; the distributions are extracted in the time loop
+        dist_in = mms_get_fpi_dist(in_tvarname, index=0, species=species, probe=probe, data_rate=data_rate)
     elif instrument == 'hpca':
         dist_in = mms_get_hpca_dist(in_tvarname, species=species, probe=probe, data_rate=data_rate)
     else:
@@ -168,8 +197,10 @@ def mms_part_products(in_tvarname,
     else:
         data_times = data_in.times
 
-    # ntimes = len(data_times)
-    ntimes = len(dist_in)
+    if instrument == 'fpi':
+        ntimes = len(data_times)
+    else:
+        ntimes = len(dist_in)
 
     # create rotation matrix to field aligned coordinates if needed
     fac_outputs = ['pa', 'gyro', 'fac_energy', 'fac_moments']
@@ -181,31 +212,8 @@ def mms_part_products(in_tvarname,
             # problem creating the FAC matrices
             fac_requested = False
 
-    out_energy = np.zeros((ntimes, dist_in[0]['n_energy']))
-    out_energy_y = np.zeros((ntimes, dist_in[0]['n_energy']))
-    out_theta = np.zeros((ntimes, dist_in[0]['n_theta']))
-    out_phi = np.zeros((ntimes, dist_in[0]['n_phi']))
-    out_theta_y = np.zeros((ntimes, dist_in[0]['n_theta']))
-    out_phi_y = np.zeros((ntimes, dist_in[0]['n_phi']))
-    if fac_requested:
-        out_pad = np.zeros((ntimes, dist_in[0]['n_theta']))
-        out_pad_y = np.zeros((ntimes, dist_in[0]['n_theta']))
-        out_gyro = np.zeros((ntimes, dist_in[0]['n_phi']))
-        out_gyro_y = np.zeros((ntimes, dist_in[0]['n_phi']))
-
-    # moments
-    if 'moments' in output:
-        out_density = np.zeros(ntimes)
-        out_avgtemp = np.zeros(ntimes)
-        out_vthermal = np.zeros(ntimes)
-        out_flux = np.zeros([ntimes, 3])
-        out_velocity = np.zeros([ntimes, 3])
-        out_mftens = np.zeros([ntimes, 6])
-        out_ptens = np.zeros([ntimes, 6])
-        #out_ttens = np.zeros([dist_in['n_times'], 3, 3])
-
     out_vars = []
-    last_update_time = None
+    scpot_data = None
 
     if 'moments' in output or correct_photoelectrons or internal_photoelectron_corrections:
         support_data = mms_pgs_clean_support(data_times, mag_name=mag_name, vel_name=vel_name, sc_pot_name=sc_pot_name)
@@ -246,145 +254,364 @@ are the scientific products that should be used for analysis."""
 
         startdelphi = get_data('mms'+probe+'_des_startdelphi_count_'+data_rate)
 
-    for i in range(0, ntimes):
-        last_update_time = spd_pgs_progress_update(last_update_time=last_update_time, current_sample=i, total_samples=ntimes, type_string=in_tvarname)
+    # metadata (species, mass, number of bins, etc.) from the first distribution
+    dist_meta = {key: value for key, value in dist_in[0].items() if not isinstance(value, np.ndarray)}
+
+    state = {'in_tvarname': in_tvarname,
+             'instrument': instrument,
+             'species': species,
+             'probe': probe,
+             'data_rate': data_rate,
+             'units': units,
+             'output': output,
+             'energy': energy,
+             'phi': phi,
+             'theta': theta,
+             'pitch': pitch,
+             'gyro': gyro,
+             'fac_requested': fac_requested,
+             'no_regrid': no_regrid,
+             'regrid': regrid,
+             'photoelectron_corrections': correct_photoelectrons or internal_photoelectron_corrections,
+             'zero_negative_values': zero_negative_values,
+             'batch_size': batch_size,
+             'dist_meta': dist_meta,
+             'show_progress': True}
+
+    # large inputs are shared with the worker processes, instead of sent with each chunk
+    arrays = {}
+    if fac_requested:
+        arrays['fac_matrix'] = fac_matrix
+    if scpot_data is not None:
+        arrays['scpot_data'] = scpot_data
+    if correct_photoelectrons or internal_photoelectron_corrections:
+        arrays['startdelphi'] = startdelphi.y
+        if data_rate == 'brst':
+            arrays['parity'] = parity.y
+        for key, model in fpi_photoelectrons.items():
+            arrays['photoelectrons_y_'+key] = model.y
+            if hasattr(model, 'v'):
+                arrays['photoelectrons_v_'+key] = model.v
+
+    if nprocs is not None or executor is not None:
+        state['show_progress'] = False
+        tvars = [in_tvarname]
+        if instrument == 'hpca':
+            tvars.append('mms' + probe + '_hpca_azimuth_angles_per_ev_degrees')
+        out = spd_pgs_parallel(_mms_part_products_samples, ntimes, state, arrays=arrays, tvars=tvars,
+                               nprocs=nprocs, executor=executor, type_string=in_tvarname)
+    else:
+        out = _mms_part_products_samples(state, arrays, 0, ntimes)
 
-        if instrument == 'fpi':
-            dists = mms_get_fpi_dist(in_tvarname, index=i, species=species, probe=probe, data_rate=data_rate)
-        elif instrument == 'hpca':
-            dists = mms_get_hpca_dist(in_tvarname, index=i, species=species, probe=probe, data_rate=data_rate)
+    if 'moments' in output:
+        # put all of the moments arrays into a hash table prior to passing to the tplot routine
+        moments = {'density': out['density'], 
+              'flux': out['flux'], 
+              'mftens': out['mftens'], 
+              'velocity': out['velocity'], 
+              'ptens': out['ptens'],
+              'vthermal': out['vthermal'],
+              'avgtemp': out['avgtemp']}
+        moments_vars = spd_pgs_moments_tplot(moments, x=data_times, prefix=in_tvarname)
+        out_vars.extend(moments_vars)
 
-        if isinstance(dists, list):
-            dist_in = dists[0]
-        else:
-            dist_in = dists
+    if 'energy' in output:
+        spd_pgs_make_tplot(in_tvarname+'_energy', x=data_times, y=out['energy_y'], z=out['energy'], units=units, ylog=True, ytitle=dist_meta['data_name'], ysubtitle='energy (eV)')
+        out_vars.append(in_tvarname+'_energy')
 
-        # apply the DES photoelectron corrections
-        if correct_photoelectrons or internal_photoelectron_corrections:
-            # From Dan Gershman's release notes on the FPI photoelectron model:
-            # Find the index I in the startdelphi_counts_brst or startdelphi_counts_fast array
-            # [360 possibilities] whose corresponding value is closest to th = e measured
-            # startdelphi_count_brst or startdelphi_count_fast for the skymap of interest. The
-            # closest index can be approximated by I = floor(startdelphi_count_brst/16) or I =
-            # floor(startdelphi_count_fast/16)
-            startdelphi_I = int(np.floor(startdelphi.y[i]/16.0))
+    if 'theta' in output:
+        spd_pgs_make_tplot(in_tvarname+'_theta', x=data_times, y=out['theta_y'], z=out['theta'], units=units, ytitle=dist_meta['data_name'], ysubtitle='theta (deg)')
+        out_vars.append(in_tvarname+'_theta')
 
-            if data_rate == 'brst':
-                parity_num = str(int(np.fix(parity.y[i])))
+    if 'phi' in output:
+        spd_pgs_make_tplot(in_tvarname+'_phi', x=data_times, y=out['phi_y'], z=out['phi'], units=units, ytitle=dist_meta['data_name'], ysubtitle='phi (deg)')
+        out_vars.append(in_tvarname+'_phi')
 
-                bg_dist = fpi_photoelectrons['bgdist_p'+parity_num]
-                n_value = fpi_photoelectrons['n_'+parity_num]
+    if 'pa' in output:
+        spd_pgs_make_tplot(in_tvarname+'_pa', x=data_times, y=out['pad_y'], z=out['pad'], units=units, ytitle=dist_meta['data_name'], ysubtitle='PA (deg)')
+        out_vars.append(in_tvarname+'_pa')
 
-                fphoto = bg_dist.y[startdelphi_I, :, :, :]
+    if 'gyro' in output:
+        spd_pgs_make_tplot(in_tvarname+'_gyro', x=data_times, y=out['gyro_y'], z=out['gyro'], units=units, ytitle=dist_meta['data_name'], ysubtitle='gyro (deg)')
+        out_vars.append(in_tvarname+'_gyro')
 
-                # need to interpolate using SC potential data to get Nphoto value
-                nphoto_scpot_dependent = n_value.y[startdelphi_I, :]
-                nphoto = interpol(nphoto_scpot_dependent, n_value.v, scpot_data[i])
-            else:
-                fphoto = fpi_photoelectrons['bg_dist'].y[startdelphi_I, :, :, :]
+    return out_vars
 
-                # need to interpolate using SC potential data to get Nphoto value
-                nphoto_scpot_dependent = fpi_photoelectrons['n'].y[startdelphi_I, :]
-                nphoto = interpol(nphoto_scpot_dependent, fpi_photoelectrons['n'].v, scpot_data[i])
 
-            # now, the corrected distribution function is simply f_corrected = f-fphoto*nphoto
-            # note: transpose is to shuffle fphoto*nphoto to energy-azimuth-elevation, to match dist.data
-            correction = fphoto*nphoto
-            corrected_df = dist_in['data']-correction.transpose([2, 0, 1])
+def _mms_part_products_samples(state, arrays, start, stop):
+    """
+    Processes the time samples start:stop for mms_part_products; this is called
+    for the full time range, or for chunks of it on worker processes (see spd_pgs_parallel)
 
-            if zero_negative_values:
-                corrected_df[corrected_df < 0] = 0.0
+    Returns:
+        Dictionary containing the spectra and moments for these time samples
+    """
+    in_tvarname = state['in_tvarname']
+    instrument = state['instrument']
+    species = state['species']
+    probe = state['probe']
+    data_rate = state['data_rate']
+    units = state['units']
+    output = state['output']
+    energy = state['energy']
+    phi = state['phi']
+    theta = state['theta']
+    pitch = state['pitch']
+    gyro = state['gyro']
+    fac_requested = state['fac_requested']
+    no_regrid = state['no_regrid']
+    regrid = state['regrid']
+    photoelectron_corrections = state['photoelectron_corrections']
+    zero_negative_values = state['zero_negative_values']
+    batch_size = state['batch_size']
+    dist_meta = state['dist_meta']
+    show_progress = state['show_progress']
+
+    fac_matrix = arrays.get('fac_matrix')
+    scpot_data = arrays.get('scpot_data')
+    startdelphi = arrays.get('startdelphi')
+    parity = arrays.get('parity')
+
+    # photoelectron model, as returned by mms_part_des_photoelectrons
+    fpi_photoelectrons = {}
+    for key in arrays.keys():
+        if key.startswith('photoelectrons_y_'):
+            model = key[len('photoelectrons_y_'):]
+            fpi_photoelectrons[model] = SimpleNamespace(y=arrays[key], v=arrays.get('photoelectrons_v_'+model))
+
+    ntimes = stop-start
+
+    out_energy = np.zeros((ntimes, dist_meta['n_energy']))
+    out_energy_y = np.zeros((ntimes, dist_meta['n_energy']))
+    out_theta = np.zeros((ntimes, dist_meta['n_theta']))
+    out_phi = np.zeros((ntimes, dist_meta['n_phi']))
+    out_theta_y = np.zeros((ntimes, dist_meta['n_theta']))
+    out_phi_y = np.zeros((ntimes, dist_meta['n_phi']))
+    if fac_requested:
+        out_pad = np.zeros((ntimes, dist_meta['n_theta']))
+        out_pad_y = np.zeros((ntimes, dist_meta['n_theta']))
+        out_gyro = np.zeros((ntimes, dist_meta['n_phi']))
+        out_gyro_y = np.zeros((ntimes, dist_meta['n_phi']))
 
-            dist_in['data'] = corrected_df
+    # moments
+    if 'moments' in output:
+        out_density = np.zeros(ntimes)
+        out_avgtemp = np.zeros(ntimes)
+        out_vthermal = np.zeros(ntimes)
+        out_flux = np.zeros([ntimes, 3])
+        out_velocity = np.zeros([ntimes, 3])
+        out_mftens = np.zeros([ntimes, 6])
+        out_ptens = np.zeros([ntimes, 6])
+        #out_ttens = np.zeros([dist_in['n_times'], 3, 3])
 
-        data = mms_convert_flux_units(dist_in, units=units)
+    last_update_time = None
 
-        clean_data = mms_pgs_clean_data(data)
+    if batch_size:
+        data_in = get_data(in_tvarname)
 
-        # split hpca angle bins to be equal width in phi/theta
-        # this is needed when skipping the regrid step
-        if instrument == 'hpca':
-            clean_data = mms_pgs_split_hpca(clean_data)
+        for block_start in range(start, stop, batch_size):
+            if show_progress:
+                last_update_time = spd_pgs_progress_update(last_update_time=last_update_time, current_sample=block_start, total_samples=stop, type_string=in_tvarname)
+
+            block_stop = min(block_start+batch_size, stop)
+            dist_block = mms_pgs_get_fpi_block(data_in, block_start, block_stop, dist_meta)
+
+            # apply the DES photoelectron corrections; see the comments in the loop below
+            if photoelectron_corrections:
+                startdelphi_I = np.floor(startdelphi[block_start:block_stop]/16.0).astype(int)
+                correction = np.zeros(dist_block['data'].shape)
+
+                for block_idx, i in enumerate(range(block_start, block_stop)):
+                    if data_rate == 'brst':
+                        parity_num = str(int(np.fix(parity[i])))
+                        bg_dist = fpi_photoelectrons['bgdist_p'+parity_num]
+                        n_value = fpi_photoelectrons['n_'+parity_num]
+                    else:
+                        bg_dist = fpi_photoelectrons['bg_dist']
+                        n_value = fpi_photoelectrons['n']
+
+                    fphoto = bg_dist.y[startdelphi_I[block_idx], :, :, :]
+                    nphoto = interpol(n_value.y[startdelphi_I[block_idx], :], n_value.v, scpot_data[i])
+                    correction[block_idx] = (fphoto*nphoto).transpose([2, 0, 1])
+
+                corrected_df = dist_block['data']-correction
+
+                if zero_negative_values:
+                    corrected_df[corrected_df < 0] = 0.0
+
+                dist_block['data'] = corrected_df
+
+            data = mms_convert_flux_units(dist_block, units=units)
+
+            clean_data = mms_pgs_clean_data_batch(data)
+
+            # Apply phi, theta, & energy limits
+            if energy is not None or theta is not None or phi is not None:
+                clean_data = spd_pgs_limit_range(clean_data, energy=energy, theta=theta, phi=phi)
+
+            # Build energy spectrogram
+            if 'energy' in output:
+                out_energy_y[block_start-start:block_stop-start, :], out_energy[block_start-start:block_stop-start, :] = mms_pgs_make_e_spec_batch(clean_data)
 
-        # Apply phi, theta, & energy limits
-        if energy is not None or theta is not None or phi is not None:
-            clean_data = spd_pgs_limit_range(clean_data, energy=energy, theta=theta, phi=phi)
+            # Build theta spectrogram
+            if 'theta' in output:
+                out_theta_y[block_start-start:block_stop-start, :], out_theta[block_start-start:block_stop-start, :] = mms_pgs_make_theta_spec_batch(clean_data, resolution=dist_meta['n_theta'])
 
-        # Build energy spectrogram
-        if 'energy' in output:
-            out_energy_y[i, :], out_energy[i, :] = mms_pgs_make_e_spec(clean_data)
+            # Build phi spectrogram
+            if 'phi' in output:
+                out_phi_y[block_start-start:block_stop-start, :], out_phi[block_start-start:block_stop-start, :] = mms_pgs_make_phi_spec_batch(clean_data, resolution=dist_meta['n_phi'])
 
-        # Build theta spectrogram
-        if 'theta' in output:
-            out_theta_y[i, :], out_theta[i, :] = mms_pgs_make_theta_spec(clean_data, resolution=dist_in['n_theta'])
+            # Calculate the moments
+            if 'moments' in output:
+                if scpot_data is not None:
+                    scpot_val = scpot_data[block_start:block_stop]
+                else:
+                    scpot_val = 0.0
 
-        # Build phi spectrogram
-        if 'phi' in output:
-            out_phi_y[i, :], out_phi[i, :] = mms_pgs_make_phi_spec(clean_data, resolution=dist_in['n_phi'])
+                moments = spd_pgs_moments_batch(clean_data, sc_pot=scpot_val)
+                out_density[block_start-start:block_stop-start] = moments['density']
+                out_avgtemp[block_start-start:block_stop-start] = moments['avgtemp']
+                out_vthermal[block_start-start:block_stop-start] = moments['vthermal']
+                out_flux[block_start-start:block_stop-start, :] = moments['flux']
+                out_velocity[block_start-start:block_stop-start, :] = moments['velocity']
+                out_mftens[block_start-start:block_stop-start, :] = moments['mftens']
+                out_ptens[block_start-start:block_stop-start, :] = moments['ptens']
 
-        # Calculate the moments
-        if 'moments' in output:
-            if scpot_data is not None:
-                scpot_val = scpot_data[i]
+            # Perform transformation to FAC, regrid data, and apply limits in new coords
+            if fac_requested:
+                fac_data = spd_pgs_do_fac_batch(clean_data, fac_matrix[block_start:block_stop, :, :])
+
+                if no_regrid == False:
+                    fac_data = mms_pgs_regrid_batch(fac_data, regrid)
+
+                fac_data['theta'] = 90.0-fac_data['theta']
+                fac_data = spd_pgs_limit_range(fac_data, theta=pitch, phi=gyro)
+
+            if 'pa' in output:
+                out_pad_y[block_start-start:block_stop-start, :], out_pad[block_start-start:block_stop-start, :] = mms_pgs_make_theta_spec_batch(fac_data, colatitude=True, resolution=dist_meta['n_theta'])
+
+            if 'gyro' in output:
+                out_gyro_y[block_start-start:block_stop-start, :], out_gyro[block_start-start:block_stop-start, :] = mms_pgs_make_phi_spec_batch(fac_data, resolution=dist_meta['n_phi'])
+
+    else:
+        for i in range(start, stop):
+            if show_progress:
+                last_update_time = spd_pgs_progress_update(last_update_time=last_update_time, current_sample=i, total_samples=stop, type_string=in_tvarname)
+
+            if instrument == 'fpi':
+                dists = mms_get_fpi_dist(in_tvarname, index=i, species=species, probe=probe, data_rate=data_rate)
+            elif instrument == 'hpca':
+                dists = mms_get_hpca_dist(in_tvarname, index=i, species=species, probe=probe, data_rate=data_rate)
+
+            if isinstance(dists, list):
+                dist_in = dists[0]
             else:
-                scpot_val = 0.0
+                dist_in = dists
 
-            moments = spd_pgs_moments(clean_data, sc_pot=scpot_val)
-            out_density[i] = moments['density']
-            out_avgtemp[i] = moments['avgtemp']
-            out_vthermal[i] = moments['vthermal']
-            out_flux[i, :] = moments['flux']
-            out_velocity[i, :] = moments['velocity']
-            out_mftens[i, :] = moments['mftens']
-            out_ptens[i, :] = moments['ptens']
+            # apply the DES photoelectron corrections
+            if photoelectron_corrections:
+                # From Dan Gershman's release notes on the FPI photoelectron model:
+                # Find the index I in the startdelphi_counts_brst or startdelphi_counts_fast array
+                # [360 possibilities] whose corresponding value is closest to th = e measured
+                # startdelphi_count_brst or startdelphi_count_fast for the skymap of interest. The
+                # closest index can be approximated by I = floor(startdelphi_count_brst/16) or I =
+                # floor(startdelphi_count_fast/16)
+                startdelphi_I = int(np.floor(startdelphi[i]/16.0))
 
-        # Perform transformation to FAC, regrid data, and apply limits in new coords
-        if fac_requested:
-            fac_data = spd_pgs_do_fac(clean_data, fac_matrix[i, :, :])
+                if data_rate == 'brst':
+                    parity_num = str(int(np.fix(parity[i])))
 
-            if no_regrid == False:
-                fac_data = spd_pgs_regrid(fac_data, regrid)
+                    bg_dist = fpi_photoelectrons['bgdist_p'+parity_num]
+                    n_value = fpi_photoelectrons['n_'+parity_num]
 
-            fac_data['theta'] = 90.0-fac_data['theta']
-            fac_data = spd_pgs_limit_range(fac_data, theta=pitch, phi=gyro)
+                    fphoto = bg_dist.y[startdelphi_I, :, :, :]
 
-        if 'pa' in output:
-            out_pad_y[i, :], out_pad[i, :] = mms_pgs_make_theta_spec(fac_data, colatitude=True, resolution=dist_in['n_theta'])
+                    # need to interpolate using SC potential data to get Nphoto value
+                    nphoto_scpot_dependent = n_value.y[startdelphi_I, :]
+                    nphoto = interpol(nphoto_scpot_dependent, n_value.v, scpot_data[i])
+                else:
+                    fphoto = fpi_photoelectrons['bg_dist'].y[startdelphi_I, :, :, :]
 
-        if 'gyro' in output:
-            out_gyro_y[i, :], out_gyro[i, :] = mms_pgs_make_phi_spec(fac_data, resolution=dist_in['n_phi'])
+                    # need to interpolate using SC potential data to get Nphoto value
+                    nphoto_scpot_dependent = fpi_photoelectrons['n'].y[startdelphi_I, :]
+                    nphoto = interpol(nphoto_scpot_dependent, fpi_photoelectrons['n'].v, scpot_data[i])
 
+                # now, the corrected distribution function is simply f_corrected = f-fphoto*nphoto
+                # note: transpose is to shuffle fphoto*nphoto to energy-azimuth-elevation, to match dist.data
+                correction = fphoto*nphoto
+                corrected_df = dist_in['data']-correction.transpose([2, 0, 1])
 
-    if 'moments' in output:
-        # put all of the moments arrays into a hash table prior to passing to the tplot routine
-        moments = {'density': out_density, 
-              'flux': out_flux, 
-              'mftens': out_mftens, 
-              'velocity': out_velocity, 
-              'ptens': out_ptens,
-              'vthermal': out_vthermal,
-              'avgtemp': out_avgtemp}
-        moments_vars = spd_pgs_moments_tplot(moments, x=data_times, prefix=in_tvarname)
-        out_vars.extend(moments_vars)
+                if zero_negative_values:
+                    corrected_df[corrected_df < 0] = 0.0
 
-    if 'energy' in output:
-        spd_pgs_make_tplot(in_tvarname+'_energy', x=data_times, y=out_energy_y, z=out_energy, units=units, ylog=True, ytitle=dist_in['data_name'], ysubtitle='energy (eV)')
-        out_vars.append(in_tvarname+'_energy')
+                dist_in['data'] = corrected_df
 
-    if 'theta' in output:
-        spd_pgs_make_tplot(in_tvarname+'_theta', x=data_times, y=out_theta_y, z=out_theta, units=units, ytitle=dist_in['data_name'], ysubtitle='theta (deg)')
-        out_vars.append(in_tvarname+'_theta')
+            data = mms_convert_flux_units(dist_in, units=units)
 
-    if 'phi' in output:
-        spd_pgs_make_tplot(in_tvarname+'_phi', x=data_times, y=out_phi_y, z=out_phi, units=units, ytitle=dist_in['data_name'], ysubtitle='phi (deg)')
-        out_vars.append(in_tvarname+'_phi')
+            clean_data = mms_pgs_clean_data(data)
 
-    if 'pa' in output:
-        spd_pgs_make_tplot(in_tvarname+'_pa', x=data_times, y=out_pad_y, z=out_pad, units=units, ytitle=dist_in['data_name'], ysubtitle='PA (deg)')
-        out_vars.append(in_tvarname+'_pa')
+            # split hpca angle bins to be equal width in phi/theta
+            # this is needed when skipping the regrid step
+            if instrument == 'hpca':
+                clean_data = mms_pgs_split_hpca(clean_data)
 
-    if 'gyro' in output:
-        spd_pgs_make_tplot(in_tvarname+'_gyro', x=data_times, y=out_gyro_y, z=out_gyro, units=units, ytitle=dist_in['data_name'], ysubtitle='gyro (deg)')
-        out_vars.append(in_tvarname+'_gyro')
+            # Apply phi, theta, & energy limits
+            if energy is not None or theta is not None or phi is not None:
+                clean_data = spd_pgs_limit_range(clean_data, energy=energy, theta=theta, phi=phi)
 
-    return out_vars
+            # Build energy spectrogram
+            if 'energy' in output:
+                out_energy_y[i-start, :], out_energy[i-start, :] = mms_pgs_make_e_spec(clean_data)
+
+            # Build theta spectrogram
+            if 'theta' in output:
+                out_theta_y[i-start, :], out_theta[i-start, :] = mms_pgs_make_theta_spec(clean_data, resolution=dist_in['n_theta'])
+
+            # Build phi spectrogram
+            if 'phi' in output:
+                out_phi_y[i-start, :], out_phi[i-start, :] = mms_pgs_make_phi_spec(clean_data, resolution=dist_in['n_phi'])
+
+            # Calculate the moments
+            if 'moments' in output:
+                if scpot_data is not None:
+                    scpot_val = scpot_data[i]
+                else:
+                    scpot_val = 0.0
+
+                moments = spd_pgs_moments(clean_data, sc_pot=scpot_val)
+                out_density[i-start] = moments['density']
+                out_avgtemp[i-start] = moments['avgtemp']
+                out_vthermal[i-start] = moments['vthermal']
+                out_flux[i-start, :] = moments['flux']
+                out_velocity[i-start, :] = moments['velocity']
+                out_mftens[i-start, :] = moments['mftens']
+                out_ptens[i-start, :] = moments['ptens']
+
+            # Perform transformation to FAC, regrid data, and apply limits in new coords
+            if fac_requested:
+                fac_data = spd_pgs_do_fac(clean_data, fac_matrix[i, :, :])
+
+                if no_regrid == False:
+                    fac_data = spd_pgs_regrid(fac_data, regrid)
+
+                fac_data['theta'] = 90.0-fac_data['theta']
+                fac_data = spd_pgs_limit_range(fac_data, theta=pitch, phi=gyro)
+
+            if 'pa' in output:
+                out_pad_y[i-start, :], out_pad[i-start, :] = mms_pgs_make_theta_spec(fac_data, colatitude=True, resolution=dist_in['n_theta'])
+
+            if 'gyro' in output:
+                out_gyro_y[i-start, :], out_gyro[i-start, :] = mms_pgs_make_phi_spec(fac_data, resolution=dist_in['n_phi'])
+
+    out = {'energy': out_energy, 'energy_y': out_energy_y,
+           'theta': out_theta, 'theta_y': out_theta_y,
+           'phi': out_phi, 'phi_y': out_phi_y}
+
+    if fac_requested:
+        out.update({'pad': out_pad, 'pad_y': out_pad_y, 'gyro': out_gyro, 'gyro_y': out_gyro_y})
+
+    if 'moments' in output:
+        out.update({'density': out_density, 'avgtemp': out_avgtemp, 'vthermal': out_vthermal, 'flux': out_flux,
+                    'velocity': out_velocity, 'mftens': out_mftens, 'ptens': out_ptens})
+
+    return out
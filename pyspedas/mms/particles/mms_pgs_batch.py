@@ -0,0 +1,278 @@
+"""
+Batched versions of the mms_part_products building blocks
+
+These routines work on particle data structures with the distributions of a block of
+time samples stacked along the first dimension, e.g., 'data' is a (time x energy x phi x theta)
+array for the distributions, and (time x energy x angle) after cleaning. They give the same
+results as calling the per-sample routines (mms_get_fpi_dist, mms_pgs_clean_data,
+mms_pgs_make_e_spec, etc.) on each time sample.
+"""
+import logging
+import numpy as np
+from scipy.ndimage.interpolation import shift
+
+from pyspedas.particles.spd_part_products.spd_pgs_regrid import spd_pgs_regrid, spd_pgs_regrid_indices
+
+
+def mms_pgs_get_fpi_block(data_in, start, stop, dist):
+    """
+    Returns a 3D particle data structure with the MMS FPI distributions for the
+    time samples start:stop stacked along the first dimension
+
+    Input
+    ----------
+        data_in: tuple
+            Distribution data returned by get_data for the FPI distribution variable
+
+        start, stop: int
+            Range of time indices to extract
+
+        dist: dict
+            Particle data structure for a single time, as returned by mms_get_fpi_dist;
+            used for the metadata (species, mass, charge, units)
+
+    Returns
+    ----------
+        Particle data structure containing (time x energy x phi x theta) arrays
+    """
+    out = {key: dist[key] for key in ['project_name', 'spacecraft', 'data_name', 'units_name', 'units_procedure',
+                                      'species', 'valid', 'charge', 'mass', 'n_energy', 'n_theta', 'n_phi']}
+
+    # data_in[1] shape is: (time, phi, theta, energy)
+    # we shuffle the output to be [time, energy, phi, theta]
+    out_data = data_in[1][start:stop].transpose([0, 3, 1, 2])
+    shape = out_data.shape
+
+    # elevations are constant across time; convert colat -> lat
+    theta = -np.asarray(90. - np.asarray(data_in[3]), dtype=np.float64)
+
+    if data_in[4].ndim == 1:
+        energy = np.reshape(data_in[4], [1, shape[1], 1, 1])
+    else:
+        energy = np.reshape(data_in[4][start:stop], [shape[0], shape[1], 1, 1])
+
+    if data_in[2].ndim == 1:
+        phi = np.reshape(data_in[2], [1, 1, shape[2], 1])
+    else:
+        phi = np.reshape(data_in[2][start:stop], [shape[0], 1, shape[2], 1])
+
+    out['data'] = out_data
+    out['bins'] = np.ones(shape)
+    out['theta'] = np.broadcast_to(np.reshape(theta, [1, 1, 1, shape[3]]), shape).copy()
+    out['phi'] = np.broadcast_to((np.asarray(phi, dtype=np.float64)+180.) % 360, shape).copy()
+    out['energy'] = np.broadcast_to(energy, shape).astype(np.float64)
+    out['dtheta'] = np.zeros(shape) + 11.25
+    out['dphi'] = np.zeros(shape) + 11.25
+    out['denergy'] = np.zeros(shape)
+    return out
+
+
+def _denergy(energy):
+    """
+    Calculate delta-energy for one (energy x angle) table, exactly as in mms_pgs_clean_data
+    """
+    de = energy - shift(energy, [1, 0])
+    denergy = shift((de+shift(de, [1, 0]))/2.0, -1)
+    # just have to make a guess at the edges(bottom edge)
+    denergy[0, :] = de[1, :]
+    # just have to make a guess at the edges(top edge)
+    denergy[-1, :] = de[-1, :]
+    return denergy
+
+
+def mms_pgs_clean_data_batch(data_in):
+    """
+    Sanitize a block of MMS FPI/HPCA distributions for use with mms_part_products;
+    reforms time by energy by phi by theta to time by energy by angle
+    and calculates delta-energy for each bin
+    """
+    shape = data_in['data'].shape
+    new_shape = [shape[0], shape[1], shape[2]*shape[3]]
+
+    def reform(values):
+        # same ordering as the Fortran-order reshape in mms_pgs_clean_data
+        return np.reshape(np.broadcast_to(values, shape).transpose([0, 1, 3, 2]), new_shape)
+
+    output = {'charge': data_in['charge'], 'mass': data_in['mass']}
+    for key in ['data', 'bins', 'theta', 'energy', 'phi', 'dtheta', 'dphi']:
+        output[key] = reform(data_in[key])
+
+    # the energy tables are usually the same for many (or all) of the distributions
+    # in the block (e.g., burst data alternate between two tables), so only
+    # calculate delta-energy once for each table
+    energy = output['energy']
+    denergy = np.empty(new_shape)
+    tables = []
+    for idx in range(shape[0]):
+        for table_idx in tables:
+            if np.array_equal(energy[idx], energy[table_idx]):
+                denergy[idx] = denergy[table_idx]
+                break
+        else:
+            denergy[idx] = _denergy(energy[idx])
+            tables.append(idx)
+    output['denergy'] = denergy
+
+    return output
+
+
+def _zero_inactive_bins(data):
+    # zero inactive bins to ensure areas with no data are represented as NaN;
+    # note: like the per-sample routines, this modifies the data in place
+    zero_bins = data['bins'] == 0
+    if zero_bins.any():
+        data['data'][zero_bins] = 0.0
+
+
+def _binned_average(values, data, bins, outbins, n_out):
+    """
+    Average data over the bins of outbins, for each time, with the same
+    conventions as the angular spectrogram routines: values are in bin j if
+    outbins[j] <= value < outbins[j+1], and the average is the (nan)sum of the
+    data divided by the sum of the bin flags
+    """
+    n_times = data.shape[0]
+    values = np.reshape(values, [n_times, -1])
+    data = np.reshape(data, [n_times, -1])
+    bins = np.reshape(bins, [n_times, -1])
+
+    n_bins = min(len(outbins)-1, n_out)
+    idx = np.searchsorted(outbins, values, side='right') - 1
+    in_range = (idx >= 0) & (idx < n_bins)
+
+    time_idx = np.broadcast_to(np.arange(n_times)[:, np.newaxis], idx.shape)
+    flat_idx = (time_idx*n_out + idx)[in_range]
+
+    data_sum = np.bincount(flat_idx, weights=np.nan_to_num(data[in_range], nan=0.0), minlength=n_times*n_out)
+    bins_sum = np.bincount(flat_idx, weights=np.nan_to_num(bins[in_range], nan=0.0), minlength=n_times*n_out)
+
+    ave = np.zeros(n_times*n_out)
+    nonzero = bins_sum != 0.0
+    ave[nonzero] = data_sum[nonzero]/bins_sum[nonzero]
+
+    return np.reshape(ave, [n_times, n_out])
+
+
+def mms_pgs_make_e_spec_batch(data_in):
+    """
+    Builds the energy spectra for a block of distributions; see mms_pgs_make_e_spec
+
+    Returns
+    -------
+    outtable : ndarray, shape (time, ny)
+        The energy bins.
+    ave : ndarray, shape (time, ny)
+        The spectra.
+    """
+    _zero_inactive_bins(data_in)
+
+    data = data_in['data']
+    energy = data_in['energy']
+    bins = data_in['bins']
+
+    # use the first energy table for now
+    outtable = energy[:, :, 0]
+
+    if np.array_equal(energy, np.broadcast_to(outtable[:, :, np.newaxis], energy.shape)):
+        # the energy table is the same for every angle, so each bin maps onto itself
+        outbins = data
+    else:
+        # rebin the data to the nearest energy in the original energy table
+        n_times, n_energy, n_angles = data.shape
+        nearest = np.argmin(np.abs(outtable[:, :, np.newaxis, np.newaxis] - energy[:, np.newaxis, :, :]), axis=1)
+        flat_idx = (np.arange(n_times)[:, np.newaxis, np.newaxis]*n_energy + nearest)*n_angles + np.arange(n_angles)
+        outbins = np.zeros(data.size)
+        np.add.at(outbins, flat_idx.flatten(), np.where(data != 0.0, data, 0.0).flatten())
+        outbins = np.reshape(outbins, data.shape)
+
+    if data.shape[2] > 1:
+        ave = np.nansum(outbins, axis=2)/np.nansum(bins, axis=2)
+    else:
+        ave = outbins[:, :, 0]/bins[:, :, 0]
+
+    return outtable, ave
+
+
+def mms_pgs_make_theta_spec_batch(data_in, resolution=16, colatitude=False):
+    """
+    Builds the theta (latitudinal) spectra for a block of distributions; see mms_pgs_make_theta_spec
+
+    Returns
+    -------
+    y : numpy.ndarray
+        The y axis of the spectrogram.
+    ave : numpy.ndarray
+        The spectra, shape (time, resolution).
+    """
+    _zero_inactive_bins(data_in)
+
+    n_theta = resolution
+    bin_size = 180.0/n_theta
+    outbins = np.arange(0, 181.0, bin_size)
+
+    # shift to colatitude
+    theta = data_in['theta'] if colatitude else 90.0-data_in['theta']
+
+    ave = _binned_average(theta, data_in['data'], data_in['bins'], outbins, n_theta)
+
+    if not colatitude:
+        outbins = 90.0-outbins
+
+    y = outbins[0:n_theta]+0.5*(outbins[1::]-outbins[0:n_theta])
+
+    return y, ave
+
+
+def mms_pgs_make_phi_spec_batch(data_in, resolution=32):
+    """
+    Builds the phi (longitudinal) spectra for a block of distributions; see mms_pgs_make_phi_spec
+
+    Returns
+    -------
+    y : array
+        The bin centers for the phi spectrogram.
+    ave : array
+        The spectra, shape (time, resolution).
+    """
+    _zero_inactive_bins(data_in)
+
+    n_phi = resolution
+    bin_size = 360.0/n_phi
+    outbins = np.arange(0, 361, bin_size)
+
+    ave = _binned_average(data_in['phi'], data_in['data'], data_in['bins'], outbins, n_phi)
+
+    y = outbins[0:n_phi]+0.5*(outbins[1::]-outbins[0:n_phi])
+
+    return y, ave
+
+
+def mms_pgs_regrid_batch(data_in, regrid_dimen):
+    """
+    Regrid a block of distributions to a regular phi/theta grid; see spd_pgs_regrid
+    """
+    if len(regrid_dimen) != 2:
+        logging.error('Invalid regrid dimensions; the dimensions should be [n_phi, n_theta]')
+        return
+
+    n_times, n_energy = data_in['energy'].shape[0:2]
+    n_bins_grid = int(regrid_dimen[0])*int(regrid_dimen[1])
+
+    # the grid is the same for each sample; only the data and bins need regridding
+    out = spd_pgs_regrid({key: data_in[key][0] for key in ['data', 'bins', 'theta', 'phi', 'energy', 'denergy']}, regrid_dimen)
+    out = {key: np.broadcast_to(value, (n_times,) + value.shape).copy() for key, value in out.items()}
+
+    # nearest source bin for each sample; the lookup tables are cached, so this
+    # is fast when the source directions repeat
+    indices = np.stack([spd_pgs_regrid_indices(data_in['phi'][idx], data_in['theta'][idx], regrid_dimen)
+                        for idx in range(n_times)])
+
+    out['data'] = np.take_along_axis(np.asarray(data_in['data'], dtype=np.float64), indices, axis=2)
+    out['scaling'] = out['data']
+    out['bins'] = np.take_along_axis(np.asarray(data_in['bins'], dtype=np.float64), indices, axis=2)
+
+    # assumes energies are constant across angle
+    out['energy'] = np.broadcast_to(data_in['energy'][:, np.newaxis, :, 0], (n_times, n_bins_grid, n_energy)).copy()
+    out['denergy'] = np.broadcast_to(data_in['denergy'][:, np.newaxis, :, 0], (n_times, n_bins_grid, n_energy)).copy()
+
+    return out
@@ -0,0 +1,124 @@
+import io
+import os
+import time
+import shutil
+import tempfile
+import threading
+import unittest
+from unittest import mock
+from urllib.parse import urlparse, parse_qs
+
+from pyspedas.mms.mms_config import CONFIG
+from pyspedas.mms.mms_load_data import mms_load_data
+
+
+class FakeResponse:
+    def __init__(self, json=None, content=b''):
+        self._json = json
+        self.raw = io.BytesIO(content)
+
+    def json(self):
+        return self._json
+
+    def close(self):
+        pass
+
+
+class FakeSDCSession:
+    """
+    Answers the file_info queries and the downloads like the SDC; the first
+    requests are the slowest, so that the responses arrive out of order
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.delay = 0.2
+        self.queries = []
+        self.downloads = []
+
+    def get(self, url, **kwargs):
+        with self.lock:
+            delay = self.delay
+            self.delay = max(self.delay - 0.02, 0.0)
+        time.sleep(delay)
+
+        params = parse_qs(urlparse(url).query)
+        if 'file' in params:
+            with self.lock:
+                self.downloads.append(params['file'][0])
+            return FakeResponse(content=params['file'][0].encode())
+
+        with self.lock:
+            self.queries.append(url)
+        prefix = '_'.join([params['sc_id'][0], params['instrument_id'][0], params['data_rate_mode'][0], params['data_level'][0]])
+        if 'descriptor' in params:
+            prefix += '_' + params['descriptor'][0]
+        files = []
+        for day in ['20151017', '20151016']:
+            name = prefix + '_' + day + '_v1.0.0.cdf'
+            files.append({'file_name': name, 'timetag': day[0:4] + '-' + day[4:6] + '-' + day[6:8] + 'T00:00:00',
+                          'file_size': len(name)})
+        return FakeResponse(json={'files': files})
+
+    def mount(self, prefix, adapter):
+        pass
+
+    def close(self):
+        pass
+
+
+class LoadDataParallelTestCases(unittest.TestCase):
+    """
+    Check that the parallel SDC queries and downloads give the files in the same
+    order as the serial ones; these don't require network access
+    """
+    def setUp(self):
+        self.data_dir = tempfile.mkdtemp()
+        self.config = dict(CONFIG)
+        CONFIG['local_data_dir'] = self.data_dir
+        CONFIG['download_only'] = True
+        CONFIG['no_download'] = False
+
+    def tearDown(self):
+        CONFIG.update(self.config)
+        shutil.rmtree(self.data_dir)
+
+    def load(self, max_workers):
+        session = FakeSDCSession()
+        with mock.patch('pyspedas.mms.mms_load_data.mms_login_lasp', return_value=(session, None)):
+            files = mms_load_data(trange=['2015-10-16', '2015-10-17'], probe=['1', '2', '3', '4'], data_rate=['srvy', 'fast'],
+                                  instrument='fpi', datatype=['des-moms', 'dis-moms'], max_workers=max_workers)
+        return files, session
+
+    def test_order(self):
+        files, session = self.load(max_workers=8)
+        expected = []
+        for prb in ['1', '2', '3', '4']:
+            for drate in ['srvy', 'fast']:
+                for dtype in ['des-moms', 'dis-moms']:
+                    # the files are sorted by time within each query
+                    for day in ['20151016', '20151017']:
+                        expected.append(os.sep.join([self.data_dir, 'mms' + prb, 'fpi', drate, 'l2', dtype, '2015', '10',
+                                                     '_'.join(['mms' + prb, 'fpi', drate, 'l2', dtype, day, 'v1.0.0.cdf'])]))
+        self.assertEqual(files, expected)
+        self.assertEqual(len(session.queries), 16)
+        self.assertEqual(len(session.downloads), 32)
+        for file in files:
+            with open(file) as f:
+                self.assertEqual(f.read(), os.path.basename(file))
+
+        # serial queries and downloads give the same files
+        for prb in ['1', '2', '3', '4']:
+            shutil.rmtree(os.path.join(self.data_dir, 'mms' + prb))
+        serial, session = self.load(max_workers=1)
+        self.assertEqual(serial, files)
+        self.assertEqual(len(session.downloads), 32)
+
+        # files that already exist locally aren't downloaded again
+        shutil.rmtree(os.path.join(self.data_dir, 'mms1'))
+        files, session = self.load(max_workers=8)
+        self.assertEqual(files, serial)
+        self.assertEqual(len(session.downloads), 8)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,83 @@
+import os
+import time
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+from pyspedas.mms.mms_config import CONFIG
+from pyspedas.mms.mms_get_local_files import mms_get_local_files
+from pyspedas.mms.mms_file_catalog import mms_parse_file_name, mms_clear_file_catalog, CATALOG_FILE, _catalogs
+
+
+class LocalFilesTestCases(unittest.TestCase):
+    def setUp(self):
+        self.data_dir = tempfile.mkdtemp()
+        self.local_data_dir = CONFIG['local_data_dir']
+        CONFIG['local_data_dir'] = self.data_dir
+
+    def tearDown(self):
+        mms_clear_file_catalog(self.data_dir)
+        CONFIG['local_data_dir'] = self.local_data_dir
+        shutil.rmtree(self.data_dir)
+
+    def make_files(self, rel_dir, names):
+        out_dir = os.path.join(self.data_dir, *rel_dir.split('/'))
+        os.makedirs(out_dir, exist_ok=True)
+        for name in names:
+            open(os.path.join(out_dir, name), 'w').close()
+        # make sure the directory isn't considered recently modified
+        old = time.time() - 60.0
+        os.utime(out_dir, (old, old))
+        return [os.path.join(out_dir, name) for name in names]
+
+    def test_parse_file_name(self):
+        info = mms_parse_file_name('mms1_fpi_brst_l2_des-moms_20151016130524_v3.3.0.cdf')
+        self.assertEqual(info['probe'], '1')
+        self.assertEqual(info['instrument'], 'fpi')
+        self.assertEqual(info['data_rate'], 'brst')
+        self.assertEqual(info['level'], 'l2')
+        self.assertEqual(info['descriptor'], 'des-moms')
+        self.assertEqual(info['timetag'], '20151016130524')
+        self.assertEqual(info['version'], (3, 3, 0))
+        info = mms_parse_file_name('mms2_fgm_srvy_l2_20151016_v4.18.0.cdf')
+        self.assertEqual(info['descriptor'], '')
+        self.assertEqual(info['timetag'], '20151016000000')
+        self.assertTrue(mms_parse_file_name('mms2_fgm_srvy_l2_20151016_v4.18.cdf') is None)
+        self.assertTrue(mms_parse_file_name('notes.txt') is None)
+
+    def test_srvy(self):
+        files = self.make_files('mms1/fgm/srvy/l2/2015/10', ['mms1_fgm_srvy_l2_20151015_v4.18.0.cdf',
+                                                           'mms1_fgm_srvy_l2_20151016_v4.18.0.cdf',
+                                                           'mms1_fgm_srvy_l2_20151017_v4.18.0.cdf',
+                                                           'mms1_fgm_srvy_l2_20151018_v4.18.0.cdf',
+                                                           'readme.txt'])
+        self.make_files('mms2/fgm/srvy/l2/2015/10', ['mms2_fgm_srvy_l2_20151016_v4.18.0.cdf'])
+        out = mms_get_local_files('1', 'fgm', 'srvy', 'l2', '', ['2015-10-16', '2015-10-17'])
+        self.assertEqual(out, files[1:2])
+        self.assertTrue(os.path.exists(os.path.join(self.data_dir, CATALOG_FILE)))
+
+    def test_brst_datatype(self):
+        files = self.make_files('mms1/fpi/brst/l2/des-moms/2015/10/16', ['mms1_fpi_brst_l2_des-moms_20151016130524_v3.3.0.cdf',
+                                                                       'mms1_fpi_brst_l2_des-moms_20151016132914_v3.3.0.cdf'])
+        self.make_files('mms1/fpi/brst/l2/dis-moms/2015/10/16', ['mms1_fpi_brst_l2_dis-moms_20151016130524_v3.3.0.cdf'])
+        out = mms_get_local_files('1', 'fpi', 'brst', 'l2', 'des-moms', ['2015-10-16/13:06', '2015-10-16/13:10'])
+        self.assertEqual(out, files[0:1])
+
+    def test_catalog_update(self):
+        files = self.make_files('mms1/fgm/srvy/l2/2015/10', ['mms1_fgm_srvy_l2_20151016_v4.18.0.cdf'])
+        trange = ['2015-10-16', '2015-10-17']
+        self.assertEqual(mms_get_local_files('1', 'fgm', 'srvy', 'l2', '', trange), files)
+        # the catalog is reused by new sessions, without listing the directories again
+        _catalogs.pop(self.data_dir)
+        with mock.patch('os.scandir') as scandir:
+            self.assertEqual(mms_get_local_files('1', 'fgm', 'srvy', 'l2', '', trange), files)
+        scandir.assert_not_called()
+        self.assertIn(self.data_dir, _catalogs)
+        # adding a file changes the modification time of the directory, so it's re-indexed
+        new_files = self.make_files('mms1/fgm/srvy/l2/2015/10', ['mms1_fgm_srvy_l2_20151016_v4.19.0.cdf'])
+        self.assertEqual(sorted(mms_get_local_files('1', 'fgm', 'srvy', 'l2', '', trange)), files + new_files)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,41 @@
+import unittest
+import numpy as np
+from numpy.testing import assert_allclose
+from pyspedas.mms.mms_pad_binning import mms_pad_bin_nanmean, mms_spin_nanmean
+
+
+class PADBinningTestCases(unittest.TestCase):
+    """
+    Check the vectorized PAD kernels used by the EIS and FEEPS PAD routines
+    against simple loops over the times and bins
+    """
+    def test_pad_bin_nanmean(self):
+        rng = np.random.default_rng(11)
+        pitch_angles = rng.random((50, 6))*180.0
+        pitch_angles[rng.random((50, 6)) < 0.1] = np.nan
+        flux = rng.random((50, 6, 4))
+        flux[rng.random((50, 6, 4)) < 0.2] = np.nan
+        pa_label = np.arange(12)*15.0 + 7.5
+
+        pa_flux = mms_pad_bin_nanmean(pitch_angles, flux, pa_label, 7.5, 10.0)
+        self.assertEqual(pa_flux.shape, (50, 12, 4))
+        for i in range(50):
+            for j in range(12):
+                ind = np.where((pitch_angles[i] + 10.0 >= pa_label[j] - 7.5) & (pitch_angles[i] - 10.0 < pa_label[j] + 7.5))[0]
+                for e in range(4):
+                    values = flux[i, ind, e]
+                    expected = np.mean(values[~np.isnan(values)]) if np.any(~np.isnan(values)) else np.nan
+                    assert_allclose(pa_flux[i, j, e], expected, rtol=1e-14)
+
+        # 2D flux (time x telescope)
+        assert_allclose(mms_pad_bin_nanmean(pitch_angles, flux[:, :, 1], pa_label, 7.5, 10.0), pa_flux[:, :, 1])
+
+    def test_spin_nanmean(self):
+        data = np.array([[1.0, np.nan], [3.0, np.nan], [5.0, 2.0], [7.0, 4.0], [9.0, 6.0]])
+        spins, means = mms_spin_nanmean(data, [4, 4, 5, 5, 4])
+        assert_allclose(spins, [4, 5])
+        assert_allclose(means, [[13.0/3.0, 6.0], [6.0, 3.0]])
+
+
+if __name__ == '__main__':
+    unittest.main()
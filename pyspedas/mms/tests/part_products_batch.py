@@ -0,0 +1,80 @@
+import unittest
+import numpy as np
+from numpy.testing import assert_allclose
+from pytplot import store_data, get_data
+from pyspedas.mms.particles.mms_part_products import mms_part_products
+from pyspedas.particles.spd_part_products.spd_pgs_regrid import spd_pgs_regrid
+
+
+class PartProductsBatchTestCases(unittest.TestCase):
+    """
+    Check that the batched (vectorized) path through mms_part_products gives the
+    same results as processing the distributions one time sample at a time
+    """
+    @classmethod
+    def setUpClass(cls):
+        n_times = 6
+        times = 1444996800.0 + np.arange(n_times)*4.5
+        rng = np.random.default_rng(42)
+        dist = rng.random((n_times, 32, 16, 32))*1e-25
+        # time-varying energy table, alternating like burst-mode data
+        energy = np.tile(np.logspace(1, 4.4, 32), (n_times, 1))
+        energy[1::2] *= 1.1
+        store_data('mms1_des_dist_fast', data={'x': times, 'y': dist,
+                                               'v1': np.arange(32)*11.25+5.625,
+                                               'v2': np.arange(16)*11.25+5.625,
+                                               'v3': energy})
+        store_data('mms1_batch_test_bvec', data={'x': times, 'y': rng.normal(size=(n_times, 3))*10.0})
+        store_data('mms1_batch_test_pos', data={'x': times, 'y': rng.normal(size=(n_times, 3))*1e4})
+
+    def run_products(self, **kwargs):
+        out_vars = mms_part_products('mms1_des_dist_fast', mag_name='mms1_batch_test_bvec',
+                                     pos_name='mms1_batch_test_pos', **kwargs)
+        return {var: get_data(var) for var in out_vars}
+
+    def compare(self, **kwargs):
+        expected = self.run_products(**kwargs)
+        for batch_size in [1, 4, 100]:
+            actual = self.run_products(batch_size=batch_size, **kwargs)
+            self.assertEqual(list(expected.keys()), list(actual.keys()))
+            for var in expected.keys():
+                assert_allclose(actual[var].y, expected[var].y, rtol=1e-10, atol=0, err_msg=var)
+                if len(expected[var]) > 2:
+                    assert_allclose(actual[var].v, expected[var].v, rtol=1e-10, err_msg=var)
+
+    def test_spectra_moments(self):
+        self.compare(output='energy theta phi moments')
+
+    def test_limits(self):
+        self.compare(output='theta phi moments', energy=[100, 5000], phi=[30, 200], theta=[-45, 60])
+
+    def test_fac_no_regrid(self):
+        self.compare(output='pa gyro', no_regrid=True, pitch=[10, 170])
+
+    def test_fac_regrid(self):
+        self.compare(output='pa gyro', regrid=[24, 12])
+
+    def test_regrid_nearest(self):
+        # each point of the new grid takes the data of the closest source bin
+        rng = np.random.default_rng(3)
+        phi = rng.random((2, 200))*360.0
+        theta = np.degrees(np.arcsin(rng.random((2, 200))*2.0-1.0))
+        data = {'data': rng.random((2, 200)), 'bins': np.ones((2, 200)), 'phi': phi, 'theta': theta,
+                'energy': np.ones((2, 200)), 'denergy': np.ones((2, 200))}
+        out = spd_pgs_regrid(data, [16, 8])
+        for i in range(2):
+            src = np.stack([np.cos(np.radians(theta[i]))*np.cos(np.radians(phi[i])),
+                            np.cos(np.radians(theta[i]))*np.sin(np.radians(phi[i])),
+                            np.sin(np.radians(theta[i]))])
+            grid = np.stack([np.cos(np.radians(out['theta'][i]))*np.cos(np.radians(out['phi'][i])),
+                             np.cos(np.radians(out['theta'][i]))*np.sin(np.radians(out['phi'][i])),
+                             np.sin(np.radians(out['theta'][i]))])
+            nearest = np.argmax(grid.T @ src, axis=1)
+            assert_allclose(out['data'][i], data['data'][i][nearest])
+
+    def test_units(self):
+        self.compare(output='theta phi', units='df_km')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,51 @@
+import unittest
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+from numpy.testing import assert_allclose
+from pytplot import store_data, get_data
+from pyspedas.mms.particles.mms_part_products import mms_part_products
+
+
+class PartProductsParallelTestCases(unittest.TestCase):
+    """
+    Check that processing the time samples in worker processes gives the
+    same results as processing them in this process
+    """
+    @classmethod
+    def setUpClass(cls):
+        n_times = 6
+        times = 1444996800.0 + np.arange(n_times)*4.5
+        rng = np.random.default_rng(7)
+        store_data('mms2_des_dist_fast', data={'x': times, 'y': rng.random((n_times, 32, 16, 32))*1e-25,
+                                               'v1': np.arange(32)*11.25+5.625,
+                                               'v2': np.arange(16)*11.25+5.625,
+                                               'v3': np.logspace(1, 4.4, 32)})
+        cls.bvec = rng.normal(size=(n_times, 3))*10.0
+        cls.pos = rng.normal(size=(n_times, 3))*1e4
+        store_data('mms2_parallel_test_bvec', data={'x': times, 'y': cls.bvec})
+
+    def run_products(self, **kwargs):
+        # the FAC transformation updates the position variable in place
+        store_data('mms2_parallel_test_pos', data={'x': get_data('mms2_parallel_test_bvec').times, 'y': self.pos.copy()})
+        out_vars = mms_part_products('mms2_des_dist_fast', mag_name='mms2_parallel_test_bvec',
+                                     pos_name='mms2_parallel_test_pos', output='energy theta phi pa gyro moments', **kwargs)
+        return {var: get_data(var) for var in out_vars}
+
+    def compare(self, expected, actual):
+        self.assertEqual(list(expected.keys()), list(actual.keys()))
+        for var in expected.keys():
+            assert_allclose(actual[var].times, expected[var].times, err_msg=var)
+            assert_allclose(actual[var].y, expected[var].y, rtol=1e-12, atol=0, err_msg=var)
+
+    def test_nprocs(self):
+        expected = self.run_products()
+        self.compare(expected, self.run_products(nprocs=2))
+
+    def test_executor(self):
+        expected = self.run_products(batch_size=3)
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            self.compare(expected, self.run_products(batch_size=3, executor=executor))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,39 @@
+import unittest
+import numpy as np
+import scipy.interpolate
+from numpy.testing import assert_allclose
+from pyspedas.particles.spd_slice2d.slice2d_2di import slice2d_2di, slice2d_unique_points, _delaunay_cache
+
+
+class Slice2DITestCases(unittest.TestCase):
+    def test_unique_points(self):
+        x = np.array([1.0, 0.0, 1.0, -0.0, 2.0, 1.0])
+        y = np.array([2.0, 1.0, 2.0, 1.0, 0.0, 3.0])
+        data = np.array([1.0, 4.0, np.nan, 6.0, np.nan, 7.0])
+        ux, uy, udata = slice2d_unique_points(x, y, data)
+        assert_allclose(ux, [0.0, 1.0, 1.0, 2.0])
+        assert_allclose(uy, [1.0, 2.0, 3.0, 0.0])
+        assert_allclose(udata, [5.0, 1.0, 7.0, np.nan])
+
+    def test_interpolation(self):
+        rng = np.random.default_rng(4)
+        xyz = rng.normal(size=(500, 3))*100.0
+        data = rng.random(500)
+        the_slice = slice2d_2di(data, xyz, 40, thetarange=[-20, 20])
+
+        # one interpolator call per point of the grid
+        angle = np.degrees(np.arcsin(xyz[:, 2]/np.linalg.norm(xyz, axis=1)))
+        keep = np.abs(angle) <= 20
+        interpolator = scipy.interpolate.LinearNDInterpolator(xyz[keep, 0:2], data[keep])
+        expected = np.array([[interpolator((xp, yp)) for yp in the_slice['ygrid']] for xp in the_slice['xgrid']])
+        assert_allclose(the_slice['data'], expected.reshape(40, 40), rtol=1e-12)
+
+        # the triangulation is reused for the same points
+        cached = len(_delaunay_cache)
+        again = slice2d_2di(data*2.0, xyz, 40, thetarange=[-20, 20])
+        self.assertEqual(len(_delaunay_cache), cached)
+        assert_allclose(again['data'], 2.0*the_slice['data'], rtol=1e-12)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,145 @@
+import os
+import tempfile
+import unittest
+import numpy as np
+from numpy.testing import assert_allclose
+from pyspedas.particles.spd_slice2d import slice2d_geo as geo
+from pyspedas.particles.spd_slice2d.slice2d_geo import slice2d_geo
+from pyspedas.particles.spd_slice2d.slice2d_movie import slice2d_movie
+
+
+def bins(phi0=0.0, n_energy=8, n_theta=8, n_phi=16):
+    """
+    Bin centers and widths on a regular energy/angle grid
+    """
+    energy = np.geomspace(10.0, 10000.0, n_energy)
+    theta = -90.0 + (np.arange(n_theta) + 0.5)*180.0/n_theta
+    phi = phi0 + (np.arange(n_phi) + 0.5)*360.0/n_phi
+    e, t, p = np.meshgrid(energy, theta, phi, indexing='ij')
+    r = np.sqrt(e).flatten()
+    return r, p.flatten(), t.flatten(), 0.2*r, np.full(r.size, 360.0/n_phi), np.full(r.size, 180.0/n_theta)
+
+
+def reference_geo(data, resolution, r, phi, theta, dr, dp, dt):
+    """
+    Loop over the bins and test all the points of the (x-y) slice plane for each
+    """
+    vmax = np.max(np.abs(r)) + np.max(dr)
+    grid = np.linspace(-vmax, vmax, resolution)
+    x = np.outer(grid, np.ones(resolution)).flatten(order='F')
+    y = np.outer(np.ones(resolution), grid).flatten(order='F')
+    pcoords = np.degrees(np.arctan2(y, x))
+    rcoords = np.sqrt(x**2 + y**2)
+    out = np.zeros(resolution**2)
+    weight = np.zeros(resolution**2)
+    for i in range(len(data)):
+        if data[i] == 0 or not (theta[i] - 0.5*dt[i] < 0 <= theta[i] + 0.5*dt[i]):
+            continue
+        plim = np.array([phi[i] - 0.5*dp[i], phi[i] + 0.5*dp[i]])
+        plim[plim > 180] -= 360.0
+        plim[plim < -180] += 360.0
+        if plim[0] > plim[1]:
+            phis = (pcoords > plim[0]) | (pcoords <= plim[1])
+        else:
+            phis = (pcoords > plim[0]) & (pcoords <= plim[1])
+        idx = np.flatnonzero(phis & (rcoords >= r[i] - 0.5*dr[i]) & (rcoords < r[i] + 0.5*dr[i]))
+        if len(idx) > 1:
+            out[idx] += data[i]
+            weight[idx] += 1
+    weight[weight == 0] = 1
+    return (out/weight).reshape((resolution, resolution), order='F')
+
+
+class SliceGeoTestCases(unittest.TestCase):
+    def test_geo(self):
+        rng = np.random.default_rng(5)
+        for phi0 in [0.0, 7.0, -11.25]:
+            r, phi, theta, dr, dp, dt = bins(phi0=phi0)
+            data = rng.random(r.size)
+            data[rng.random(r.size) < 0.3] = 0.0
+            the_slice = slice2d_geo(data, 81, r, phi, theta, dr, dp, dt, orient_matrix=np.identity(3))
+            assert_allclose(the_slice['data'], reference_geo(data, 81, r, phi, theta, dr, dp, dt), rtol=1e-14)
+
+    def test_overlapping_bins(self):
+        # two sets of bins, rotated in phi, are averaged where they overlap
+        first = bins()
+        second = bins(phi0=5.0)
+        combined = [np.concatenate((a, b)) for a, b in zip(first, second)]
+        data = np.random.default_rng(6).random(combined[0].size)
+        the_slice = slice2d_geo(data, 61, *combined, orient_matrix=np.identity(3))
+        assert_allclose(the_slice['data'], reference_geo(data, 61, *combined), rtol=1e-14)
+
+    def test_sum_angle(self):
+        # summing over the planes at +/- 30 degrees about the x axis of a slice
+        # through isotropic data gives the same value at every point of a shell
+        r, phi, theta, dr, dp, dt = bins()
+        data = np.ones(r.size)
+        averaged = slice2d_geo(data, 41, r, phi, theta, dr, dp, dt, orient_matrix=np.identity(3), average_angle=[-30, 30])
+        values = averaged['data'][averaged['data'] != 0]
+        assert_allclose(values, 1.0)
+        summed = slice2d_geo(data, 41, r, phi, theta, dr, dp, dt, orient_matrix=np.identity(3), sum_angle=[-30, 30])
+        # the sums over several planes aren't exact, so compare them with a tolerance
+        self.assertTrue(np.all(summed['data'] >= averaged['data']*(1.0 - 1e-12)))
+        self.assertGreater(np.max(summed['data']), 1.0)
+
+        # the average over the planes is the sum divided by the number of bins summed
+        data = np.random.default_rng(8).random(r.size)
+        averaged = slice2d_geo(data, 41, r, phi, theta, dr, dp, dt, orient_matrix=np.identity(3), average_angle=[-30, 30])
+        summed_data = slice2d_geo(data, 41, r, phi, theta, dr, dp, dt, orient_matrix=np.identity(3), sum_angle=[-30, 30])
+        counts = summed['data'].copy()
+        counts[counts == 0] = 1
+        assert_allclose(averaged['data'], summed_data['data']/counts, rtol=1e-13)
+
+    def test_cache(self):
+        r, phi, theta, dr, dp, dt = bins()
+        data = np.random.default_rng(7).random(r.size)
+        geo._geo_cache.clear()
+        expected = slice2d_geo(data, 41, r, phi, theta, dr, dp, dt, orient_matrix=np.identity(3))
+        self.assertTrue(all(pixels.dtype == np.int32 and bin_idx.dtype == np.int32
+                            for pixels, bin_idx in list(geo._geo_cache.values())[0]))
+        # a new orientation for each slice: only the most recent maps are kept
+        for angle in [10.0, 20.0, 30.0]:
+            c, s = np.cos(np.radians(angle)), np.sin(np.radians(angle))
+            slice2d_geo(data, 41, r, phi, theta, dr, dp, dt, orient_matrix=np.array([[c, -s, 0], [s, c, 0], [0, 0, 1]]))
+        self.assertEqual(len(geo._geo_cache), geo.GEO_CACHE_SIZE)
+        # maps larger than the cache aren't kept
+        cache_bytes = geo.GEO_CACHE_BYTES
+        try:
+            geo.GEO_CACHE_BYTES = 1024
+            geo._geo_cache.clear()
+            the_slice = slice2d_geo(data, 41, r, phi, theta, dr, dp, dt, orient_matrix=np.identity(3))
+            self.assertEqual(len(geo._geo_cache), 0)
+        finally:
+            geo.GEO_CACHE_BYTES = cache_bytes
+        assert_allclose(the_slice['data'], expected['data'], rtol=0)
+
+    def test_movie(self):
+        r, phi, theta, dr, dp, dt = bins()
+        shape = (8, 8, 16)
+        dists = []
+        for idx in range(6):
+            energy = np.broadcast_to(np.geomspace(10.0, 10000.0, 8)[:, None, None], shape).copy()
+            dists.append({'project_name': 'test', 'spacecraft': '1', 'data_name': 'test dist', 'units_name': 'df_km',
+                          'species': 'e', 'mass': 5.68566e-06, 'charge': -1.0,
+                          'start_time': 1000.0 + idx*10, 'end_time': 1010.0 + idx*10,
+                          'data': np.full(shape, 1.0 + idx), 'bins': np.ones(shape, dtype=int), 'energy': energy,
+                          'phi': phi.reshape(shape), 'dphi': dp.reshape(shape),
+                          'theta': theta.reshape(shape), 'dtheta': dt.reshape(shape)})
+
+        slices = slice2d_movie(dists, trange=[1000.0, 1060.0], resolution=51)
+        self.assertEqual(len(slices), 6)
+        assert_allclose([np.max(the_slice['data']) for the_slice in slices], [1.0, 2.0, 3.0, 4.0, 5.0, 6.0])
+
+        # 20 second windows average two distributions; the last window has no data
+        slices = slice2d_movie(dists, trange=[1000.0, 1080.0], window=20.0, resolution=51)
+        assert_allclose([np.max(the_slice['data']) for the_slice in slices[0:3]], [1.5, 3.5, 5.5])
+        self.assertIsNone(slices[3])
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            prefix = os.path.join(tmpdir, 'frame')
+            slice2d_movie(dists, times=[1005.0, 1035.0], resolution=51, save_png=prefix)
+            self.assertEqual(sorted(os.listdir(tmpdir)), ['frame_0.png', 'frame_1.png'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -115,3 +115,89 @@ def moments_3d(data_in, sc_pot=0, no_unit_conversion=False):
               'vthermal': vthermal,
               'avgtemp': avgtemp}
     return output
+
+
+def moments_3d_batch(data_in, sc_pot=0):
+    """
+    Calculates plasma moments for a block of distributions at once
+
+    Input:
+        data_in: dict
+            Particle data structure with the distributions stacked along the
+            first dimension, i.e., 'data', 'energy', 'theta', etc. are
+            (time x energy x angle) arrays
+
+    Parameters:
+        sc_pot: float or numpy.ndarray
+            Spacecraft potential; scalar, or one value per distribution
+
+    Notes:
+        Gives the same results as calling moments_3d for each distribution
+
+    Returns:
+        Dictionary containing moments; each value has the time dimension first
+
+    """
+    charge = data_in['charge']
+    mass = data_in['mass']
+    n_times = data_in['data'].shape[0]
+
+    sc_pot = np.reshape(np.broadcast_to(np.asarray(sc_pot, dtype=np.float64), (n_times,)), [n_times, 1, 1])
+
+    energy = np.array(data_in['energy'], dtype=np.float64)
+    energy[energy < 0.1] = 0.1
+
+    de = data_in['denergy']
+    de_e = de/energy
+
+    e_inf = energy + charge*sc_pot
+    e_inf[e_inf < 0] = 0.0
+
+    # mystery line from the IDL version
+    weight = (energy + charge*sc_pot)/de + 0.5
+    weight[weight < 0] = 0
+    weight[weight > 1] = 1
+
+    domega_weight = moments_3d_omega_weights(data_in['theta'], data_in['phi'], data_in['dtheta'], data_in['dphi'])
+
+    data = np.array(data_in['data'], dtype=np.float64)
+    data[data_in['bins'] == 0] = 0
+
+    sum_axes = (1, 2)
+
+    data_dv = data*de_e*weight*domega_weight[0]
+
+    # density calculation
+    dweight = np.sqrt(e_inf)/energy
+    pardens = np.sqrt(mass/2.0)*1e-5*data_dv*dweight
+    density = np.nansum(pardens, axis=sum_axes)
+
+    # flux calculation
+    tmp = data*de_e*weight*e_inf/energy
+    flux = np.stack([np.nansum(tmp*domega_weight[i], axis=sum_axes) for i in [1, 2, 3]], axis=1)
+
+    # velocity flux calculation
+    tmp = data*de_e*weight*e_inf**1.5/energy
+    vftens = np.stack([np.nansum(tmp*domega_weight[i], axis=sum_axes) for i in range(4, 10)], axis=1)*np.sqrt(2.0/mass)*1e5
+    mftens = vftens*mass/1e10
+
+    velocity = flux/density[:, np.newaxis]/1e5 # km/s
+
+    mf3x3 = mftens[:, [[0, 3, 4], [3, 1, 5], [4, 5, 2]]]
+    pt3x3 = mf3x3 - velocity[:, :, np.newaxis]*flux[:, np.newaxis, :]*mass/1e5
+    ptens = pt3x3[:, [0, 1, 2, 0, 0, 1], [0, 1, 2, 1, 2, 2]]
+
+    t3x3 = pt3x3/density[:, np.newaxis, np.newaxis]
+    avgtemp = (t3x3[:, 0, 0] + t3x3[:, 1, 1] + t3x3[:, 2, 2])/3.0  # trace/3
+
+    vthermal = np.sqrt(2.0*avgtemp/mass)
+
+    output = {'density': density,
+              'flux': flux,
+              'mftens': mftens,
+              'velocity': velocity,
+              'ptens': ptens,
+              'ttens': t3x3,
+              'vthermal': vthermal,
+              'avgtemp': avgtemp}
+    return output
@@ -21,12 +21,16 @@ def moments_3d_omega_weights(theta, phi, dtheta, dphi):
     Notes:
         The calculations were heisted from Davin Larson's IDL version
 
+        The inputs can have any shape (e.g., energy x angle for a single
+        distribution, or time x energy x angle for a block of distributions);
+        the weights are returned in an array with shape [13] + theta.shape
+
     Returns:
         Omega weights to be used in moments_3d
 
     """
 
-    omega = np.zeros([13, theta.shape[0], theta.shape[1]])
+    omega = np.zeros([13] + list(theta.shape))
 
     # Angular moment integrals
     ph2 = phi + dphi/2.0
@@ -57,18 +61,18 @@ def moments_3d_omega_weights(theta, phi, dtheta, dphi):
     ic2tst = (-cth2**3 + cth1**3)/3.0
     icpsp = (sph2**2 - sph1**2)/2.0
 
-    omega[0, :, :] = ict*ip
-    omega[1, :, :] = ic2t*icp
-    omega[2, :, :] = ic2t*isp
-    omega[3, :, :] = ictst*ip
-    omega[4, :, :] = ic3t*ic2p
-    omega[5, :, :] = ic3t*is2p
-    omega[6, :, :] = icts2t*ip
-    omega[7, :, :] = ic3t*icpsp
-    omega[8, :, :] = ic2tst*icp
-    omega[9, :, :] = ic2tst*isp
-    omega[10, :, :] = omega[1, :, :]
-    omega[11, :, :] = omega[2, :, :]
-    omega[12, :, :] = omega[3, :, :]
+    omega[0] = ict*ip
+    omega[1] = ic2t*icp
+    omega[2] = ic2t*isp
+    omega[3] = ictst*ip
+    omega[4] = ic3t*ic2p
+    omega[5] = ic3t*is2p
+    omega[6] = icts2t*ip
+    omega[7] = ic3t*icpsp
+    omega[8] = ic2tst*icp
+    omega[9] = ic2tst*isp
+    omega[10] = omega[1]
+    omega[11] = omega[2]
+    omega[12] = omega[3]
 
     return omega
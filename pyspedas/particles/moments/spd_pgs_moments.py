@@ -1,5 +1,5 @@
 
-from pyspedas.particles.moments.moments_3d import moments_3d
+from pyspedas.particles.moments.moments_3d import moments_3d, moments_3d_batch
 
 
 def spd_pgs_moments(data_in, sc_pot=0):
@@ -21,3 +21,25 @@ def spd_pgs_moments(data_in, sc_pot=0):
     """
 
     return moments_3d(data_in, sc_pot=sc_pot)
+
+
+def spd_pgs_moments_batch(data_in, sc_pot=0):
+    """
+
+    Calculates moments for a block of distributions stacked along the
+    first dimension of a simplified particle data structure.
+    Simply a wrapper for moments_3d_batch right now
+
+    Input:
+        data_in: dict
+            Particle data structure (time x energy x angle arrays)
+
+    Parameters:
+        sc_pot: float or numpy.ndarray
+            Spacecraft potential (scalar or one value per distribution)
+
+    Returns:
+        Dictionary containing moments
+    """
+
+    return moments_3d_batch(data_in, sc_pot=sc_pot)
@@ -32,3 +32,33 @@ def spd_pgs_do_fac(data_in, mat):
     data_out['phi'] = sphere_data[2].value*180.0/np.pi
 
     return data_out
+
+
+def spd_pgs_do_fac_batch(data_in, mat):
+    """
+    Applies field aligned coordinate transformations to a block of distributions
+
+    Input:
+        data_in: dict
+            Particle data structure with the distributions stacked along the first dimension
+
+        mat: numpy.ndarray
+            The (time, 3, 3) field-aligned rotation matrices to apply to the data
+
+    Returns:
+        Rotated particle data structure
+    """
+
+    data_out = data_in.copy()
+    theta = data_in['theta']*np.pi/180.0
+    phi = data_in['phi']*np.pi/180.0
+
+    cart_data = np.stack([np.cos(theta)*np.cos(phi), np.cos(theta)*np.sin(phi), np.sin(theta)])
+
+    # rotate all of the bins of each distribution with that distribution's matrix
+    x, y, z = np.einsum('tij,jt...->it...', mat, cart_data)
+
+    data_out['theta'] = np.arctan2(z, np.hypot(x, y))*180.0/np.pi
+    data_out['phi'] = np.mod(np.arctan2(y, x), 2.0*np.pi)*180.0/np.pi
+
+    return data_out
@@ -0,0 +1,188 @@
+import os
+import logging
+from copy import deepcopy
+from uuid import uuid4
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from multiprocessing import shared_memory
+
+import numpy as np
+from pytplot import get_data, store_data
+
+from pyspedas.particles.spd_part_products.spd_pgs_progress_update import spd_pgs_progress_update
+
+logging.captureWarnings(True)
+logging.basicConfig(format='%(asctime)s: %(message)s', datefmt='%d-%b-%y %H:%M:%S', level=logging.INFO)
+
+# input arrays attached by this process, keyed by the tag of the parallel run
+_attached = {}
+
+
+def _share_array(values, blocks):
+    """
+    Copy an array into a new shared memory block; returns a description
+    that can be used to attach to the block from another process
+    """
+    values = np.ascontiguousarray(values)
+    if values.dtype.hasobject or values.nbytes == 0:
+        # can't be shared; these are pickled with each chunk instead
+        return ('value', values)
+    shm = shared_memory.SharedMemory(create=True, size=values.nbytes)
+    blocks.append(shm)
+    shared = np.ndarray(values.shape, dtype=values.dtype, buffer=shm.buf)
+    shared[...] = values
+    return ('shm', shm.name, values.shape, values.dtype.str)
+
+
+def _attach_array(desc, blocks):
+    """
+    Return an array backed by the shared memory block described by desc
+    """
+    if desc[0] == 'value':
+        return desc[1]
+    shm = shared_memory.SharedMemory(name=desc[1])
+    blocks.append(shm)
+    return np.ndarray(desc[2], dtype=np.dtype(desc[3]), buffer=shm.buf)
+
+
+def _attach(tag, shared):
+    """
+    Attach to the shared inputs of a parallel run (once per process); the
+    shared tplot variables are recreated in this process, so that routines
+    that read them with get_data work unchanged
+    """
+    if tag in _attached:
+        return _attached[tag][0]
+
+    # inputs from previous runs are no longer needed
+    for old_tag in list(_attached.keys()):
+        for shm in _attached.pop(old_tag)[1]:
+            shm.close()
+
+    blocks = []
+    arrays = {name: _attach_array(desc, blocks) for name, desc in shared['arrays'].items()}
+
+    for tvar in shared['tvars']:
+        data = {field: _attach_array(desc, blocks) for field, desc in tvar['fields'].items()}
+        data['x'] = data.pop('times')
+        store_data(tvar['name'], data=data, attr_dict=tvar['attrs'])
+
+    _attached[tag] = (arrays, blocks)
+    return arrays
+
+
+def _run_chunk(func, tag, shared, state, start, stop):
+    arrays = _attach(tag, shared)
+    return start, func(state, arrays, start, stop)
+
+
+def spd_pgs_parallel(func, n_samples, state, arrays=None, tvars=None, nprocs=None, executor=None, chunk_size=None, type_string=None):
+    """
+    Runs the time loop of a particle products routine on chunks of the time axis
+    in parallel, and stitches the outputs back together
+
+    Input:
+        func: function
+            Module-level function called as func(state, arrays, start, stop) to
+            process the time samples start:stop; it should return a dictionary
+            of output arrays, with time as the first dimension
+
+        n_samples: int
+            Total number of time samples
+
+        state: dict
+            Small, picklable inputs (keywords, metadata, etc.) passed to func;
+            these are sent along with each chunk
+
+    Parameters:
+        arrays: dict of numpy.ndarray
+            Large input arrays (e.g., FAC matrices, spacecraft potential); these are
+            copied into shared memory once, instead of being sent with each chunk
+
+        tvars: list of str
+            tplot variables read by func (e.g., the distribution data); these are
+            copied into shared memory, and recreated in each worker process
+
+        nprocs: int
+            Number of worker processes; defaults to the number of CPUs
+
+        executor: concurrent.futures.Executor
+            Existing executor to run the chunks on, instead of creating a new
+            process pool; it isn't shut down by this routine
+
+        chunk_size: int
+            Number of time samples per chunk; by default, the time axis is split
+            into 4 chunks per worker
+
+        type_string: str
+            Name shown in the progress messages (usually the variable name)
+
+    Returns:
+        Dictionary containing the outputs from func, with the arrays concatenated
+        along the time dimension; other values are taken from the last chunk
+
+    """
+    if arrays is None:
+        arrays = {}
+
+    if tvars is None:
+        tvars = []
+
+    if nprocs is None:
+        nprocs = os.cpu_count() or 1
+
+    if (executor is None and nprocs <= 1) or n_samples <= 1:
+        return func(state, arrays, 0, n_samples)
+
+    if chunk_size is None:
+        chunk_size = int(np.ceil(n_samples/(4.0*nprocs)))
+    chunk_size = max(chunk_size, 1)
+
+    tag = uuid4().hex
+    blocks = []
+    try:
+        shared = {'arrays': {name: _share_array(values, blocks) for name, values in arrays.items()}, 'tvars': []}
+
+        for tvar in tvars:
+            data = get_data(tvar)
+            if data is None:
+                continue
+            shared['tvars'].append({'name': tvar,
+                                    'fields': {field: _share_array(values, blocks) for field, values in zip(data._fields, data)},
+                                    'attrs': deepcopy(get_data(tvar, metadata=True))})
+
+        # executors using threads (or forked processes) already have these inputs
+        _attached[tag] = (arrays, [])
+
+        own_executor = executor is None
+        if own_executor:
+            executor = ProcessPoolExecutor(max_workers=nprocs)
+
+        try:
+            futures = [executor.submit(_run_chunk, func, tag, shared, state, start, min(start+chunk_size, n_samples))
+                       for start in range(0, n_samples, chunk_size)]
+
+            results = {}
+            last_update_time = None
+            for completed, future in enumerate(as_completed(futures)):
+                start, output = future.result()
+                results[start] = output
+                last_update_time = spd_pgs_progress_update(last_update_time=last_update_time, current_sample=min((completed+1)*chunk_size, n_samples),
+                                                           total_samples=n_samples, type_string=type_string)
+        finally:
+            if own_executor:
+                executor.shutdown()
+    finally:
+        _attached.pop(tag, None)
+        for shm in blocks:
+            shm.close()
+            shm.unlink()
+
+    outputs = [results[start] for start in sorted(results.keys())]
+    stitched = {}
+    for key, value in outputs[-1].items():
+        if isinstance(value, np.ndarray) and value.ndim > 0:
+            stitched[key] = np.concatenate([output[key] for output in outputs], axis=0)
+        else:
+            stitched[key] = value
+
+    return stitched
@@ -1,12 +1,32 @@
 import logging
+from collections import OrderedDict
+from functools import lru_cache
 import numpy as np
-from scipy.interpolate import NearestNDInterpolator
+from scipy.spatial import cKDTree
 from astropy.coordinates import spherical_to_cartesian
 
+# maximum number of nearest-neighbor tables kept by spd_pgs_regrid_indices
+REGRID_CACHE_SIZE = 256
+
+# nearest-neighbor tables for recently seen source geometries, keyed by
+# the target grid dimensions and the source phi/theta values
+_regrid_cache = OrderedDict()
+
 
 def spd_pgs_regrid(data, regrid_dimen):
     """
+    Regrid a particle data structure to a regular phi/theta grid, using
+    the nearest source bin for each point of the new grid
+
+    Input:
+        data: dict
+            Particle data structure (energy x angle arrays)
 
+        regrid_dimen: list of int
+            Dimensions of the new grid: [n_phi, n_theta]
+
+    Returns:
+        Particle data structure on the new grid
     """
     if len(regrid_dimen) != 2:
         logging.error('Invalid regrid dimensions; the dimensions should be [n_phi, n_theta]')
@@ -19,19 +39,19 @@ def spd_pgs_regrid(data, regrid_dimen):
     n_bins_grid = n_phi_grid*n_theta_grid
 
     d_phi_grid = 360.0/n_phi_grid
-    d_theta_grid = 180.0/n_theta_grid
 
-    phi_angles = (np.arange(n_bins_grid) % n_phi_grid)*d_phi_grid+d_phi_grid/2.0
+    phi_angles, theta_angles, grid_points = _regrid_target(n_phi_grid, n_theta_grid)
     phi_grid = np.repeat(np.reshape(phi_angles, [n_bins_grid, 1]), n_energy, axis=1).T
-
-    theta_angles = np.fix(np.arange(n_bins_grid)/n_phi_grid)*d_theta_grid+d_theta_grid/2.0 - 90
     theta_grid = np.repeat(np.reshape(theta_angles, [n_bins_grid, 1]), n_energy, axis=1).T
 
     d_phi_grid = np.zeros([n_energy, n_bins_grid]) + d_phi_grid
     d_theta_grid = np.zeros([n_energy, n_bins_grid]) + d_phi_grid
 
-    data_grid = np.zeros([n_energy, n_bins_grid])
-    bins_grid = np.zeros([n_energy, n_bins_grid])
+    # nearest source bin for each point of the new grid, at each energy
+    indices = spd_pgs_regrid_indices(data['phi'], data['theta'], regrid_dimen)
+
+    data_grid = np.take_along_axis(np.asarray(data['data'], dtype=np.float64), indices, axis=1)
+    bins_grid = np.take_along_axis(np.asarray(data['bins'], dtype=np.float64), indices, axis=1)
 
     output = {'data': data_grid,
               'scaling': data_grid,
@@ -47,31 +67,80 @@ def spd_pgs_regrid(data, regrid_dimen):
     output['energy'] = np.repeat(np.reshape(data['energy'][:, 0], [n_energy, 1]), n_bins_grid, axis=1).T
     output['denergy'] = np.repeat(np.reshape(data['denergy'][:, 0], [n_energy, 1]), n_bins_grid, axis=1).T
 
-    for i in range(0, n_energy):
-        phi_temp = data['phi'][i, :]
-        theta_temp = data['theta'][i, :]
-        data_temp = data['data'][i, :]
-        bins_temp = data['bins'][i, :]
+    return output
+
 
-        r_grid = np.ones(len(phi_grid[i, :]))
+def spd_pgs_regrid_indices(phi, theta, regrid_dimen):
+    """
+    Find the nearest source bin for each point of the regular phi/theta grid
 
-        data_grid_interp = griddata(phi_temp, theta_temp, data_temp)
-        bins_grid_interp = griddata(phi_temp, theta_temp, bins_temp)
+    The source directions are usually the same at every energy (and often from
+    one distribution to the next), so the tables are calculated once for each
+    unique set of source directions, and the most recent are cached.
 
-        grid_x, grid_y, grid_z = spherical_to_cartesian(r_grid, theta_grid[i, :]*np.pi/180.0, phi_grid[i, :]*np.pi/180.0)
+    Input:
+        phi, theta: numpy.ndarray
+            Source bin directions (energy x angle), in degrees
 
-        for j in range(0, len(phi_grid[i, :])):
-            output['data'][i, j] = data_grid_interp(grid_x[j], grid_y[j], grid_z[j])
-            output['bins'][i, j] = bins_grid_interp(grid_x[j], grid_y[j], grid_z[j])
+        regrid_dimen: list of int
+            Dimensions of the new grid: [n_phi, n_theta]
 
-    return output
+    Returns:
+        Array of indices (energy x n_phi*n_theta) into the angle dimension
+        of the source data
+    """
+    phi = np.asarray(phi, dtype=np.float64)
+    theta = np.asarray(theta, dtype=np.float64)
+    n_phi_grid = int(regrid_dimen[0])
+    n_theta_grid = int(regrid_dimen[1])
+
+    indices = np.empty([phi.shape[0], n_phi_grid*n_theta_grid], dtype=np.intp)
+    for i in range(phi.shape[0]):
+        if i > 0 and np.array_equal(phi[i], phi[i-1]) and np.array_equal(theta[i], theta[i-1]):
+            indices[i] = indices[i-1]
+            continue
 
+        key = (n_phi_grid, n_theta_grid, phi[i].tobytes(), theta[i].tobytes())
+        table = _regrid_cache.get(key)
+        if table is None:
+            table = _nearest_indices(phi[i], theta[i], n_phi_grid, n_theta_grid)
+            _regrid_cache[key] = table
+            if len(_regrid_cache) > REGRID_CACHE_SIZE:
+                _regrid_cache.popitem(last=False)
+        else:
+            _regrid_cache.move_to_end(key)
+        indices[i] = table
 
-def griddata(phi, theta, data):
-    r = np.ones(len(phi))
-    phi_rad = phi*np.pi/180.0
-    theta_rad = theta*np.pi/180.0
-    cart_temp = spherical_to_cartesian(r, theta_rad, phi_rad)
+    return indices
+
+
+@lru_cache(maxsize=16)
+def _regrid_target(n_phi_grid, n_theta_grid):
+    """
+    Returns the phi and theta angles of the new grid, and the grid
+    points as unit vectors
+    """
+    n_bins_grid = n_phi_grid*n_theta_grid
+    d_phi_grid = 360.0/n_phi_grid
+    d_theta_grid = 180.0/n_theta_grid
+
+    phi_angles = (np.arange(n_bins_grid) % n_phi_grid)*d_phi_grid+d_phi_grid/2.0
+    theta_angles = np.fix(np.arange(n_bins_grid)/n_phi_grid)*d_theta_grid+d_theta_grid/2.0 - 90
+
+    grid_points = np.stack(spherical_to_cartesian(np.ones(n_bins_grid), theta_angles*np.pi/180.0, phi_angles*np.pi/180.0)).T
+
+    for values in [phi_angles, theta_angles, grid_points]:
+        values.flags.writeable = False
+
+    return phi_angles, theta_angles, grid_points
+
+
+def _nearest_indices(phi, theta, n_phi_grid, n_theta_grid):
+    """
+    Query the nearest source bin for all the points of the new grid at once
+    """
+    cart_temp = spherical_to_cartesian(np.ones(len(phi)), theta*np.pi/180.0, phi*np.pi/180.0)
+    points = np.ascontiguousarray(np.stack(cart_temp).T, dtype=np.float64)
 
-    points = np.stack(cart_temp).T
-    return NearestNDInterpolator(points, data)
+    _, indices = cKDTree(points).query(_regrid_target(n_phi_grid, n_theta_grid)[2])
+    return indices
@@ -1,7 +1,14 @@
+from collections import OrderedDict
 import numpy as np
 import scipy.interpolate
 import scipy.spatial
 
+# maximum number of triangulations kept by griddata_tri
+DELAUNAY_CACHE_SIZE = 8
+
+# Delaunay triangulations of recently seen point sets, keyed by the points
+_delaunay_cache = OrderedDict()
+
 
 def slice2d_2di(datapoints, xyz, resolution, thetarange=None, zdirrange=None):
     """
@@ -33,69 +40,64 @@ def slice2d_2di(datapoints, xyz, resolution, thetarange=None, zdirrange=None):
                 xyz = xyz[index, :]
                 datapoints = datapoints[index]
 
-    x = xyz[:, 0]
-    y = xyz[:, 1]
-
-    # average duplicates along the way
-    # note: the following algorithm was translated directly
-    # from IDL, and apparently came from thm_esa_slice2d
-    # originally
-    # uni2 = np.unique(x, return_index=True)[1]+1
-    uni2 = np.unique(x, return_index=True)[1]
-    uni1 = np.insert(uni2[0:len(uni2)-1] + 1, 0, 0)
-
-    kk = 0
-    for i in range(0, len(uni2)):
-        yi = y[uni1[i]:uni2[i]+1]
-        xi = x[uni1[i]:uni2[i]+1]
-        datapointsi = datapoints[uni1[i]:uni2[i]+1]
-
-        xi = xi[np.argsort(yi)]
-        datapointsi = datapointsi[np.argsort(yi)]
-        yi = yi[np.argsort(yi)]
-
-        index2 = np.unique(yi, return_index=True)[1]
-        if len(index2) == 1:
-            index1 = 0
-        else:
-            index1 = np.insert(index2[0:len(index2)-1]+1, 0, 0)
-
-        for j in range(0, len(index2)):
-            if isinstance(index1, int):
-                y[kk] = yi[index1]
-                x[kk] = xi[index1]
-                if index1 == index2[j]:
-                    datapoints[kk] = datapointsi[index1]
-                else:
-                    datapoints[kk] = np.nanmean(datapointsi[index1:index2[j]+1])
-            else:
-                y[kk] = yi[index1[j]]
-                x[kk] = xi[index1[j]]
-                if index1[j] == index2[j]:
-                    datapoints[kk] = datapointsi[index1[j]]
-                else:
-                    datapoints[kk] = np.nanmean(datapointsi[index1[j]:index2[j]+1])
-            kk = kk + 1
-
-    y = y[0:kk]
-    x = x[0:kk]
-    datapoints = datapoints[0:kk]
+    # average duplicates
+    x, y, datapoints = slice2d_unique_points(xyz[:, 0], xyz[:, 1], datapoints)
 
     xmax = np.nanmax(np.abs(np.array([y, x])))
     xrange = [-1*xmax, xmax]
     xgrid = np.linspace(xrange[0], xrange[1], num=resolution)
     ygrid = np.linspace(xrange[0], xrange[1], num=resolution)
-    out = np.zeros((resolution, resolution))
+
+    # interpolate onto the whole grid at once
     grid_interpolator = griddata_tri(datapoints, x, y)
-    for xi, xp in enumerate(xgrid):
-        for yi, yp in enumerate(ygrid):
-            out[xi, yi] = grid_interpolator((xp, yp))
+    xmesh, ymesh = np.meshgrid(xgrid, ygrid, indexing='ij')
+    out = grid_interpolator(xmesh, ymesh)
 
     return {'data': out, 'xgrid': xgrid, 'ygrid': ygrid}
 
 
+def slice2d_unique_points(x, y, datapoints):
+    """
+    Averages (ignoring NaNs) the data of points with the same x and y
+
+    Returns
+    --------
+        Tuple containing the x, y and averaged data of the unique points,
+        sorted by x, then y
+    """
+    # +0.0 so that -0.0 and 0.0 are the same key
+    keys = np.empty(len(x), dtype=[('x', np.float64), ('y', np.float64)])
+    keys['x'] = np.asarray(x, dtype=np.float64) + 0.0
+    keys['y'] = np.asarray(y, dtype=np.float64) + 0.0
+    unique_keys, inverse = np.unique(keys, return_inverse=True)
+    inverse = inverse.reshape(-1)
+
+    datapoints = np.asarray(datapoints, dtype=np.float64)
+    valid = ~np.isnan(datapoints)
+    sums = np.bincount(inverse, weights=np.where(valid, datapoints, 0.0), minlength=len(unique_keys))
+    counts = np.bincount(inverse, weights=valid, minlength=len(unique_keys))
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        averages = np.where(counts > 0, sums/counts, np.nan)
+
+    return unique_keys['x'], unique_keys['y'], averages
+
+
 def griddata_tri(data, x, y):
-    cart_temp = np.array([x, y])
-    points = np.stack(cart_temp).T
-    delaunay = scipy.spatial.Delaunay(points)
+    """
+    Returns a linear interpolator over the Delaunay triangulation of the points;
+    the triangulations of the most recent point sets are cached, so that
+    consecutive slices with the same points (e.g., the same bins and
+    orientation) only need to be triangulated once
+    """
+    points = np.ascontiguousarray(np.stack((x, y), axis=1), dtype=np.float64)
+    key = points.tobytes()
+    delaunay = _delaunay_cache.get(key)
+    if delaunay is None:
+        delaunay = scipy.spatial.Delaunay(points)
+        _delaunay_cache[key] = delaunay
+        if len(_delaunay_cache) > DELAUNAY_CACHE_SIZE:
+            _delaunay_cache.popitem(last=False)
+    else:
+        _delaunay_cache.move_to_end(key)
     return scipy.interpolate.LinearNDInterpolator(delaunay, data)
@@ -1,9 +1,20 @@
 import logging
+from collections import OrderedDict
 from copy import deepcopy
 from time import time
 import numpy as np
 from pyspedas.particles.spd_slice2d.quaternions import qtom, qcompose
 
+# maximum number of pixel -> bin maps kept by slice2d_geo, and their maximum
+# total size in bytes; with angle averaging/summing, a map holds the pairs of
+# every plane, so a single map can take tens of MB
+GEO_CACHE_SIZE = 2
+GEO_CACHE_BYTES = 128*1024*1024
+
+# pixel -> bin maps for recently seen slices, keyed by the resolution, the
+# slice plane(s) and the bin boundaries
+_geo_cache = OrderedDict()
+
 
 def slice2d_geo(data, resolution, r, phi, theta, dr, dp, dt, orient_matrix=None, rotation_matrix=None,
                 custom_matrix=None, msg_prefix='', shift=None, average_angle=None, sum_angle=None):
@@ -11,11 +22,17 @@ def slice2d_geo(data, resolution, r, phi, theta, dr, dp, dt, orient_matrix=None,
     Produces slices showing each bin's boundaries by assigning
     each bin's value to all points on the slice plane that
     fall within that bin's boundaries.
+
+    The bins each point of the slice plane falls in only depend on the
+    geometry of the slice and of the bins, not on the data, so they are
+    found for all the points at once (see slice2d_geo_map), and the most
+    recent maps are cached; slices of consecutive distributions with the
+    same bins and orientation (e.g., the frames of a movie) only need to
+    accumulate the data.
     """
     n = float(resolution)
     n_int = int(n)
     rd = 180/np.pi
-    tolerance = 5e-7 # to account for rounding errors
     # for progress messages
     previous_time = time()
 
@@ -23,15 +40,6 @@ def slice2d_geo(data, resolution, r, phi, theta, dr, dp, dt, orient_matrix=None,
     dr_range = [-np.max(dr), np.max(np.abs(dr))]
     xgrid = np.linspace(vrange[0]+dr_range[0], vrange[1]+dr_range[1], n_int)
     ygrid = np.linspace(vrange[0]+dr_range[0], vrange[1]+dr_range[1], n_int)
-    z = 0
-
-    uvals = np.zeros((n_int**2, 3))
-    xvals = np.outer(xgrid, np.ones(n_int)).flatten(order='F')
-    yvals = np.outer(np.ones(n_int), ygrid).flatten(order='F')
-    zvals = np.zeros(n_int**2)
-    uvals[:, 0] = xvals
-    uvals[:, 1] = yvals
-    uvals[:, 2] = zvals
 
     m = deepcopy(orient_matrix)
     # rotate slice coordinates to desired location
@@ -43,7 +51,6 @@ def slice2d_geo(data, resolution, r, phi, theta, dr, dp, dt, orient_matrix=None,
     else:
         if rotation_matrix is not None:
             m = rotation_matrix @ m
-    uvals = uvals @ m.T
 
     if average_angle is not None or sum_angle is not None:
         if sum_angle is not None:
@@ -68,97 +75,28 @@ def slice2d_geo(data, resolution, r, phi, theta, dr, dp, dt, orient_matrix=None,
         qs = qcompose(xv, a_range/rd, free=True)  # quaternions to rotate about x by a
         ms = qtom(qs)  # get matrices
     else:
-        na = 0
+        ms = np.zeros((0, 3, 3))
+
+    data = np.asarray(data, dtype=np.float64)
+    planes = slice2d_geo_map(xgrid, ygrid, m, ms, r, phi, theta, dr, dp, dt)
 
-    num_points = len(data)
     out = np.zeros(n_int**2)
     weight = np.zeros(n_int**2)
 
-    # loop over slice plans (if averaging over angle)
-    for j in range(-1, na):
-        if j >= 0:
-            ut = np.matmul(ms[j, :, :], deepcopy(uvals).T).T
-        else:
-            ut = deepcopy(uvals)
-
-        # Convert transformed slice coordinates to spherical
-        pcoords = rd*np.arctan2(ut[:, 1], ut[:, 0])  # phi
-        tcoords = rd*np.arctan2(ut[:, 2], np.sqrt(ut[:, 0]**2 + ut[:, 1]**2))  # theta
-        rcoords = np.sqrt(ut[:, 0]**2 + ut[:, 1]**2 + ut[:, 2]**2)  # r
+    # accumulate the data of the (nonzero) bins over the slice plane(s)
+    for j, (pixels, bins) in enumerate(planes):
+        values = data[bins]
+        nonzero = values != 0
+        out += np.bincount(pixels[nonzero], weights=values[nonzero], minlength=n_int**2)
+        weight += np.bincount(pixels[nonzero], minlength=n_int**2)
 
-        # Loop over bins to determine what region each bin covers on the slice plane
-        for i in range(0, num_points):
-            if data[i] == 0:
-                continue
-
-            # theta
-            tlim = np.array([theta[i]-0.5*dt[i], theta[i]+0.5*dt[i]])
-
-            # account for rounding errors
-            # this is particularly important is slice plane is at zero elevation
-            tr = np.argwhere(np.abs(tlim - np.round(tlim)) < tolerance).flatten()
-            if len(tr) > 0:
-               tlim[tr] = np.round(tlim[tr])
-
-            thetas =(tcoords > tlim[0]) & (tcoords <= tlim[1])
-
-            if len(thetas) == 0:
-                continue
-
-            if np.sum(thetas) < 1:
-                continue
-            
-            # phi
-            plim = np.array([phi[i]-0.5*dp[i], phi[i]+0.5*dp[i]])
-
-            # keep limits within [-180, 180]
-            over = np.argwhere(plim > 180).flatten()
-            under = np.argwhere(plim < -180).flatten()
-            if len(over) > 0:
-                plim[over] += -360.0
-            if len(under) > 0:
-                plim[under] += 360.0
-            
-            # account for rounding errors
-            pr = np.argwhere(np.abs(plim - np.round(plim)) < tolerance).flatten()
-            if len(pr) > 0:
-               plim[pr] = np.round(plim[pr])
-            
-            # determine which region ( p0->p1 or p1->p0) the bin spans
-            if plim[0] > plim[1]:
-                phis = (pcoords > plim[0]) | (pcoords <= plim[1])
-            else:
-                phis = (pcoords > plim[0]) & (pcoords <= plim[1])
-            
-            if len(phis) == 0:
-                continue
-
-            if np.sum(phis) < 1:
-                continue
-
-            # R (velocity/energy)
-            rdata = (rcoords >= r[i]-0.5*dr[i]) & (rcoords < r[i]+0.5*dr[i])
-
-            bidx = np.argwhere(phis & thetas & rdata).flatten()
-
-            if len(bidx) > 1:
-                weight[bidx] = weight[bidx] + 1
-                out[bidx] = out[bidx] + data[i]
-
-            # output progress messages every 6 seconds
-            if (time() - previous_time) > 6:
-                if na == 0:
-                    num_angles = 1
-                else:
-                    num_angles = na
-                msg = msg_prefix + str(int(100*((j+1)*num_points + i)/(num_angles*num_points))) + '% complete'
-                logging.info(msg)
-                previous_time = time()
+        # output progress messages every 6 seconds
+        if (time() - previous_time) > 6:
+            logging.info(msg_prefix + str(int(100*(j+1)/len(planes))) + '% complete')
+            previous_time = time()
 
     # average areas where bins overlapped
-    adj = np.argwhere(weight == 0)
-    if len(adj) > 0:
-        weight[adj] = 1
+    weight[weight == 0] = 1
 
     if sum_angle is None:
         out = out / weight
@@ -170,3 +108,245 @@ def slice2d_geo(data, resolution, r, phi, theta, dr, dp, dt, orient_matrix=None,
         ygrid -= shift[1]
 
     return {'data': out, 'xgrid': xgrid, 'ygrid': ygrid}
+
+
+def slice2d_geo_map(xgrid, ygrid, matrix, plane_matrices, r, phi, theta, dr, dp, dt):
+    """
+    Finds the bins that each point of the slice plane falls in
+
+    Input
+    ------
+        xgrid, ygrid: ndarray
+            Coordinates of the points along the slice's x and y axes
+
+        matrix: ndarray
+            3x3 matrix rotating the slice plane to its location
+
+        plane_matrices: ndarray
+            Nx3x3 matrices of the additional planes (rotated about the slice's
+            x axis) when averaging/summing over an angle range; may be empty
+
+        r, phi, theta, dr, dp, dt: ndarray
+            Centers and widths of the bins
+
+    Returns
+    --------
+        List with a tuple for the slice plane, and for each additional plane,
+        containing the point indices (column-major over the grid) and the bin
+        indices (int32) of each (point, bin) pair, sorted by bin; bins that
+        cover less than two points of a plane are left out of that plane
+    """
+    key = (np.asarray(xgrid, dtype=np.float64).tobytes(), np.asarray(ygrid, dtype=np.float64).tobytes(),
+           np.asarray(matrix, dtype=np.float64).tobytes(), np.asarray(plane_matrices, dtype=np.float64).tobytes()) + \
+        tuple(np.asarray(values, dtype=np.float64).tobytes() for values in [r, phi, theta, dr, dp, dt])
+
+    planes = _geo_cache.get(key)
+    if planes is not None:
+        _geo_cache.move_to_end(key)
+        return planes
+
+    n_int = len(xgrid)
+    uvals = np.zeros((n_int**2, 3))
+    uvals[:, 0] = np.outer(xgrid, np.ones(n_int)).flatten(order='F')
+    uvals[:, 1] = np.outer(np.ones(n_int), ygrid).flatten(order='F')
+    uvals = uvals @ np.asarray(matrix).T
+
+    limits = _bin_limits(r, phi, theta, dr, dp, dt)
+    lookup = _bin_lookup(limits) if len(limits['bin']) > 0 else {'bin': limits['bin']}
+    nbins = len(np.asarray(r).reshape(-1))
+
+    planes = []
+    for j in range(-1, len(plane_matrices)):
+        if j >= 0:
+            ut = np.matmul(plane_matrices[j, :, :], uvals.T).T
+        else:
+            ut = uvals
+
+        planes.append(_plane_bins(ut, lookup, nbins))
+
+    for pixels, bins in planes:
+        pixels.flags.writeable = False
+        bins.flags.writeable = False
+
+    # maps larger than the cache (e.g., high resolution slices averaged over
+    # many planes) aren't kept
+    if _map_bytes(planes) <= GEO_CACHE_BYTES:
+        _geo_cache[key] = planes
+        while len(_geo_cache) > GEO_CACHE_SIZE or sum(_map_bytes(cached) for cached in _geo_cache.values()) > GEO_CACHE_BYTES:
+            _geo_cache.popitem(last=False)
+
+    return planes
+
+
+def _map_bytes(planes):
+    """
+    Returns the size in bytes of a pixel -> bin map
+    """
+    return sum(pixels.nbytes + bins.nbytes for pixels, bins in planes)
+
+
+def _bin_limits(r, phi, theta, dr, dp, dt):
+    """
+    Returns the limits of the bins along theta (lower limit excluded), phi
+    (lower limit excluded) and r (upper limit excluded), as pieces of the bins;
+    bins that span phi = +/-180 are split in two pieces, and empty bins are
+    left out
+    """
+    tolerance = 5e-7  # to account for rounding errors
+
+    r, phi, theta, dr, dp, dt = [np.asarray(values, dtype=np.float64).reshape(-1) for values in [r, phi, theta, dr, dp, dt]]
+
+    def round_limits(values):
+        # account for rounding errors
+        # this is particularly important is slice plane is at zero elevation
+        rounded = np.round(values)
+        return np.where(np.abs(values - rounded) < tolerance, rounded, values)
+
+    t_lo = round_limits(theta - 0.5*dt)
+    t_hi = round_limits(theta + 0.5*dt)
+
+    # keep limits within [-180, 180]
+    p_lo = phi - 0.5*dp
+    p_hi = phi + 0.5*dp
+    p_lo = round_limits(np.where(p_lo > 180, p_lo - 360.0, np.where(p_lo < -180, p_lo + 360.0, p_lo)))
+    p_hi = round_limits(np.where(p_hi > 180, p_hi - 360.0, np.where(p_hi < -180, p_hi + 360.0, p_hi)))
+
+    r_lo = r - 0.5*dr
+    r_hi = r + 0.5*dr
+
+    # bins spanning p0 -> p1 through +/-180 cover (p0, inf) and (-inf, p1]
+    wraps = p_lo > p_hi
+    bins = np.concatenate((np.arange(len(r)), np.flatnonzero(wraps)))
+    p_lo = np.concatenate((p_lo, np.full(np.sum(wraps), -np.inf)))
+    p_hi = np.concatenate((np.where(wraps, np.inf, p_hi), p_hi[wraps]))
+
+    limits = {'bin': bins,
+              't_lo': t_lo[bins], 't_hi': t_hi[bins],
+              'p_lo': p_lo, 'p_hi': p_hi,
+              'r_lo': r_lo[bins], 'r_hi': r_hi[bins]}
+
+    valid = (limits['t_lo'] < limits['t_hi']) & (limits['p_lo'] < limits['p_hi']) & (limits['r_lo'] < limits['r_hi'])
+    return {name: values[valid] for name, values in limits.items()}
+
+
+def _interval_layers(lo, hi):
+    """
+    Splits a set of possibly overlapping intervals into layers of intervals
+    that don't overlap, so that the interval of a value in each layer is a
+    binary search on the interval starts
+
+    Returns
+    --------
+        Tuple containing the layer and the index of the unique interval of each
+        input interval, and the list of the unique intervals in each layer
+        (indices, starts and ends)
+    """
+    intervals, interval_idx = np.unique(np.stack((lo, hi), axis=1), axis=0, return_inverse=True)
+    interval_idx = interval_idx.reshape(-1)
+
+    # intervals are sorted by their start; put each in the first layer it doesn't overlap
+    layer_ends = []
+    layer = np.zeros(len(intervals), dtype=np.int64)
+    for idx, (start, end) in enumerate(intervals):
+        for layer_num, layer_end in enumerate(layer_ends):
+            if start >= layer_end:
+                break
+        else:
+            layer_num = len(layer_ends)
+            layer_ends.append(-np.inf)
+        layer[idx] = layer_num
+        layer_ends[layer_num] = end
+
+    layers = []
+    for layer_num in range(len(layer_ends)):
+        members = np.flatnonzero(layer == layer_num)
+        layers.append((members, intervals[members, 0], intervals[members, 1]))
+
+    return layer[interval_idx], interval_idx, layers
+
+
+def _find_intervals(layer, values, lower_closed):
+    """
+    Returns the index of the unique interval of a layer each value falls in (-1 if none)
+    """
+    members, starts, ends = layer
+    if lower_closed:
+        loc = np.searchsorted(starts, values, side='right') - 1
+        inside = (loc >= 0) & (values < ends[np.maximum(loc, 0)])
+    else:
+        loc = np.searchsorted(starts, values, side='left') - 1
+        inside = (loc >= 0) & (values <= ends[np.maximum(loc, 0)])
+    return np.where(inside, members[np.maximum(loc, 0)], -1)
+
+
+def _bin_lookup(limits):
+    """
+    Prepares the searches for the bin pieces containing a point: the pieces
+    are grouped by the layers of their theta, phi and r intervals, and sorted
+    by the indices of their intervals in each group
+    """
+    t_layer, t_idx, t_layers = _interval_layers(limits['t_lo'], limits['t_hi'])
+    p_layer, p_idx, p_layers = _interval_layers(limits['p_lo'], limits['p_hi'])
+    r_layer, r_idx, r_layers = _interval_layers(limits['r_lo'], limits['r_hi'])
+
+    # number of unique intervals along theta and phi
+    nt = int(np.max(t_idx)) + 1
+    np_ = int(np.max(p_idx)) + 1
+
+    groups = []
+    combos = np.unique(np.stack((t_layer, p_layer, r_layer), axis=1), axis=0)
+    for tl, pl, rl in combos:
+        members = np.flatnonzero((t_layer == tl) & (p_layer == pl) & (r_layer == rl))
+        keys = (r_idx[members]*np_ + p_idx[members])*nt + t_idx[members]
+        order = np.argsort(keys, kind='stable')
+        groups.append((tl, pl, rl, keys[order], members[order]))
+
+    return {'bin': limits['bin'], 'nt': nt, 'np': np_, 'groups': groups,
+            't_layers': t_layers, 'p_layers': p_layers, 'r_layers': r_layers}
+
+
+def _plane_bins(ut, lookup, nbins):
+    """
+    Returns the (point, bin) pairs of one slice plane, given the coordinates
+    of its points; see slice2d_geo_map
+    """
+    rd = 180/np.pi
+    pixel_list = [np.zeros(0, dtype=np.int64)]
+    piece_list = [np.zeros(0, dtype=np.int64)]
+
+    if len(lookup['bin']) > 0:
+        # Convert transformed slice coordinates to spherical
+        pcoords = rd*np.arctan2(ut[:, 1], ut[:, 0])  # phi
+        tcoords = rd*np.arctan2(ut[:, 2], np.sqrt(ut[:, 0]**2 + ut[:, 1]**2))  # theta
+        rcoords = np.sqrt(ut[:, 0]**2 + ut[:, 1]**2 + ut[:, 2]**2)  # r
+
+        t_found = [_find_intervals(layer, tcoords, False) for layer in lookup['t_layers']]
+        p_found = [_find_intervals(layer, pcoords, False) for layer in lookup['p_layers']]
+        r_found = [_find_intervals(layer, rcoords, True) for layer in lookup['r_layers']]
+        nt, np_ = lookup['nt'], lookup['np']
+
+        for tl, pl, rl, keys, members in lookup['groups']:
+            # points inside an interval along all three dimensions
+            points = np.flatnonzero((t_found[tl] >= 0) & (p_found[pl] >= 0) & (r_found[rl] >= 0))
+            point_keys = (r_found[rl][points]*np_ + p_found[pl][points])*nt + t_found[tl][points]
+
+            # pieces with the same intervals as each point
+            first = np.searchsorted(keys, point_keys, side='left')
+            counts = np.searchsorted(keys, point_keys, side='right') - first
+            total = np.sum(counts)
+            offsets = np.arange(total) - np.repeat(np.cumsum(counts) - counts, counts)
+            pixel_list.append(np.repeat(points, counts))
+            piece_list.append(members[np.repeat(first, counts) + offsets])
+
+    pixels = np.concatenate(pixel_list)
+    bins = lookup['bin'][np.concatenate(piece_list)].astype(np.int64)
+
+    # bins need to cover more than one point
+    keep = np.bincount(bins, minlength=nbins)[bins] > 1
+    pixels = pixels[keep]
+    bins = bins[keep]
+
+    # sort by bin, so that the data are accumulated in bin order; the maps are
+    # kept as int32 to halve the size of the cache
+    order = np.argsort(bins, kind='stable')
+    return pixels[order].astype(np.int32), bins[order].astype(np.int32)
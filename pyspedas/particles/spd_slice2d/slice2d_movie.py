@@ -0,0 +1,138 @@
+import logging
+import numpy as np
+
+from .slice2d import slice2d
+from .slice2d_intrange import slice2d_intrange
+
+from pyspedas import time_double, time_string
+
+
+def slice2d_movie(dists,
+                  times=None,
+                  trange=None,
+                  window=None,
+                  samples=None,
+                  center_time=False,
+                  save_png=None,
+                  zrange=None,
+                  display=False,
+                  plot_options=None,
+                  **slice_options):
+    """
+    Creates a series of 2D slices of 3D particle data over many time windows,
+    e.g., for the frames of a movie
+
+    With the geometric interpolation, the points of the slice plane that fall
+    in each bin are only found once for all the frames that have the same
+    bins and orientation (see slice2d_geo), so the frames after the first
+    only need to accumulate the data.
+
+    Input
+    ---------------------
+        dists: list of dicts
+            List of 3D particle data structures
+
+    Parameters
+    ---------------------
+        times: list of str or list of float
+            Times of the frames; each frame uses the WINDOW or SAMPLES
+            nearest to its time (default: 1 sample)
+
+        trange: list of str or list of float
+            Time range of the movie, used when TIMES isn't set; the frames
+            are consecutive windows of length WINDOW over the time range,
+            or every distribution in the time range if WINDOW isn't set
+
+        window: int or float
+            Length in seconds of the time window of each frame
+
+        samples: int
+            Number of samples nearest to the time of each frame to average
+
+        center_time: bool
+            Flag denoting that the frame times should be the midpoints of
+            the windows instead of their beginnings
+
+        save_png: str
+            Save the frames as PNG files, named SAVE_PNG + '_' + the frame
+            number (zero-padded)
+
+        zrange: list of float
+            Range of the color bars; by default, the range of all the frames,
+            so that the colors are the same from one frame to the next
+
+        display: bool
+            Flag to display each frame
+
+        plot_options: dict
+            Additional keywords passed to slice2d_plot.plot (e.g., xrange, yrange)
+
+        slice_options:
+            Keywords passed to slice2d (e.g., interpolation, rotation, resolution)
+
+    Returns
+    ---------------------
+        List of the slices (None for frames without data)
+    """
+    if times is None:
+        if trange is None:
+            logging.error('Please specify the frame times or a time range for the movie.')
+            return
+
+        tr = time_double(trange)
+        if window is not None:
+            times = np.arange(tr[0], tr[1], window)
+            center_time = False
+        else:
+            # one frame for each distribution in the time range
+            centers = [dist['start_time'] + (dist['end_time']-dist['start_time'])/2.0 for dist in dists]
+            times = np.array(centers)[slice2d_intrange(dists, tr)]
+            samples = 1
+    else:
+        times = time_double(times)
+
+    slices = []
+    for frame_time in np.atleast_1d(times):
+        if window is not None:
+            if center_time:
+                frame_trange = [frame_time - window/2.0, frame_time + window/2.0]
+            else:
+                frame_trange = [frame_time, frame_time + window]
+            if len(slice2d_intrange(dists, frame_trange)) == 0:
+                logging.warning('No data in the window starting at ' + time_string(frame_trange[0]))
+                slices.append(None)
+                continue
+        slices.append(slice2d(dists, time=frame_time, window=window, samples=samples, center_time=center_time,
+                              **slice_options))
+
+    valid = [the_slice for the_slice in slices if the_slice is not None]
+
+    if save_png is None and not display:
+        return slices
+
+    if len(valid) == 0:
+        logging.error('No slices to plot.')
+        return slices
+
+    import matplotlib.pyplot as plt
+    from .slice2d_plot import plot
+
+    if zrange is None:
+        zranges = np.array([the_slice['zrange'] for the_slice in valid if the_slice['zrange'][0] > 0])
+        if len(zranges) > 0:
+            # padding, as in slice2d_plot
+            zrange = [np.min(zranges[:, 0])*0.999, np.max(zranges[:, 1])*1.001]
+
+    if plot_options is None:
+        plot_options = {}
+
+    digits = len(str(len(slices)))
+    for frame, the_slice in enumerate(slices):
+        if the_slice is None:
+            continue
+        frame_png = None if save_png is None else save_png + '_' + str(frame).zfill(digits)
+        plot(the_slice, zrange=zrange, save_png=frame_png, display=display, **plot_options)
+        # don't keep the figures of all the frames open
+        plt.close(plt.gcf())
+
+    return slices
@@ -44,7 +44,12 @@ def data(trange=['2012-11-05/00:00:00', '2012-11-06/00:00:00'], resolution=10, d
 
         out_type: str
             Set the type of the return/output to be
-            'df' (pandas dataframe), 'np' (numpy array) or 'dc' (dictionary).
+            'df' (pandas dataframe), 'np' (numpy array; the last column holds
+            the unix times), 'dc' (dictionary) or 'cube' (dictionary with the
+            currents as a time x grid point x component array).
+
+            The daily archives are read without extracting them, and the data of
+            each day are cached next to its archive (see pyspedas.secs.day_cube).
     Returns
     ----------
         list of str of downloaded filenames (if downloadonly == True)
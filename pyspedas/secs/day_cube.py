@@ -0,0 +1,317 @@
+"""
+Reader for the daily SECS/EICS archives
+
+Each daily archive (SECS%Y%m%d.zip, or SECS%Y%m%d.zip.gz for 2007) holds one
+small text file per snapshot, with the latitude, longitude and current
+component(s) at each grid point. The members are read straight out of the
+archive, without extracting them, and assembled into a day cube: the unix times
+of the snapshots, the latitudes and longitudes of the grid points, and the
+currents as a (time x grid point x component) float array.
+
+The first time an archive is read, its day cube is saved next to it: the
+currents in a .npy file, which later calls memory-map, and the times and the
+grid in a small .npz file, which records a schema version and the modification
+time and size of the archive. The cache is only used when all three still match.
+"""
+import gzip
+import io
+import logging
+import os
+import re
+import zipfile
+import numpy as np
+
+# increment when the layout of the cache files changes
+DAY_CUBE_VERSION = 1
+
+# current components of each data type
+COMPONENTS = {'EICS': ['Jx', 'Jy'], 'SECS': ['J']}
+
+# time stamp in the member names, e.g., EICS20170327_060000.dat
+_member_time = re.compile(r'(\d{4})(\d{2})(\d{2})_(\d{2})(\d{2})(\d{2})\.dat$')
+
+
+def day_cube_files(archive_file):
+    """
+    Returns the names of the cache files (currents, times and grid) for a daily archive
+    """
+    base = archive_file[:-3] if archive_file.endswith('.gz') else archive_file
+    base = base[:-4] if base.endswith('.zip') else base
+    return base + '.cube.npy', base + '.cube.npz'
+
+
+def load_day_cube(archive_file, dtype, cache=True):
+    """
+    Load the day cube of a daily SECS/EICS archive
+
+    Parameters
+    -----------
+        archive_file: str
+            Name of the daily archive (.zip or .zip.gz)
+
+        dtype: str
+            Data type; valid options: 'EICS' or 'SECS'
+
+        cache: bool
+            Load the day cube from (and save it to) the cache files
+
+    Returns
+    --------
+        Dictionary with the keys 'time' (unix times), 'latitude', 'longitude',
+        'components' (names of the current components) and 'data' (currents,
+        time x grid point x component; memory-mapped when read from the cache)
+    """
+    if dtype not in COMPONENTS:
+        raise TypeError("%r are invalid keyword arguments" % dtype)
+
+    stat = os.stat(archive_file)
+    stamp = (stat.st_mtime_ns, stat.st_size)
+
+    if cache:
+        cube = _read_cache(archive_file, stamp, len(COMPONENTS[dtype]))
+        if cube is not None:
+            cube['components'] = list(COMPONENTS[dtype])
+            return cube
+
+    cube = read_archive(archive_file, dtype)
+
+    if cache:
+        _write_cache(archive_file, stamp, cube)
+
+    return cube
+
+
+def read_archive(archive_file, dtype):
+    """
+    Read the snapshots in a daily SECS/EICS archive into a day cube, without
+    extracting them; see load_day_cube for the output
+    """
+    ncomp = len(COMPONENTS[dtype])
+    ncol = 2 + ncomp
+
+    if archive_file.endswith('.gz'):
+        # the zip central directory is at the end of the file, so decompress into memory
+        # rather than seeking back and forth in the gzip stream
+        with gzip.open(archive_file, 'rb') as f:
+            source = io.BytesIO(f.read())
+    else:
+        source = archive_file
+
+    stamps = []
+    counts = []
+    blocks = []
+    with zipfile.ZipFile(source, 'r') as zf:
+        for info in zf.infolist():
+            match = _member_time.search(info.filename)
+            if info.is_dir() or match is None or info.file_size == 0:
+                continue
+            values = np.fromstring(zf.read(info), sep=' ')
+            if values.size == 0 or values.size % ncol != 0:
+                logging.warning('Skipping ' + info.filename + ' in ' + archive_file + ': unexpected number of values')
+                continue
+            stamps.append('%s-%s-%sT%s:%s:%s' % match.groups())
+            counts.append(values.size // ncol)
+            blocks.append(values)
+
+    times = np.array(stamps, dtype='datetime64[s]').astype(np.int64).astype(np.float64)
+    order = np.argsort(times, kind='stable')
+
+    if len(blocks) == 0:
+        return {'time': times, 'latitude': np.zeros(0), 'longitude': np.zeros(0),
+                'components': list(COMPONENTS[dtype]), 'data': np.zeros((0, 0, ncomp))}
+
+    rows = np.concatenate(blocks).reshape(-1, ncol)
+    counts = np.array(counts)
+    same_grid = bool(np.all(counts == counts[0])) and _same_points(rows[:, 0:2], len(counts))
+
+    # snapshot of each row
+    snapshot = np.repeat(np.arange(len(counts)), counts)
+    grid, data = _assemble(rows[:, 0:2], rows[:, 2:], snapshot, len(counts), same_grid)
+
+    return {'time': times[order], 'latitude': grid[:, 0], 'longitude': grid[:, 1],
+            'components': list(COMPONENTS[dtype]), 'data': data[order]}
+
+
+def merge_day_cubes(cubes):
+    """
+    Concatenate day cubes in time; days with different grids are merged on the
+    union of their grid points, with NaNs where a day has no value
+    """
+    cubes = [cube for cube in cubes if len(cube['time']) > 0]
+    if len(cubes) == 0:
+        return None
+    if len(cubes) == 1:
+        return cubes[0]
+
+    first = cubes[0]
+    if all(np.array_equal(cube['latitude'], first['latitude']) and np.array_equal(cube['longitude'], first['longitude'])
+           for cube in cubes):
+        return {'time': np.concatenate([cube['time'] for cube in cubes]),
+                'latitude': first['latitude'], 'longitude': first['longitude'],
+                'components': first['components'],
+                'data': np.concatenate([cube['data'] for cube in cubes])}
+
+    ntimes = [len(cube['time']) for cube in cubes]
+    ncomp = first['data'].shape[2]
+    # one row per time and grid point of each day
+    rows = np.concatenate([np.tile(np.stack([cube['latitude'], cube['longitude']], axis=1), (len(cube['time']), 1))
+                           for cube in cubes])
+    values = np.concatenate([np.asarray(cube['data']).reshape(-1, ncomp) for cube in cubes])
+    snapshot = np.concatenate([np.repeat(np.arange(ntime) + offset, len(cube['latitude']))
+                               for ntime, offset, cube in zip(ntimes, np.cumsum([0] + ntimes[:-1]), cubes)])
+    grid, data = _assemble(rows, values, snapshot, sum(ntimes), same_grid=False)
+
+    return {'time': np.concatenate([cube['time'] for cube in cubes]),
+            'latitude': grid[:, 0], 'longitude': grid[:, 1],
+            'components': first['components'], 'data': data}
+
+
+def select_times(cube, trange, resolution):
+    """
+    Returns the indices of the snapshots of a day cube within trange at the
+    requested resolution (seconds), i.e., the times the file names generated by
+    dailynames(trange=trange, res=resolution) would have
+    """
+    from pytplot import time_double
+
+    start, end = time_double(trange[0]), time_double(trange[1])
+    first = np.floor(start/resolution)*resolution
+    last = max(np.ceil(end/resolution)*resolution, first + resolution)
+    times = cube['time']
+    return np.where((times >= first) & (times < last) & (np.mod(times, resolution) == 0))[0]
+
+
+def day_cube_output(cube, dtype, out_type='np', indices=None):
+    """
+    Convert (some of the snapshots of) a day cube to the outputs of read_data_files
+
+    Parameters
+    -----------
+        cube: dict
+            Day cube, from load_day_cube or merge_day_cubes
+
+        dtype: str
+            Data type; valid options: 'EICS' or 'SECS'
+
+        out_type: str
+            'df' (pandas dataframe), 'np' (numpy array), 'dc' (dictionary)
+            or 'cube' (the day cube itself)
+
+        indices: ndarray
+            Indices of the snapshots to return (default: all)
+
+    Returns
+    --------
+        The data, in the same layout as read_data_files, except that the last
+        column of the 'np' output holds the unix times of the snapshots rather
+        than their time strings, so that the array is a float array; grid
+        points without a value in a snapshot are left out of the 'df' and 'np'
+        outputs
+    """
+    components = COMPONENTS[dtype]
+    if indices is None:
+        indices = np.arange(len(cube['time']))
+    times = cube['time'][indices]
+    data = np.asarray(cube['data'][indices], dtype=np.float64)
+
+    if out_type == 'cube':
+        return {'time': times, 'latitude': cube['latitude'], 'longitude': cube['longitude'],
+                'components': list(components), 'data': data}
+
+    if out_type == 'dc':
+        output = {'time': times, 'latitude': cube['latitude'], 'longitude': cube['longitude']}
+        for comp_idx, component in enumerate(components):
+            output[component] = data[:, :, comp_idx]
+        return output
+
+    if out_type not in ['df', 'np']:
+        raise TypeError("%r are invalid keyword arguments" % out_type)
+
+    # one row per snapshot and grid point, as in the snapshot files
+    npoints = len(cube['latitude'])
+    keep = ~np.all(np.isnan(data), axis=2).reshape(-1)
+    columns = [np.tile(cube['latitude'], len(times)), np.tile(cube['longitude'], len(times))]
+    columns += [data[:, :, comp_idx].reshape(-1) for comp_idx in range(len(components))]
+
+    if out_type == 'np':
+        columns.append(np.repeat(times, npoints))
+        return np.stack(columns, axis=1)[keep]
+
+    import pandas as pd
+    date_time = np.datetime_as_string(times.astype(np.int64).astype('datetime64[s]'))
+    date_time = np.char.replace(np.char.replace(np.char.replace(date_time, '-', ''), ':', ''), 'T', '_')
+    output = pd.DataFrame(dict(zip(['latitude', 'longitude'] + components, [values[keep] for values in columns])))
+    output['datetime'] = np.repeat(date_time, npoints)[keep]
+    return output
+
+
+def _same_points(grid_rows, nsnapshots):
+    """
+    Check if snapshots with the same number of rows all have the same grid
+    points, in the same order
+    """
+    grid_rows = grid_rows.reshape(nsnapshots, -1, 2)
+    return bool(np.all(grid_rows == grid_rows[0]))
+
+
+def _assemble(grid_rows, values, snapshot, nsnapshots, same_grid):
+    """
+    Put the rows of the snapshots into a (snapshot x grid point x component) array;
+    if the snapshots don't share one grid, the grid is the union of their grid points
+    """
+    ncomp = values.shape[1]
+    if same_grid:
+        npoints = len(grid_rows) // nsnapshots
+        return grid_rows[0:npoints].copy(), values.reshape(nsnapshots, npoints, ncomp)
+
+    grid, point = np.unique(grid_rows, axis=0, return_inverse=True)
+    data = np.full((nsnapshots, len(grid), ncomp), np.nan)
+    data[snapshot, point.reshape(-1)] = values
+    return grid, data
+
+
+def _read_cache(archive_file, stamp, ncomp):
+    """
+    Returns the day cube in the cache files for an archive, or None if there
+    isn't a valid cache
+    """
+    data_file, meta_file = day_cube_files(archive_file)
+    if not os.path.exists(data_file) or not os.path.exists(meta_file):
+        return None
+    try:
+        with np.load(meta_file, allow_pickle=False) as meta:
+            if meta['version'] != DAY_CUBE_VERSION or (int(meta['mtime']), int(meta['size'])) != stamp:
+                return None
+            cube = {key: meta[key] for key in ['time', 'latitude', 'longitude']}
+        data = np.load(data_file, mmap_mode='r', allow_pickle=False)
+    except (OSError, ValueError, KeyError, zipfile.BadZipFile):
+        return None
+    if data.shape != (len(cube['time']), len(cube['latitude']), ncomp):
+        return None
+    cube['data'] = data
+    return cube
+
+
+def _write_cache(archive_file, stamp, cube):
+    """
+    Save a day cube to the cache files for an archive; the files are written
+    under temporary names first, and the .npz file (which validates the cache)
+    is written last, so that a partially written cache is never read
+    """
+    data_file, meta_file = day_cube_files(archive_file)
+    temp_files = [name + '.' + str(os.getpid()) + '.tmp' for name in [data_file, meta_file]]
+    try:
+        if os.path.exists(meta_file):
+            os.remove(meta_file)
+        with open(temp_files[0], 'wb') as f:
+            np.save(f, np.ascontiguousarray(cube['data'], dtype=np.float64))
+        os.replace(temp_files[0], data_file)
+        with open(temp_files[1], 'wb') as f:
+            np.savez(f, version=DAY_CUBE_VERSION, mtime=stamp[0], size=stamp[1],
+                     time=cube['time'], latitude=cube['latitude'], longitude=cube['longitude'])
+        os.replace(temp_files[1], meta_file)
+    except OSError as e:
+        logging.warning('Unable to write the day cube cache for ' + archive_file + ': ' + str(e))
+        for temp_file in temp_files:
+            if os.path.exists(temp_file):
+                os.remove(temp_file)
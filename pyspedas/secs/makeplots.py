@@ -10,9 +10,8 @@ from matplotlib.colors import TwoSlopeNorm, Normalize, SymLogNorm, NoNorm, LogNo
 from .config import CONFIG
 from itertools import chain
 from matplotlib.path import Path
-from pyspedas.secs import read_data_files
+from .load import load
 from datetime import datetime, timedelta
-from pyspedas.utilities.dailynames import dailynames
 from mpl_toolkits.basemap.solar import daynight_terminator
 import logging
 #os.environ['PROJ_LIB'] = '/Users/cao/anaconda3/envs/secs/share/proj'
@@ -202,11 +201,8 @@ def _make_EICS_plots(dtime=None, vplot_sized=False, contour_den=8, s_loc=False,
     if not os.path.exists(CONFIG['plots_dir']):
         os.makedirs(CONFIG['plots_dir'])
     dtime_range = [dtime, dtime]
-    pathformat_prefix = dtype + '/%Y/%m/'
-    pathformat_unzipped = pathformat_prefix + '%d/' + dtype + '%Y%m%d_%H%M%S.dat'
-    filename_unzipped = dailynames(file_format=pathformat_unzipped, trange=dtime_range, res=10)
-    out_files_unzipped = [CONFIG['local_data_dir'] + rf_res for rf_res in filename_unzipped]
-    Data_Days_time = read_data_files(out_files=out_files_unzipped, dtype=dtype, out_type='df')
+    # the snapshot at dtime, from the (cached) day cube of the downloaded archive
+    Data_Days_time = load(trange=dtime_range, resolution=10, dtype=dtype, no_download=True, out_type='df')
 
     if pred == True: # XC
         obs_var = Data_Days_time['Jy']
@@ -522,11 +518,8 @@ def _make_SECS_plots(data=None, dtime=None, contour_den=8, s_loc=False):
     if not os.path.exists(CONFIG['plots_dir']):
         os.makedirs(CONFIG['plots_dir'])
     dtime_range = [dtime, dtime]
-    pathformat_prefix = dtype + '/%Y/%m/'
-    pathformat_unzipped = pathformat_prefix + '%d/' + dtype + '%Y%m%d_%H%M%S.dat'
-    filename_unzipped = dailynames(file_format=pathformat_unzipped, trange=dtime_range, res=10)
-    out_files_unzipped = [CONFIG['local_data_dir'] + rf_res for rf_res in filename_unzipped]
-    Data_Days_time = read_data_files(out_files=out_files_unzipped, dtype=dtype, out_type='df')
+    # the snapshot at dtime, from the (cached) day cube of the downloaded archive
+    Data_Days_time = load(trange=dtime_range, resolution=10, dtype=dtype, no_download=True, out_type='df')
 
     J_comp = Data_Days_time['J']
     Jc_max, Jc_min = J_comp.max(), J_comp.min()
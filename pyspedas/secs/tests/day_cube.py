@@ -0,0 +1,103 @@
+import gzip
+import os
+import shutil
+import tempfile
+import unittest
+import zipfile
+import numpy as np
+from numpy.testing import assert_allclose
+from pyspedas.secs.day_cube import load_day_cube, merge_day_cubes, select_times, day_cube_output, day_cube_files
+
+
+def make_archive(filename, day, times, points, compress_gz=False):
+    """
+    Write a synthetic daily EICS archive, with one member per snapshot
+    """
+    rng = np.random.default_rng(3)
+    currents = {}
+    with zipfile.ZipFile(filename, 'w', zipfile.ZIP_DEFLATED) as zf:
+        for seconds in times:
+            stamp = day + '_%02d%02d%02d' % (seconds // 3600, (seconds // 60) % 60, seconds % 60)
+            values = rng.normal(size=(len(points), 2))*100.0
+            currents[seconds] = values
+            text = ''.join('%10.3f %10.3f %12.5f %12.5f\n' % (lat, lon, jx, jy) for (lat, lon), (jx, jy) in zip(points, values))
+            zf.writestr(day[6:8] + '/EICS' + stamp + '.dat', text)
+    if compress_gz:
+        with open(filename, 'rb') as f_in, gzip.open(filename + '.gz', 'wb') as f_out:
+            shutil.copyfileobj(f_in, f_out)
+        os.remove(filename)
+    return currents
+
+
+class DayCubeTestCases(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.points = [(50.0, -120.0), (50.0, -115.0), (55.0, -120.0)]
+        self.archive = os.path.join(self.dir, 'EICS20170327.zip')
+        # members are written out of order
+        self.currents = make_archive(self.archive, '20170327', [20, 0, 10, 3600], self.points)
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def test_read_archive(self):
+        cube = load_day_cube(self.archive, 'EICS', cache=False)
+        assert_allclose(cube['time'], 1490572800.0 + np.array([0, 10, 20, 3600]))
+        assert_allclose(cube['latitude'], [50.0, 50.0, 55.0])
+        assert_allclose(cube['longitude'], [-120.0, -115.0, -120.0])
+        self.assertEqual(cube['data'].shape, (4, 3, 2))
+        for idx, seconds in enumerate([0, 10, 20, 3600]):
+            assert_allclose(cube['data'][idx], self.currents[seconds], atol=1e-5)
+        self.assertFalse(os.path.exists(day_cube_files(self.archive)[0]))
+
+    def test_cache(self):
+        cube = load_day_cube(self.archive, 'EICS')
+        self.assertTrue(all(os.path.exists(name) for name in day_cube_files(self.archive)))
+        cached = load_day_cube(self.archive, 'EICS')
+        self.assertIsInstance(cached['data'], np.memmap)
+        assert_allclose(cached['data'], cube['data'])
+        assert_allclose(cached['time'], cube['time'])
+
+        # the cache is rebuilt when the archive changes
+        make_archive(self.archive, '20170327', [0], self.points)
+        self.assertEqual(load_day_cube(self.archive, 'EICS')['data'].shape, (1, 3, 2))
+
+    def test_gz_archive(self):
+        archive = os.path.join(self.dir, 'EICS20070101.zip')
+        make_archive(archive, '20070101', [0, 10], self.points, compress_gz=True)
+        cube = load_day_cube(archive + '.gz', 'EICS')
+        self.assertEqual(cube['data'].shape, (2, 3, 2))
+        self.assertTrue(day_cube_files(archive + '.gz')[0].endswith('EICS20070101.cube.npy'))
+
+    def test_outputs(self):
+        cube = load_day_cube(self.archive, 'EICS')
+        indices = select_times(cube, ['2017-03-27/00:00:00', '2017-03-27/00:00:15'], 10)
+        self.assertEqual(indices.tolist(), [0, 1])
+        # resolution of 20 seconds
+        self.assertEqual(select_times(cube, ['2017-03-27', '2017-03-28'], 20).tolist(), [0, 2, 3])
+
+        df = day_cube_output(cube, 'EICS', out_type='df', indices=indices)
+        self.assertEqual(list(df.columns), ['latitude', 'longitude', 'Jx', 'Jy', 'datetime'])
+        self.assertEqual(df['datetime'].tolist(), ['20170327_000000']*3 + ['20170327_000010']*3)
+        assert_allclose(df['Jy'].to_numpy()[3:], self.currents[10][:, 1], atol=1e-5)
+
+        np_out = day_cube_output(cube, 'EICS', out_type='np', indices=indices)
+        self.assertEqual(np_out.dtype, np.float64)
+        assert_allclose(np_out[:, 4], [1490572800.0]*3 + [1490572810.0]*3)
+
+        dc = day_cube_output(cube, 'EICS', out_type='dc', indices=indices)
+        assert_allclose(dc['Jx'], cube['data'][0:2, :, 0])
+
+    def test_merge_grids(self):
+        other = os.path.join(self.dir, 'EICS20170328.zip')
+        make_archive(other, '20170328', [0], self.points[1:] + [(60.0, -100.0)])
+        cube = merge_day_cubes([load_day_cube(self.archive, 'EICS'), load_day_cube(other, 'EICS')])
+        self.assertEqual(cube['data'].shape, (5, 4, 2))
+        # the first grid point isn't in the second day, and the last isn't in the first
+        self.assertTrue(np.all(np.isnan(cube['data'][4, 0])))
+        self.assertTrue(np.all(np.isnan(cube['data'][0:4, 3])))
+        self.assertEqual(len(day_cube_output(cube, 'EICS', out_type='df')), 4*3 + 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
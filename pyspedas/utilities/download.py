@@ -1,18 +1,27 @@
 import os
 import re
+import time
 import warnings
 import requests
 import logging
 import fnmatch
+import hashlib
 import datetime
+import threading
+import secrets
 import pkg_resources
 
 from pathlib import Path
-from shutil import copyfileobj, copy
-from tempfile import NamedTemporaryFile
+from urllib.parse import urlparse
+from concurrent.futures import ThreadPoolExecutor
 from html.parser import HTMLParser
 from netCDF4 import Dataset
 from cdflib import CDF
+from pyspedas.utilities import index_cache
+
+# HTTP status codes that indicate a transient problem on the server side; requests
+# returning these are retried with an exponential backoff
+_retry_status_codes = (429, 500, 502, 503, 504)
 
 
 # the following is used to parse the links from an HTML index file
@@ -64,6 +73,83 @@ def check_downloaded_file(filename):
     return result
 
 
+def stream_to_file(fsrc, filename, expected_size=None, checksum=None, hash_name='md5', chunk_size=1024*1024):
+    """
+    Write the body of a streamed HTTP response to a file
+
+    The data are written to a temporary file in the destination directory, which is
+    renamed to the final file name once the transfer completes (and passes the optional
+    size and checksum checks), so a partially written file never appears at the final path.
+
+    Parameters:
+        fsrc: requests.Response object
+            Response from a request made with stream=True
+
+        filename: str
+            Local file name
+
+        expected_size: int
+            Expected size of the file, in bytes
+
+        checksum: str
+            Expected hex digest of the file; computed while streaming the data
+
+        hash_name: str
+            Name of the hashlib algorithm used to compute the checksum. Default is 'md5'.
+
+        chunk_size: int
+            Number of bytes read from the stream at a time
+
+    Returns:
+        True if the file was saved, False if the size or the checksum didn't match
+    """
+    out_dir = os.path.dirname(filename)
+    if out_dir != '':
+        os.makedirs(out_dir, exist_ok=True)
+
+    digest = hashlib.new(hash_name) if checksum is not None else None
+    size = 0
+
+    # the temporary file is created with the permissions a regular file would get
+    # (0o666, less the umask), since it's renamed to the final file name
+    while True:
+        tmp_name = os.path.join(out_dir, '.' + os.path.basename(filename) + '.' + secrets.token_hex(4) + '.part')
+        try:
+            fd = os.open(tmp_name, os.O_WRONLY | os.O_CREAT | os.O_EXCL | getattr(os, 'O_BINARY', 0), 0o666)
+            break
+        except FileExistsError:
+            continue
+
+    try:
+        with os.fdopen(fd, 'wb') as ftmp:
+            while True:
+                chunk = fsrc.raw.read(chunk_size)
+                if not chunk:
+                    break
+                ftmp.write(chunk)
+                size += len(chunk)
+                if digest is not None:
+                    digest.update(chunk)
+
+        if expected_size is not None and size != int(expected_size):
+            logging.error('Incomplete download: ' + filename + ' (received ' + str(size) + ' of ' + str(expected_size) + ' bytes)')
+            os.unlink(tmp_name)
+            return False
+
+        if digest is not None and digest.hexdigest().lower() != checksum.lower():
+            logging.error('Checksum mismatch: ' + filename)
+            os.unlink(tmp_name)
+            return False
+
+        os.replace(tmp_name, filename)
+    except BaseException:
+        if os.path.exists(tmp_name):
+            os.unlink(tmp_name)
+        raise
+
+    return True
+
+
 def download_file(url=None,
                   filename=None,
                   headers={},
@@ -72,7 +158,9 @@ def download_file(url=None,
                   verify=False,
                   session=None,
                   basic_auth=False,
-                  nbr_tries=0):
+                  nbr_tries=0,
+                  max_retries=3,
+                  retry_backoff=0.5):
     """
     Download a file and return its local path; this function is primarily meant to be called by the download function
 
@@ -101,6 +189,14 @@ def download_file(url=None,
         nbr_tries: int
             Counts how many times we tried to download the file. Default is 0.
 
+        max_retries: int
+            Number of times to retry the request after a connection error or a
+            transient server error (429, 500, 502, 503, 504). Default is 3.
+
+        retry_backoff: float
+            Base delay in seconds between retries; the delay doubles after each
+            failed attempt. Default is 0.5.
+
     Notes:
         Checks if the CDF or netCDF file can be opened, and if it can't, tries to download the file for a second time.
 
@@ -111,6 +207,10 @@ def download_file(url=None,
     headers_original = headers
     session_original = session
 
+    # work on a copy of the headers, so that concurrent calls sharing the same
+    # dictionary don't see each other's If-Modified-Since values
+    headers = dict(headers)
+
     if session is None:
         session = requests.Session()
 
@@ -123,16 +223,38 @@ def download_file(url=None,
         mod_tm = (datetime.datetime.utcfromtimestamp(os.path.getmtime(filename))).strftime('%a, %d %b %Y %H:%M:%S GMT')
         headers['If-Modified-Since'] = mod_tm
 
-    with warnings.catch_warnings():
-        warnings.simplefilter("ignore", category=ResourceWarning)
-        if not basic_auth:
-            fsrc = session.get(url, stream=True, verify=verify, headers=headers)
-        else:
-            fsrc = session.get(url, stream=True, verify=verify, headers=headers, auth=(username, password))
+    fsrc = None
+    for attempt in range(max_retries + 1):
+        if attempt > 0:
+            delay = retry_backoff * 2 ** (attempt - 1)
+            logging.info('Retrying ' + url + ' in ' + str(delay) + ' seconds')
+            time.sleep(delay)
+
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", category=ResourceWarning)
+            try:
+                if not basic_auth:
+                    fsrc = session.get(url, stream=True, verify=verify, headers=headers)
+                else:
+                    fsrc = session.get(url, stream=True, verify=verify, headers=headers, auth=(username, password))
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+                # only an error once all the attempts failed
+                logging.warning('Connection error (attempt ' + str(attempt + 1) + ' of ' + str(max_retries + 1) + '): ' + url)
+                logging.debug(str(e))
+                fsrc = None
+                continue
+
+        if fsrc.status_code not in _retry_status_codes:
+            break
 
-    # need to delete the If-Modified-Since header so it's not set in the dictionary in subsequent calls
-    if headers.get('If-Modified-Since') is not None:
-        del headers['If-Modified-Since']
+        logging.info('Server returned status ' + str(fsrc.status_code) + ' for ' + url
+                     + ' (attempt ' + str(attempt + 1) + ' of ' + str(max_retries + 1) + ')')
+        if attempt < max_retries:
+            fsrc.close()
+
+    if fsrc is None:
+        logging.error('Connection error: ' + url + ' (failed after ' + str(max_retries + 1) + ' attempts)')
+        return None
 
     needs_to_download_file = False
     if fsrc.status_code == 304:
@@ -160,21 +282,19 @@ def download_file(url=None,
         return None
 
     if needs_to_download_file:
-        ftmp = NamedTemporaryFile(delete=False)
-
-        with open(ftmp.name, 'wb') as f:
-            copyfileobj(fsrc.raw, f)
-
-        # make sure the directory exists
-        if not os.path.exists(os.path.dirname(filename)) and os.path.dirname(filename) != '':
-            os.makedirs(os.path.dirname(filename))
+        # the raw stream contains exactly Content-Length bytes, even if the content is encoded
+        expected_size = fsrc.headers.get('Content-Length')
 
-        # if the download was successful, copy to data directory
-        copy(ftmp.name, filename)
+        try:
+            saved = stream_to_file(fsrc, filename, expected_size=expected_size)
+        except (requests.exceptions.RequestException, OSError) as e:
+            logging.error('Error downloading ' + url + ': ' + str(e))
+            saved = False
+        finally:
+            fsrc.close()
 
-        fsrc.close()
-        ftmp.close()
-        os.unlink(ftmp.name)  # delete the temporary file
+        if not saved:
+            return None
 
         logging.info('Download complete: ' + filename)
 
@@ -195,7 +315,9 @@ def download_file(url=None,
                       verify=verify,
                       session=session_original,
                       basic_auth=basic_auth,
-                      nbr_tries=nbr_tries)
+                      nbr_tries=nbr_tries,
+                      max_retries=max_retries,
+                      retry_backoff=retry_backoff)
 
     # If the file again cannot be opened, we give up.
     if nbr_tries > 0 and check_downloaded_file(filename) == False:
@@ -222,7 +344,12 @@ def download(remote_path='',
              last_version=False,
              basic_auth=False,
              regex=False,
-             no_wildcards=False):
+             no_wildcards=False,
+             max_workers=4,
+             max_retries=3,
+             retry_backoff=0.5,
+             use_index_cache=True,
+             index_ttl=None):
     """
     Download one or more remote files and return their local paths.
 
@@ -272,6 +399,32 @@ def download(remote_path='',
         no_wildcards: bool
             Flag to assume no wild cards in the requested url/filename
 
+        max_workers: int
+            Maximum number of simultaneous connections to each remote host;
+            set to 1 to download the files one at a time. Default is 4.
+
+        max_retries: int
+            Number of times to retry a file after a connection error or a
+            transient server error. Default is 3.
+
+        retry_backoff: float
+            Base delay in seconds between retries; the delay doubles after each
+            failed attempt. Default is 0.5.
+
+        use_index_cache: bool
+            Flag to keep the remote index listings used to expand wildcards in the
+            on-disk cache (see pyspedas.utilities.index_cache); the cached listings
+            are also used to expand wildcards when no_download is set, or when the
+            server can't be reached. Default is True.
+
+        index_ttl: float
+            Number of seconds a cached index listing is used without revalidating
+            it with the server; defaults to the SPEDAS_INDEX_CACHE_TTL environment
+            variable, or if that isn't set, to 0. By default, the cached listings
+            are always revalidated with a conditional request (using the ETag and
+            Last-Modified values returned by the server); a larger TTL avoids these
+            requests, but files added to the server within the TTL won't be found
+
     Returns:
         String list specifying the full local path to all requested files
 
@@ -294,7 +447,7 @@ def download(remote_path='',
         return
 
     if session is None:
-        session = requests.Session()
+        session = _new_session(max_workers)
 
     if username is not None:
         session.auth = requests.auth.HTTPDigestAuth(username, password)
@@ -309,68 +462,47 @@ def download(remote_path='',
     out = []
     index_table = {}
 
+    # list of files to process, in the order they should be returned; each entry is a dict
+    # with the remote URL, the local file name, whether the file should be downloaded,
+    # and the options to use when searching for local files if the download fails
+    jobs = []
+
     if not isinstance(remote_file, list):
         remote_file = [remote_file]
 
     urls = [remote_path+rfile for rfile in remote_file]
 
     for url in urls:
-        resp_data = None
         url_file = url[url.rfind("/")+1:]
         url_base = url.replace(url_file, '')
 
         # automatically use remote_file locally if local_file is not specified
         if local_file_in == '':
-            # if remote_file is the entire url then only use the filename
-            if remote_path == '':
-                local_file = url_file
-            else:
-                local_file = url.replace(remote_path, '')
-
-                if local_file == '':  # remote_path was the full file name
-                    local_file = remote_path[remote_path.rfind("/")+1:]
+            local_file = _local_file_name(url, remote_path)
 
         filename = os.path.join(local_path, local_file)
 
         short_path = local_file[:1+local_file.rfind("/")]
 
-        if not no_download:
-            # expand the wildcards in the url
-            if ('?' in url or '*' in url or regex) and (not no_download and not no_wildcards):
-                if index_table.get(url_base) is not None:
-                    links = index_table[url_base]
-                else:
-                    logging.info('Downloading remote index: ' + url_base)
-
-                    # we'll need to parse the HTML index file for the file list
-                    with warnings.catch_warnings():
-                        warnings.simplefilter("ignore", category=ResourceWarning)
-                        try:
-                            if not basic_auth:
-                                html_index = session.get(url_base, verify=verify, headers=headers)
-                            else:
-                                html_index = session.get(url_base, verify=verify, headers=headers, auth=(username, password))
-                        except requests.exceptions.ConnectionError:
-                            continue
-
-                    if html_index.status_code == 404:
-                        logging.error('Remote index not found: ' + url_base)
-                        continue
-
-                    if html_index.status_code == 401 or html_index.status_code == 403:
-                        logging.error('Unauthorized: ' + url_base)
-                        continue
-
-                    # grab the links
-                    link_parser = LinkParser()
-                    link_parser.feed(html_index.text)
-
-                    try:
-                        links = link_parser.links
-                        index_table[url_base] = links
-                    except AttributeError:
-                        links = []
+        online = not no_download
 
+        # expand the wildcards in the url
+        if ('?' in url or '*' in url or regex) and not no_wildcards:
+            if index_table.get(url_base) is not None:
+                links = index_table[url_base]
+            elif no_download:
+                # use the cached listing, if there is one, instead of searching the local directories
+                cached = index_cache.load_index(url_base) if use_index_cache else None
+                links = cached['links'] if cached is not None else None
+            else:
+                links, online = _remote_index(url_base, session=session, verify=verify, headers=headers,
+                                              auth=(username, password) if basic_auth else None,
+                                              use_cache=use_index_cache, ttl=index_ttl)
+                if links is None:
+                    continue
+                index_table[url_base] = links
+
+            if links is not None:
                 # find the file names that match our string
                 if not regex:
                     # note: fnmatch.filter accepts ? (single character) and * (multiple characters)
@@ -379,10 +511,10 @@ def download(remote_path='',
                     reg_expression = re.compile(url_file)
                     new_links = list(filter(reg_expression.match, links))
 
-                if len(new_links) == 0:
+                if online and len(new_links) == 0:
                     logging.info("No links matching pattern %s found at remote index %s", url_file, url_base)
 
-                if last_version and len(new_links) > 1:
+                if online and last_version and len(new_links) > 1:
                     new_links = sorted(new_links)
                     new_links = [new_links[-1]]
 
@@ -390,59 +522,241 @@ def download(remote_path='',
                     # the user specified a wild card in the remote_path
                     remote_path = url_base
 
-                # download the files
-                for new_link in new_links:
-                    resp_data = download(remote_path=remote_path, remote_file=short_path+new_link,
-                                         local_path=local_path, username=username, password=password,
-                                         verify=verify, headers=headers, session=session, basic_auth=basic_auth)
-                    if resp_data is not None:
-                        for file in resp_data:
-                            out.append(file)
-                session.close()
-                continue
-            resp_data = download_file(url=url, filename=filename, username=username, password=password, verify=verify,
-                                      headers=headers, session=session, basic_auth=basic_auth)
+                # queue the matching files; these are treated as plain files, i.e.,
+                # without wildcards, regular expressions or version selection
+                link_jobs = []
+                for new_link in sorted(new_links) if not online else new_links:
+                    link_url = remote_path + short_path + new_link
+                    link_file = _local_file_name(link_url, remote_path)
+                    link_filename = os.path.join(local_path, link_file)
+                    if not online and not os.path.exists(link_filename):
+                        continue
+                    link_jobs.append({'url': link_url,
+                                      'filename': link_filename,
+                                      'local_file': link_file,
+                                      'download': online,
+                                      'local': not online,
+                                      'regex': False,
+                                      'last_version': False})
+
+                if not online and last_version and len(link_jobs) > 1:
+                    link_jobs = [link_jobs[-1]]
+
+                # when working offline, fall back to searching the local directories
+                # if none of the files in the cached listing are available
+                if online or len(link_jobs) > 0:
+                    jobs.extend(link_jobs)
+                    continue
+
+        jobs.append({'url': url,
+                     'filename': filename,
+                     'local_file': local_file,
+                     'download': online,
+                     'local': False,
+                     'regex': regex,
+                     'last_version': last_version})
+
+    results = _download_files([job for job in jobs if job['download']],
+                              max_workers=max_workers,
+                              username=username,
+                              password=password,
+                              verify=verify,
+                              headers=headers,
+                              session=session,
+                              basic_auth=basic_auth,
+                              max_retries=max_retries,
+                              retry_backoff=retry_backoff)
+
+    for job in jobs:
+        resp_data = None
+        if job['download']:
+            resp_data = results[job['url'], job['filename']]
 
         if resp_data is not None:
-            if not isinstance(resp_data, list):
-                resp_data = [resp_data]
-            for file in resp_data:
-                out.append(file)
+            out.append(resp_data)
+        elif job['local']:
+            # file from the cached listing, already known to exist locally
+            out.append(job['filename'])
         else:
             # download wasn't successful, search for local files
             logging.info('Searching for local files...')
-            
-            temp_out = []
-            
-            if local_path == '':
-                local_path_to_search = str(Path('.').resolve())
-            else:
-                local_path_to_search = local_path
+            temp_out = _search_local_files(local_path, job['local_file'], regex=job['regex'])
 
-            for dirpath, dirnames, filenames in os.walk(local_path_to_search):
-                local = local_file[local_file.rfind("/")+1:]
-                if not regex:
-                    matching_files = fnmatch.filter(filenames, local)
-                else:
-                    reg_expression = re.compile(local)
-                    matching_files = list(filter(reg_expression.match, filenames))
-
-                for file in matching_files:
-                    # out.append(os.path.join(dirpath, file))
-                    temp_out.append(os.path.join(dirpath, file))
-                                
-            # check if the file exists, and if so, set the last modification time in the header
             if len(temp_out) == 0:
-                logging.info('No local files found for ' + url)
+                logging.info('No local files found for ' + job['url'])
                 continue
-            temp_out = sorted(temp_out)
-            
-            if last_version:
+
+            if job['last_version']:
                 out.append(temp_out[-1]) # append the latest version
             else:
                 for file in temp_out:
                     out.append(file)
 
-
     session.close()
     return out
+
+
+def _remote_index(url_base, session=None, verify=True, headers={}, auth=None, use_cache=True, ttl=None):
+    """
+    Return the list of links in a remote HTML index
+
+    The listing is taken from the index cache if it's still fresh; otherwise, it's
+    revalidated with a conditional request, and downloaded and parsed only if it changed.
+
+    Returns:
+        Tuple containing the list of links (None if the index couldn't be loaded), and a flag
+        that is False if the server couldn't be reached and the cached listing was used instead
+    """
+    cached = index_cache.load_index(url_base) if use_cache else None
+
+    if index_cache.is_fresh(cached, ttl):
+        logging.debug('Using cached remote index: ' + url_base)
+        return cached['links'], True
+
+    logging.info('Downloading remote index: ' + url_base)
+
+    request_headers = dict(headers)
+    request_headers.update(index_cache.validation_headers(cached))
+
+    # we'll need to parse the HTML index file for the file list
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", category=ResourceWarning)
+        try:
+            html_index = session.get(url_base, verify=verify, headers=request_headers, auth=auth)
+        except requests.exceptions.ConnectionError:
+            if cached is not None:
+                logging.info('Unable to connect; using the cached remote index: ' + url_base)
+                return cached['links'], False
+            return None, True
+
+    if html_index.status_code == 304 and cached is not None:
+        index_cache.save_index(url_base, cached['links'], etag=cached.get('etag'),
+                               last_modified=cached.get('last_modified'))
+        return cached['links'], True
+
+    if html_index.status_code == 404:
+        logging.error('Remote index not found: ' + url_base)
+        return None, True
+
+    if html_index.status_code == 401 or html_index.status_code == 403:
+        logging.error('Unauthorized: ' + url_base)
+        return None, True
+
+    # grab the links
+    link_parser = LinkParser()
+    link_parser.feed(html_index.text)
+
+    try:
+        links = link_parser.links
+    except AttributeError:
+        links = []
+
+    if use_cache and html_index.status_code == 200:
+        index_cache.save_index(url_base, links, etag=html_index.headers.get('ETag'),
+                               last_modified=html_index.headers.get('Last-Modified'))
+
+    return links, True
+
+
+def _new_session(max_workers=4):
+    """
+    Create a requests session whose connection pool keeps enough keep-alive
+    connections open for max_workers simultaneous downloads from each host
+    """
+    session = requests.Session()
+    pool_size = max(int(max_workers), 1)
+    adapter = requests.adapters.HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+
+def _local_file_name(url, remote_path):
+    """
+    Return the local file name (relative to local_path) for a remote URL
+    """
+    url_file = url[url.rfind("/")+1:]
+
+    # if remote_file is the entire url then only use the filename
+    if remote_path == '':
+        return url_file
+
+    local_file = url.replace(remote_path, '')
+    if local_file == '':  # remote_path was the full file name
+        local_file = remote_path[remote_path.rfind("/")+1:]
+    return local_file
+
+
+def _search_local_files(local_path, local_file, regex=False):
+    """
+    Return the sorted list of files under local_path matching the file name in local_file
+    """
+    out = []
+
+    if local_path == '':
+        local_path_to_search = str(Path('.').resolve())
+    else:
+        local_path_to_search = local_path
+
+    local = local_file[local_file.rfind("/")+1:]
+    if regex:
+        reg_expression = re.compile(local)
+
+    for dirpath, dirnames, filenames in os.walk(local_path_to_search):
+        if not regex:
+            matching_files = fnmatch.filter(filenames, local)
+        else:
+            matching_files = list(filter(reg_expression.match, filenames))
+
+        for file in matching_files:
+            out.append(os.path.join(dirpath, file))
+
+    return sorted(out)
+
+
+def _download_files(jobs, max_workers=4, **kwargs):
+    """
+    Download a list of files with at most max_workers simultaneous connections to each host
+
+    Parameters:
+        jobs: list of dict
+            Files to download; each dict contains the remote 'url' and the local 'filename'
+
+        max_workers: int
+            Maximum number of simultaneous connections to each host
+
+        All other keywords are passed to download_file
+
+    Returns:
+        Dictionary mapping each (url, filename) pair to the local file name returned
+        by download_file (None if the download failed)
+    """
+    results = {}
+    # the same file can be requested more than once, e.g., with overlapping wildcards;
+    # only download it once
+    unique_jobs = list(dict.fromkeys((job['url'], job['filename']) for job in jobs))
+
+    if len(unique_jobs) == 0:
+        return results
+
+    max_workers = max(int(max_workers), 1)
+
+    if max_workers == 1 or len(unique_jobs) == 1:
+        for url, filename in unique_jobs:
+            results[url, filename] = download_file(url=url, filename=filename, **kwargs)
+        return results
+
+    # limit the number of connections to each host
+    hosts = {urlparse(url).netloc for url, filename in unique_jobs}
+    host_limits = {host: threading.BoundedSemaphore(max_workers) for host in hosts}
+
+    def fetch(url, filename):
+        with host_limits[urlparse(url).netloc]:
+            return download_file(url=url, filename=filename, **kwargs)
+
+    with ThreadPoolExecutor(max_workers=min(max_workers*len(hosts), len(unique_jobs))) as executor:
+        futures = [(key, executor.submit(fetch, *key)) for key in unique_jobs]
+        for key, future in futures:
+            results[key] = future.result()
+
+    return results
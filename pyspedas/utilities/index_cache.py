@@ -0,0 +1,156 @@
+"""
+On-disk cache of the remote HTML index listings used to expand wildcards in download()
+
+Each listing is stored as a small JSON file named after a hash of its URL, together
+with the ETag and Last-Modified values returned by the server, so that the cache
+is shared by all load routines and Python processes using the same cache directory.
+
+The cache is configured with the following environment variables:
+
+    SPEDAS_INDEX_CACHE_DIR: directory containing the cached listings; defaults to
+        'index_cache' in SPEDAS_DATA_DIR, or ~/.pyspedas/index_cache if that isn't set
+
+    SPEDAS_INDEX_CACHE_TTL: number of seconds a cached listing is used without
+        contacting the server; after this, the listing is revalidated using a
+        conditional request. Defaults to 0, i.e., the listings are always
+        revalidated, and only downloaded again if they changed on the server
+
+    SPEDAS_INDEX_CACHE: set to 0 to disable the cache
+"""
+import os
+import json
+import time
+import hashlib
+import logging
+from tempfile import NamedTemporaryFile
+
+CONFIG = {'enabled': True,
+          'cache_dir': os.path.join(os.path.expanduser('~'), '.pyspedas', 'index_cache'),
+          'ttl': 0.0}
+
+if os.environ.get('SPEDAS_DATA_DIR'):
+    CONFIG['cache_dir'] = os.path.join(os.environ['SPEDAS_DATA_DIR'], 'index_cache')
+
+if os.environ.get('SPEDAS_INDEX_CACHE_DIR'):
+    CONFIG['cache_dir'] = os.environ['SPEDAS_INDEX_CACHE_DIR']
+
+if os.environ.get('SPEDAS_INDEX_CACHE_TTL'):
+    CONFIG['ttl'] = float(os.environ['SPEDAS_INDEX_CACHE_TTL'])
+
+if os.environ.get('SPEDAS_INDEX_CACHE') in ['0', 'false', 'False']:
+    CONFIG['enabled'] = False
+
+# listings already read (or written) by this process, keyed by URL
+_memory_cache = {}
+
+
+def _cache_file(url):
+    return os.path.join(CONFIG['cache_dir'], hashlib.sha1(url.encode('utf-8')).hexdigest() + '.json')
+
+
+def load_index(url):
+    """
+    Return the cached listing for a remote index URL
+
+    Returns:
+        dict containing 'url', 'links', 'etag', 'last_modified' and 'fetched' (the
+        unix time the listing was last validated), or None if the URL isn't cached
+    """
+    if not CONFIG['enabled']:
+        return None
+
+    entry = _memory_cache.get(url)
+    filename = _cache_file(url)
+
+    try:
+        mtime = os.path.getmtime(filename)
+    except OSError:
+        return entry
+
+    # another process may have updated the listing since we last read it
+    if entry is not None and entry.get('_mtime') == mtime:
+        return entry
+
+    try:
+        with open(filename, 'r') as f:
+            entry = json.load(f)
+    except (OSError, ValueError):
+        logging.warning('Unable to read cached index for ' + url)
+        return None
+
+    if entry.get('url') != url:
+        return None
+
+    entry['_mtime'] = mtime
+    _memory_cache[url] = entry
+    return entry
+
+
+def save_index(url, links, etag=None, last_modified=None):
+    """
+    Save the listing for a remote index URL, along with the validators returned by the server
+    """
+    entry = {'url': url,
+             'links': list(links),
+             'etag': etag,
+             'last_modified': last_modified,
+             'fetched': time.time()}
+
+    _memory_cache[url] = entry
+
+    if not CONFIG['enabled']:
+        return entry
+
+    # write to a temporary file, then rename it, so that other processes
+    # never see a partially written listing
+    try:
+        os.makedirs(CONFIG['cache_dir'], exist_ok=True)
+        with NamedTemporaryFile('w', dir=CONFIG['cache_dir'], suffix='.tmp', delete=False) as f:
+            json.dump(entry, f)
+        os.replace(f.name, _cache_file(url))
+        entry['_mtime'] = os.path.getmtime(_cache_file(url))
+    except OSError:
+        logging.warning('Unable to save cached index for ' + url)
+
+    return entry
+
+
+def is_fresh(entry, ttl=None):
+    """
+    Check if a cached listing can be used without revalidating it with the server;
+    ttl defaults to the 'ttl' setting
+    """
+    if entry is None:
+        return False
+    if ttl is None:
+        ttl = CONFIG['ttl']
+    return time.time() - entry['fetched'] < ttl
+
+
+def validation_headers(entry):
+    """
+    Return the headers for a conditional request revalidating a cached listing
+    """
+    headers = {}
+    if entry is None:
+        return headers
+    if entry.get('etag') is not None:
+        headers['If-None-Match'] = entry['etag']
+    if entry.get('last_modified') is not None:
+        headers['If-Modified-Since'] = entry['last_modified']
+    return headers
+
+
+def clear_index_cache():
+    """
+    Remove all cached listings
+    """
+    _memory_cache.clear()
+    if not os.path.isdir(CONFIG['cache_dir']):
+        return
+    for file in os.listdir(CONFIG['cache_dir']):
+        if file.endswith('.json'):
+            try:
+                os.remove(os.path.join(CONFIG['cache_dir'], file))
+            except OSError:
+                pass
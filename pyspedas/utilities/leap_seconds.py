@@ -1,9 +1,38 @@
+"""
+Leap second table, and conversions between TAI, TT2000 and unix times
+
+The leap second table is parsed once per process, and kept until the table
+file changes; the conversions are binary searches on the table, and accept
+scalars or arrays.
+"""
+import bisect
 import os
 import datetime
-import pandas as pd
 import numpy as np
 from pyspedas.utilities.download import download
-from pyspedas import time_double
+
+# TAI seconds since 1958-01-01 at the unix epoch (1970-01-01)
+TAI_MINUS_UNIX = 378691200.0
+
+# TAI seconds since 1958-01-01 at the TT2000 epoch (2000-01-01T12:00:00 TT,
+# i.e., 2000-01-01T11:59:27.816 TAI), split into whole seconds and a fraction
+TT2000_EPOCH_TAI_SECONDS = 1325419168
+TT2000_EPOCH_TAI_FRACTION = -0.184
+
+# leap second table parsed from the table file, and the name, modification time
+# and size of the file it was parsed from
+_leap_table = {'stamp': None, 'table': None, 'unix': None, 'tai': None, 'leaps': None}
+
+
+def leap_table_file():
+    """
+    Returns the name of the leap second table file
+    """
+    if os.environ.get('CDF_LEAPSECONDSTABLE') is not None:
+        return os.environ.get('CDF_LEAPSECONDSTABLE')
+    elif os.environ.get('SPEDAS_DATA_DIR') is not None:
+        return os.path.join(os.environ.get('SPEDAS_DATA_DIR'), 'CDFLeapSeconds.txt')
+    return os.path.join('data', 'CDFLeapSeconds.txt')
 
 
 def load_leap_table(reload=False):
@@ -20,17 +49,13 @@ def load_leap_table(reload=False):
 
     Returns
     ---------
-        dict containing 'dates' with array of Julian dates corresponding
-        to the leap seconds in the 'leaps' array
+        dict containing 'juls' with array of Julian dates corresponding
+        to the leap seconds in the 'leaps' array, and 'unix' with the
+        same dates as unix times; the arrays are read-only, and shared
+        by all the callers
 
     """
-    if os.environ.get('CDF_LEAPSECONDSTABLE') is not None:
-        table_file = os.environ.get('CDF_LEAPSECONDSTABLE')
-    elif os.environ.get('SPEDAS_DATA_DIR') is not None:
-        table_file = os.path.join(os.environ.get('SPEDAS_DATA_DIR'), 'CDFLeapSeconds.txt')
-    else:
-        table_file = os.path.join('data', 'CDFLeapSeconds.txt')
-
+    table_file = leap_table_file()
     table_dir = os.path.dirname(table_file)
 
     if reload or not os.path.exists(table_file):
@@ -38,18 +63,138 @@ def load_leap_table(reload=False):
                               remote_file='CDFLeapSeconds.txt',
                               local_path=table_dir)
 
-    cols = ['Year', 'Month', 'Day', 'LS', 'Drift']
-    table = pd.read_csv(table_file,
-                        delim_whitespace=True,
-                        dtype=str,
-                        names=cols,
-                        comment=';',
-                        skipinitialspace=True,
-                        index_col=False)
-
-    leap_dates = table['Year'].to_numpy() + '-' + table['Month'].to_numpy() + '-' + table['Day'].to_numpy()
-    leap_dates = time_double(leap_dates)
-    juls = np.array(leap_dates)/86400.0 + datetime.date(1970, 1, 1).toordinal() + 1721424.5
-
-    return {'leaps': np.float64(table['LS'].to_numpy()),
-            'juls': juls}
+    stat = os.stat(table_file)
+    stamp = (table_file, stat.st_mtime_ns, stat.st_size)
+
+    if reload or _leap_table['stamp'] != stamp:
+        dates = []
+        leaps = []
+        with open(table_file, 'r') as f:
+            for line in f:
+                if line.startswith(';'):
+                    continue
+                columns = line.split()
+                if len(columns) < 4:
+                    continue
+                dates.append('%04d-%02d-%02d' % (int(columns[0]), int(columns[1]), int(columns[2])))
+                leaps.append(float(columns[3]))
+
+        leap_dates = np.array(dates, dtype='datetime64[s]').astype(np.int64).astype(np.float64)
+        leaps = np.array(leaps, dtype=np.float64)
+        juls = leap_dates/86400.0 + datetime.date(1970, 1, 1).toordinal() + 1721424.5
+
+        for values in [leap_dates, leaps, juls]:
+            values.flags.writeable = False
+
+        # a leap second starts at the TAI time of the leap date, less the previous leap seconds
+        previous = np.concatenate(([0.0], leaps[:-1]))
+        _leap_table.update(stamp=stamp,
+                           table={'leaps': leaps, 'juls': juls, 'unix': leap_dates},
+                           unix=leap_dates.tolist(),
+                           tai=(leap_dates + TAI_MINUS_UNIX + previous).tolist(),
+                           leaps=[0.0] + leaps.tolist())
+
+    return _leap_table['table']
+
+
+def tai2unix(values):
+    """
+    Converts TAI times (seconds since 1958-01-01) to unix times
+
+    Parameters
+    -----------
+        values: float, list of floats or np.ndarray
+            Time values in TAI
+
+    Returns
+    --------
+        Unix times; a float for a scalar input, otherwise an array. Times in a
+        leap second repeat the last second of the day, and times before the
+        first entry of the leap second table aren't corrected for leap seconds
+    """
+    load_leap_table()
+
+    if np.ndim(values) == 0:
+        value = float(values)
+        return value - TAI_MINUS_UNIX - _leap_table['leaps'][bisect.bisect_right(_leap_table['tai'], value)]
+
+    values = np.asarray(values, dtype=np.float64)
+    leaps = np.asarray(_leap_table['leaps'])[np.searchsorted(_leap_table['tai'], values, side='right')]
+    return values - TAI_MINUS_UNIX - leaps
+
+
+def unix2tai(values):
+    """
+    Converts unix times to TAI times (seconds since 1958-01-01)
+
+    Parameters
+    -----------
+        values: float, list of floats or np.ndarray
+            Unix times
+
+    Returns
+    --------
+        TAI times; a float for a scalar input, otherwise an array
+    """
+    load_leap_table()
+
+    if np.ndim(values) == 0:
+        value = float(values)
+        return value + TAI_MINUS_UNIX + _leap_table['leaps'][bisect.bisect_right(_leap_table['unix'], value)]
+
+    values = np.asarray(values, dtype=np.float64)
+    leaps = np.asarray(_leap_table['leaps'])[np.searchsorted(_leap_table['unix'], values, side='right')]
+    return values + TAI_MINUS_UNIX + leaps
+
+
+def tt20002unix(values):
+    """
+    Converts TT2000 times (nanoseconds since 2000-01-01T12:00:00 TT) to unix times
+
+    Parameters
+    -----------
+        values: int, list of ints or np.ndarray
+            TT2000 times
+
+    Returns
+    --------
+        Unix times; a float for a scalar input, otherwise an array
+    """
+    if np.ndim(values) == 0:
+        seconds, nanoseconds = divmod(int(values), 1000000000)
+        return tai2unix(seconds + TT2000_EPOCH_TAI_SECONDS + (nanoseconds/1e9 + TT2000_EPOCH_TAI_FRACTION))
+
+    seconds, nanoseconds = np.divmod(np.asarray(values, dtype=np.int64), 1000000000)
+    return tai2unix((seconds + TT2000_EPOCH_TAI_SECONDS) + (nanoseconds/1e9 + TT2000_EPOCH_TAI_FRACTION))
+
+
+def unix2tt2000(values):
+    """
+    Converts unix times to TT2000 times (nanoseconds since 2000-01-01T12:00:00 TT)
+
+    Parameters
+    -----------
+        values: float, list of floats or np.ndarray
+            Unix times
+
+    Returns
+    --------
+        TT2000 times; an int for a scalar input, otherwise an int64 array
+    """
+    load_leap_table()
+
+    # whole seconds and fractions are kept apart, so that no precision is lost
+    # in the large offsets between the epochs
+    if np.ndim(values) == 0:
+        value = float(values)
+        seconds = np.floor(value)
+        leap = _leap_table['leaps'][bisect.bisect_right(_leap_table['unix'], value)]
+        fraction = value - seconds + leap - TT2000_EPOCH_TAI_FRACTION
+        return (int(seconds) + int(TAI_MINUS_UNIX) - TT2000_EPOCH_TAI_SECONDS)*1000000000 + int(round(fraction*1e9))
+
+    values = np.asarray(values, dtype=np.float64)
+    seconds = np.floor(values)
+    leaps = np.asarray(_leap_table['leaps'])[np.searchsorted(_leap_table['unix'], values, side='right')]
+    fraction = values - seconds + leaps - TT2000_EPOCH_TAI_FRACTION
+    whole = seconds.astype(np.int64) + (int(TAI_MINUS_UNIX) - TT2000_EPOCH_TAI_SECONDS)
+    return whole*1000000000 + np.round(fraction*1e9).astype(np.int64)
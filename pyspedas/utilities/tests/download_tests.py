@@ -1,8 +1,235 @@
 
 import os
+import shutil
+import hashlib
+import requests
+import tempfile
+import threading
 import unittest
+from functools import partial
+from unittest import mock
+from http.server import ThreadingHTTPServer, SimpleHTTPRequestHandler
+
+from pyspedas.utilities.download import download, download_file, stream_to_file
+from pyspedas.utilities import index_cache
+
+
+class QuietHandler(SimpleHTTPRequestHandler):
+    # paths of the requests received, and the number of 304 responses sent
+    requests = []
+    not_modified = 0
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        self.requests.append(self.path)
+        self.etag = None
+        if self.path.endswith('/'):
+            # send an ETag with the directory listings, and support revalidating them
+            names = sorted(os.listdir(self.translate_path(self.path)))
+            self.etag = '"' + str(hash(tuple(names))) + '"'
+            if self.headers.get('If-None-Match') == self.etag:
+                QuietHandler.not_modified += 1
+                self.send_response(304)
+                self.end_headers()
+                return
+        super().do_GET()
+
+    def end_headers(self):
+        if getattr(self, 'etag', None) is not None:
+            self.send_header('ETag', self.etag)
+        super().end_headers()
+
+
+class FlakyHandler(QuietHandler):
+    # fail the first request for each file with a 503
+    failed = set()
+
+    def do_GET(self):
+        if self.path.endswith('.txt') and self.path not in self.failed:
+            self.failed.add(self.path)
+            self.etag = None
+            self.send_error(503)
+            return
+        super().do_GET()
+
+
+class LocalServerDownloadTestCases(unittest.TestCase):
+    """Tests against a local HTTP server, so these don't require network access"""
+    handler = QuietHandler
+
+    @classmethod
+    def setUpClass(cls):
+        cls.remote_dir = tempfile.mkdtemp()
+        os.makedirs(os.path.join(cls.remote_dir, 'data', '2020'))
+        cls.names = ['test_20200101_v01.txt', 'test_20200101_v02.txt', 'test_20200102_v01.txt', 'test_20200103_v01.txt']
+        for name in cls.names:
+            with open(os.path.join(cls.remote_dir, 'data', '2020', name), 'w') as f:
+                f.write(name)
+        cls.server = ThreadingHTTPServer(('127.0.0.1', 0), partial(cls.handler, directory=cls.remote_dir))
+        cls.thread = threading.Thread(target=cls.server.serve_forever, daemon=True)
+        cls.thread.start()
+        cls.remote_path = 'http://127.0.0.1:' + str(cls.server.server_address[1]) + '/'
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+        shutil.rmtree(cls.remote_dir)
+
+    def setUp(self):
+        self.local_dir = tempfile.mkdtemp()
+        self.cache_dir = index_cache.CONFIG['cache_dir']
+        index_cache.CONFIG['cache_dir'] = os.path.join(self.local_dir, 'index_cache')
+        index_cache.clear_index_cache()
+        QuietHandler.requests = []
+        QuietHandler.not_modified = 0
+
+    def tearDown(self):
+        index_cache.clear_index_cache()
+        index_cache.CONFIG['cache_dir'] = self.cache_dir
+        shutil.rmtree(self.local_dir)
+
+    def test_concurrent_order(self):
+        remote_files = ['data/2020/test_20200103_v01.txt', 'data/2020/test_20200101_v??.txt', 'data/2020/test_20200102_v01.txt']
+        serial = download(remote_path=self.remote_path, remote_file=remote_files, local_path=self.local_dir, max_workers=1)
+        files = download(remote_path=self.remote_path, remote_file=remote_files, local_path=self.local_dir, max_workers=8)
+        expected = [os.path.join(self.local_dir, 'data', '2020', name) for name in
+                    ['test_20200103_v01.txt', 'test_20200101_v01.txt', 'test_20200101_v02.txt', 'test_20200102_v01.txt']]
+        self.assertEqual(serial, expected)
+        self.assertEqual(files, expected)
+        for file in files:
+            with open(file) as f:
+                self.assertEqual(f.read(), os.path.basename(file))
+
+    def test_concurrent_last_version(self):
+        files = download(remote_path=self.remote_path, remote_file='data/2020/test_20200101_v??.txt',
+                         local_path=self.local_dir, last_version=True)
+        self.assertEqual(files, [os.path.join(self.local_dir, 'data', '2020', 'test_20200101_v02.txt')])
+
+    def test_missing_file_local_fallback(self):
+        download(remote_path=self.remote_path, remote_file='data/2020/test_20200102_v01.txt', local_path=self.local_dir)
+        files = download(remote_path=self.remote_path, remote_file=['data/2020/test_20200102_v01.txt', 'data/2020/test_20200104_v01.txt'],
+                         local_path=self.local_dir)
+        self.assertEqual(files, [os.path.join(self.local_dir, 'data', '2020', 'test_20200102_v01.txt')])
+
+    def test_index_cache_ttl(self):
+        remote_file = 'data/2020/test_2020010?_v01.txt'
+        files = download(remote_path=self.remote_path, remote_file=remote_file, local_path=self.local_dir)
+        self.assertEqual(len(files), 3)
+        self.assertIsNotNone(index_cache.load_index(self.remote_path + 'data/2020/'))
+        # within the TTL, the cached listing is used without contacting the server
+        QuietHandler.requests = []
+        files_cached = download(remote_path=self.remote_path, remote_file=remote_file, local_path=self.local_dir, index_ttl=3600)
+        self.assertEqual(files_cached, files)
+        self.assertNotIn('/data/2020/', QuietHandler.requests)
+
+    def test_index_cache_default_ttl(self):
+        remote_file = 'data/2020/test_2020010?_v01.txt'
+        files = download(remote_path=self.remote_path, remote_file=remote_file, local_path=self.local_dir)
+        # the cached listings are revalidated by default, so new files are found
+        QuietHandler.requests = []
+        self.assertEqual(download(remote_path=self.remote_path, remote_file=remote_file, local_path=self.local_dir), files)
+        self.assertEqual(QuietHandler.not_modified, 1)
+        self.assertEqual(QuietHandler.requests.count('/data/2020/'), 1)
+        self.assertFalse(index_cache.is_fresh(index_cache.load_index(self.remote_path + 'data/2020/')))
+
+    def test_index_cache_revalidate(self):
+        remote_file = 'data/2020/test_2020010?_v01.txt'
+        files = download(remote_path=self.remote_path, remote_file=remote_file, local_path=self.local_dir)
+        # after the TTL, the listing is revalidated using its ETag
+        files_revalidated = download(remote_path=self.remote_path, remote_file=remote_file, local_path=self.local_dir, index_ttl=0)
+        self.assertEqual(files_revalidated, files)
+        self.assertEqual(QuietHandler.not_modified, 1)
+        self.assertEqual(QuietHandler.requests.count('/data/2020/'), 2)
+
+    def test_index_cache_offline(self):
+        remote_file = 'data/2020/test_20200101_v??.txt'
+        download(remote_path=self.remote_path, remote_file='data/2020/test_20200101_v01.txt', local_path=self.local_dir)
+        # no cached listing: the local directories are searched
+        files = download(remote_path=self.remote_path, remote_file=remote_file, local_path=self.local_dir, no_download=True)
+        self.assertEqual(files, [os.path.join(self.local_dir, 'data', '2020', 'test_20200101_v01.txt')])
+        download(remote_path=self.remote_path, remote_file=remote_file, local_path=self.local_dir)
+        QuietHandler.requests = []
+        # the files in the cached listing are used without walking the local directories
+        with mock.patch('os.walk') as walk:
+            files = download(remote_path=self.remote_path, remote_file=remote_file, local_path=self.local_dir, no_download=True)
+        walk.assert_not_called()
+        self.assertEqual(QuietHandler.requests, [])
+        self.assertEqual(files, [os.path.join(self.local_dir, 'data', '2020', name) for name in self.names[0:2]])
+        files = download(remote_path=self.remote_path, remote_file=remote_file, local_path=self.local_dir, no_download=True, last_version=True)
+        self.assertEqual(files, [os.path.join(self.local_dir, 'data', '2020', self.names[1])])
+
+    def test_index_cache_unreachable(self):
+        # the server can't be reached: the cached listing is used to find the local files
+        remote_path = 'http://127.0.0.1:1/'
+        index_cache.save_index(remote_path + 'data/2020/', self.names)
+        os.makedirs(os.path.join(self.local_dir, 'data', '2020'))
+        for name in self.names[1:3]:
+            open(os.path.join(self.local_dir, 'data', '2020', name), 'w').close()
+        files = download(remote_path=remote_path, remote_file='data/2020/test_*.txt', local_path=self.local_dir)
+        self.assertEqual(files, [os.path.join(self.local_dir, 'data', '2020', name) for name in self.names[1:3]])
+
+    def test_stream_to_file(self):
+        name = self.names[0]
+        url = self.remote_path + 'data/2020/' + name
+        out_file = os.path.join(self.local_dir, 'stream', name)
+        md5 = hashlib.md5(name.encode()).hexdigest()
+        with requests.get(url, stream=True) as fsrc:
+            self.assertFalse(stream_to_file(fsrc, out_file, checksum='0'*32))
+        self.assertFalse(os.path.exists(out_file))
+        with requests.get(url, stream=True) as fsrc:
+            self.assertFalse(stream_to_file(fsrc, out_file, expected_size=len(name)+1))
+        self.assertFalse(os.path.exists(out_file))
+        with requests.get(url, stream=True) as fsrc:
+            self.assertTrue(stream_to_file(fsrc, out_file, expected_size=len(name), checksum=md5))
+        with open(out_file) as f:
+            self.assertEqual(f.read(), name)
+        # no temporary files are left behind
+        self.assertEqual(os.listdir(os.path.dirname(out_file)), [name])
+
+    @unittest.skipIf(os.name != 'posix', 'file modes are POSIX-specific')
+    def test_stream_to_file_umask(self):
+        # the files get the permissions of regular files, under the current umask
+        name = self.names[0]
+        out_file = os.path.join(self.local_dir, 'stream', name)
+        umask = os.umask(0o027)
+        try:
+            with requests.get(self.remote_path + 'data/2020/' + name, stream=True) as fsrc:
+                self.assertTrue(stream_to_file(fsrc, out_file))
+        finally:
+            os.umask(umask)
+        self.assertEqual(os.stat(out_file).st_mode & 0o777, 0o640)
+
+
+class RetryDownloadTestCases(LocalServerDownloadTestCases):
+    handler = FlakyHandler
+
+    def setUp(self):
+        super().setUp()
+        FlakyHandler.failed = set()
+
+    def test_retry(self):
+        files = download(remote_path=self.remote_path, remote_file='data/2020/test_2020010?_v01.txt',
+                         local_path=self.local_dir, retry_backoff=0.01)
+        self.assertEqual(len(files), 3)
+        files = download(remote_path=self.remote_path, remote_file='data/2020/test_20200101_v02.txt',
+                         local_path=self.local_dir, max_retries=0)
+        self.assertEqual(files, [])
+
+    def test_retry_logging(self):
+        # failed attempts that are retried successfully aren't reported as errors
+        with self.assertLogs(level='INFO') as logs:
+            download(remote_path=self.remote_path, remote_file='data/2020/test_20200102_v01.txt',
+                     local_path=self.local_dir, retry_backoff=0.01)
+        self.assertEqual([record for record in logs.records if record.levelname == 'ERROR'], [])
+        # connection errors are only reported as an error after the last attempt
+        with self.assertLogs(level='WARNING') as logs:
+            self.assertIsNone(download_file(url='http://127.0.0.1:1/test.txt', filename=os.path.join(self.local_dir, 'test.txt'),
+                                            max_retries=2, retry_backoff=0.01))
+        self.assertEqual([record.levelname for record in logs.records], ['WARNING', 'WARNING', 'WARNING', 'ERROR'])
 
-from pyspedas.utilities.download import download
 
 class DownloadTestCases(unittest.TestCase):
     def test_remote_path(self):
@@ -0,0 +1,44 @@
+import subprocess
+import sys
+import unittest
+
+
+def run_python(code):
+    """Run code in a new interpreter (with nothing imported yet), and return its output"""
+    return subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, check=True).stdout
+
+
+class ImportTestCases(unittest.TestCase):
+    def test_import_is_lazy(self):
+        # importing pyspedas shouldn't import the heavy dependencies
+        output = run_python('import sys, pyspedas\n'
+                            'heavy = ["pytplot", "scipy", "astropy", "cdflib", "netCDF4", "matplotlib", "xarray",\n'
+                            '         "pyspedas.mms", "pyspedas.themis", "pyspedas.analysis"]\n'
+                            'print([m for m in heavy if m in sys.modules])')
+        self.assertEqual(output.strip(), '[]')
+
+    def test_import_time(self):
+        # benchmark: best of 3 fresh interpreters; the import took several seconds before the
+        # mission subpackages were loaded lazily, and takes a few ms now
+        times = [float(run_python('import time\n'
+                                  'start = time.perf_counter()\n'
+                                  'import pyspedas\n'
+                                  'print(time.perf_counter() - start)')) for _ in range(3)]
+        self.assertLess(min(times), 0.5)
+
+    def test_lazy_names(self):
+        output = run_python('import pyspedas\n'
+                            'import pyspedas.cotrans.cotrans_lib\n'
+                            'from pyspedas import tinterpol, mms_load_fgm\n'
+                            'print(callable(pyspedas.cotrans), callable(pyspedas.time_double), callable(tinterpol),\n'
+                            '      callable(mms_load_fgm), pyspedas.themis.__name__, "mms_eis_pad" in dir(pyspedas))')
+        self.assertEqual(output.strip(), 'True True True True pyspedas.themis True')
+
+    def test_missing_name(self):
+        import pyspedas
+        with self.assertRaises(AttributeError):
+            pyspedas.not_a_pyspedas_name
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,5 +1,9 @@
+import os
+import tempfile
 import unittest
+from unittest.mock import patch
 from datetime import datetime, timezone
+import numpy as np
 
 from pytplot import time_string, time_datetime
 from pytplot import time_float, time_double
@@ -40,5 +44,51 @@ class TimeTestCases(unittest.TestCase):
         self.assertTrue(time_double('2015-12-15 12:07:23.767000') == 1450181243.767)
         self.assertTrue(time_double(['2015-12-15 12:07:23.767000', '2015-12-15 12:07:43.767000']) == [1450181243.767, 1450181263.767])
 
+
+class LeapSecondTestCases(unittest.TestCase):
+    def setUp(self):
+        # the last few entries of the CDF leap second table
+        self.table = tempfile.NamedTemporaryFile('w', suffix='.txt', delete=False)
+        self.table.write('; Year Month Day Leap Seconds      Drift\n'
+                         '  2012   7    1   35.0            0.0  0.0\n'
+                         '  2015   7    1   36.0            0.0  0.0\n'
+                         '  2017   1    1   37.0            0.0  0.0\n')
+        self.table.close()
+        self.env = patch.dict(os.environ, {'CDF_LEAPSECONDSTABLE': self.table.name})
+        self.env.start()
+
+    def tearDown(self):
+        self.env.stop()
+        os.remove(self.table.name)
+
+    def test_tai2unix(self):
+        from pyspedas.utilities.leap_seconds import tai2unix, unix2tai
+        from pyspedas.mms.mms_tai2unix import mms_tai2unix
+        # 2017-01-01/00:00:00 UTC
+        tai = 1483228800.0 + 378691200.0 + 37.0
+        self.assertEqual(tai2unix(tai), 1483228800.0)
+        self.assertEqual(unix2tai(1483228800.0), tai)
+        # the leap second repeats the last second of 2016
+        self.assertEqual(tai2unix(tai - 0.5), 1483228799.5)
+        self.assertEqual(tai2unix(tai - 1.5), 1483228799.5)
+        self.assertEqual(tai2unix(tai - 2.0), 1483228799.0)
+
+        tais = np.linspace(1.3e9 + 378691200.0, 1.6e9 + 378691200.0, 10001)
+        unix = tai2unix(tais)
+        self.assertTrue(np.all(unix == [tai2unix(value) for value in tais]))
+        self.assertTrue(np.all(np.abs(unix2tai(unix) - tais) < 1e-6))
+        self.assertTrue(np.all(mms_tai2unix(list(tais)) == unix))
+        self.assertEqual(mms_tai2unix(tai).tolist(), [1483228800.0])
+
+    def test_tt2000(self):
+        from pyspedas.utilities.leap_seconds import tt20002unix, unix2tt2000
+        self.assertEqual(unix2tt2000(1483228800.0), 536500869184000000)
+        self.assertEqual(tt20002unix(536500869184000000), 1483228800.0)
+        tt2000 = unix2tt2000(np.array([1.3e9, 1483228800.0, 1.6e9]))
+        self.assertEqual(tt2000.dtype, np.int64)
+        self.assertEqual(tt2000[1], 536500869184000000)
+        self.assertTrue(np.all(tt20002unix(tt2000) == [1.3e9, 1483228800.0, 1.6e9]))
+
+
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file